@@ -12,6 +12,7 @@ import json
 from types import SimpleNamespace
 from PIL import Image
 import secrets
+import time
 import pandas as pd
 import io
 
@@ -36,6 +37,7 @@ from flask import (
     jsonify,
     Response,
     make_response,
+    g,
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
@@ -221,10 +223,8 @@ from database import (
     list_lender_borrowers,
     get_agent_contact,
     update_agent_contact,
-    get_lender_borrower,
     update_lender_borrower,
     add_crm_interaction,
-    list_crm_interactions,
     log_automated_email,
     get_contacts_for_automated_email,
     add_crm_task,
@@ -232,17 +232,31 @@ from database import (
     update_crm_task,
     delete_crm_task,
     add_crm_deal,
-    list_crm_deals,
     update_crm_deal,
     delete_crm_deal,
     add_crm_relationship,
-    list_crm_relationships,
+    get_crm_rollups,
+    get_occasion_contacts,
+    get_upcoming_occasions,
     delete_crm_relationship,
     add_crm_saved_view,
     list_crm_saved_views,
     delete_crm_saved_view,
 )
 
+import campaign_renderer
+import crm_bulk
+import crm_import
+import crm_import_worker
+import email_outbox
+import followup_queue
+import home_valuation
+import job_scheduler
+import crm_query
+import send_window
+import video_render_queue
+import video_render_worker
+
 # ---------------- R2 STORAGE HELPERS ----------------
 from r2_storage import (
     upload_file_to_r2,
@@ -470,6 +484,20 @@ def hex_to_color_name(hex_code):
     return hex_code
 
 
+@app.before_request
+def _start_request_timer():
+    g._request_started = time.monotonic()
+
+
+@app.after_request
+def _record_request_latency(response):
+    """Feed request durations to the campaign send governor (send_window.py)."""
+    started = g.pop("_request_started", None)
+    if started is not None and not request.path.startswith("/static/"):
+        send_window.request_latency.record(time.monotonic() - started)
+    return response
+
+
 @app.context_processor
 def inject_professionals():
     """Make professionals data available to all templates - CRITICAL FOR DASHBOARD DISPLAY."""
@@ -886,7 +914,6 @@ def agent_remove_participant(tx_id, participant_id):
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from apscheduler.schedulers.background import BackgroundScheduler
 
 EMAIL_HOST = os.environ.get("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.environ.get("EMAIL_PORT", 587))
@@ -1008,123 +1035,134 @@ def get_due_reminders():
 
 
 def send_due_reminders():
+    """Email reminders that are due."""
     reminders = get_due_reminders()
+    sent = 0
     for r in reminders:
         if r.get("email"):
-            send_reminder_email(r["email"], r["subject"], r["body"])
+            sent += bool(send_reminder_email(r["email"], r["subject"], r["body"]))
+    return sent
 
 
 # ====================== CRM AUTOMATED EMAIL FUNCTIONS ======================
 
+# Campaign templates: str.format fields over the contact row, the campaign
+# context passed to queue_campaign_emails and the professional's {signature}.
+# See campaign_renderer.py.
+BIRTHDAY_CAMPAIGN = campaign_renderer.Campaign(
+    "birthday",
+    subject="🎂 Happy Birthday, {name}!",
+    text="""Hi {name},
+
+Wishing you a wonderful birthday filled with joy and happiness!
+
+Thank you for being part of our community.
+
+{signature}
+""",
+)
+
+ANNIVERSARY_CAMPAIGN = campaign_renderer.Campaign(
+    "anniversary",
+    subject="🏠 Happy Home Anniversary, {name}!",
+    text="""Hi {name},
+
+Congratulations on your home anniversary{property_info}!
+
+We hope you're enjoying your home and creating wonderful memories.
+
+{signature}
+""",
+)
+
+SEASONAL_CAMPAIGN = campaign_renderer.Campaign(
+    "seasonal",
+    subject="🍂 {season} Home Maintenance Checklist",
+    text="""Hi {name},
+
+Here's your {season_lower} home maintenance checklist to keep your home in great shape:
+
+{checklist}
+
+Stay safe and enjoy the season!
+
+{signature}
+""",
+)
+
+EQUITY_CAMPAIGN = campaign_renderer.Campaign(
+    "equity",
+    subject="💰 Your Home Equity Update - {month}",
+    text="""Hi {name},
+
+Here's your monthly equity update:
+
+Property: {property_address}
+Estimated Value: ${property_value:,.0f}
+Estimated Equity: ${equity_estimate:,.0f}
+
+Your home equity continues to grow! This represents significant wealth you've built.
+
+{signature}
+""",
+    defaults={"property_address": "Your Home", "property_value": 0, "equity_estimate": 0},
+)
+
+HOLIDAY_CAMPAIGN = campaign_renderer.Campaign(
+    "holiday",
+    subject="🎄 {holiday}, {name}!",
+    text="""Hi {name},
+
+{holiday}! We hope you have a wonderful celebration with family and friends.
+
+Thank you for being part of our community.
+
+{signature}
+""",
+)
+
+
+def queue_campaign_emails(campaign, contacts, period, **context):
+    """Render a campaign for its contacts into the outbox and start sending.
+
+    period names the campaign instance ("2026" for a birthday, "2026-05" for a
+    monthly equity update). Contacts already in the send ledger for it are
+    dropped with one range scan before rendering, and the outbox insert claims
+    the rest in the same transaction, so re-running a job (after a crash, or in
+    two workers) is a cheap no-op.
+
+    The template is compiled once for the run and messages stream straight
+    into the outbox insert. The outbox sender reuses SMTP sessions,
+    rate-limits, retries failures and writes automated_email_logs in bulk;
+    whatever isn't sent now is picked up by the scheduled drain_outbox job.
+    """
+    sent = email_outbox.ledger_keys(campaign.email_type, period)
+    pending = [c for c in contacts if (c['type'], c['id']) not in sent]
+    if not pending:
+        return 0
+    compiled = campaign.compile(**context)
+    # Large campaigns go out in shards spread over the send window, each
+    # enqueued in its own short transaction (see send_window.py)
+    shards = send_window.shard_contacts(pending)
+    queued = 0
+    for shard, delay in zip(shards, send_window.shard_delays(len(shards))):
+        queued += email_outbox.enqueue_many(
+            campaign_renderer.render_messages(compiled, shard), period=period, delay_seconds=delay,
+        )
+    if queued:
+        print(f"[EMAIL OUTBOX] Queued {queued} {campaign.email_type} emails in {len(shards)} shard(s)")
+        email_outbox.drain_outbox()
+    return queued
+
+
 def get_birthday_contacts():
-    """Get contacts with birthdays today."""
-    from datetime import datetime
-    from database import get_connection
-    today = datetime.now()
-    today_str = f"{today.month:02d}/{today.day:02d}"
-    
-    contacts = []
-    # Get agent contacts
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT id, agent_user_id, name, email, birthday
-        FROM agent_contacts
-        WHERE email IS NOT NULL AND email != '' 
-          AND auto_birthday = 1
-          AND birthday LIKE ?
-        """,
-        (f"%{today_str}%",)
-    )
-    for row in cur.fetchall():
-        contacts.append({
-            'id': row['id'],
-            'type': 'agent_contact',
-            'professional_id': row['agent_user_id'],
-            'name': row['name'],
-            'email': row['email']
-        })
-    
-    # Get lender borrowers
-    cur.execute(
-        """
-        SELECT id, lender_user_id, name, email, birthday
-        FROM lender_borrowers
-        WHERE email IS NOT NULL AND email != '' 
-          AND auto_birthday = 1
-          AND birthday LIKE ?
-        """,
-        (f"%{today_str}%",)
-    )
-    for row in cur.fetchall():
-        contacts.append({
-            'id': row['id'],
-            'type': 'lender_borrower',
-            'professional_id': row['lender_user_id'],
-            'name': row['name'],
-            'email': row['email']
-        })
-    
-    conn.close()
-    return contacts
+    """Get contacts with birthdays today (indexed month/day lookup)."""
+    return get_occasion_contacts("birthday")
 
 
 def get_anniversary_contacts():
-    """Get contacts with home anniversaries today."""
-    from datetime import datetime
-    from database import get_connection
-    today = datetime.now()
-    today_str = f"{today.month:02d}/{today.day:02d}"
-    
-    contacts = []
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Agent contacts
-    cur.execute(
-        """
-        SELECT id, agent_user_id, name, email, home_anniversary, property_address
-        FROM agent_contacts
-        WHERE email IS NOT NULL AND email != '' 
-          AND auto_anniversary = 1
-          AND home_anniversary LIKE ?
-        """,
-        (f"%{today_str}%",)
-    )
-    for row in cur.fetchall():
-        contacts.append({
-            'id': row['id'],
-            'type': 'agent_contact',
-            'professional_id': row['agent_user_id'],
-            'name': row['name'],
-            'email': row['email'],
-            'property_address': row['property_address']
-        })
-    
-    # Lender borrowers
-    cur.execute(
-        """
-        SELECT id, lender_user_id, name, email, home_anniversary, property_address
-        FROM lender_borrowers
-        WHERE email IS NOT NULL AND email != '' 
-          AND auto_anniversary = 1
-          AND home_anniversary LIKE ?
-        """,
-        (f"%{today_str}%",)
-    )
-    for row in cur.fetchall():
-        contacts.append({
-            'id': row['id'],
-            'type': 'lender_borrower',
-            'professional_id': row['lender_user_id'],
-            'name': row['name'],
-            'email': row['email'],
-            'property_address': row['property_address']
-        })
-    
-    conn.close()
-    return contacts
+    """Get contacts with home anniversaries today (indexed month/day lookup)."""
+    return get_occasion_contacts("anniversary")
 
 
 def send_birthday_emails():
@@ -1132,23 +1170,7 @@ def send_birthday_emails():
     if not EMAIL_USER or not EMAIL_PASS:
         return
     
-    contacts = get_birthday_contacts()
-    for contact in contacts:
-        subject = f"🎂 Happy Birthday, {contact['name']}!"
-        body = f"""Hi {contact['name']},
-
-Wishing you a wonderful birthday filled with joy and happiness!
-
-Thank you for being part of our community.
-
-Best regards,
-Your Life, Your Home Team
-"""
-        if send_reminder_email(contact['email'], subject, body):
-            log_automated_email(
-                contact['id'], contact['type'], contact['professional_id'],
-                'birthday', contact['email'], subject, 'sent'
-            )
+    return queue_campaign_emails(BIRTHDAY_CAMPAIGN, get_birthday_contacts(), period=str(datetime.now().year))
 
 
 def send_anniversary_emails():
@@ -1158,22 +1180,8 @@ def send_anniversary_emails():
     
     contacts = get_anniversary_contacts()
     for contact in contacts:
-        property_info = f" at {contact.get('property_address', 'your home')}" if contact.get('property_address') else ""
-        subject = f"🏠 Happy Home Anniversary, {contact['name']}!"
-        body = f"""Hi {contact['name']},
-
-Congratulations on your home anniversary{property_info}!
-
-We hope you're enjoying your home and creating wonderful memories.
-
-Best regards,
-Your Life, Your Home Team
-"""
-        if send_reminder_email(contact['email'], subject, body):
-            log_automated_email(
-                contact['id'], contact['type'], contact['professional_id'],
-                'anniversary', contact['email'], subject, 'sent'
-            )
+        contact['property_info'] = f" at {contact['property_address']}" if contact.get('property_address') else ""
+    return queue_campaign_emails(ANNIVERSARY_CAMPAIGN, contacts, period=str(datetime.now().year))
 
 
 def send_seasonal_checklists():
@@ -1270,25 +1278,11 @@ def send_seasonal_checklists():
     
     conn.close()
     
-    # Send to all contacts (only once per season - you may want to track this)
-    for contact in contacts:
-        subject = f"🍂 {season} Home Maintenance Checklist"
-        body = f"""Hi {contact['name']},
-
-Here's your {season.lower()} home maintenance checklist to keep your home in great shape:
-
-{checklist}
-
-Stay safe and enjoy the season!
-
-Best regards,
-Your Life, Your Home Team
-"""
-        if send_reminder_email(contact['email'], subject, body):
-            log_automated_email(
-                contact['id'], contact['type'], contact['professional_id'],
-                'seasonal', contact['email'], subject, 'sent'
-            )
+    # Once per monthly run; a retried or doubled run the same month is a no-op
+    return queue_campaign_emails(
+        SEASONAL_CAMPAIGN, contacts, period=datetime.now().strftime('%Y-%m'),
+        season=season, season_lower=season.lower(), checklist=checklist,
+    )
 
 
 def send_equity_updates():
@@ -1373,28 +1367,9 @@ def send_equity_updates():
     
     conn.close()
     
-    for contact in contacts:
-        equity = contact.get('equity_estimate', 0)
-        property_val = contact.get('property_value', 0)
-        subject = f"💰 Your Home Equity Update - {today.strftime('%B %Y')}"
-        body = f"""Hi {contact['name']},
-
-Here's your monthly equity update:
-
-Property: {contact.get('property_address', 'Your Home')}
-Estimated Value: ${property_val:,.0f}
-Estimated Equity: ${equity:,.0f}
-
-Your home equity continues to grow! This represents significant wealth you've built.
-
-Best regards,
-Your Life, Your Home Team
-"""
-        if send_reminder_email(contact['email'], subject, body):
-            log_automated_email(
-                contact['id'], contact['type'], contact['professional_id'],
-                'equity', contact['email'], subject, 'sent'
-            )
+    return queue_campaign_emails(
+        EQUITY_CAMPAIGN, contacts, period=today.strftime('%Y-%m'), month=today.strftime('%B %Y'),
+    )
 
 
 def send_holiday_greetings():
@@ -1456,102 +1431,44 @@ def send_holiday_greetings():
     
     conn.close()
     
-    for contact in contacts:
-        subject = f"🎄 {holiday}, {contact['name']}!"
-        body = f"""Hi {contact['name']},
-
-{holiday}! We hope you have a wonderful celebration with family and friends.
-
-Thank you for being part of our community.
-
-Best regards,
-Your Life, Your Home Team
-"""
-        if send_reminder_email(contact['email'], subject, body):
-            log_automated_email(
-                contact['id'], contact['type'], contact['professional_id'],
-                'holiday', contact['email'], subject, 'sent'
-            )
+    return queue_campaign_emails(HOLIDAY_CAMPAIGN, contacts, period=today.strftime('%Y-%m-%d'), holiday=holiday)
 
 
 def update_home_values_daily():
     """Automatically update home values daily using Homebot-style appreciation formulas."""
-    from database import get_connection, get_user_properties, get_homeowner_snapshot_for_property, upsert_homeowner_snapshot_for_property
-    from datetime import datetime, timedelta
-    
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        
-        # Get all homeowners with snapshots
-        cur.execute("""
-            SELECT DISTINCT user_id, property_id 
-            FROM homeowner_snapshots 
-            WHERE value_estimate IS NOT NULL OR loan_balance IS NOT NULL
-        """)
-        snapshots = cur.fetchall()
-        conn.close()
-        
-        updated_count = 0
-        for row in snapshots:
-            user_id = row['user_id']
-            property_id = row['property_id'] if row['property_id'] else None
-            
-            if not property_id:
-                continue
-                
-            # Get current snapshot
-            snapshot = get_homeowner_snapshot_for_property(user_id, property_id)
-            if not snapshot:
-                continue
-            
-            # Apply Homebot-style daily appreciation (3.5% annual = ~0.0096% daily)
-            # Only update if value hasn't been refreshed in last 24 hours
-            last_refresh = snapshot.get('last_value_refresh')
-            if last_refresh:
-                try:
-                    last_date = datetime.fromisoformat(last_refresh.replace('Z', '+00:00'))
-                    if (datetime.now() - last_date.replace(tzinfo=None)).days < 1:
-                        continue  # Skip if updated in last 24 hours
-                except:
-                    pass
-            
-            current_value = snapshot.get('value_estimate')
-            if current_value and current_value > 0:
-                # Daily appreciation: 1.035^(1/365) - 1 ≈ 0.000094% per day
-                daily_rate = (1.035 ** (1/365)) - 1
-                new_value = current_value * (1 + daily_rate)
-                
-                # Update snapshot with new value (preserve other fields)
-                upsert_homeowner_snapshot_for_property(
-                    user_id=user_id,
-                    property_id=property_id,
-                    value_estimate=new_value,
-                )
-                updated_count += 1
-        
-        print(f"✓ Daily value update: {updated_count} properties updated")
+        # Vectorized over every snapshot in one transaction; see home_valuation.py
+        result = home_valuation.run_valuation()
+        print(f"✓ Daily value update: {result['updated']} properties updated in {result['seconds']}s")
+        return result['updated']
     except Exception as e:
         print(f"Error in daily value update: {e}")
+        raise
+
+
+# Jobs run only in the worker holding the scheduler lease; see job_scheduler.py
+SCHEDULER = job_scheduler.JobScheduler()
 
 
 def start_scheduler():
     """Start background scheduler safely without blocking app startup."""
     try:
-        scheduler = BackgroundScheduler()
-        scheduler.add_job(send_due_reminders, "cron", hour=12, minute=0)
+        SCHEDULER.add_job("send_due_reminders", send_due_reminders, "cron", hour=12, minute=0)
         # CRM automated emails
-        scheduler.add_job(send_birthday_emails, "cron", hour=9, minute=0)  # 9 AM daily
-        scheduler.add_job(send_anniversary_emails, "cron", hour=9, minute=5)  # 9:05 AM daily
-        scheduler.add_job(send_seasonal_checklists, "cron", day=1, hour=10, minute=0)  # 1st of month, 10 AM
-        scheduler.add_job(send_equity_updates, "cron", day=1, hour=10, minute=5)  # 1st of month, 10:05 AM
-        scheduler.add_job(send_holiday_greetings, "cron", hour=9, minute=10)  # 9:10 AM daily
+        SCHEDULER.add_job("send_birthday_emails", send_birthday_emails, "cron", hour=9, minute=0)  # 9 AM daily
+        SCHEDULER.add_job("send_anniversary_emails", send_anniversary_emails, "cron", hour=9, minute=5)  # 9:05 AM daily
+        SCHEDULER.add_job("send_seasonal_checklists", send_seasonal_checklists, "cron", day=1, hour=10, minute=0)  # 1st of month, 10 AM
+        SCHEDULER.add_job("send_equity_updates", send_equity_updates, "cron", day=1, hour=10, minute=5)  # 1st of month, 10:05 AM
+        SCHEDULER.add_job("send_holiday_greetings", send_holiday_greetings, "cron", hour=9, minute=10)  # 9:10 AM daily
+        SCHEDULER.add_job("send_followup_digests", followup_queue.send_followup_digests, "cron", hour=8, minute=0)  # 8 AM daily
         # Automatic daily home value updates (Homebot-style)
-        scheduler.add_job(update_home_values_daily, "cron", hour=2, minute=0)  # 2 AM daily
-        scheduler.start()
+        SCHEDULER.add_job("update_home_values_daily", update_home_values_daily, "cron", hour=2, minute=0)  # 2 AM daily
+        # Outbox retries and anything a campaign job didn't finish sending
+        SCHEDULER.add_job("drain_outbox", email_outbox.drain_outbox, "interval", quiet=True, minutes=1)
+        SCHEDULER.start()
         print("✓ Reminder scheduler started with CRM automation and daily value updates.")
     except Exception as e:
-        print(f"⚠ Scheduler error: {e}")(f"⚠ Scheduler could not start (non-critical): {e}")
+        print(f"⚠ Scheduler could not start (non-critical): {e}")
 
 
 # Start scheduler when app starts (non-blocking)
@@ -1560,6 +1477,19 @@ try:
 except Exception as e:
     print(f"⚠ Scheduler initialization failed (non-critical): {e}")
 
+# Background CRM imports; also resumes jobs left behind by a restarted worker
+try:
+    crm_import_worker.start()
+except Exception as e:
+    print(f"⚠ CRM import worker could not start (non-critical): {e}")
+
+# Video Studio render processes; picks up anything queued before a restart
+if VIDEO_STUDIO_ENABLED:
+    try:
+        video_render_worker.start()
+    except Exception as e:
+        print(f"⚠ Video render workers could not start (non-critical): {e}")
+
 
 # -------------------------------------------------
 # SHARED UTILS
@@ -1679,7 +1609,7 @@ def get_agent_dashboard_metrics(user_id):
     return {
         "new_leads": sum((c1.get("stage") or "") == "new" for c1 in contacts_list),
         "active_transactions": len(transactions) if transactions else 0,
-        "followups_today": max(len(contacts_list) // 2, 0),
+        "followups_today": followup_queue.due_count(user_id, "agent"),
     }
 
 
@@ -2087,8 +2017,7 @@ def signup():
             
             from database import (
                 create_client_relationship, 
-                add_agent_contact, 
-                list_agent_contacts,
+                add_agent_contact,
                 get_user_by_id
             )
             
@@ -2126,16 +2055,11 @@ def signup():
                         # Create CRM contact - CRITICAL
                         try:
                             # Check if contact already exists
-                            existing_contacts = list_agent_contacts(agent_id)
-                            contact_exists = False
-                            existing_contact_id = None
-                            for existing in existing_contacts:
-                                existing_dict = dict(existing) if hasattr(existing, 'keys') and not isinstance(existing, dict) else existing
-                                if existing_dict.get("email") and existing_dict.get("email").lower() == email.lower():
-                                    contact_exists = True
-                                    existing_contact_id = existing_dict.get("id")
-                                    print(f"SIGNUP: CRM contact already exists for {email} (ID: {existing_contact_id})")
-                                    break
+                            from crm_dedup import find_existing_contact
+                            existing_contact_id = find_existing_contact("agent", agent_id, {"email": email})
+                            contact_exists = existing_contact_id is not None
+                            if contact_exists:
+                                print(f"SIGNUP: CRM contact already exists for {email} (ID: {existing_contact_id})")
                             
                             if not contact_exists:
                                 contact_id = add_agent_contact(
@@ -2449,13 +2373,10 @@ def debug_sync_homeowner_to_crm(homeowner_id):
             return jsonify({"error": "Homeowner has no linked agent"}), 400
         
         # Check if contact already exists
-        existing_contacts = list_agent_contacts(agent_id)
-        contact_exists = False
-        for existing in existing_contacts:
-            existing_dict = dict(existing) if hasattr(existing, 'keys') and not isinstance(existing, dict) else existing
-            if existing_dict.get("email") and existing_dict.get("email").lower() == homeowner_dict.get("email", "").lower():
-                contact_exists = True
-                break
+        from crm_dedup import find_existing_contact
+        contact_exists = find_existing_contact(
+            "agent", agent_id, {"email": homeowner_dict.get("email", "")}
+        ) is not None
         
         if contact_exists:
             return jsonify({"message": "Contact already exists in CRM", "homeowner_id": homeowner_id, "agent_id": agent_id})
@@ -2550,6 +2471,9 @@ def debug_sync_all_homeowners_to_crm():
         homeowners = cur.fetchall()
         conn.close()
         
+        from crm_dedup import DuplicateIndex
+        dedup_by_agent = {}
+        
         results = []
         for homeowner_row in homeowners:
             homeowner = dict(homeowner_row) if hasattr(homeowner_row, 'keys') and not isinstance(homeowner_row, dict) else homeowner_row
@@ -2571,16 +2495,10 @@ def debug_sync_all_homeowners_to_crm():
                 results.append({"homeowner_id": homeowner_id, "status": "skipped", "reason": "no agent"})
                 continue
             
-            # Check if contact exists
-            existing_contacts = list_agent_contacts(agent_id)
-            contact_exists = False
-            for existing in existing_contacts:
-                existing_dict = dict(existing) if hasattr(existing, 'keys') and not isinstance(existing, dict) else existing
-                if existing_dict.get("email") and existing_dict.get("email").lower() == homeowner.get("email", "").lower():
-                    contact_exists = True
-                    break
-            
-            if contact_exists:
+            # Check if contact exists (one book read per agent, then set lookups)
+            if agent_id not in dedup_by_agent:
+                dedup_by_agent[agent_id] = DuplicateIndex.for_book("agent", agent_id, ("email",))
+            if dedup_by_agent[agent_id].check_and_add({"email": homeowner.get("email", "")}, homeowner_id):
                 results.append({"homeowner_id": homeowner_id, "status": "exists", "agent_id": agent_id})
                 continue
             
@@ -4853,6 +4771,46 @@ def lender_dashboard():
 # -------------------------------------------------
 # AGENT ROUTES
 # -------------------------------------------------
+# Contacts shown in the CRM "Needs Follow-up" panel (the head of the queue)
+FOLLOWUP_PANEL_SIZE = 25
+
+
+def update_followup_days_from_form(user_id):
+    """Handle the CRM follow-up threshold form (agent and lender)."""
+    try:
+        days = int(request.form.get("follow_up_days", "30").strip())
+        followup_queue.set_follow_up_days(user_id, days)
+        flash(f"Follow-up reminder set to {days} days!", "success")
+    except ValueError:
+        flash("Please enter a number between 1 and 365.", "error")
+
+
+def run_bulk_form_action(role, user_id, ids, noun):
+    """Handle the CRM Bulk Actions form (agent and lender) in one transaction."""
+    action_type = request.form.get("bulk_action_type", "").strip()
+    if not ids or not action_type:
+        return
+    # Checkbox values arrive as strings; apply_bulk takes integer ids
+    params = {"ids": [int(i) for i in ids if i.strip().isdigit()]}
+    if action_type in ("change_stage", "change_status"):
+        params.update(operation="set_stage",
+                      stage=request.form.get("bulk_stage" if role == "agent" else "bulk_status", "").strip())
+    elif action_type in ("add_tag", "remove_tag"):
+        params.update(operation=action_type, tag=request.form.get("bulk_tag", ""))
+    elif action_type in ("automation_on", "automation_off"):
+        params.update(operation="set_automation", enabled=action_type == "automation_on")
+    else:
+        params.update(operation=action_type)
+    try:
+        result = crm_bulk.apply_bulk(role, user_id, **params)
+        verb = "Deleted" if params["operation"] == "delete" else "Updated"
+        flash(f"{verb} {result['affected']} of {result['matched']} selected {noun}(s).", "success")
+    except crm_bulk.BulkOperationError as e:
+        flash(str(e), "error")
+    except Exception as e:
+        flash(f"Error performing bulk action: {e}", "error")
+
+
 @app.route("/agent/crm", methods=["GET", "POST"])
 def agent_crm():
     """Agent CRM - comprehensive contact management with automated emails."""
@@ -5102,278 +5060,79 @@ def agent_crm():
                     flash(f"Error adding relationship: {e}", "error")
         
         elif action == "bulk_action":
-            contact_ids = request.form.getlist("contact_ids")
-            bulk_action_type = request.form.get("bulk_action_type", "").strip()
-            
-            if contact_ids and bulk_action_type:
-                try:
-                    for contact_id in contact_ids:
-                        if bulk_action_type == "add_tag":
-                            tag = request.form.get("bulk_tag", "").strip()
-                            contact = get_agent_contact(int(contact_id), user["id"])
-                            if contact:
-                                contact_dict = dict(contact) if hasattr(contact, 'keys') else contact
-                                existing_tags = (contact_dict.get("tags") or "").split(",")
-                                existing_tags = [t.strip() for t in existing_tags if t.strip()]
-                                if tag and tag not in existing_tags:
-                                    existing_tags.append(tag)
-                                    update_agent_contact(int(contact_id), user["id"], tags=", ".join(existing_tags))
-                        elif bulk_action_type == "change_stage":
-                            stage = request.form.get("bulk_stage", "").strip()
-                            if stage:
-                                update_agent_contact(int(contact_id), user["id"], stage=stage)
-                    flash(f"Bulk action completed for {len(contact_ids)} contact(s)!", "success")
-                except Exception as e:
-                    flash(f"Error performing bulk action: {e}", "error")
+            run_bulk_form_action("agent", user["id"], request.form.getlist("contact_ids"), "contact")
+        
+        elif action == "update_followup_days":
+            update_followup_days_from_form(user["id"])
 
     stage_filter = request.args.get("stage")
     search_query = request.args.get("search", "").strip()
     tag_filter = request.args.get("tag", "").strip()
     sort_by = request.args.get("sort", "name")  # name, stage, last_touch, created_at
-    
-    # DEBUG: Log contact loading
-    print(f"\n{'='*60}")
-    print(f"AGENT CRM: Loading contacts for agent {user['id']}")
-    print(f"  Stage filter: {stage_filter}")
-    print(f"  Search query: {search_query}")
-    print(f"  Tag filter: {tag_filter}")
-    print(f"{'='*60}\n")
+    cursor = request.args.get("cursor", "").strip() or None
+    next_cursor = None
     
     try:
-        contacts = list_agent_contacts(user["id"], stage_filter)
-        print(f"AGENT CRM: Found {len(contacts)} contacts from database")
-        
-        # DEBUG: Log all contacts found
-        for idx, contact in enumerate(contacts[:5]):  # Log first 5
-            contact_dict = dict(contact) if hasattr(contact, 'keys') and not isinstance(contact, dict) else contact
-            print(f"  Contact {idx+1}: {contact_dict.get('name')} ({contact_dict.get('email')}) - Stage: {contact_dict.get('stage')}")
-        
-        if len(contacts) > 5:
-            print(f"  ... and {len(contacts) - 5} more contacts")
-        # Convert contacts to dicts for JSON serialization in template
-        # Handle None values and ensure all fields exist
-        contacts_list = []
-        for contact in contacts:
-            try:
-                # Convert sqlite3.Row to dict, handling missing columns gracefully
-                # sqlite3.Row objects need to be converted to dict explicitly
-                import sqlite3
-                if isinstance(contact, sqlite3.Row):
-                    contact_dict = {key: contact[key] for key in contact.keys()}
-                elif hasattr(contact, 'keys') and not isinstance(contact, dict):
-                    # It's a Row-like object
-                    contact_dict = {key: contact[key] for key in contact.keys()}
-                elif isinstance(contact, dict):
-                    contact_dict = contact.copy()
-                else:
-                    # Fallback: try to convert
-                    try:
-                        contact_dict = dict(contact)
-                    except:
-                        contact_dict = {key: getattr(contact, key, None) for key in dir(contact) if not key.startswith('_')}
-                
-                # Ensure all expected fields exist with defaults
-                expected_fields = {
-                    'id': None, 'created_at': '', 'name': '', 'email': '', 'phone': '',
-                    'stage': 'new', 'best_contact': '', 'last_touch': '', 'birthday': '',
-                    'home_anniversary': '', 'address': '', 'notes': '', 'tags': '',
-                    'property_address': '', 'property_value': None, 'equity_estimate': None,
-                    'auto_birthday': 1, 'auto_anniversary': 1, 'auto_seasonal': 1,
-                    'auto_equity': 1, 'auto_holidays': 1, 'equity_frequency': 'monthly'
-                }
-                for field, default in expected_fields.items():
-                    if field not in contact_dict:
-                        contact_dict[field] = default
-                
-                # Apply search filter
-                if search_query:
-                    search_lower = search_query.lower()
-                    matches = (
-                        search_lower in (contact_dict.get('name') or '').lower() or
-                        search_lower in (contact_dict.get('email') or '').lower() or
-                        search_lower in (contact_dict.get('phone') or '').lower() or
-                        search_lower in (contact_dict.get('property_address') or '').lower() or
-                        search_lower in (contact_dict.get('notes') or '').lower() or
-                        search_lower in (contact_dict.get('tags') or '').lower()
-                    )
-                    if not matches:
-                        continue
-                
-                # Apply tag filter
-                if tag_filter:
-                    contact_tags = (contact_dict.get('tags') or '').lower()
-                    if tag_filter.lower() not in contact_tags:
-                        continue
-                
-                # Fetch interaction count and history for this contact
-                try:
-                    interactions = list_crm_interactions(
-                        contact_dict['id'], "agent_contact", user["id"], limit=50
-                    )
-                    contact_dict['interaction_count'] = len(interactions)
-                    contact_dict['recent_interactions'] = [
-                        dict(i) if hasattr(i, 'keys') else i for i in interactions[:3]
-                    ]
-                    contact_dict['all_interactions'] = [
-                        dict(i) if hasattr(i, 'keys') else i for i in interactions
-                    ]
-                except Exception as e:
-                    print(f"Error fetching interactions: {e}")
-                    contact_dict['interaction_count'] = 0
-                    contact_dict['recent_interactions'] = []
-                    contact_dict['all_interactions'] = []
-                
-                # Fetch tasks for this contact
-                try:
-                    tasks = list_crm_tasks(user["id"], contact_dict['id'], "agent_contact", status="pending")
-                    tasks_list = []
-                    for t in tasks:
-                        if hasattr(t, 'keys'):
-                            tasks_list.append(dict(t))
-                        else:
-                            tasks_list.append(t)
-                    contact_dict['pending_tasks'] = tasks_list
-                    contact_dict['task_count'] = len(tasks_list)
-                except Exception as e:
-                    print(f"Error fetching tasks: {e}")
-                    contact_dict['pending_tasks'] = []
-                    contact_dict['task_count'] = 0
-                
-                # Fetch deals for this contact
-                try:
-                    deals = list_crm_deals(user["id"], contact_dict['id'], "agent_contact")
-                    deals_list = []
-                    for d in deals:
-                        if hasattr(d, 'keys'):
-                            deals_list.append(dict(d))
-                        else:
-                            deals_list.append(d)
-                    contact_dict['deals'] = deals_list
-                    contact_dict['deal_count'] = len(deals_list)
-                    contact_dict['total_pipeline_value'] = sum([
-                        (d.get('deal_value') if isinstance(d, dict) else (d['deal_value'] if 'deal_value' in d else 0)) or 0 
-                        for d in deals_list
-                    ])
-                except Exception as e:
-                    print(f"Error fetching deals for contact {contact_dict.get('id')}: {e}")
-                    contact_dict['deals'] = []
-                    contact_dict['deal_count'] = 0
-                    contact_dict['total_pipeline_value'] = 0
-                
-                # Fetch relationships for this contact
-                try:
-                    relationships = list_crm_relationships(contact_dict['id'], "agent_contact", user["id"])
-                    relationships_list = []
-                    for r in relationships:
-                        if hasattr(r, 'keys'):
-                            relationships_list.append(dict(r))
-                        else:
-                            relationships_list.append(r)
-                    contact_dict['relationships'] = relationships_list
-                except Exception as e:
-                    print(f"Error fetching relationships for contact {contact_dict.get('id')}: {e}")
-                    contact_dict['relationships'] = []
-                
-                contacts_list.append(contact_dict)
-            except Exception as e:
-                import traceback
-                print(f"Error converting contact: {traceback.format_exc()}")
-                continue
-        
-        # Ensure all contacts are dicts before sorting/stats
-        contacts_list_dicts = []
-        for c in contacts_list:
-            if isinstance(c, dict):
-                contacts_list_dicts.append(c)
-            elif hasattr(c, 'keys'):
-                try:
-                    import sqlite3
-                    if isinstance(c, sqlite3.Row):
-                        contacts_list_dicts.append({key: c[key] for key in c.keys()})
-                    else:
-                        contacts_list_dicts.append(dict(c))
-                except Exception as e:
-                    print(f"Error converting contact to dict: {e}")
-                    continue
-            else:
-                print(f"Skipping invalid contact: {type(c)}")
-                continue
-        
-        # Sort contacts
-        if sort_by == "name":
-            contacts_list_dicts.sort(key=lambda x: (x.get('name') or '').lower() if isinstance(x, dict) else '')
-        elif sort_by == "stage":
-            stage_order = {'new': 0, 'nurture': 1, 'active': 2, 'past': 3, 'sphere': 4}
-            contacts_list_dicts.sort(key=lambda x: stage_order.get(x.get('stage', 'new') if isinstance(x, dict) else 'new', 5))
-        elif sort_by == "last_touch":
-            contacts_list_dicts.sort(key=lambda x: (x.get('last_touch') or '') if isinstance(x, dict) else '', reverse=True)
-        elif sort_by == "created_at":
-            contacts_list_dicts.sort(key=lambda x: (x.get('created_at') or '') if isinstance(x, dict) else '', reverse=True)
-        
-        # Calculate stats
-        total_contacts = len(contacts_list_dicts)
-        all_tasks = list_crm_tasks(user["id"], status="pending")
-        all_deals_raw = list_crm_deals(user["id"])
-        
-        # Convert all_deals to dicts
-        all_deals = []
-        for d in all_deals_raw:
-            if hasattr(d, 'keys'):
-                all_deals.append(dict(d))
-            else:
-                all_deals.append(d)
-        
-        # Get follow-up threshold from user settings
-        from database import get_user_by_id
-        user_details = get_user_by_id(user["id"])
-        if user_details and hasattr(user_details, 'keys'):
-            user_details = dict(user_details)
-        follow_up_days = user_details.get('follow_up_days', 30) if user_details and isinstance(user_details, dict) else 30
+        # Filtering, sorting and paging happen in SQL (see crm_query.py)
+        page = crm_query.fetch_page(
+            "agent", user["id"], stage=stage_filter, search=search_query,
+            tag=tag_filter, sort_by=sort_by, cursor=cursor,
+            page_size=request.args.get("per_page", crm_query.DEFAULT_PAGE_SIZE, type=int),
+        )
+        contacts_list_dicts = page["items"]
+        sort_by = page["sort_by"]
+        next_cursor = page["next_cursor"]
+        print(f"AGENT CRM: {len(contacts_list_dicts)} contacts on this page for agent {user['id']}"
+              f"{' (more available)' if page['has_more'] else ''}")
+        
+        # Interactions, tasks, deals and relationships for every contact on the
+        # page in one grouped query per table instead of four per contact
+        try:
+            rollups = get_crm_rollups(
+                user["id"], [c['id'] for c in contacts_list_dicts], "agent_contact"
+            )
+        except Exception as e:
+            print(f"Error fetching CRM rollups: {e}")
+            rollups = {}
+        for contact_dict in contacts_list_dicts:
+            contact_dict.update(rollups.get(contact_dict['id']) or {
+                'interaction_count': 0, 'recent_interactions': [], 'all_interactions': [],
+                'pending_tasks': [], 'task_count': 0,
+                'deals': [], 'deal_count': 0, 'total_pipeline_value': 0,
+                'relationships': [],
+            })
         
-        # Get contacts needing follow-up
+        # Follow-up queue: due count and who to call next, off the rollup indexes
+        follow_up_days = followup_queue.follow_up_days(user["id"])
         try:
-            from database import get_contacts_needing_followup
-            contacts_needing_followup = get_contacts_needing_followup(user["id"], follow_up_days)
-            needs_followup_count = len(contacts_needing_followup)
+            needs_followup_count = followup_queue.due_count(user["id"], "agent", days=follow_up_days)
+            followup_list = followup_queue.next_contacts(
+                user["id"], "agent", limit=FOLLOWUP_PANEL_SIZE, days=follow_up_days
+            )
         except Exception as e:
             print(f"Error getting contacts needing followup: {e}")
             needs_followup_count = 0
+            followup_list = []
         
-        stats = {
-            'total': total_contacts,
-            'new': len([c for c in contacts_list_dicts if c.get('stage') == 'new']),
-            'active': len([c for c in contacts_list_dicts if c.get('stage') == 'active']),
-            'past': len([c for c in contacts_list_dicts if c.get('stage') == 'past']),
-            'with_automation': len([c for c in contacts_list_dicts if any([
-                c.get('auto_birthday'), c.get('auto_anniversary'),
-                c.get('auto_seasonal'), c.get('auto_equity'), c.get('auto_holidays')
-            ])]),
-            'total_equity': sum([c.get('equity_estimate') or 0 for c in contacts_list_dicts]),
-            'pending_tasks': len(all_tasks),
-            'total_deals': len(all_deals),
-            'pipeline_value': sum([(d.get('deal_value') if isinstance(d, dict) else 0) or 0 for d in all_deals]),
-            'expected_commission': sum([(d.get('expected_commission') if isinstance(d, dict) else 0) or 0 for d in all_deals]),
-            'needs_followup': needs_followup_count,
-            'follow_up_days': follow_up_days,
-        }
+        # Stats cover the whole filtered book, not just this page - one aggregate query
+        stats = crm_query.fetch_stats(
+            "agent", user["id"], stage=stage_filter, search=search_query, tag=tag_filter
+        )
+        stats['needs_followup'] = needs_followup_count
+        stats['follow_up_days'] = follow_up_days
         
-        # Get all unique tags
-        all_tags = set()
-        for contact in contacts_list_dicts:
-            tags = contact.get('tags', '') or '' if isinstance(contact, dict) else ''
-            if tags:
-                all_tags.update([t.strip() for t in tags.split(',') if t.strip()])
-        all_tags = sorted(list(all_tags))
+        all_tags = crm_query.fetch_tags("agent", user["id"])
         
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
         print(f"Error loading contacts: {error_trace}")
         flash(f"Error loading contacts: {e}", "error")
-        contacts_list = []
         contacts_list_dicts = []  # Ensure this is defined even on error
+        next_cursor = None
         stats = {'total': 0, 'new': 0, 'active': 0, 'past': 0, 'with_automation': 0, 'total_equity': 0, 'pending_tasks': 0, 'total_deals': 0, 'pipeline_value': 0, 'expected_commission': 0, 'needs_followup': 0, 'follow_up_days': 30}
         all_tags = []
+        followup_list = []
     
     # Get all pending tasks for dashboard
     try:
@@ -5404,10 +5163,13 @@ def agent_crm():
             search_query=search_query,
             tag_filter=tag_filter,
             sort_by=sort_by,
+            cursor=cursor,
+            next_cursor=next_cursor,
             stats=stats,
             all_tags=all_tags,
             upcoming_tasks=upcoming_tasks,
             email_templates=email_templates,
+            followup_queue=followup_list,
         )
     except Exception as e:
         import traceback
@@ -5416,6 +5178,137 @@ def agent_crm():
         return f"Template Error: {e}<br><pre>{error_msg}</pre>", 500
 
 
+@app.route("/api/crm/bulk", methods=["POST"])
+def api_crm_bulk():
+    """
+    Apply one operation to many contacts in the signed-in professional's book,
+    in a single transaction with one audit entry (see crm_bulk.py).
+
+    JSON body: {"operation": "set_stage"|"add_tag"|"remove_tag"|"set_automation"|"delete",
+    one of "ids": [...], "view_id": N or "filters": {"stage"/"status", "search", "tag"},
+    plus "stage", "tag", or "enabled" (true/false) and optional "columns" as the
+    operation needs}. Deleting by filters or a view needs at least one filter,
+    or "confirm_all": true to delete the whole book.
+    Returns the matched and affected counts.
+    """
+    user = get_current_user()
+    if not user or user.get("role") not in ("agent", "lender"):
+        return jsonify({"success": False, "error": "Not logged in"}), 401
+
+    data = request.get_json(silent=True) or {}
+    try:
+        result = crm_bulk.apply_bulk(
+            user["role"], user["id"], data.get("operation", ""),
+            ids=data.get("ids"), filters=data.get("filters"), view_id=data.get("view_id"),
+            stage=data.get("stage"), tag=data.get("tag"), enabled=data.get("enabled"),
+            columns=data.get("columns"), confirm_all=data.get("confirm_all") is True,
+        )
+    except crm_bulk.BulkOperationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, **result})
+
+
+@app.route("/api/crm/followups", methods=["GET"])
+def api_crm_followups():
+    """
+    The signed-in professional's follow-up queue: contacts longest without
+    contact among those due, oldest first.
+
+    ?limit=N (default 10, max 100) &stage=<stage/status> &days=N (default: the
+    user's follow_up_days). Returns the due count alongside the contacts.
+    """
+    user = get_current_user()
+    if not user or user.get("role") not in ("agent", "lender"):
+        return jsonify({"success": False, "error": "Not logged in"}), 401
+
+    limit = max(1, min(request.args.get("limit", 10, type=int), 100))
+    stage = request.args.get("stage", "").strip() or None
+    days = request.args.get("days", type=int) or followup_queue.follow_up_days(user["id"])
+    if not 1 <= days <= 365:
+        return jsonify({"success": False, "error": "days must be between 1 and 365"}), 400
+
+    contacts = followup_queue.next_contacts(user["id"], user["role"], limit=limit, stage=stage, days=days)
+    return jsonify({
+        "success": True,
+        "follow_up_days": days,
+        "due_count": followup_queue.due_count(user["id"], user["role"], stage=stage, days=days),
+        "contacts": contacts,
+    })
+
+
+@app.route("/api/crm/occasions", methods=["GET"])
+def api_crm_occasions():
+    """
+    Birthdays and home anniversaries in the signed-in professional's book.
+
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (default: today through the next 30 days)
+    &kind=birthday|anniversary|all. The window may wrap the new year.
+    """
+    from datetime import date as _date, timedelta as _timedelta
+
+    user = get_current_user()
+    if not user or user.get("role") not in ("agent", "lender"):
+        return jsonify({"success": False, "error": "Not logged in"}), 401
+
+    try:
+        start = _date.fromisoformat(request.args["start"]) if request.args.get("start") else _date.today()
+        end = (_date.fromisoformat(request.args["end"]) if request.args.get("end")
+               else start + _timedelta(days=request.args.get("days", 30, type=int)))
+    except ValueError:
+        return jsonify({"success": False, "error": "Dates must be YYYY-MM-DD"}), 400
+    if end < start or (end - start).days > 366:
+        return jsonify({"success": False, "error": "Window must be 0-366 days"}), 400
+
+    kind = request.args.get("kind", "all")
+    kinds = ("birthday", "anniversary") if kind == "all" else (kind,)
+    if not set(kinds) <= {"birthday", "anniversary"}:
+        return jsonify({"success": False, "error": "Unknown kind"}), 400
+
+    contact_type = "agent_contact" if user["role"] == "agent" else "lender_borrower"
+    occasions = get_upcoming_occasions(user["id"], contact_type, start, end, kinds)
+    return jsonify({
+        "success": True,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "occasions": occasions,
+    })
+
+
+@app.route("/api/search", methods=["GET"])
+def api_search():
+    """
+    Ranked full-text search for the signed-in user.
+
+    ?q=<text>&scope=contacts|interactions|boards|all&limit=20
+    Agents and lenders search their CRM book and interaction notes; homeowners
+    search their design boards. Highlights/snippets are HTML with <mark> tags.
+    """
+    import search_index
+
+    user = get_current_user()
+    if not user:
+        return jsonify({"success": False, "error": "Not logged in"}), 401
+
+    q = request.args.get("q", "").strip()
+    scope = request.args.get("scope", "all").strip()
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    results = {}
+    role = user.get("role")
+
+    if role in ("agent", "lender"):
+        contact_type = "agent_contact" if role == "agent" else "lender_borrower"
+        if scope in ("contacts", "all"):
+            results["contacts"] = search_index.search_contacts(role, user["id"], q, limit)
+        if scope in ("interactions", "all"):
+            results["interactions"] = search_index.search_interactions(
+                user["id"], q, contact_type, limit
+            )
+    if scope in ("boards", "all"):
+        results["boards"] = search_index.search_design_boards(user["id"], q, limit)
+
+    return jsonify({"success": True, "query": q, "results": results})
+
+
 @app.route("/agent/crm/import", methods=["GET", "POST"])
 def agent_crm_import():
     """Agent CRM bulk import from Excel/CSV."""
@@ -5440,38 +5333,27 @@ def agent_crm_import():
                 flash("Please select a file to upload.", "error")
                 return redirect(url_for("agent_crm_import"))
             
-            # Check file extension
-            filename = file.filename.lower()
-            if not (filename.endswith('.xlsx') or filename.endswith('.xls') or filename.endswith('.csv')):
-                flash("Please upload an Excel (.xlsx, .xls) or CSV file.", "error")
-                return redirect(url_for("agent_crm_import"))
-            
             try:
-                # Read file into pandas
-                if filename.endswith('.csv'):
-                    df = pd.read_csv(file)
-                else:
-                    df = pd.read_excel(file)
-                
-                # Convert to list of dicts for preview
-                data = df.to_dict('records')
-                
-                # Get column names for mapping
-                columns = list(df.columns)
-                
-                # Store in session for import step
-                session['crm_import_data'] = json.dumps(data, default=str)
-                session['crm_import_columns'] = columns
+                # Rows are streamed into the server-side staging table; only the
+                # import id goes into the session
+                batch = crm_import.stage_upload(user["id"], "agent", file)
+                session['crm_import_id'] = batch["id"]
+                session.pop('crm_import_data', None)
+                session.pop('crm_import_columns', None)
                 
                 return render_template(
                     "agent/crm_import_preview.html",
                     brand_name=FRONT_BRAND_NAME,
                     user=user,
-                    data=data[:10],  # Preview first 10 rows
-                    total_rows=len(data),
-                    columns=columns,
-                    sample_data=data[0] if data else {},
+                    import_id=batch["id"],
+                    data=batch["preview"],  # Preview first 10 rows
+                    total_rows=batch["total_rows"],
+                    columns=batch["columns"],
+                    sample_data=batch["preview"][0] if batch["preview"] else {},
                 )
+            except crm_import.CRMImportError as e:
+                flash(str(e), "error")
+                return redirect(url_for("agent_crm_import"))
             except Exception as e:
                 import traceback
                 flash(f"Error reading file: {str(e)}", "error")
@@ -5479,112 +5361,30 @@ def agent_crm_import():
                 return redirect(url_for("agent_crm_import"))
         
         elif action == "import":
-            # Actually import the data
-            import_data_json = session.get('crm_import_data')
-            if not import_data_json:
+            # Actually import the staged rows
+            import_id = request.form.get("import_id") or session.get('crm_import_id')
+            if not import_id:
                 flash("No import data found. Please upload a file again.", "error")
                 return redirect(url_for("agent_crm_import"))
             
             try:
-                data = json.loads(import_data_json)
-                
-                # Get column mappings from form
-                mappings = {
-                    'name': request.form.get('map_name', '').strip(),
-                    'email': request.form.get('map_email', '').strip(),
-                    'phone': request.form.get('map_phone', '').strip(),
-                    'stage': request.form.get('map_stage', '').strip(),
-                    'birthday': request.form.get('map_birthday', '').strip(),
-                    'home_anniversary': request.form.get('map_anniversary', '').strip(),
-                    'address': request.form.get('map_address', '').strip(),
-                    'property_address': request.form.get('map_property_address', '').strip(),
-                    'property_value': request.form.get('map_property_value', '').strip(),
-                    'equity_estimate': request.form.get('map_equity', '').strip(),
-                    'notes': request.form.get('map_notes', '').strip(),
-                    'tags': request.form.get('map_tags', '').strip(),
-                }
-                
-                # Default stage if not mapped
-                default_stage = request.form.get('default_stage', 'new').strip()
-                
-                # Import settings
-                skip_duplicates = request.form.get('skip_duplicates') == 'on'
-                duplicate_check = request.form.get('duplicate_check', 'email').strip()
-                
-                imported = 0
-                skipped = 0
-                errors = []
-                
-                for idx, row in enumerate(data):
-                    try:
-                        # Map columns to fields
-                        name = str(row.get(mappings['name'], '')).strip() if mappings['name'] else ''
-                        email = str(row.get(mappings['email'], '')).strip() if mappings['email'] else ''
-                        phone = str(row.get(mappings['phone'], '')).strip() if mappings['phone'] else ''
-                        stage = str(row.get(mappings['stage'], default_stage)).strip() if mappings['stage'] else default_stage
-                        birthday = str(row.get(mappings['birthday'], '')).strip() if mappings['birthday'] else ''
-                        home_anniversary = str(row.get(mappings['home_anniversary'], '')).strip() if mappings['home_anniversary'] else ''
-                        address = str(row.get(mappings['address'], '')).strip() if mappings['address'] else ''
-                        property_address = str(row.get(mappings['property_address'], '')).strip() if mappings['property_address'] else ''
-                        notes = str(row.get(mappings['notes'], '')).strip() if mappings['notes'] else ''
-                        tags = str(row.get(mappings['tags'], '')).strip() if mappings['tags'] else ''
-                        
-                        # Parse numeric values
-                        try:
-                            property_value = float(row.get(mappings['property_value'], 0)) if mappings['property_value'] and str(row.get(mappings['property_value'], '')).strip() else None
-                        except:
-                            property_value = None
-                        
-                        try:
-                            equity_estimate = float(row.get(mappings['equity_estimate'], 0)) if mappings['equity_estimate'] and str(row.get(mappings['equity_estimate'], '')).strip() else None
-                        except:
-                            equity_estimate = None
-                        
-                        if not name:
-                            errors.append(f"Row {idx + 1}: Missing name")
-                            continue
-                        
-                        # Check for duplicates if enabled
-                        if skip_duplicates:
-                            existing_contacts = list_agent_contacts(user["id"])
-                            is_duplicate = False
-                            for existing in existing_contacts:
-                                if duplicate_check == 'email' and email:
-                                    if existing.get('email') and existing['email'].lower() == email.lower():
-                                        is_duplicate = True
-                                        break
-                                elif duplicate_check == 'phone' and phone:
-                                    if existing.get('phone') and existing['phone'] == phone:
-                                        is_duplicate = True
-                                        break
-                                elif duplicate_check == 'name' and name:
-                                    if existing.get('name') and existing['name'].lower() == name.lower():
-                                        is_duplicate = True
-                                        break
-                            
-                            if is_duplicate:
-                                skipped += 1
-                                continue
-                        
-                        # Add contact
-                        add_agent_contact(
-                            user["id"], name, email, phone, stage, email or phone, "",
-                            birthday, home_anniversary, address, notes, tags,
-                            property_address, property_value, equity_estimate
-                        )
-                        imported += 1
-                    except Exception as e:
-                        errors.append(f"Row {idx + 1}: {str(e)}")
-                
-                # Clear session
-                session.pop('crm_import_data', None)
-                session.pop('crm_import_columns', None)
-                
-                flash(f"Import complete! {imported} contacts imported, {skipped} skipped, {len(errors)} errors.", "success")
-                if errors:
-                    flash(f"Errors: {', '.join(errors[:5])}{'...' if len(errors) > 5 else ''}", "error")
+                # Runs on the background import worker; the page polls its progress
+                target = crm_import.IMPORT_TARGETS["agent"]
+                crm_import.enqueue_import(
+                    import_id,
+                    user["id"],
+                    crm_import.mappings_from_form("agent", request.form),
+                    default_stage=request.form.get(target["default_field"], target["default_stage"]).strip(),
+                    skip_duplicates=request.form.get('skip_duplicates') == 'on',
+                    duplicate_check=request.form.get('duplicate_check', 'email').strip(),
+                )
+                crm_import_worker.start()
+                session.pop('crm_import_id', None)
                 
-                return redirect(url_for("agent_crm"))
+                return redirect(url_for("agent_crm_import_status", import_id=import_id))
+            except crm_import.CRMImportError as e:
+                flash(str(e), "error")
+                return redirect(url_for("agent_crm_import"))
             except Exception as e:
                 import traceback
                 flash(f"Error during import: {str(e)}", "error")
@@ -5599,6 +5399,28 @@ def agent_crm_import():
     )
 
 
+@app.route("/agent/crm/import/<import_id>")
+def agent_crm_import_status(import_id):
+    """Progress page for a background CRM import."""
+    user = get_current_user()
+    if not user or user.get("role") != "agent":
+        return redirect(url_for("login", role="agent"))
+    try:
+        progress = crm_import.job_progress(import_id, user["id"])
+    except crm_import.CRMImportError as e:
+        flash(str(e), "error")
+        return redirect(url_for("agent_crm_import"))
+    if not progress["done"]:
+        # Covers a job queued before this process's worker thread existed
+        crm_import_worker.start()
+    return render_template(
+        "agent/crm_import_status.html",
+        brand_name=FRONT_BRAND_NAME,
+        user=user,
+        progress=progress,
+    )
+
+
 @app.route("/agent/transactions", methods=["GET", "POST"])
 def agent_transactions():
     """Agent transactions - list and create transactions."""
@@ -5746,20 +5568,16 @@ def agent_transaction_add_client_to_crm(tx_id):
         if not client_name:
             return jsonify({"success": False, "error": "Client name is required"}), 400
         
-        # Check if contact already exists
-        from database import list_agent_contacts
-        contacts = list_agent_contacts(user["id"])
-        existing = None
-        for contact in contacts:
-            contact_dict = dict(contact) if hasattr(contact, 'keys') else contact
-            if (contact_dict.get('name', '').lower() == client_name.lower() or
-                (client_email and contact_dict.get('email', '').lower() == client_email.lower()) or
-                (client_phone and contact_dict.get('phone', '') == client_phone)):
-                existing = contact_dict
-                break
+        # Check if contact already exists (name, email or phone)
+        from crm_dedup import DEDUP_KEYS, find_existing_contact
+        existing_id = find_existing_contact(
+            "agent", user["id"],
+            {"name": client_name, "email": client_email, "phone": client_phone},
+            DEDUP_KEYS,
+        )
         
-        if existing:
-            return jsonify({"success": True, "message": "Client already exists in CRM", "contact_id": existing.get('id')}), 200
+        if existing_id:
+            return jsonify({"success": True, "message": "Client already exists in CRM", "contact_id": existing_id}), 200
         
         # Add to CRM
         from database import add_agent_contact
@@ -7360,6 +7178,7 @@ def agent_video_studio_create():
         property_address = request.form.get('property_address', '')
         highlights = request.form.get('highlights', '')
         include_captions = request.form.get('include_captions') == 'on'
+        render_quality = 'draft' if request.form.get('draft_preview') == 'on' else 'final'
         
         # Check subscription for premium 3D tours
         if video_type == '3d-tour':
@@ -7401,8 +7220,7 @@ def agent_video_studio_create():
             return redirect(url_for("agent_video_studio"))
         
         # Create project in database
-        from video_database import create_video_project, update_video_render_status
-        from database import get_user_profile
+        from video_database import create_video_project
         
         project_id = create_video_project(
             user_id=user["id"],
@@ -7417,76 +7235,29 @@ def agent_video_studio_create():
             include_captions=include_captions
         )
         
-        # Update status to rendering
-        update_video_render_status(project_id, 'rendering')
-        
-        # Get agent branding
-        agent_profile = get_user_profile(user["id"])
-        agent_profile_dict = dict(agent_profile) if agent_profile and hasattr(agent_profile, 'keys') else {}
-        
-        # Render video
-        from video_studio import VideoRenderer
-        
-        # Set up output directory
-        output_dir = Path("generated_videos")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
-        renderer = VideoRenderer(output_dir=str(output_dir))
-        
-        result = renderer.create_listing_video(
-            project_id=project_id,
-            media_files=media_files,
-            style=style_preset,
-            aspect_ratio=aspect_ratio,
-            duration=duration,
-            headline=headline,
-            property_address=property_address,
-            agent_name=user["name"],
-            agent_phone=user.get("phone", user.get("email")),
-            agent_logo=agent_profile_dict.get("brokerage_logo"),
-            agent_photo=agent_profile_dict.get("professional_photo"),
-            include_captions=include_captions,
-            video_type=video_type,
-            room_labels=room_labels
-        )
+        # Render in the background (video_render_worker.py); the view page polls
+        # agent_video_studio_status until it's done
+        video_render_queue.enqueue_render(project_id, {
+            "agent_name": user["name"],
+            "agent_phone": user.get("phone", user.get("email")),
+            "room_labels": room_labels,
+        }, quality=render_quality)
+        video_render_worker.start()
+        print(f"[VIDEO CREATE] Queued project {project_id} for {render_quality} rendering")
+        
+        # Return JSON for AJAX requests (new tab feature!)
+        if request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'application/json' in request.headers.get('Accept', ''):
+            return jsonify({
+                "success": True,
+                "project_id": project_id,
+                "job_id": project_id,
+                "status_url": url_for("agent_video_studio_status", project_id=project_id),
+                "quality": render_quality,
+                "message": "Draft preview queued!" if render_quality == 'draft' else "Video queued for rendering!"
+            })
         
-        print(f"[VIDEO CREATE] Render result: {result}")
-        print(f"[VIDEO CREATE] Success: {result.get('success')}")
-        print(f"[VIDEO CREATE] Output path: {result.get('output_path')}")
-        print(f"[VIDEO CREATE] Error: {result.get('error')}")
-        
-        if result["success"]:
-            # Update status to complete
-            update_video_render_status(
-                project_id,
-                'complete',
-                result["output_path"]
-            )
-            print(f"[VIDEO CREATE] Updated project {project_id} to complete with path: {result['output_path']}")
-            
-            # Return JSON for AJAX requests (new tab feature!)
-            if request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'application/json' in request.headers.get('Accept', ''):
-                return jsonify({
-                    "success": True,
-                    "project_id": project_id,
-                    "message": "Video created successfully!"
-                })
-            
-            flash("✨ Video created successfully!", "success")
-            return redirect(url_for("agent_video_studio_view", project_id=project_id))
-        else:
-            update_video_render_status(project_id, 'failed')
-            print(f"[VIDEO CREATE] Video rendering failed: {result.get('error')}")
-            
-            # Return JSON for AJAX requests
-            if request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'application/json' in request.headers.get('Accept', ''):
-                return jsonify({
-                    "success": False,
-                    "error": result.get('error')
-                })
-            
-            flash(f"Video creation failed: {result.get('error')}", "error")
-            return redirect(url_for("agent_video_studio"))
+        flash("🎬 Your video is rendering - this page updates when it's ready.", "info")
+        return redirect(url_for("agent_video_studio_view", project_id=project_id))
         
     except ImportError as e:
         print(f"Video Studio import error: {e}")
@@ -7542,6 +7313,59 @@ def agent_video_studio_view(project_id):
         return redirect(url_for("agent_video_studio"))
 
 
+@app.route("/agent/video-studio/<int:project_id>/status")
+def agent_video_studio_status(project_id):
+    """Render job status for polling: queued/rendering/complete/failed with progress"""
+    user = get_current_user()
+    if not user or user.get("role") != "agent":
+        return jsonify({"success": False, "error": "Not logged in"}), 401
+    
+    status = video_render_queue.render_job_status(project_id)
+    if not status or status["user_id"] != user["id"]:
+        return jsonify({"success": False, "error": "Video project not found"}), 404
+    
+    return jsonify({
+        "success": True,
+        "job_id": project_id,
+        "status": status["render_status"],
+        "quality": status["render_quality"] or "final",
+        "progress": status["render_progress"] or 0,
+        "message": status["render_message"],
+        "error": status["render_error"],
+        "queue_position": status["queue_position"],
+        "ready": status["ready"],
+        "video_url": url_for("agent_video_studio_serve", project_id=project_id) if status["ready"] else None,
+    })
+
+
+@app.route("/agent/video-studio/<int:project_id>/finalize", methods=["POST"])
+def agent_video_studio_finalize(project_id):
+    """Promote a draft preview: render the full-quality video with the same settings"""
+    user = get_current_user()
+    if not user or user.get("role") != "agent":
+        return redirect(url_for("login", role="agent"))
+    
+    if not VIDEO_STUDIO_ENABLED:
+        flash("Video Studio is not available", "error")
+        return redirect(url_for("agent_video_studio"))
+    
+    from video_database import get_video_project
+    project = get_video_project(project_id)
+    if not project or project["user_id"] != user["id"]:
+        flash("Video project not found", "error")
+        return redirect(url_for("agent_video_studio"))
+    
+    if project.get("render_status") in ("queued", "rendering"):
+        flash("This video is already rendering.", "info")
+    elif project.get("render_quality") != "draft":
+        flash("This video is already full quality.", "info")
+    else:
+        video_render_queue.promote_to_final(project_id)
+        video_render_worker.start()
+        flash("🎬 Rendering the final video with your draft's settings.", "success")
+    return redirect(url_for("agent_video_studio_view", project_id=project_id))
+
+
 @app.route("/agent/video-studio/serve/<int:project_id>")
 def agent_video_studio_serve(project_id):
     """Serve the video file for a project"""
@@ -7902,172 +7726,69 @@ def lender_crm():
                     flash(f"Error adding deal: {e}", "error")
         
         elif action == "bulk_action":
-            borrower_ids = request.form.getlist("borrower_ids")
-            bulk_action_type = request.form.get("bulk_action_type", "").strip()
-            
-            if borrower_ids and bulk_action_type:
-                try:
-                    for borrower_id in borrower_ids:
-                        if bulk_action_type == "add_tag":
-                            tag = request.form.get("bulk_tag", "").strip()
-                            borrower = get_lender_borrower(int(borrower_id), user["id"])
-                            if borrower:
-                                existing_tags = (borrower.get("tags") or "").split(",")
-                                existing_tags = [t.strip() for t in existing_tags if t.strip()]
-                                if tag and tag not in existing_tags:
-                                    existing_tags.append(tag)
-                                    update_lender_borrower(int(borrower_id), user["id"], tags=", ".join(existing_tags))
-                        elif bulk_action_type == "change_status":
-                            status = request.form.get("bulk_status", "").strip()
-                            if status:
-                                update_lender_borrower(int(borrower_id), user["id"], status=status)
-                    flash(f"Bulk action completed for {len(borrower_ids)} borrower(s)!", "success")
-                except Exception as e:
-                    flash(f"Error performing bulk action: {e}", "error")
+            run_bulk_form_action("lender", user["id"], request.form.getlist("borrower_ids"), "borrower")
         
         elif action == "update_followup_days":
-            follow_up_days = request.form.get("follow_up_days", "30").strip()
-            try:
-                days = int(follow_up_days)
-                if 1 <= days <= 365:
-                    conn = get_connection()
-                    cur = conn.cursor()
-                    cur.execute(
-                        "UPDATE users SET follow_up_days = ? WHERE id = ?",
-                        (days, user["id"])
-                    )
-                    conn.commit()
-                    conn.close()
-                    flash(f"Follow-up reminder set to {days} days!", "success")
-                else:
-                    flash("Please enter a number between 1 and 365.", "error")
-            except ValueError:
-                flash("Invalid number. Please enter a number between 1 and 365.", "error")
+            update_followup_days_from_form(user["id"])
 
     status_filter = request.args.get("status")
-    borrowers = list_lender_borrowers(user["id"], status_filter)
-    
-    # Convert borrowers to dicts and enrich with tasks/deals
-    borrowers_list = []
-    for borrower in borrowers:
-        try:
-            borrower_dict = dict(borrower)
-            
-            # Fetch interaction count
-            try:
-                interactions = list_crm_interactions(
-                    borrower_dict['id'], "lender_borrower", user["id"], limit=50
-                )
-                borrower_dict['interaction_count'] = len(interactions)
-                borrower_dict['recent_interactions'] = [dict(i) for i in interactions[:3]]
-            except:
-                borrower_dict['interaction_count'] = 0
-                borrower_dict['recent_interactions'] = []
-            
-            # Fetch tasks
-            try:
-                tasks = list_crm_tasks(user["id"], borrower_dict['id'], "lender_borrower", status="pending")
-                borrower_dict['pending_tasks'] = [dict(t) for t in tasks]
-                borrower_dict['task_count'] = len(tasks)
-            except:
-                borrower_dict['pending_tasks'] = []
-                borrower_dict['task_count'] = 0
-            
-            # Fetch deals
-            try:
-                deals = list_crm_deals(user["id"], borrower_dict['id'], "lender_borrower")
-                borrower_dict['deals'] = [dict(d) for d in deals]
-                borrower_dict['deal_count'] = len(deals)
-                borrower_dict['total_pipeline_value'] = sum([d.get('deal_value') or 0 for d in deals])
-            except:
-                borrower_dict['deals'] = []
-                borrower_dict['deal_count'] = 0
-                borrower_dict['total_pipeline_value'] = 0
-            
-            borrowers_list.append(borrower_dict)
-        except:
-            continue
-    
-    # Calculate stats
-    all_tasks = list_crm_tasks(user["id"], status="pending")
-    all_deals = list_crm_deals(user["id"])
-    
-    # Get follow-up threshold from user settings
-    from database import get_user_by_id
-    user_details = get_user_by_id(user["id"])
-    follow_up_days = user_details.get('follow_up_days', 30) if user_details else 30
+    search_query = request.args.get("search", "").strip()
+    tag_filter = request.args.get("tag", "").strip()
+    sort_by = request.args.get("sort", "created_at")  # name, status, last_touch, created_at
+    cursor = request.args.get("cursor", "").strip() or None
+    
+    # Filtering, sorting and paging happen in SQL (see crm_query.py)
+    page = crm_query.fetch_page(
+        "lender", user["id"], stage=status_filter, search=search_query,
+        tag=tag_filter, sort_by=sort_by, cursor=cursor,
+        page_size=request.args.get("per_page", crm_query.DEFAULT_PAGE_SIZE, type=int),
+    )
+    borrowers_list = page["items"]
+    sort_by = page["sort_by"]
+    next_cursor = page["next_cursor"]
     
-    # Get borrowers needing follow-up
+    # Enrich with tasks/deals (batched, see get_crm_rollups)
     try:
-        from database import get_connection
-        conn = get_connection()
-        cur = conn.cursor()
-        from datetime import timedelta
-        cutoff_date = datetime.now() - timedelta(days=follow_up_days)
-        cutoff_iso = cutoff_date.isoformat()
-        
-        cur.execute("""
-            SELECT DISTINCT lb.id
-            FROM lender_borrowers lb
-            LEFT JOIN crm_interactions ci ON ci.contact_id = lb.id 
-                AND ci.contact_type = 'lender_borrower' 
-                AND ci.professional_user_id = lb.lender_user_id
-            WHERE lb.lender_user_id = ?
-            AND (
-                COALESCE(
-                    (SELECT MAX(ci2.interaction_date) 
-                     FROM crm_interactions ci2 
-                     WHERE ci2.contact_id = lb.id 
-                     AND ci2.contact_type = 'lender_borrower' 
-                     AND ci2.professional_user_id = lb.lender_user_id),
-                    lb.last_touch,
-                    lb.created_at
-                ) < ? OR
-                COALESCE(
-                    (SELECT MAX(ci3.interaction_date) 
-                     FROM crm_interactions ci3 
-                     WHERE ci3.contact_id = lb.id 
-                     AND ci3.contact_type = 'lender_borrower' 
-                     AND ci3.professional_user_id = lb.lender_user_id),
-                    lb.last_touch
-                ) IS NULL
-            )
-        """, (user["id"], cutoff_iso))
-        needs_followup_count = len(cur.fetchall())
-        conn.close()
+        rollups = get_crm_rollups(
+            user["id"], [b['id'] for b in borrowers_list], "lender_borrower"
+        )
+    except Exception as e:
+        print(f"Error fetching CRM rollups: {e}")
+        rollups = {}
+    for borrower_dict in borrowers_list:
+        rollup = rollups.get(borrower_dict['id']) or {}
+        borrower_dict['interaction_count'] = rollup.get('interaction_count', 0)
+        borrower_dict['recent_interactions'] = rollup.get('recent_interactions', [])
+        borrower_dict['pending_tasks'] = rollup.get('pending_tasks', [])
+        borrower_dict['task_count'] = rollup.get('task_count', 0)
+        borrower_dict['deals'] = rollup.get('deals', [])
+        borrower_dict['deal_count'] = rollup.get('deal_count', 0)
+        borrower_dict['total_pipeline_value'] = rollup.get('total_pipeline_value', 0)
+    
+    # Follow-up queue: due count and who to call next, off the rollup indexes
+    follow_up_days = followup_queue.follow_up_days(user["id"])
+    try:
+        needs_followup_count = followup_queue.due_count(user["id"], "lender", days=follow_up_days)
+        followup_list = followup_queue.next_contacts(
+            user["id"], "lender", limit=FOLLOWUP_PANEL_SIZE, days=follow_up_days
+        )
     except Exception as e:
         print(f"Error getting borrowers needing followup: {e}")
         needs_followup_count = 0
+        followup_list = []
     
-    stats = {
-        'total': len(borrowers_list),
-        'prospect': len([b for b in borrowers_list if b.get('status') == 'prospect']),
-        'preapproval': len([b for b in borrowers_list if b.get('status') == 'preapproval']),
-        'in_process': len([b for b in borrowers_list if b.get('status') == 'in_process']),
-        'closed': len([b for b in borrowers_list if b.get('status') == 'closed']),
-        'pending_tasks': len(all_tasks),
-        'total_deals': len(all_deals),
-        'pipeline_value': sum([d.get('deal_value') or 0 for d in all_deals]),
-        'expected_commission': sum([d.get('expected_commission') or 0 for d in all_deals]),
-        'needs_followup': needs_followup_count,
-        'follow_up_days': follow_up_days,
-        'with_automation': len([b for b in borrowers_list if any([
-            b.get('auto_birthday'), b.get('auto_anniversary'),
-            b.get('auto_seasonal'), b.get('auto_equity'), b.get('auto_holidays')
-        ])]),
-    }
+    # Stats cover the whole filtered book, not just this page - one aggregate query
+    stats = crm_query.fetch_stats(
+        "lender", user["id"], stage=status_filter, search=search_query, tag=tag_filter
+    )
+    stats['needs_followup'] = needs_followup_count
+    stats['follow_up_days'] = follow_up_days
     
-    # Get all unique tags
-    all_tags = set()
-    for borrower in borrowers_list:
-        tags = borrower.get('tags', '') or ''
-        if tags:
-            all_tags.update([t.strip() for t in tags.split(',') if t.strip()])
-    all_tags = sorted(list(all_tags))
+    all_tags = crm_query.fetch_tags("lender", user["id"])
     
     # Get upcoming tasks
     try:
-        upcoming_tasks = [dict(t) for t in all_tasks[:10]]
+        upcoming_tasks = [dict(t) for t in list_crm_tasks(user["id"], status="pending")[:10]]
     except:
         upcoming_tasks = []
     
@@ -8077,9 +7798,15 @@ def lender_crm():
         user=user,
         borrowers=borrowers_list,
         status_filter=status_filter,
+        search_query=search_query,
+        tag_filter=tag_filter,
+        sort_by=sort_by,
+        cursor=cursor,
+        next_cursor=next_cursor,
         stats=stats,
         all_tags=all_tags,
         upcoming_tasks=upcoming_tasks,
+        followup_queue=followup_list,
     )
 
 
@@ -8107,38 +7834,27 @@ def lender_crm_import():
                 flash("Please select a file to upload.", "error")
                 return redirect(url_for("lender_crm_import"))
             
-            # Check file extension
-            filename = file.filename.lower()
-            if not (filename.endswith('.xlsx') or filename.endswith('.xls') or filename.endswith('.csv')):
-                flash("Please upload an Excel (.xlsx, .xls) or CSV file.", "error")
-                return redirect(url_for("lender_crm_import"))
-            
             try:
-                # Read file into pandas
-                if filename.endswith('.csv'):
-                    df = pd.read_csv(file)
-                else:
-                    df = pd.read_excel(file)
-                
-                # Convert to list of dicts for preview
-                data = df.to_dict('records')
-                
-                # Get column names for mapping
-                columns = list(df.columns)
-                
-                # Store in session for import step
-                session['crm_import_data'] = json.dumps(data, default=str)
-                session['crm_import_columns'] = columns
+                # Rows are streamed into the server-side staging table; only the
+                # import id goes into the session
+                batch = crm_import.stage_upload(user["id"], "lender", file)
+                session['crm_import_id'] = batch["id"]
+                session.pop('crm_import_data', None)
+                session.pop('crm_import_columns', None)
                 
                 return render_template(
                     "lender/crm_import_preview.html",
                     brand_name=FRONT_BRAND_NAME,
                     user=user,
-                    data=data[:10],  # Preview first 10 rows
-                    total_rows=len(data),
-                    columns=columns,
-                    sample_data=data[0] if data else {},
+                    import_id=batch["id"],
+                    data=batch["preview"],  # Preview first 10 rows
+                    total_rows=batch["total_rows"],
+                    columns=batch["columns"],
+                    sample_data=batch["preview"][0] if batch["preview"] else {},
                 )
+            except crm_import.CRMImportError as e:
+                flash(str(e), "error")
+                return redirect(url_for("lender_crm_import"))
             except Exception as e:
                 import traceback
                 flash(f"Error reading file: {str(e)}", "error")
@@ -8146,116 +7862,30 @@ def lender_crm_import():
                 return redirect(url_for("lender_crm_import"))
         
         elif action == "import":
-            # Actually import the data
-            import_data_json = session.get('crm_import_data')
-            if not import_data_json:
+            # Actually import the staged rows
+            import_id = request.form.get("import_id") or session.get('crm_import_id')
+            if not import_id:
                 flash("No import data found. Please upload a file again.", "error")
                 return redirect(url_for("lender_crm_import"))
             
             try:
-                data = json.loads(import_data_json)
-                
-                # Get column mappings from form
-                mappings = {
-                    'name': request.form.get('map_name', '').strip(),
-                    'email': request.form.get('map_email', '').strip(),
-                    'phone': request.form.get('map_phone', '').strip(),
-                    'status': request.form.get('map_status', '').strip(),
-                    'loan_type': request.form.get('map_loan_type', '').strip(),
-                    'target_payment': request.form.get('map_target_payment', '').strip(),
-                    'birthday': request.form.get('map_birthday', '').strip(),
-                    'home_anniversary': request.form.get('map_anniversary', '').strip(),
-                    'address': request.form.get('map_address', '').strip(),
-                    'property_address': request.form.get('map_property_address', '').strip(),
-                    'loan_amount': request.form.get('map_loan_amount', '').strip(),
-                    'loan_rate': request.form.get('map_loan_rate', '').strip(),
-                    'notes': request.form.get('map_notes', '').strip(),
-                    'tags': request.form.get('map_tags', '').strip(),
-                }
-                
-                # Default status if not mapped
-                default_status = request.form.get('default_status', 'prospect').strip()
-                
-                # Import settings
-                skip_duplicates = request.form.get('skip_duplicates') == 'on'
-                duplicate_check = request.form.get('duplicate_check', 'email').strip()
-                
-                imported = 0
-                skipped = 0
-                errors = []
-                
-                for idx, row in enumerate(data):
-                    try:
-                        # Map columns to fields
-                        name = str(row.get(mappings['name'], '')).strip() if mappings['name'] else ''
-                        email = str(row.get(mappings['email'], '')).strip() if mappings['email'] else ''
-                        phone = str(row.get(mappings['phone'], '')).strip() if mappings['phone'] else ''
-                        status = str(row.get(mappings['status'], default_status)).strip() if mappings['status'] else default_status
-                        loan_type = str(row.get(mappings['loan_type'], '')).strip() if mappings['loan_type'] else ''
-                        target_payment = str(row.get(mappings['target_payment'], '')).strip() if mappings['target_payment'] else ''
-                        birthday = str(row.get(mappings['birthday'], '')).strip() if mappings['birthday'] else ''
-                        home_anniversary = str(row.get(mappings['home_anniversary'], '')).strip() if mappings['home_anniversary'] else ''
-                        address = str(row.get(mappings['address'], '')).strip() if mappings['address'] else ''
-                        property_address = str(row.get(mappings['property_address'], '')).strip() if mappings['property_address'] else ''
-                        notes = str(row.get(mappings['notes'], '')).strip() if mappings['notes'] else ''
-                        tags = str(row.get(mappings['tags'], '')).strip() if mappings['tags'] else ''
-                        
-                        # Parse numeric values
-                        try:
-                            loan_amount = float(row.get(mappings['loan_amount'], 0)) if mappings['loan_amount'] and str(row.get(mappings['loan_amount'], '')).strip() else None
-                        except:
-                            loan_amount = None
-                        
-                        try:
-                            loan_rate = float(row.get(mappings['loan_rate'], 0)) if mappings['loan_rate'] and str(row.get(mappings['loan_rate'], '')).strip() else None
-                        except:
-                            loan_rate = None
-                        
-                        if not name:
-                            errors.append(f"Row {idx + 1}: Missing name")
-                            continue
-                        
-                        # Check for duplicates if enabled
-                        if skip_duplicates:
-                            existing_borrowers = list_lender_borrowers(user["id"])
-                            is_duplicate = False
-                            for existing in existing_borrowers:
-                                if duplicate_check == 'email' and email:
-                                    if existing.get('email') and existing['email'].lower() == email.lower():
-                                        is_duplicate = True
-                                        break
-                                elif duplicate_check == 'phone' and phone:
-                                    if existing.get('phone') and existing['phone'] == phone:
-                                        is_duplicate = True
-                                        break
-                                elif duplicate_check == 'name' and name:
-                                    if existing.get('name') and existing['name'].lower() == name.lower():
-                                        is_duplicate = True
-                                        break
-                            
-                            if is_duplicate:
-                                skipped += 1
-                                continue
-                        
-                        # Add borrower
-                        add_lender_borrower(
-                            user["id"], name, status, loan_type, target_payment, "",
-                            email, phone, birthday, home_anniversary, address, notes, tags,
-                            property_address, loan_amount, loan_rate
-                        )
-                        imported += 1
-                    except Exception as e:
-                        errors.append(f"Row {idx + 1}: {str(e)}")
-                
-                # Clear session
-                session.pop('crm_import_data', None)
-                session.pop('crm_import_columns', None)
-                
-                flash(f"Import complete! {imported} borrowers imported, {skipped} skipped, {len(errors)} errors.", "success")
-                if errors:
-                    flash(f"Errors: {', '.join(errors[:5])}{'...' if len(errors) > 5 else ''}", "error")
+                # Runs on the background import worker; the page polls its progress
+                target = crm_import.IMPORT_TARGETS["lender"]
+                crm_import.enqueue_import(
+                    import_id,
+                    user["id"],
+                    crm_import.mappings_from_form("lender", request.form),
+                    default_stage=request.form.get(target["default_field"], target["default_stage"]).strip(),
+                    skip_duplicates=request.form.get('skip_duplicates') == 'on',
+                    duplicate_check=request.form.get('duplicate_check', 'email').strip(),
+                )
+                crm_import_worker.start()
+                session.pop('crm_import_id', None)
                 
-                return redirect(url_for("lender_crm"))
+                return redirect(url_for("lender_crm_import_status", import_id=import_id))
+            except crm_import.CRMImportError as e:
+                flash(str(e), "error")
+                return redirect(url_for("lender_crm_import"))
             except Exception as e:
                 import traceback
                 flash(f"Error during import: {str(e)}", "error")
@@ -8270,6 +7900,60 @@ def lender_crm_import():
     )
 
 
+@app.route("/lender/crm/import/<import_id>")
+def lender_crm_import_status(import_id):
+    """Progress page for a background CRM import."""
+    user = get_current_user()
+    if not user or user.get("role") != "lender":
+        return redirect(url_for("login", role="lender"))
+    try:
+        progress = crm_import.job_progress(import_id, user["id"])
+    except crm_import.CRMImportError as e:
+        flash(str(e), "error")
+        return redirect(url_for("lender_crm_import"))
+    if not progress["done"]:
+        # Covers a job queued before this process's worker thread existed
+        crm_import_worker.start()
+    return render_template(
+        "lender/crm_import_status.html",
+        brand_name=FRONT_BRAND_NAME,
+        user=user,
+        progress=progress,
+    )
+
+
+@app.route("/crm/import/<import_id>/progress")
+def crm_import_progress(import_id):
+    """JSON progress of a background CRM import (rows parsed, inserted, skipped, errors)."""
+    user = get_current_user()
+    if not user:
+        return jsonify({"success": False, "error": "Not logged in"}), 401
+    try:
+        progress = crm_import.job_progress(import_id, user["id"])
+    except crm_import.CRMImportError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    return jsonify({"success": True, **progress})
+
+
+@app.route("/crm/import/<import_id>/errors.csv")
+def crm_import_error_report(import_id):
+    """Download the per-row report (errors and skipped duplicates) of a CRM import."""
+    user = get_current_user()
+    if not user:
+        return redirect(url_for("login"))
+    try:
+        crm_import.get_batch(import_id, user["id"])
+    except crm_import.CRMImportError:
+        abort(404)
+    return Response(
+        crm_import.error_report_csv(import_id, user["id"]),
+        mimetype="text/csv",
+        headers={
+            "Content-Disposition": f'attachment; filename="import-{import_id[:8]}-report.csv"'
+        },
+    )
+
+
 @app.route("/lender/loans", methods=["GET", "POST"])
 def lender_loans():
     """Lender loans management."""
@@ -9450,6 +9134,80 @@ def admin_audit_logs():
     
     return render_template('admin/audit_logs.html', logs=logs)
 
+@app.route("/admin/db-pool")
+def admin_db_pool_stats():
+    """Connection pool metrics for this worker (checkouts, waits, opens)"""
+    from rbac import has_permission
+    from database import get_pool_stats
+
+    user = session.get('user')
+    if not user or not has_permission(user['id'], 'reports.view'):
+        return jsonify({"error": "Access denied"}), 403
+
+    return jsonify(get_pool_stats())
+
+
+@app.route("/admin/video-cache")
+def admin_video_cache_stats():
+    """Video Studio segment cache and photo ingest cache: hits, misses and evictions per kind, and disk use"""
+    from rbac import has_permission
+    import video_ingest
+    import video_segment_cache
+
+    user = session.get('user')
+    if not user or not has_permission(user['id'], 'reports.view'):
+        return jsonify({"error": "Access denied"}), 403
+
+    return jsonify({**video_segment_cache.stats(), "ingest": video_ingest.disk_usage()})
+
+
+@app.route("/admin/scheduler")
+def admin_scheduler():
+    """Scheduled jobs, the current scheduler leader and recent runs"""
+    from rbac import has_permission
+
+    user = session.get('user')
+    if not user or not has_permission(user['id'], 'reports.view'):
+        flash("Access denied", "error")
+        return redirect(url_for('dashboard'))
+
+    job_filter = request.args.get('job') or None
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    return render_template(
+        'admin/scheduler.html',
+        jobs=SCHEDULER.job_summaries(),
+        lease=SCHEDULER.leader(),
+        this_worker=SCHEDULER.holder,
+        runs=SCHEDULER.recent_runs(limit, job_filter),
+        job_filter=job_filter,
+        can_trigger=has_permission(user['id'], 'security.manage_roles'),
+        outbox=email_outbox.outbox_counts(),
+        smtp_configured=email_outbox.SMTPSettings.from_env().configured,
+        governor=send_window.governor.status(),
+    )
+
+
+@app.route("/admin/scheduler/<job_name>/run", methods=["POST"])
+def admin_scheduler_run(job_name):
+    """Run a scheduled job now (in a background thread of this worker)"""
+    from rbac import has_permission
+    from audit import audit_log
+
+    user = session.get('user')
+    if not user or not has_permission(user['id'], 'security.manage_roles'):
+        flash("Access denied", "error")
+        return redirect(url_for('dashboard'))
+
+    try:
+        run_id = SCHEDULER.trigger(job_name, user_id=user['id'])
+        audit_log(user['id'], 'job_triggered', 'scheduler', details=f"{job_name} (run #{run_id})")
+        flash(f"Started {job_name} (run #{run_id}).", "success")
+    except KeyError:
+        flash(f"Unknown job: {job_name}", "error")
+    except RuntimeError as e:
+        flash(str(e), "error")
+    return redirect(url_for('admin_scheduler'))
+
 
 # ---------------- DEVELOPMENT SERVER ----------------
 if __name__ == "__main__":
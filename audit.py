@@ -7,7 +7,7 @@ from database import get_connection
 from flask import request, has_request_context
 from datetime import datetime
 
-def audit_log(user_id, action, resource, resource_id=None, details=None):
+def audit_log(user_id, action, resource, resource_id=None, details=None, conn=None):
     """
     Log an action to the audit trail
     
@@ -17,8 +17,12 @@ def audit_log(user_id, action, resource, resource_id=None, details=None):
         resource: Resource type (e.g., 'users', 'properties', 'access_control')
         resource_id: ID of specific resource (optional)
         details: Additional details (optional)
+        conn: Open connection to write through (optional). The entry then
+            commits or rolls back with the caller's transaction.
     """
-    conn = get_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
     cur = conn.cursor()
     
     # Get request context if available
@@ -44,8 +48,9 @@ def audit_log(user_id, action, resource, resource_id=None, details=None):
         user_agent
     ))
     
-    conn.commit()
-    conn.close()
+    if own_conn:
+        conn.commit()
+        conn.close()
 
 def get_audit_logs(user_id=None, action=None, resource=None, limit=100):
     """
@@ -130,6 +135,8 @@ class AuditAction:
     CREATED = 'created'
     UPDATED = 'updated'
     DELETED = 'deleted'
+    BULK_UPDATED = 'bulk_updated'
+    BULK_DELETED = 'bulk_deleted'
     
     # Security
     PASSWORD_CHANGED = 'password_changed'
@@ -0,0 +1,234 @@
+"""
+Campaign Renderer
+Mail-merge for the automated CRM campaigns (birthday, anniversary, seasonal,
+equity, holiday).
+
+Each job used to build an f-string body per contact. A Campaign is now a
+str.format-style template that is compiled once per run: campaign-wide fields
+(season, holiday, month...) are folded into the literal text, the HTML part is
+derived from the plain part (or given explicitly), and what's left is a flat
+list of literal/field pairs, so rendering a recipient is a single join. Each
+professional's signature block is rendered once in both parts and reused for
+all of their contacts, and render_messages() loads that branding up front
+and returns a generator that feeds email_outbox.enqueue_many() directly -
+rendering runs no queries, so nothing reads the database while enqueue_many
+holds its write transaction.
+
+    BIRTHDAY = Campaign("birthday", "Happy Birthday, {name}!", "Hi {name},\\n...\\n{signature}")
+    compiled = BIRTHDAY.compile()
+    email_outbox.enqueue_many(render_messages(compiled, contacts))
+"""
+
+import html
+import string
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database import get_connection
+
+DEFAULT_SIGNATURE = "Best regards,\nYour Life, Your Home Team"
+# Markup around HTML parts derived from the plain text
+HTML_HEAD = (
+    '<!DOCTYPE html><html><body style="margin:0;padding:24px;background:#f6f7f9;">'
+    '<div style="max-width:560px;margin:0 auto;padding:24px;background:#ffffff;border-radius:8px;'
+    'font-family:Helvetica,Arial,sans-serif;font-size:15px;line-height:1.5;color:#1f2933;">'
+)
+HTML_FOOT = '</div></body></html>'
+# Fields whose values are already HTML (pre-rendered) and must not be escaped
+RAW_HTML_FIELDS = frozenset({"signature"})
+
+_FORMATTER = string.Formatter()
+_SQLITE_MAX_PARAMS = 900
+
+
+def text_to_html(text: str) -> str:
+    """Escape plain text and keep its line breaks"""
+    return html.escape(text).replace("\n", "<br>\n")
+
+
+class CompiledTemplate:
+    """A template reduced to (literal, field, format_spec) parts; render() joins them"""
+
+    def __init__(self, source: str, context: Optional[Dict[str, Any]] = None,
+                 html_part: bool = False, from_text: bool = False,
+                 defaults: Optional[Dict[str, Any]] = None):
+        self.html_part = html_part
+        self.defaults = defaults or {}
+        context = context or {}
+        # In an HTML part derived from plain text, literals are escaped too
+        convert_literal = text_to_html if from_text else (lambda s: s)
+        parts: List[Tuple[str, Optional[str], str]] = []
+        literal = ""
+        for text, name, spec, conversion in _FORMATTER.parse(source):
+            literal += convert_literal(text)
+            if name is None:
+                continue
+            if not name or not name.isidentifier():
+                raise ValueError(f"Template fields must be plain names, got {{{name}}}")
+            if conversion:
+                raise ValueError(f"Conversions aren't supported ({{{name}!{conversion}}})")
+            if name in context:
+                literal += self._format(name, context[name], spec or "")
+                continue
+            parts.append((literal, name, spec or ""))
+            literal = ""
+        self._parts = parts
+        self._tail = literal
+        self.fields = frozenset(name for _, name, _ in parts)
+
+    def _format(self, name: str, value: Any, spec: str) -> str:
+        if value is None:
+            value = self.defaults.get(name, "")
+        text = format(value, spec) if spec else str(value)
+        if self.html_part and name not in RAW_HTML_FIELDS:
+            text = text_to_html(text)
+        return text
+
+    def render(self, fields: Dict[str, Any]) -> str:
+        fmt = self._format
+        out = []
+        for literal, name, spec in self._parts:
+            out.append(literal)
+            out.append(fmt(name, fields.get(name), spec))
+        out.append(self._tail)
+        return "".join(out)
+
+
+@dataclass
+class Campaign:
+    """
+    One automated email. subject and text are str.format templates over the
+    contact's fields, the campaign context passed to compile() and {signature};
+    html defaults to the text part with line breaks, between HTML_HEAD/FOOT.
+    defaults fill fields that are missing or NULL for a contact.
+    """
+    email_type: str
+    subject: str
+    text: str
+    html: Optional[str] = None
+    defaults: Dict[str, Any] = field(default_factory=dict)
+
+    def compile(self, **context: Any) -> "CompiledCampaign":
+        if self.html is not None:
+            html_part = CompiledTemplate(self.html, context, html_part=True, defaults=self.defaults)
+        else:
+            body = CompiledTemplate(self.text, context, html_part=True, from_text=True, defaults=self.defaults)
+            html_part = _wrap(body, HTML_HEAD, HTML_FOOT)
+        return CompiledCampaign(
+            email_type=self.email_type,
+            subject=CompiledTemplate(self.subject, context, defaults=self.defaults),
+            text=CompiledTemplate(self.text, context, defaults=self.defaults),
+            html=html_part,
+        )
+
+
+def _wrap(template: CompiledTemplate, before: str, after: str) -> CompiledTemplate:
+    """Put fixed markup around a compiled template without re-parsing it"""
+    if template._parts:
+        first_literal, name, spec = template._parts[0]
+        template._parts[0] = (before + first_literal, name, spec)
+        template._tail += after
+    else:
+        template._tail = before + template._tail + after
+    return template
+
+
+@dataclass
+class CompiledCampaign:
+    email_type: str
+    subject: CompiledTemplate
+    text: CompiledTemplate
+    html: CompiledTemplate
+
+    def render(self, contact: Dict[str, Any], branding: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Outbox row for one contact (needs id, type, professional_id, email)"""
+        branding = branding or _DEFAULT_BRANDING
+        fields = dict(contact, signature=branding["text"])
+        subject = self.subject.render(fields)
+        body = self.text.render(fields)
+        fields["signature"] = branding["html"]
+        return {
+            "to_email": contact["email"],
+            "subject": subject,
+            "body": body,
+            "body_html": self.html.render(fields),
+            "email_type": self.email_type,
+            "contact_id": contact["id"],
+            "contact_type": contact["type"],
+            "professional_user_id": contact["professional_id"],
+        }
+
+
+# ---------------- BRANDING ----------------
+
+_DEFAULT_BRANDING = {"text": DEFAULT_SIGNATURE, "html": text_to_html(DEFAULT_SIGNATURE)}
+
+
+def render_branding(profile: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Signature block for a professional in both parts: name, team/brokerage, contact lines"""
+    if not profile or not profile.get("name"):
+        return _DEFAULT_BRANDING
+    lines = [profile["name"]]
+    company = profile.get("team_name") or profile.get("brokerage_name")
+    if company:
+        lines.append(company)
+    if profile.get("role") == "lender" and profile.get("nmls_number"):
+        lines.append(f"NMLS #{profile['nmls_number']}")
+    if profile.get("phone"):
+        lines.append(profile["phone"])
+    text_lines = ["Best regards,"] + lines
+    html_lines = ["Best regards,"] + [html.escape(line) for line in lines]
+    website = profile.get("website_url")
+    if website:
+        text_lines.append(website)
+        html_lines.append(f'<a href="{html.escape(website, quote=True)}">{html.escape(website)}</a>')
+    return {"text": "\n".join(text_lines), "html": "<br>\n".join(html_lines)}
+
+
+def load_branding(professional_ids: Iterable[int]) -> Dict[int, Dict[str, str]]:
+    """Pre-rendered signature blocks for a set of professionals, in a few queries"""
+    ids = sorted({pid for pid in professional_ids if pid is not None})
+    branding: Dict[int, Dict[str, str]] = {}
+    if not ids:
+        return branding
+    conn = get_connection()
+    try:
+        for i in range(0, len(ids), _SQLITE_MAX_PARAMS):
+            chunk = ids[i:i + _SQLITE_MAX_PARAMS]
+            rows = conn.execute(
+                f"""
+                SELECT u.id, u.name, u.role, p.team_name, p.brokerage_name, p.phone,
+                       p.website_url, p.nmls_number
+                FROM users u
+                LEFT JOIN user_profiles p ON p.user_id = u.id
+                WHERE u.id IN ({', '.join('?' for _ in chunk)})
+                """,
+                chunk,
+            ).fetchall()
+            for row in rows:
+                branding[row["id"]] = render_branding(dict(row))
+    finally:
+        conn.close()
+    return branding
+
+
+def render_messages(compiled: CompiledCampaign, contacts: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Outbox rows for every contact with an email, rendered lazily (branding is loaded now, not on first next())"""
+    branding = load_branding(contact["professional_id"] for contact in contacts)
+    return (
+        compiled.render(contact, branding.get(contact["professional_id"]))
+        for contact in contacts
+        if contact.get("email")
+    )
+
+
+__all__ = [
+    'Campaign',
+    'CompiledCampaign',
+    'CompiledTemplate',
+    'DEFAULT_SIGNATURE',
+    'load_branding',
+    'render_branding',
+    'render_messages',
+    'text_to_html',
+]
@@ -0,0 +1,332 @@
+"""
+CRM Bulk Operations
+Apply one change to many contacts in a single transaction.
+
+The CRM bulk form used to loop over the selected ids calling
+update_agent_contact / update_lender_borrower, each opening a connection and
+committing, so cleaning up a 5,000-contact book meant 5,000 writes (and
+usually several requests). Here the target set is materialized once into a
+temp table - from the selected ids, from list filters (stage, search, tag, as
+crm_query.build_where reads them) or from a saved view - and the operation
+runs as one set-based UPDATE or DELETE against it. The whole thing, including
+a single summarized audit_logs entry, commits or rolls back together.
+
+    result = crm_bulk.apply_bulk("agent", user_id, "set_stage", ids=[1, 2, 3], stage="nurture")
+    # {'operation': 'set_stage', 'matched': 3, 'affected': 2, ...}
+
+Operations:
+    set_stage       stage (agent) / status (lender) = stage
+    add_tag         append tag where the contact doesn't have it
+    remove_tag      drop tag wherever it appears
+    set_automation  auto_* flags (all, or `columns`) = enabled
+    delete          contacts plus their interactions, tasks, deals and relationships
+
+Bulk edits are data clean-up, not contact with the client, so unlike the
+single-contact update they leave last_touch (and the follow-up queue) alone.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from audit import AuditAction, audit_log
+from crm_query import AUTOMATION_COLUMNS, CRM_BOOKS, build_where, normalize_tag, tag_pattern, tags_match_sql
+from database import get_connection
+
+OPERATIONS = ("set_stage", "add_tag", "remove_tag", "set_automation", "delete")
+# Largest explicit id selection accepted in one request
+MAX_SELECTION = 50_000
+
+_TARGETS = "temp.crm_bulk_targets"
+# Activity rows that belong to a contact and go with it on delete
+_CONTACT_ACTIVITY = ("crm_interactions", "crm_tasks", "crm_deals")
+
+
+class BulkOperationError(ValueError):
+    """Invalid bulk request (unknown operation, bad parameters, unknown view)"""
+
+
+def _is_int(value: Any) -> bool:
+    # JSON true/false are bools, which Python also counts as ints
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_request(ids, filters, view_id, enabled, columns) -> None:
+    """Reject wrongly typed JSON input before it's iterated or tested for truth"""
+    if ids is not None and not (isinstance(ids, list) and all(_is_int(i) for i in ids)):
+        raise BulkOperationError("ids must be a list of contact ids")
+    if filters is not None and not isinstance(filters, dict):
+        raise BulkOperationError("filters must be an object")
+    if view_id is not None and not _is_int(view_id):
+        raise BulkOperationError("view_id must be a saved view id")
+    if enabled is not None and not isinstance(enabled, bool):
+        raise BulkOperationError("enabled must be true or false")
+    if columns is not None and not (isinstance(columns, list) and all(isinstance(c, str) for c in columns)):
+        raise BulkOperationError("columns must be a list of automation column names")
+
+
+def _clean_filters(book, filters: Dict[str, Any]) -> Dict[str, Any]:
+    """The stage/search/tag filters that are set; each must be a string"""
+    cleaned = {}
+    for key in (book["stage_column"], "stage", "search", "tag"):
+        value = filters.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise BulkOperationError(f"Filter {key} must be a string")
+        if value.strip():
+            cleaned[key] = value
+    return cleaned
+
+
+def _clean_tag(tag: Optional[str]) -> str:
+    if tag is not None and not isinstance(tag, str):
+        raise BulkOperationError("Enter a single tag (no commas)")
+    tag = (tag or "").strip()
+    if not tag or "," in tag:
+        raise BulkOperationError("Enter a single tag (no commas)")
+    return tag
+
+
+def load_view_filters(view_id: int, professional_user_id: int, role: str) -> Dict[str, Any]:
+    """Filters stored with a saved view ({'stage'|'status', 'search', 'tag'})"""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT filters_json FROM crm_saved_views WHERE id = ? AND professional_user_id = ? AND role = ?",
+            (view_id, professional_user_id, role),
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise BulkOperationError("Saved view not found")
+    try:
+        filters = json.loads(row["filters_json"] or "{}")
+    except ValueError:
+        raise BulkOperationError("Saved view has invalid filters")
+    return filters if isinstance(filters, dict) else {}
+
+
+# ---------------- SELECTION ----------------
+
+def _load_targets(conn, role: str, owner_id: int, ids: Optional[List[int]],
+                  filters: Optional[Dict[str, Any]]) -> int:
+    """Fill the temp target table with the owner's matching contact ids; returns the count"""
+    book = CRM_BOOKS[role]
+    conn.execute(f"DROP TABLE IF EXISTS {_TARGETS}")
+    conn.execute("CREATE TEMP TABLE crm_bulk_targets (id INTEGER PRIMARY KEY)")
+    if ids is not None:
+        id_list = sorted(set(ids))
+        if len(id_list) > MAX_SELECTION:
+            raise BulkOperationError(f"Select at most {MAX_SELECTION:,} contacts at a time")
+        # Ids that aren't the owner's are simply not loaded
+        conn.executemany(
+            f"""
+            INSERT INTO {_TARGETS} (id)
+            SELECT id FROM {book['table']} WHERE id = ? AND {book['owner_column']} = ?
+            """,
+            ((contact_id, owner_id) for contact_id in id_list),
+        )
+    else:
+        filters = filters or {}
+        where, params = build_where(
+            role, owner_id,
+            stage=filters.get(book["stage_column"]) or filters.get("stage"),
+            search=filters.get("search"),
+            tag=filters.get("tag"),
+        )
+        conn.execute(f"INSERT INTO {_TARGETS} (id) SELECT id FROM {book['table']} WHERE {where}", params)
+    return conn.execute(f"SELECT COUNT(*) FROM {_TARGETS}").fetchone()[0]
+
+
+# ---------------- OPERATIONS ----------------
+
+def _set_stage(conn, book, owner_id, stage) -> int:
+    if stage not in book["stage_order"]:
+        raise BulkOperationError(f"{book['stage_column'].title()} must be one of {', '.join(book['stage_order'])}")
+    cur = conn.execute(
+        f"""
+        UPDATE {book['table']} SET {book['stage_column']} = ?
+        WHERE {book['owner_column']} = ? AND id IN (SELECT id FROM {_TARGETS})
+          AND {book['stage_column']} IS NOT ?
+        """,
+        (stage, owner_id, stage),
+    )
+    return cur.rowcount
+
+
+def _add_tag(conn, book, owner_id, tag) -> int:
+    tag = _clean_tag(tag)
+    cur = conn.execute(
+        f"""
+        UPDATE {book['table']}
+        SET tags = CASE WHEN TRIM(COALESCE(tags, '')) = '' THEN ? ELSE tags || ', ' || ? END
+        WHERE {book['owner_column']} = ? AND id IN (SELECT id FROM {_TARGETS})
+          AND NOT {tags_match_sql()}
+        """,
+        (tag, tag, owner_id, tag_pattern(tag)),
+    )
+    return cur.rowcount
+
+
+def _remove_tag(conn, book, owner_id, tag) -> int:
+    tag = _clean_tag(tag)
+    rows = conn.execute(
+        f"""
+        SELECT id, tags FROM {book['table']}
+        WHERE {book['owner_column']} = ? AND id IN (SELECT id FROM {_TARGETS}) AND {tags_match_sql()}
+        """,
+        (owner_id, tag_pattern(tag)),
+    ).fetchall()
+    updates = []
+    for row in rows:
+        kept = [t.strip() for t in row["tags"].split(",") if t.strip() and normalize_tag(t) != normalize_tag(tag)]
+        updates.append((", ".join(kept) or None, row["id"]))
+    conn.executemany(f"UPDATE {book['table']} SET tags = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+def _set_automation(conn, book, owner_id, enabled, columns) -> int:
+    columns = list(columns or AUTOMATION_COLUMNS)
+    unknown = [col for col in columns if col not in AUTOMATION_COLUMNS]
+    if unknown or not columns:
+        raise BulkOperationError(f"Automation columns must be among {', '.join(AUTOMATION_COLUMNS)}")
+    if enabled is None:
+        raise BulkOperationError("Say whether to turn automated emails on or off")
+    value = 1 if enabled else 0
+    cur = conn.execute(
+        f"""
+        UPDATE {book['table']} SET {', '.join(f'{col} = ?' for col in columns)}
+        WHERE {book['owner_column']} = ? AND id IN (SELECT id FROM {_TARGETS})
+          AND ({' OR '.join(f'COALESCE({col}, 0) != ?' for col in columns)})
+        """,
+        [value] * len(columns) + [owner_id] + [value] * len(columns),
+    )
+    return cur.rowcount
+
+
+def _delete(conn, book, owner_id) -> int:
+    # Contacts first: their rollup rows go with them, so the activity deletes
+    # below don't recompute rollups for contacts that no longer exist
+    cur = conn.execute(
+        f"DELETE FROM {book['table']} WHERE {book['owner_column']} = ? AND id IN (SELECT id FROM {_TARGETS})",
+        (owner_id,),
+    )
+    deleted = cur.rowcount
+    for table in _CONTACT_ACTIVITY:
+        conn.execute(
+            f"""
+            DELETE FROM {table}
+            WHERE professional_user_id = ? AND contact_type = ? AND contact_id IN (SELECT id FROM {_TARGETS})
+            """,
+            (owner_id, book["contact_type"]),
+        )
+    conn.execute(
+        f"""
+        DELETE FROM crm_relationships
+        WHERE professional_user_id = ? AND contact_type = ?
+          AND (contact_id_1 IN (SELECT id FROM {_TARGETS}) OR contact_id_2 IN (SELECT id FROM {_TARGETS}))
+        """,
+        (owner_id, book["contact_type"]),
+    )
+    return deleted
+
+
+def apply_bulk(
+    role: str,
+    owner_id: int,
+    operation: str,
+    ids: Optional[List[int]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    view_id: Optional[int] = None,
+    stage: Optional[str] = None,
+    tag: Optional[str] = None,
+    enabled: Optional[bool] = None,
+    columns: Optional[List[str]] = None,
+    actor_user_id: Optional[int] = None,
+    confirm_all: bool = False,
+) -> Dict[str, Any]:
+    """
+    Apply `operation` to the owner's contacts picked by ids, filters or a saved
+    view (exactly one), in one transaction with one audit entry. A delete by
+    filters or view with no filter set would empty the whole book, so it also
+    needs confirm_all=True.
+
+    Returns {'operation', 'matched', 'affected'}: matched is how many of the
+    owner's contacts were selected, affected how many actually changed.
+    Raises BulkOperationError for invalid requests.
+    """
+    if role not in CRM_BOOKS:
+        raise BulkOperationError(f"role must be one of {tuple(CRM_BOOKS)}")
+    if operation not in OPERATIONS:
+        raise BulkOperationError(f"Unknown bulk operation: {operation}")
+    if sum(x is not None for x in (ids, filters, view_id)) != 1:
+        raise BulkOperationError("Select contacts by ids, filters or a saved view")
+    _check_request(ids, filters, view_id, enabled, columns)
+    book = CRM_BOOKS[role]
+    if view_id is not None:
+        filters = load_view_filters(view_id, owner_id, role)
+    if filters is not None:
+        filters = _clean_filters(book, filters)
+        if operation == "delete" and not filters and not confirm_all:
+            raise BulkOperationError(
+                "Deleting by filters needs at least one filter (or confirm_all to delete every contact)"
+            )
+
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        matched = _load_targets(conn, role, owner_id, ids, filters)
+        if operation == "set_stage":
+            affected = _set_stage(conn, book, owner_id, stage)
+        elif operation == "add_tag":
+            affected = _add_tag(conn, book, owner_id, tag)
+        elif operation == "remove_tag":
+            affected = _remove_tag(conn, book, owner_id, tag)
+        elif operation == "set_automation":
+            affected = _set_automation(conn, book, owner_id, enabled, columns)
+        else:
+            affected = _delete(conn, book, owner_id)
+
+        summary = {
+            "operation": operation,
+            "selection": "ids" if ids is not None else (f"view:{view_id}" if view_id is not None else "filters"),
+            "matched": matched,
+            "affected": affected,
+        }
+        if operation == "set_stage":
+            summary[book["stage_column"]] = stage
+        elif operation in ("add_tag", "remove_tag"):
+            summary["tag"] = tag.strip()
+        elif operation == "set_automation":
+            summary["enabled"] = bool(enabled)
+            summary["columns"] = list(columns or AUTOMATION_COLUMNS)
+        if filters:
+            summary["filters"] = filters
+        audit_log(
+            actor_user_id or owner_id,
+            AuditAction.BULK_DELETED if operation == "delete" else AuditAction.BULK_UPDATED,
+            book["table"],
+            details=json.dumps(summary, sort_keys=True),
+            conn=conn,
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {_TARGETS}")
+        finally:
+            conn.close()
+
+    print(f"[CRM BULK] {operation} on {book['table']} for user {owner_id}: {affected} of {matched} changed")
+    return {"operation": operation, "matched": matched, "affected": affected}
+
+
+__all__ = [
+    'BulkOperationError',
+    'MAX_SELECTION',
+    'OPERATIONS',
+    'apply_bulk',
+    'load_view_filters',
+]
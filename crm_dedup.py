@@ -0,0 +1,175 @@
+"""
+CRM Duplicate Detection
+Hash-set index of normalized contact keys for imports and homeowner → CRM sync.
+
+The book is read once (id, name, email, phone) and every candidate is checked
+with set lookups, so deduplicating N incoming rows against a book of M contacts
+costs O(N + M) instead of re-listing the book per row. Rows accepted from the
+same file are added as they go, which catches duplicates inside the file too.
+
+    index = DuplicateIndex.for_book("agent", agent_id, keys=("email",))
+    match = index.check_and_add(record, origin=row_num)
+    if match:
+        print(match["reason"])   # "duplicate email of existing contact #12"
+
+Single lookups (signup sync, add-to-CRM) use find_existing_contact instead,
+an equality lookup on the indexed email_key / phone_key / name_key columns
+that database.py writes with the same normalizers.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from database import DEDUP_KEY_COLUMNS, get_connection, normalize_email, normalize_name, normalize_phone
+
+DEDUP_KEYS = ("email", "phone", "name")
+
+BOOKS = {
+    "agent": ("agent_contacts", "agent_user_id", "contact"),
+    "lender": ("lender_borrowers", "lender_user_id", "borrower"),
+}
+
+
+# ---------------- NORMALIZATION ----------------
+
+# normalize_email / normalize_phone / normalize_name live in database.py, which
+# also writes their output to the email_key / phone_key / name_key columns
+NORMALIZERS = {
+    "email": normalize_email,
+    "phone": normalize_phone,
+    "name": normalize_name,
+}
+
+
+def normalized_keys(record: Dict[str, Any], keys: Iterable[str]) -> Dict[str, str]:
+    """{key: normalized value} for the keys that have a usable value"""
+    out = {}
+    for key in keys:
+        value = NORMALIZERS[key](record.get(key))
+        if value:
+            out[key] = value
+    return out
+
+
+# ---------------- INDEX ----------------
+
+class DuplicateIndex:
+    """
+    Normalized email/phone/name -> where it was first seen.
+
+    Origins are ("existing", contact_id) for rows already in the book and
+    ("file", row_num) for rows accepted earlier in the same import.
+    """
+
+    def __init__(self, keys: Iterable[str] = ("email",), noun: str = "contact"):
+        self.keys: Tuple[str, ...] = tuple(k for k in keys if k in DEDUP_KEYS) or ("email",)
+        self.noun = noun
+        self._seen: Dict[str, Dict[str, Tuple[str, Any]]] = {key: {} for key in self.keys}
+        self.stats = {"existing": 0, "in_file": 0}
+
+    @classmethod
+    def for_book(cls, role: str, owner_id: int, keys: Iterable[str] = ("email",), conn=None) -> "DuplicateIndex":
+        """Index every contact in a professional's book with one query"""
+        table, owner_col, noun = BOOKS[role]
+        index = cls(keys, noun)
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        try:
+            cur = conn.execute(
+                f"SELECT id, name, email, phone FROM {table} WHERE {owner_col} = ?",
+                (owner_id,),
+            )
+            while True:
+                rows = cur.fetchmany(5000)
+                if not rows:
+                    break
+                for row in rows:
+                    index.add(
+                        {"name": row["name"], "email": row["email"], "phone": row["phone"]},
+                        ("existing", row["id"]),
+                    )
+        finally:
+            if own_conn:
+                conn.close()
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(seen) for seen in self._seen.values())
+
+    def add(self, record: Dict[str, Any], origin: Tuple[str, Any]) -> None:
+        for key, value in normalized_keys(record, self.keys).items():
+            self._seen[key].setdefault(value, origin)
+
+    def match(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        First key of record already in the index, as
+        {'key', 'value', 'origin', 'matched_id', 'reason'}; None if it's new.
+        """
+        for key, value in normalized_keys(record, self.keys).items():
+            origin = self._seen[key].get(value)
+            if origin is None:
+                continue
+            kind, ref = origin
+            if kind == "existing":
+                reason = f"duplicate {key} of existing {self.noun} #{ref}"
+            else:
+                reason = f"duplicate {key} of row {ref} in this file"
+            return {
+                "key": key,
+                "value": value,
+                "origin": kind,
+                "matched_id": ref if kind == "existing" else None,
+                "reason": reason,
+            }
+        return None
+
+    def check_and_add(self, record: Dict[str, Any], origin: Any) -> Optional[Dict[str, Any]]:
+        """match(); if the record is new, remember it as ("file", origin)"""
+        found = self.match(record)
+        if found:
+            self.stats["existing" if found["origin"] == "existing" else "in_file"] += 1
+            return found
+        self.add(record, ("file", origin))
+        return None
+
+
+def find_existing_contact(role: str, owner_id: int, record: Dict[str, Any], keys: Iterable[str] = ("email",),
+                          conn=None) -> Optional[int]:
+    """
+    Id of the book entry matching record on any of keys, or None.
+
+    One indexed equality query per key against the stored normalized key
+    columns, so a single signup or add-to-CRM sync no longer reads the whole
+    book; imports and bulk sync, which check many rows, still use
+    DuplicateIndex.
+    """
+    table, owner_col, _ = BOOKS[role]
+    wanted = normalized_keys(record, tuple(k for k in keys if k in DEDUP_KEYS) or ("email",))
+    if not wanted:
+        return None
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        for key, value in wanted.items():
+            row = conn.execute(
+                f"SELECT id FROM {table} WHERE {owner_col} = ? AND {DEDUP_KEY_COLUMNS[key]} = ? ORDER BY id LIMIT 1",
+                (owner_id, value),
+            ).fetchone()
+            if row:
+                return row["id"]
+    finally:
+        if own_conn:
+            conn.close()
+    return None
+
+
+__all__ = [
+    'DEDUP_KEYS',
+    'DuplicateIndex',
+    'find_existing_contact',
+    'normalize_email',
+    'normalize_name',
+    'normalize_phone',
+    'normalized_keys',
+]
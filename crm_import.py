@@ -0,0 +1,768 @@
+"""
+CRM Import Pipeline
+Streams CSV/XLSX uploads into a server-side staging table, previews from it and
+commits mapped rows in chunked executemany transactions.
+
+The old import read the whole file with pandas and parked every row as JSON in
+the Flask session cookie. Now the session only carries an import id; rows are
+parsed one at a time (csv.reader / openpyxl read-only) and written to
+crm_import_rows in chunks, so memory stays flat whatever the file size.
+
+Committing a batch is a background job: enqueue_import() marks it queued, a
+crm_import_worker thread claims it and inserts in checkpointed chunks, and the
+page polls job_progress(). A job orphaned by a killed worker is re-claimed once
+its heartbeat goes stale and continues from its last checkpoint.
+
+Flow:
+    batch = stage_upload(user_id, "agent", request.files["file"])
+    preview_rows(batch["id"], user_id)              # first rows for the mapping page
+    enqueue_import(batch["id"], user_id, mappings)  # worker inserts into agent_contacts / lender_borrowers
+    job_progress(batch["id"], user_id)              # rows parsed / inserted / skipped / errors
+    error_report_csv(batch["id"], user_id)          # per-row report download
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from crm_dedup import DEDUP_KEYS, DuplicateIndex
+from database import dedup_key_columns, get_connection, occasion_columns
+
+STAGE_CHUNK_SIZE = 1000
+COMMIT_CHUNK_SIZE = 500
+PREVIEW_ROWS = 10
+STAGING_RETENTION_HOURS = 24
+REPORT_RETENTION_DAYS = 7
+
+# A running job whose heartbeat is older than this is assumed dead (worker
+# killed, deploy restart) and is picked up again from its last checkpoint
+JOB_HEARTBEAT_TIMEOUT_SECONDS = 90
+JOB_MAX_ATTEMPTS = 3
+
+ALLOWED_EXTENSIONS = (".csv", ".xlsx", ".xls")
+
+# Per role: target table, owner column, the preview form's map_* field for each
+# CRM column, which columns are numeric, and the form field holding the default
+# stage/status.
+IMPORT_TARGETS: Dict[str, Dict[str, Any]] = {
+    "agent": {
+        "table": "agent_contacts",
+        "owner_column": "agent_user_id",
+        "stage_column": "stage",
+        "default_field": "default_stage",
+        "default_stage": "new",
+        "form_fields": {
+            "name": "map_name",
+            "email": "map_email",
+            "phone": "map_phone",
+            "stage": "map_stage",
+            "birthday": "map_birthday",
+            "home_anniversary": "map_anniversary",
+            "address": "map_address",
+            "property_address": "map_property_address",
+            "property_value": "map_property_value",
+            "equity_estimate": "map_equity",
+            "notes": "map_notes",
+            "tags": "map_tags",
+        },
+        "numeric": ("property_value", "equity_estimate"),
+    },
+    "lender": {
+        "table": "lender_borrowers",
+        "owner_column": "lender_user_id",
+        "stage_column": "status",
+        "default_field": "default_status",
+        "default_stage": "prospect",
+        "form_fields": {
+            "name": "map_name",
+            "email": "map_email",
+            "phone": "map_phone",
+            "status": "map_status",
+            "loan_type": "map_loan_type",
+            "target_payment": "map_target_payment",
+            "birthday": "map_birthday",
+            "home_anniversary": "map_anniversary",
+            "address": "map_address",
+            "property_address": "map_property_address",
+            "loan_amount": "map_loan_amount",
+            "loan_rate": "map_loan_rate",
+            "notes": "map_notes",
+            "tags": "map_tags",
+        },
+        "numeric": ("loan_amount", "loan_rate"),
+    },
+}
+
+
+class CRMImportError(Exception):
+    """Upload or staged batch can't be used (bad file, unknown/expired import id)"""
+
+
+class JobLeaseLost(Exception):
+    """Another worker took over the job (this one stalled past the heartbeat timeout)"""
+
+
+# ---------------- PARSING ----------------
+
+def _header(raw: List[Any]) -> List[str]:
+    """Column names from the first row; blanks and repeats get unique names"""
+    columns, seen = [], {}
+    for i, value in enumerate(raw):
+        name = str(value).strip() if value is not None else ""
+        name = name or f"Column {i + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name} ({seen[name]})"
+        else:
+            seen[name] = 1
+        columns.append(name)
+    return columns
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        # Midnight timestamps are plain dates in a spreadsheet
+        if value.hour == value.minute == value.second == 0:
+            return value.date().isoformat()
+        return value.isoformat(sep=" ")
+    if isinstance(value, float) and value.is_integer():
+        # Phone numbers and years typed into numeric cells come back as 5551234.0
+        return int(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def iter_rows(stream, filename: str) -> Iterator[Tuple[List[str], List[Any]]]:
+    """
+    Yield (columns, values) for every data row of a CSV or Excel upload.
+    Rows are produced one at a time; the file is never fully materialised.
+    """
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            reader = csv.reader(text)
+            columns = None
+            for raw in reader:
+                if columns is None:
+                    columns = _header(raw)
+                    continue
+                if not any(cell.strip() for cell in raw):
+                    continue
+                values = [_cell(cell) for cell in raw[:len(columns)]]
+                values += [None] * (len(columns) - len(values))
+                yield columns, values
+        finally:
+            text.detach()
+    elif name.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            columns = None
+            for raw in rows:
+                if columns is None:
+                    columns = _header(list(raw))
+                    continue
+                values = [_cell(cell) for cell in raw[:len(columns)]]
+                if all(v is None for v in values):
+                    continue
+                values += [None] * (len(columns) - len(values))
+                yield columns, values
+        finally:
+            workbook.close()
+    elif name.endswith(".xls"):
+        # Legacy binary Excel has no streaming reader; these files are small in practice
+        import pandas as pd
+
+        df = pd.read_excel(stream, dtype=object)
+        columns = _header(list(df.columns))
+        for raw in df.itertuples(index=False, name=None):
+            values = [None if (v != v) else _cell(v) for v in raw]  # NaN -> None
+            if all(v is None for v in values):
+                continue
+            yield columns, values
+    else:
+        raise CRMImportError("Please upload an Excel (.xlsx, .xls) or CSV file.")
+
+
+# ---------------- STAGING ----------------
+
+def purge_stale_batches(conn=None) -> None:
+    """
+    Drop staged rows of imports abandoned more than STAGING_RETENTION_HOURS ago
+    and finished imports (with their reports) after REPORT_RETENTION_DAYS.
+    Queued and running jobs are never touched.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        cutoff = f"-{STAGING_RETENTION_HOURS} hours"
+        conn.execute(
+            """
+            DELETE FROM crm_import_rows WHERE import_id IN (
+                SELECT id FROM crm_import_batches
+                WHERE created_at < datetime('now', ?) AND status NOT IN ('queued', 'running')
+            )
+            """,
+            (cutoff,),
+        )
+        conn.execute(
+            "DELETE FROM crm_import_batches WHERE status IN ('staging', 'staged') AND created_at < datetime('now', ?)",
+            (cutoff,),
+        )
+        report_cutoff = f"-{REPORT_RETENTION_DAYS} days"
+        conn.execute(
+            """
+            DELETE FROM crm_import_errors WHERE import_id IN (
+                SELECT id FROM crm_import_batches
+                WHERE status IN ('imported', 'failed') AND created_at < datetime('now', ?)
+            )
+            """,
+            (report_cutoff,),
+        )
+        conn.execute(
+            "DELETE FROM crm_import_batches WHERE status IN ('imported', 'failed') AND created_at < datetime('now', ?)",
+            (report_cutoff,),
+        )
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def stage_upload(user_id: int, role: str, file_storage) -> Dict[str, Any]:
+    """
+    Parse an uploaded file into crm_import_rows. Returns the batch
+    ({'id', 'columns', 'total_rows', 'filename', 'preview'}).
+    """
+    if role not in IMPORT_TARGETS:
+        raise CRMImportError(f"Unknown import role: {role}")
+    filename = file_storage.filename or ""
+    if not filename.lower().endswith(ALLOWED_EXTENSIONS):
+        raise CRMImportError("Please upload an Excel (.xlsx, .xls) or CSV file.")
+
+    import_id = uuid4().hex
+    columns: List[str] = []
+    total = 0
+    chunk: List[Tuple[str, int, str]] = []
+
+    conn = get_connection()
+    try:
+        purge_stale_batches(conn)
+        # Batch row first so a worker dying mid-upload leaves something purge can find
+        conn.execute(
+            """
+            INSERT INTO crm_import_batches (id, user_id, role, filename, columns_json, status)
+            VALUES (?, ?, ?, ?, '[]', 'staging')
+            """,
+            (import_id, user_id, role, filename),
+        )
+        conn.commit()
+        for columns, values in iter_rows(file_storage.stream, filename):
+            total += 1
+            chunk.append((import_id, total, json.dumps(values, default=str)))
+            if len(chunk) >= STAGE_CHUNK_SIZE:
+                conn.executemany(
+                    "INSERT INTO crm_import_rows (import_id, row_num, values_json) VALUES (?, ?, ?)",
+                    chunk,
+                )
+                conn.commit()
+                chunk = []
+        if chunk:
+            conn.executemany(
+                "INSERT INTO crm_import_rows (import_id, row_num, values_json) VALUES (?, ?, ?)",
+                chunk,
+            )
+        conn.execute(
+            """
+            UPDATE crm_import_batches SET columns_json = ?, total_rows = ?, status = 'staged'
+            WHERE id = ?
+            """,
+            (json.dumps(columns), total, import_id),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.execute("DELETE FROM crm_import_rows WHERE import_id = ?", (import_id,))
+        conn.execute("DELETE FROM crm_import_batches WHERE id = ?", (import_id,))
+        conn.commit()
+        raise
+    finally:
+        conn.close()
+
+    print(f"[CRM IMPORT] Staged {total} rows from {filename} as {import_id}")
+    batch = get_batch(import_id, user_id)
+    batch["preview"] = preview_rows(import_id, user_id)
+    return batch
+
+
+def get_batch(import_id: str, user_id: int) -> Dict[str, Any]:
+    """Batch metadata; raises CRMImportError if it doesn't exist or isn't this user's"""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT * FROM crm_import_batches WHERE id = ? AND user_id = ?",
+            (import_id, user_id),
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        raise CRMImportError("No import data found. Please upload a file again.")
+    batch = dict(row)
+    batch["columns"] = json.loads(batch.pop("columns_json"))
+    return batch
+
+
+def preview_rows(import_id: str, user_id: int, limit: int = PREVIEW_ROWS) -> List[Dict[str, Any]]:
+    """First staged rows as {column: value} dicts"""
+    batch = get_batch(import_id, user_id)
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """
+            SELECT values_json FROM crm_import_rows
+            WHERE import_id = ? ORDER BY row_num LIMIT ?
+            """,
+            (import_id, limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(batch["columns"], json.loads(r["values_json"]))) for r in rows]
+
+
+def iter_staged(import_id: str, columns: List[str], start_row: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(row_num, {column: value}) for staged rows after start_row, read in chunks"""
+    last = start_row
+    while True:
+        conn = get_connection()
+        try:
+            rows = conn.execute(
+                """
+                SELECT row_num, values_json FROM crm_import_rows
+                WHERE import_id = ? AND row_num > ?
+                ORDER BY row_num LIMIT ?
+                """,
+                (import_id, last, STAGE_CHUNK_SIZE),
+            ).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        for r in rows:
+            yield r["row_num"], dict(zip(columns, json.loads(r["values_json"])))
+        last = rows[-1]["row_num"]
+
+
+# ---------------- MAPPING ----------------
+
+def mappings_from_form(role: str, form) -> Dict[str, str]:
+    """{crm column: spreadsheet column} from the preview page's map_* selects"""
+    fields = IMPORT_TARGETS[role]["form_fields"]
+    return {column: (form.get(field, "") or "").strip() for column, field in fields.items()}
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def build_record(role: str, row: Dict[str, Any], mappings: Dict[str, str], default_stage: str) -> Dict[str, Any]:
+    """Map one staged row onto CRM columns. Raises ValueError for unusable rows."""
+    target = IMPORT_TARGETS[role]
+    record: Dict[str, Any] = {}
+    for column, source in mappings.items():
+        raw = row.get(source) if source else None
+        if column in target["numeric"]:
+            text = _text(raw).replace(",", "").replace("$", "").replace("%", "")
+            try:
+                record[column] = float(text) if text else None
+            except ValueError:
+                record[column] = None
+        else:
+            record[column] = _text(raw)
+
+    stage_col = target["stage_column"]
+    record[stage_col] = record.get(stage_col) or default_stage
+    if not record.get("name"):
+        raise ValueError("Missing name")
+
+    record.update(occasion_columns(record))
+    record.update(dedup_key_columns(record))
+    record["last_touch"] = ""
+    if role == "agent":
+        record["best_contact"] = record.get("email") or record.get("phone") or ""
+    return record
+
+
+def _insert_chunk(conn, role: str, owner_id: int, records: List[Dict[str, Any]]) -> None:
+    target = IMPORT_TARGETS[role]
+    columns = list(records[0].keys())
+    conn.executemany(
+        f"""
+        INSERT INTO {target['table']} ({target['owner_column']}, {', '.join(columns)})
+        VALUES (?, {', '.join('?' for _ in columns)})
+        """,
+        [(owner_id, *(rec[c] for c in columns)) for rec in records],
+    )
+
+
+# ---------------- JOBS ----------------
+
+def enqueue_import(
+    import_id: str,
+    user_id: int,
+    mappings: Dict[str, str],
+    default_stage: Optional[str] = None,
+    skip_duplicates: bool = True,
+    duplicate_check: str = "email",
+) -> Dict[str, Any]:
+    """
+    Queue a staged batch for the background worker (crm_import_worker) and
+    return it. duplicate_check is "email", "phone", "name" or "any".
+    """
+    batch = get_batch(import_id, user_id)
+    if batch["status"] == "staging":
+        raise CRMImportError("This upload is still being processed. Please try again shortly.")
+    options = {
+        "mappings": mappings,
+        "default_stage": default_stage or IMPORT_TARGETS[batch["role"]]["default_stage"],
+        "skip_duplicates": bool(skip_duplicates),
+        "duplicate_check": duplicate_check if duplicate_check in DEDUP_KEYS + ("any",) else "email",
+    }
+    conn = get_connection()
+    try:
+        # Guarded on status so a double-submitted form can't queue the batch twice
+        queued = conn.execute(
+            """
+            UPDATE crm_import_batches
+            SET status = 'queued', options_json = ?, processed_rows = 0, imported = 0,
+                skipped = 0, error_count = 0, attempts = 0, error_message = NULL
+            WHERE id = ? AND user_id = ? AND status = 'staged'
+            """,
+            (json.dumps(options), import_id, user_id),
+        ).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    if not queued:
+        raise CRMImportError("This import has already been processed.")
+    print(f"[CRM IMPORT] Queued {import_id} ({batch['total_rows']} rows)")
+    return get_batch(import_id, user_id)
+
+
+def claim_next_job(worker_id: str, import_id: Optional[str] = None) -> Optional[str]:
+    """
+    Take ownership of the oldest queued job, or of a running one whose worker
+    stopped heartbeating (killed or restarted mid-import). Returns its id.
+    The UPDATE re-checks the claim condition so only one worker can win.
+    """
+    claimable = """
+        (status = 'queued'
+         OR (status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < datetime('now', ?))))
+    """
+    stale = f"-{JOB_HEARTBEAT_TIMEOUT_SECONDS} seconds"
+    conn = get_connection()
+    try:
+        while True:
+            sql = f"SELECT id, attempts FROM crm_import_batches WHERE {claimable}"
+            params: List[Any] = [stale]
+            if import_id:
+                sql += " AND id = ?"
+                params.append(import_id)
+            row = conn.execute(sql + " ORDER BY created_at LIMIT 1", params).fetchone()
+            if not row:
+                return None
+            if (row["attempts"] or 0) >= JOB_MAX_ATTEMPTS:
+                conn.execute(
+                    f"""
+                    UPDATE crm_import_batches
+                    SET status = 'failed', completed_at = CURRENT_TIMESTAMP,
+                        error_message = 'Import stopped after {JOB_MAX_ATTEMPTS} attempts'
+                    WHERE id = ? AND {claimable}
+                    """,
+                    (row["id"], stale),
+                )
+                conn.commit()
+                continue
+            claimed = conn.execute(
+                f"""
+                UPDATE crm_import_batches
+                SET status = 'running', worker_id = ?, heartbeat_at = CURRENT_TIMESTAMP,
+                    started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                    attempts = COALESCE(attempts, 0) + 1
+                WHERE id = ? AND {claimable}
+                """,
+                (worker_id, row["id"], stale),
+            ).rowcount
+            conn.commit()
+            if claimed:
+                return row["id"]
+    finally:
+        conn.close()
+
+
+def _load_job(import_id: str) -> Dict[str, Any]:
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM crm_import_batches WHERE id = ?", (import_id,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        raise CRMImportError(f"Unknown import {import_id}")
+    batch = dict(row)
+    batch["columns"] = json.loads(batch.pop("columns_json"))
+    batch["options"] = json.loads(batch.pop("options_json") or "{}")
+    return batch
+
+
+def run_import_job(import_id: str, worker_id: str) -> None:
+    """
+    Insert a claimed batch into the user's CRM, resuming after processed_rows.
+
+    Every COMMIT_CHUNK_SIZE staged rows the inserted contacts, their report
+    lines and the new checkpoint/counters are committed in one transaction, so
+    a job picked up after a crash continues exactly where the last commit left
+    off without inserting anything twice.
+    """
+    batch = _load_job(import_id)
+    role, user_id, options = batch["role"], batch["user_id"], batch["options"]
+    resumed_from = batch["processed_rows"] or 0
+    if resumed_from:
+        print(f"[CRM IMPORT] Resuming {import_id} after row {resumed_from}")
+
+    conn = get_connection()
+    try:
+        dedup = None
+        if options.get("skip_duplicates", True):
+            check = options.get("duplicate_check", "email")
+            keys = DEDUP_KEYS if check == "any" else (check,)
+            # Rows this job already inserted are in the book now, so a resumed
+            # job still skips later repeats of them
+            dedup = DuplicateIndex.for_book(role, user_id, keys, conn=conn)
+
+        records: List[Dict[str, Any]] = []
+        report: List[Tuple[str, int, str, str]] = []
+        last_row = resumed_from
+
+        def checkpoint() -> None:
+            if records:
+                _insert_chunk(conn, role, user_id, records)
+            if report:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO crm_import_errors (import_id, row_num, kind, message) VALUES (?, ?, ?, ?)",
+                    report,
+                )
+            duplicates = sum(1 for r in report if r[2] != "error")
+            owned = conn.execute(
+                """
+                UPDATE crm_import_batches
+                SET processed_rows = ?, imported = imported + ?, skipped = skipped + ?,
+                    error_count = error_count + ?, heartbeat_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'running' AND worker_id = ?
+                """,
+                (last_row, len(records), duplicates, len(report) - duplicates, import_id, worker_id),
+            ).rowcount
+            if not owned:
+                conn.rollback()
+                raise JobLeaseLost(import_id)
+            conn.commit()
+            records.clear()
+            report.clear()
+
+        since_checkpoint = 0
+        for row_num, row in iter_staged(import_id, batch["columns"], start_row=resumed_from):
+            last_row = row_num
+            since_checkpoint += 1
+            try:
+                record = build_record(role, row, options.get("mappings", {}), options.get("default_stage"))
+            except ValueError as e:
+                report.append((import_id, row_num, "error", str(e)))
+                record = None
+            if record is not None and dedup is not None:
+                match = dedup.check_and_add(record, row_num)
+                if match:
+                    kind = "existing" if match["origin"] == "existing" else "in_file"
+                    report.append((import_id, row_num, kind, match["reason"]))
+                    record = None
+            if record is not None:
+                records.append(record)
+            if since_checkpoint >= COMMIT_CHUNK_SIZE:
+                checkpoint()
+                since_checkpoint = 0
+        checkpoint()
+
+        conn.execute(
+            """
+            UPDATE crm_import_batches
+            SET status = 'imported', completed_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND worker_id = ?
+            """,
+            (import_id, worker_id),
+        )
+        conn.execute("DELETE FROM crm_import_rows WHERE import_id = ?", (import_id,))
+        conn.commit()
+    except JobLeaseLost:
+        print(f"[CRM IMPORT] {import_id}: taken over by another worker, stopping")
+        return
+    except Exception as e:
+        conn.rollback()
+        conn.execute(
+            """
+            UPDATE crm_import_batches
+            SET status = 'failed', error_message = ?, completed_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND worker_id = ?
+            """,
+            (str(e)[:500], import_id, worker_id),
+        )
+        conn.commit()
+        print(f"[CRM IMPORT] {import_id} failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+    done = _load_job(import_id)
+    print(f"[CRM IMPORT] {import_id}: {done['imported']} imported, {done['skipped']} skipped, "
+          f"{done['error_count']} errors")
+
+
+def job_progress(import_id: str, user_id: int) -> Dict[str, Any]:
+    """Progress of an import for the status page / JSON endpoint"""
+    batch = get_batch(import_id, user_id)
+    total = batch["total_rows"] or 0
+    processed = batch.get("processed_rows") or 0
+    if batch["status"] == "imported":
+        processed = total
+    return {
+        "id": batch["id"],
+        "role": batch["role"],
+        "filename": batch["filename"],
+        "status": batch["status"],
+        "done": batch["status"] in ("imported", "failed"),
+        "total_rows": total,
+        "rows_parsed": processed,
+        "inserted": batch["imported"] or 0,
+        "skipped": batch["skipped"] or 0,
+        "errors": batch["error_count"] or 0,
+        "percent": round(100.0 * processed / total, 1) if total else 100.0,
+        "error_message": batch.get("error_message"),
+        "started_at": batch.get("started_at"),
+        "completed_at": batch["completed_at"],
+    }
+
+
+REPORT_KINDS = {
+    "error": "Error",
+    "existing": "Duplicate (already in CRM)",
+    "in_file": "Duplicate (repeated in file)",
+}
+
+
+def report_lines(import_id: str, user_id: int, kinds: Optional[Tuple[str, ...]] = None) -> Iterator[Tuple[int, str, str]]:
+    """(row_num, kind, message) for every skipped or rejected row, in row order"""
+    get_batch(import_id, user_id)
+    sql = "SELECT row_num, kind, message FROM crm_import_errors WHERE import_id = ?"
+    params: List[Any] = [import_id]
+    if kinds:
+        sql += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+        params.extend(kinds)
+    last = 0
+    while True:
+        conn = get_connection()
+        try:
+            rows = conn.execute(
+                sql + " AND row_num > ? ORDER BY row_num LIMIT ?",
+                [*params, last, STAGE_CHUNK_SIZE],
+            ).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return
+        for r in rows:
+            yield r["row_num"], r["kind"], r["message"]
+        last = rows[-1]["row_num"]
+
+
+def error_report_csv(import_id: str, user_id: int) -> Iterator[str]:
+    """CSV lines (with header) of the import report, for streaming as a download"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Row", "Result", "Reason"])
+    for row_num, kind, message in report_lines(import_id, user_id):
+        writer.writerow([row_num, REPORT_KINDS.get(kind, kind), message])
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def commit_import(
+    import_id: str,
+    user_id: int,
+    mappings: Dict[str, str],
+    default_stage: Optional[str] = None,
+    skip_duplicates: bool = True,
+    duplicate_check: str = "email",
+) -> Dict[str, Any]:
+    """
+    Queue and run an import in the calling thread (scripts and small batches;
+    the web app queues and lets crm_import_worker run it).
+
+    Returns {'imported', 'skipped', 'skipped_existing', 'skipped_in_file',
+     'duplicates': ["Row N: reason", ...], 'errors': ["Row N: reason", ...],
+     'total_rows'}.
+    """
+    enqueue_import(import_id, user_id, mappings, default_stage, skip_duplicates, duplicate_check)
+    worker_id = f"inline:{uuid4().hex[:8]}"
+    if claim_next_job(worker_id, import_id=import_id) is None:
+        raise CRMImportError("This import has already been processed.")
+    run_import_job(import_id, worker_id)
+
+    batch = get_batch(import_id, user_id)
+    duplicates, errors, counts = [], [], {"existing": 0, "in_file": 0}
+    for row_num, kind, message in report_lines(import_id, user_id):
+        if kind == "error":
+            errors.append(f"Row {row_num}: {message}")
+        else:
+            counts[kind] = counts.get(kind, 0) + 1
+            duplicates.append(f"Row {row_num}: {message}")
+    return {
+        "imported": batch["imported"],
+        "skipped": batch["skipped"],
+        "skipped_existing": counts["existing"],
+        "skipped_in_file": counts["in_file"],
+        "duplicates": duplicates,
+        "errors": errors,
+        "total_rows": batch["total_rows"],
+    }
+
+
+__all__ = [
+    'IMPORT_TARGETS',
+    'CRMImportError',
+    'build_record',
+    'claim_next_job',
+    'commit_import',
+    'enqueue_import',
+    'error_report_csv',
+    'get_batch',
+    'iter_rows',
+    'iter_staged',
+    'job_progress',
+    'mappings_from_form',
+    'preview_rows',
+    'purge_stale_batches',
+    'report_lines',
+    'run_import_job',
+    'stage_upload',
+]
@@ -0,0 +1,84 @@
+"""
+CRM Import Worker
+Background thread that runs queued CRM imports outside the request cycle.
+
+Each gunicorn worker process starts one of these. Workers claim jobs from
+crm_import_batches with a guarded UPDATE, so two processes never run the same
+import; a job whose process died stops heartbeating and is claimed again by
+whichever worker polls next, resuming from its last checkpoint.
+
+    crm_import.enqueue_import(import_id, user_id, mappings)
+    crm_import_worker.start()   # idempotent; wakes the thread if it's idle
+"""
+
+import os
+import socket
+import threading
+import traceback
+from typing import Optional
+
+import crm_import
+
+POLL_SECONDS = 15
+
+
+class ImportWorker:
+    def __init__(self, poll_seconds: float = POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.worker_id = ""
+
+    def start(self) -> None:
+        """Start the thread in this process (again after a fork), or wake it"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                self._wake.set()
+                return
+            self._pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}:{self._pid}"
+            self._thread = threading.Thread(target=self._loop, name="crm-import-worker", daemon=True)
+            self._thread.start()
+            print(f"[CRM IMPORT] Worker {self.worker_id} started")
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def run_pending(self) -> int:
+        """Run claimable jobs until none are left; returns how many ran"""
+        ran = 0
+        while True:
+            import_id = crm_import.claim_next_job(self.worker_id)
+            if import_id is None:
+                return ran
+            ran += 1
+            try:
+                crm_import.run_import_job(import_id, self.worker_id)
+            except Exception:
+                # Already recorded as failed on the batch; keep serving other jobs
+                print(f"[CRM IMPORT] Job {import_id} error: {traceback.format_exc()}")
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                self.run_pending()
+            except Exception as e:
+                print(f"[CRM IMPORT] Worker poll error: {e}")
+            self._wake.wait(self.poll_seconds)
+
+
+_worker = ImportWorker()
+
+
+def start() -> None:
+    _worker.start()
+
+
+__all__ = [
+    'ImportWorker',
+    'POLL_SECONDS',
+    'start',
+]
@@ -0,0 +1,333 @@
+"""
+CRM Query Engine
+Compiles the CRM list parameters (stage/status, search, tag, sort) into SQL with
+LIMIT and keyset cursors, plus a single aggregate query for the stats block.
+
+/agent/crm and /lender/crm used to load the professional's whole book, filter
+and sort it in Python, then walk it again for every stat. With this module a
+page costs one indexed range read of page_size + 1 rows whatever the book size.
+
+Cursors are opaque strings encoding the sort key and id of the last row shown;
+the next page starts strictly after that (sort key, id) pair, so inserts and
+deletes between requests never skip or repeat rows the way OFFSET would.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional
+
+import search_index
+from database import OPEN_TASK_STATUS, get_connection
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# One entry per CRM flavour. "stage" is the pipeline column the sidebar filters on.
+CRM_BOOKS: Dict[str, Dict[str, Any]] = {
+    "agent": {
+        "table": "agent_contacts",
+        "owner_column": "agent_user_id",
+        "contact_type": "agent_contact",
+        "stage_column": "stage",
+        "stage_order": ("new", "nurture", "active", "past", "sphere"),
+        "stat_stages": ("new", "active", "past"),
+        "columns": (
+            "id", "created_at", "name", "email", "phone", "stage", "best_contact",
+            "last_touch", "birthday", "home_anniversary", "address", "notes", "tags",
+            "property_address", "property_value", "equity_estimate", "auto_birthday",
+            "auto_anniversary", "auto_seasonal", "auto_equity", "auto_holidays",
+            "equity_frequency",
+        ),
+        "search_columns": ("name", "email", "phone", "property_address", "notes", "tags"),
+        "equity_column": "equity_estimate",
+        "default_sort": "name",
+    },
+    "lender": {
+        "table": "lender_borrowers",
+        "owner_column": "lender_user_id",
+        "contact_type": "lender_borrower",
+        "stage_column": "status",
+        "stage_order": ("prospect", "preapproval", "in_process", "closed"),
+        "stat_stages": ("prospect", "preapproval", "in_process", "closed"),
+        "columns": (
+            "id", "created_at", "name", "status", "loan_type", "target_payment",
+            "last_touch", "email", "phone", "birthday", "home_anniversary", "address",
+            "notes", "tags", "property_address", "loan_amount", "loan_rate",
+            "auto_birthday", "auto_anniversary", "auto_seasonal", "auto_equity",
+            "auto_holidays", "equity_frequency",
+        ),
+        "search_columns": ("name", "email", "phone", "property_address", "notes", "tags", "loan_type"),
+        "equity_column": None,
+        "default_sort": "created_at",
+    },
+}
+
+AUTOMATION_COLUMNS = ("auto_birthday", "auto_anniversary", "auto_seasonal", "auto_equity", "auto_holidays")
+
+
+# ---------------- SORTS ----------------
+
+def _sort_spec(book: Dict[str, Any], sort_by: str):
+    """(sql expression, descending) for a sort name; id breaks ties in the same direction"""
+    if sort_by == "name":
+        return "COALESCE(name, '') COLLATE NOCASE", False
+    if sort_by in ("stage", "status"):
+        whens = " ".join(
+            f"WHEN '{value}' THEN {i}" for i, value in enumerate(book["stage_order"])
+        )
+        return f"(CASE {book['stage_column']} {whens} ELSE {len(book['stage_order'])} END)", False
+    if sort_by == "last_touch":
+        return "COALESCE(last_touch, '')", True
+    return "COALESCE(created_at, '')", True
+
+
+def normalize_sort(book: Dict[str, Any], sort_by: Optional[str]) -> str:
+    if sort_by in ("name", "stage", "status", "last_touch", "created_at"):
+        return sort_by
+    return book["default_sort"]
+
+
+# ---------------- CURSORS ----------------
+
+def encode_cursor(sort_by: str, key: Any, row_id: int) -> str:
+    raw = json.dumps([sort_by, key, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], sort_by: str):
+    """(key, id) from a cursor, or None if missing/invalid/for another sort"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key, row_id = json.loads(raw)
+        if cursor_sort != sort_by:
+            return None
+        return key, int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+# ---------------- FILTERS ----------------
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def normalize_tag(tag: str) -> str:
+    """Lowercase, whitespace runs collapsed - how tags_match_sql sees each stored tag"""
+    return " ".join(tag.split()).lower()
+
+
+def tags_match_sql(column: str = "tags") -> str:
+    """
+    Whole-tag match on a comma separated tags column; bind tag_pattern(tag).
+
+    tags are free text ("buyer, vip", "buyer ,vip", "buyer,  vip"), so
+    tabs/newlines become spaces, runs of spaces collapse to one (the CHAR(1)
+    sentinel trick), and the space left on either side of each comma is
+    dropped before the LIKE.
+    """
+    text = f"REPLACE(REPLACE(REPLACE(LOWER(COALESCE({column}, '')), CHAR(9), ' '), CHAR(10), ' '), CHAR(13), ' ')"
+    single = f"REPLACE(REPLACE(REPLACE({text}, ' ', ' ' || CHAR(1)), CHAR(1) || ' ', ''), CHAR(1), '')"
+    return f"REPLACE(REPLACE(',' || {single} || ',', ', ', ','), ' ,', ',') LIKE ? ESCAPE '\\'"
+
+
+def tag_pattern(tag: str) -> str:
+    """LIKE parameter for tags_match_sql"""
+    return f"%,{_like_escape(normalize_tag(tag))},%"
+
+
+def build_where(
+    role: str,
+    owner_id: int,
+    stage: Optional[str] = None,
+    search: Optional[str] = None,
+    tag: Optional[str] = None,
+):
+    """
+    WHERE clause (without the keyword) and params shared by listing and stats.
+    Search goes through the FTS5 index (prefix match on every word) when it
+    exists, otherwise a LIKE over the search columns.
+    """
+    book = CRM_BOOKS[role]
+    clauses = [f"{book['owner_column']} = ?"]
+    params: List[Any] = [owner_id]
+
+    if stage:
+        clauses.append(f"{book['stage_column']} = ?")
+        params.append(stage)
+
+    fts_clause = search_index.contact_match_clause(role) if search else None
+    fts_query = search_index.match_expression(search) if fts_clause else None
+    if fts_query:
+        clauses.append(fts_clause)
+        params.append(fts_query)
+    elif search and search.strip():
+        pattern = f"%{_like_escape(search.strip().lower())}%"
+        ors = " OR ".join(
+            f"LOWER(COALESCE({col}, '')) LIKE ? ESCAPE '\\'" for col in book["search_columns"]
+        )
+        clauses.append(f"({ors})")
+        params.extend([pattern] * len(book["search_columns"]))
+
+    if tag:
+        # tags is a comma separated string ("buyer, vip"); match whole tags only
+        clauses.append(tags_match_sql())
+        params.append(tag_pattern(tag))
+
+    return " AND ".join(clauses), params
+
+
+# ---------------- QUERIES ----------------
+
+def fetch_page(
+    role: str,
+    owner_id: int,
+    stage: Optional[str] = None,
+    search: Optional[str] = None,
+    tag: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> Dict[str, Any]:
+    """
+    One page of a CRM book.
+
+    Returns {'items': [dict, ...], 'next_cursor': str|None, 'has_more': bool,
+    'sort_by': str}.
+    """
+    book = CRM_BOOKS[role]
+    sort_by = normalize_sort(book, sort_by)
+    page_size = max(1, min(int(page_size or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    sort_expr, descending = _sort_spec(book, sort_by)
+
+    where, params = build_where(role, owner_id, stage, search, tag)
+    after = decode_cursor(cursor, sort_by)
+    if after is not None:
+        key, last_id = after
+        op = "<" if descending else ">"
+        where += f" AND ({sort_expr} {op} ? OR ({sort_expr} = ? AND id {op} ?))"
+        params.extend([key, key, last_id])
+
+    direction = "DESC" if descending else "ASC"
+    sql = f"""
+        SELECT {', '.join(book['columns'])}, {sort_expr} AS _sort_key
+        FROM {book['table']}
+        WHERE {where}
+        ORDER BY {sort_expr} {direction}, id {direction}
+        LIMIT ?
+    """
+    params.append(page_size + 1)
+
+    conn = get_connection()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    items = []
+    for row in rows:
+        item = dict(row)
+        item.pop("_sort_key", None)
+        items.append(item)
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_by, last["_sort_key"], last["id"])
+
+    return {"items": items, "next_cursor": next_cursor, "has_more": has_more, "sort_by": sort_by}
+
+
+def fetch_stats(
+    role: str,
+    owner_id: int,
+    stage: Optional[str] = None,
+    search: Optional[str] = None,
+    tag: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Stats block for the CRM page in one statement: stage counts, automation and
+    equity over the filtered book, plus the professional's pending tasks and deals.
+    """
+    book = CRM_BOOKS[role]
+    where, params = build_where(role, owner_id, stage, search, tag)
+
+    stage_sums = ", ".join(
+        f"SUM(CASE WHEN {book['stage_column']} = '{value}' THEN 1 ELSE 0 END) AS \"{value}\""
+        for value in book["stat_stages"]
+    )
+    automation = " OR ".join(f"COALESCE({col}, 0) != 0" for col in AUTOMATION_COLUMNS)
+    equity = (
+        f"COALESCE(SUM({book['equity_column']}), 0)" if book["equity_column"] else "0"
+    )
+
+    sql = f"""
+        SELECT
+            c.total, {', '.join(f'c."{v}"' for v in book['stat_stages'])},
+            c.with_automation, c.total_equity,
+            (SELECT COUNT(*) FROM crm_tasks
+             WHERE professional_user_id = ? AND status = '{OPEN_TASK_STATUS}') AS pending_tasks,
+            d.total_deals, d.pipeline_value, d.expected_commission
+        FROM (
+            SELECT COUNT(*) AS total, {stage_sums},
+                   SUM(CASE WHEN {automation} THEN 1 ELSE 0 END) AS with_automation,
+                   {equity} AS total_equity
+            FROM {book['table']}
+            WHERE {where}
+        ) c,
+        (
+            SELECT COUNT(*) AS total_deals,
+                   COALESCE(SUM(deal_value), 0) AS pipeline_value,
+                   COALESCE(SUM(expected_commission), 0) AS expected_commission
+            FROM crm_deals
+            WHERE professional_user_id = ?
+        ) d
+    """
+    conn = get_connection()
+    try:
+        row = conn.execute(sql, [owner_id, *params, owner_id]).fetchone()
+    finally:
+        conn.close()
+
+    stats = {key: (row[key] or 0) for key in row.keys()}
+    return stats
+
+
+def fetch_tags(role: str, owner_id: int) -> List[str]:
+    """Sorted unique tags across the book (reads only the tags column)"""
+    book = CRM_BOOKS[role]
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT DISTINCT tags FROM {book['table']}
+            WHERE {book['owner_column']} = ? AND tags IS NOT NULL AND tags != ''
+            """,
+            (owner_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    tags = set()
+    for row in rows:
+        tags.update(t.strip() for t in row["tags"].split(",") if t.strip())
+    return sorted(tags)
+
+
+__all__ = [
+    'CRM_BOOKS',
+    'DEFAULT_PAGE_SIZE',
+    'MAX_PAGE_SIZE',
+    'build_where',
+    'decode_cursor',
+    'encode_cursor',
+    'fetch_page',
+    'fetch_stats',
+    'fetch_tags',
+    'normalize_tag',
+    'tag_pattern',
+    'tags_match_sql',
+]
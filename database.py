@@ -1,9 +1,15 @@
 import sqlite3
 import json
 import os
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+import calendar
+import re
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import date, datetime, timedelta
+
+from db_pool import ConnectionPool
+from schema_registry import schema
 
 # Use persistent storage path - Railway or local
 # Railway: Use persistent volume path if available
@@ -33,933 +39,43 @@ else:
     print(f"[DATABASE] Using local storage: {DB_PATH}")
 
 
-def get_connection() -> sqlite3.Connection:
-    """
-    Get a database connection with proper timeout and thread safety.
-    SQLite timeout allows waiting for locks to be released (default 5 seconds).
-    """
-    conn = sqlite3.connect(DB_PATH, timeout=10.0, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    # Enable WAL mode for better concurrency
-    try:
-        conn.execute("PRAGMA journal_mode=WAL")
-    except:
-        pass  # WAL might not be available in all SQLite versions
-    return conn
-
-
-def init_db() -> None:
-    conn = get_connection()
-    cur = conn.cursor()
-
-    # ---------------- USERS ----------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            name TEXT,
-            email TEXT UNIQUE,
-            password_hash TEXT,
-            role TEXT CHECK(role IN ('homeowner','agent','lender')) NOT NULL,
-            follow_up_days INTEGER DEFAULT 30
-        )
-        """
-    )
-    
-    # Add follow_up_days column if it doesn't exist
-    try:
-        cur.execute("ALTER TABLE users ADD COLUMN follow_up_days INTEGER DEFAULT 30")
-    except:
-        pass
-    
-    # Add agent_id and lender_id columns for homeowner linking
-    try:
-        cur.execute("ALTER TABLE users ADD COLUMN agent_id INTEGER REFERENCES users(id)")
-    except:
-        pass
-    try:
-        cur.execute("ALTER TABLE users ADD COLUMN lender_id INTEGER REFERENCES users(id)")
-    except:
-        pass
-    
-    # Add subscription_tier column for premium features (free, basic, premium, pro)
-    try:
-        cur.execute("ALTER TABLE users ADD COLUMN subscription_tier TEXT DEFAULT 'free' CHECK(subscription_tier IN ('free','basic','premium','pro'))")
-    except:
-        pass
-
-    # ------------- USER PROFILES -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS user_profiles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE NOT NULL,
-            role TEXT CHECK(role IN ('agent','lender')) NOT NULL,
-            referral_code TEXT UNIQUE,
-            professional_photo TEXT,
-            brokerage_logo TEXT,
-            team_name TEXT,
-            brokerage_name TEXT,
-            website_url TEXT,
-            facebook_url TEXT,
-            instagram_url TEXT,
-            linkedin_url TEXT,
-            twitter_url TEXT,
-            youtube_url TEXT,
-            phone TEXT,
-            call_button_enabled INTEGER DEFAULT 1,
-            schedule_button_enabled INTEGER DEFAULT 1,
-            schedule_url TEXT,
-            bio TEXT,
-            specialties TEXT,
-            years_experience INTEGER,
-            languages TEXT,
-            service_areas TEXT,
-            nmls_number TEXT,
-            license_number TEXT,
-            company_address TEXT,
-            company_city TEXT,
-            company_state TEXT,
-            company_zip TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Add referral_code column if it doesn't exist
-    try:
-        # Check if column exists
-        cur.execute("PRAGMA table_info(user_profiles)")
-        columns = [row[1] for row in cur.fetchall()]
-        if 'referral_code' not in columns:
-            # Add column without UNIQUE constraint (SQLite limitation)
-            cur.execute("ALTER TABLE user_profiles ADD COLUMN referral_code TEXT")
-            # Create unique index for referral_code
-            try:
-                cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_profiles_referral_code ON user_profiles(referral_code) WHERE referral_code IS NOT NULL")
-            except:
-                pass  # Index might already exist
-    except Exception as e:
-        print(f"Warning: Could not add referral_code column: {e}")
-        pass
-    
-    # Add application_url column if it doesn't exist (for lenders)
-    try:
-        cur.execute("ALTER TABLE user_profiles ADD COLUMN application_url TEXT")
-    except:
-        pass
-    
-    # Add homebot_widget_id column if it doesn't exist (for agents/lenders)
-    try:
-        cur.execute("ALTER TABLE user_profiles ADD COLUMN homebot_widget_id TEXT")
-    except:
-        pass
-    
-    # Add market rate columns if they don't exist (for lenders/agents to set rates)
-    try:
-        cur.execute("ALTER TABLE user_profiles ADD COLUMN va_rate_30yr REAL")
-    except:
-        pass
-    try:
-        cur.execute("ALTER TABLE user_profiles ADD COLUMN fha_rate_30yr REAL")
-    except:
-        pass
-    try:
-        cur.execute("ALTER TABLE user_profiles ADD COLUMN conventional_rate_30yr REAL")
-    except:
-        pass
-
-    # ---------------- VIDEO STUDIO ----------------
-    # Table for video projects
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS video_projects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            transaction_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            video_type TEXT NOT NULL,
-            aspect_ratio TEXT NOT NULL,
-            duration INTEGER NOT NULL,
-            style_preset TEXT NOT NULL,
-            headline TEXT,
-            property_address TEXT,
-            highlights TEXT,
-            media_files TEXT,
-            include_lender INTEGER DEFAULT 0,
-            include_captions INTEGER DEFAULT 1,
-            render_status TEXT DEFAULT 'draft',
-            output_path TEXT,
-            thumbnail_path TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (transaction_id) REFERENCES agent_transactions (id)
-        )
-    """)
-
-    # ------------- CLIENT RELATIONSHIPS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS client_relationships (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            homeowner_id INTEGER NOT NULL,
-            professional_id INTEGER NOT NULL,
-            professional_role TEXT CHECK(professional_role IN ('agent','lender')) NOT NULL,
-            referral_code TEXT,
-            status TEXT DEFAULT 'active' CHECK(status IN ('active','inactive','removed')),
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (homeowner_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (professional_id) REFERENCES users(id) ON DELETE CASCADE,
-            UNIQUE(homeowner_id, professional_id, professional_role)
-        )
-        """
-    )
-    
-    # Migration: Ensure homeowner_id column exists (for existing databases)
-    try:
-        cur.execute("ALTER TABLE client_relationships ADD COLUMN homeowner_id INTEGER")
-        # If homeowner_id was missing, we need to handle existing data
-        # For now, we'll just ensure the column exists
-    except:
-        pass  # Column already exists
-    
-    # Migration: Ensure status column exists
-    try:
-        cur.execute("ALTER TABLE client_relationships ADD COLUMN status TEXT DEFAULT 'active'")
-    except:
-        pass  # Column already exists
-
-    # ------------- REFERRAL LINKS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS referral_links (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            token TEXT UNIQUE NOT NULL,
-            agent_id INTEGER REFERENCES users(id),
-            lender_id INTEGER REFERENCES users(id),
-            is_active INTEGER DEFAULT 1,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            CHECK(agent_id IS NOT NULL OR lender_id IS NOT NULL)
-        )
-        """
-    )
-    
-    # Create index on token for fast lookups
-    try:
-        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_referral_links_token ON referral_links(token)")
-    except:
-        pass
-
-    # ------------- TRUSTED VENDORS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS trusted_vendors (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            agent_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            category TEXT NOT NULL,
-            contact_name TEXT,
-            phone TEXT,
-            email TEXT,
-            website TEXT,
-            address TEXT,
-            notes TEXT,
-            is_active INTEGER DEFAULT 1,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (agent_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Create index for faster lookups
-    try:
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_trusted_vendors_agent_id ON trusted_vendors(agent_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_trusted_vendors_category ON trusted_vendors(category)")
-    except:
-        pass
-
-    # ------------- TRANSACTION VENDOR LINKS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS transaction_vendors (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            transaction_id INTEGER NOT NULL,
-            vendor_id INTEGER NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (transaction_id) REFERENCES agent_transactions(id) ON DELETE CASCADE,
-            FOREIGN KEY (vendor_id) REFERENCES trusted_vendors(id) ON DELETE CASCADE,
-            UNIQUE(transaction_id, vendor_id)
-        )
-        """
-    )
-
-    # ------------- PROPERTIES -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS properties (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            address TEXT NOT NULL,
-            estimated_value REAL,
-            property_type TEXT DEFAULT 'primary',
-            is_primary INTEGER DEFAULT 0,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-
-    # ------------- HOMEOWNER SNAPSHOTS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS homeowner_snapshots (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            property_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            value_estimate REAL,
-            equity_estimate REAL,
-            loan_rate REAL,
-            loan_payment REAL,
-            loan_balance REAL,
-            loan_term_years REAL,
-            loan_start_date TEXT,
-            last_value_refresh TEXT,
-            value_refresh_source TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (property_id) REFERENCES properties(id) ON DELETE CASCADE,
-            UNIQUE(user_id, property_id)
-        )
-        """
-    )
-    
-    # Add refresh tracking columns if they don't exist (migration)
-    try:
-        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN last_value_refresh TEXT")
-    except:
-        pass
-    try:
-        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN value_refresh_source TEXT")
-    except:
-        pass
-    
-    # Add initial purchase value for appreciation calculation
-    try:
-        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN initial_purchase_value REAL")
-    except:
-        pass
-    
-    # Add property tax, insurance, and PMI columns for accurate payment calculations
-    try:
-        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN property_tax_monthly REAL")
-    except:
-        pass
-    try:
-        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN homeowners_insurance_monthly REAL")
-    except:
-        pass
-    try:
-        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN pmi_monthly REAL")
-    except:
-        pass
-
-    # ------------- SNAPSHOT HISTORY (Monthly tracking) -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS homeowner_snapshot_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            property_id INTEGER,
-            snapshot_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            value_estimate REAL,
-            equity_estimate REAL,
-            loan_balance REAL,
-            loan_rate REAL,
-            loan_payment REAL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (property_id) REFERENCES properties(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Create index for faster history queries
-    try:
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_snapshot_history_user_property ON homeowner_snapshot_history(user_id, property_id, snapshot_date)")
-    except:
-        pass
-
-    # ------------- HOMEOWNER NOTES (DESIGN BOARDS) -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS homeowner_notes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            project_name TEXT,          -- board name
-            title TEXT,
-            tags TEXT,
-            details TEXT,
-            links TEXT,
-            photos TEXT,                -- JSON list of photo filenames
-            files TEXT,                 -- JSON list of file filenames
-            vision_statement TEXT,
-            color_palette TEXT,         -- JSON list of hex colors
-            board_template TEXT,        -- 'minimal', 'modern', 'cozy', 'bold'
-            label_style TEXT,          -- 'none', 'subtle', 'bold'
-            is_private INTEGER DEFAULT 0,
-            shareable_link TEXT,
-            product_sources TEXT,
-            show_notes_panel INTEGER DEFAULT 1,
-            fixtures TEXT               -- JSON list of fixture image filenames
-        )
-        """
-    )
-    
-    # Migration: Add missing columns to homeowner_notes if they don't exist
-    migration_columns = [
-        ("links", "TEXT"),
-        ("vision_statement", "TEXT"),
-        ("color_palette", "TEXT"),
-        ("board_template", "TEXT"),
-        ("label_style", "TEXT"),
-        ("is_private", "INTEGER DEFAULT 0"),
-        ("shareable_link", "TEXT"),
-        ("product_sources", "TEXT"),
-        ("show_notes_panel", "INTEGER DEFAULT 1"),
-        ("fixtures", "TEXT"),
-    ]
-    
-    for col_name, col_type in migration_columns:
-        try:
-            cur.execute(f"ALTER TABLE homeowner_notes ADD COLUMN {col_name} {col_type}")
-            print(f"[DB MIGRATION] Added column '{col_name}' to homeowner_notes")
-        except Exception as e:
-            # Column already exists, ignore
-            pass
-
-    # ------------- HOMEOWNER DOCUMENTS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS homeowner_documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            name TEXT,
-            category TEXT,
-            file_path TEXT,
-            r2_key TEXT,
-            r2_url TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Migration: Add name column if it doesn't exist (for existing databases)
-    try:
-        cur.execute("ALTER TABLE homeowner_documents ADD COLUMN name TEXT")
-        print("[DB MIGRATION] Added 'name' column to homeowner_documents")
-    except:
-        pass  # Column already exists
-    
-    # Migration: Ensure all required columns exist
-    try:
-        cur.execute("ALTER TABLE homeowner_documents ADD COLUMN r2_key TEXT")
-    except:
-        pass
-    try:
-        cur.execute("ALTER TABLE homeowner_documents ADD COLUMN r2_url TEXT")
-    except:
-        pass
-
-    # ------------- HOMEOWNER WARRANTY LOG -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS homeowner_warranty_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            item_name TEXT NOT NULL,
-            category TEXT NOT NULL,
-            purchase_date TEXT,
-            warranty_start TEXT,
-            warranty_expiry TEXT,
-            warranty_provider TEXT,
-            warranty_number TEXT,
-            notes TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Create index for faster lookups
-    try:
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_warranty_log_user_id ON homeowner_warranty_log(user_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_warranty_log_category ON homeowner_warranty_log(category)")
-    except:
-        pass
-
-    # ------------- HOMEOWNER PROJECTS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS homeowner_projects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            name TEXT,
-            category TEXT,
-            status TEXT,
-            budget TEXT,
-            notes TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Add category column if it doesn't exist (migration for existing databases)
-    try:
-        cur.execute("PRAGMA table_info(homeowner_projects)")
-        columns = [row[1] for row in cur.fetchall()]
-        if 'category' not in columns:
-            cur.execute("ALTER TABLE homeowner_projects ADD COLUMN category TEXT")
-    except Exception as e:
-        print(f"Warning: Could not add category column to homeowner_projects: {e}")
-        pass
-
-    # ------------- NEXT MOVE PLAN -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS next_move_plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            timeline TEXT,
-            budget_range TEXT,
-            location_preferences TEXT,
-            property_type_preferences TEXT,
-            must_haves TEXT,
-            nice_to_haves TEXT,
-            concerns TEXT,
-            notes TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-
-    # ------------- HOMEOWNER QUESTIONS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS homeowner_questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            topic TEXT,
-            question TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-
-    # ------------- AGENT CONTACTS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS agent_contacts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            agent_user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            name TEXT,
-            email TEXT,
-            phone TEXT,
-            stage TEXT,
-            best_contact TEXT,
-            last_touch TEXT,
-            birthday TEXT,
-            home_anniversary TEXT,
-            address TEXT,
-            notes TEXT,
-            tags TEXT,
-            property_address TEXT,
-            property_value REAL,
-            equity_estimate REAL,
-            auto_birthday INTEGER DEFAULT 1,
-            auto_anniversary INTEGER DEFAULT 1,
-            auto_seasonal INTEGER DEFAULT 1,
-            auto_equity INTEGER DEFAULT 1,
-            auto_holidays INTEGER DEFAULT 1,
-            equity_frequency TEXT DEFAULT 'monthly',
-            FOREIGN KEY (agent_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Add new columns to existing table (migration)
-    for col in ['birthday', 'home_anniversary', 'address', 'notes', 'tags', 
-                'property_address', 'property_value', 'equity_estimate',
-                'auto_birthday', 'auto_anniversary', 'auto_seasonal', 
-                'auto_equity', 'auto_holidays', 'equity_frequency']:
-        try:
-            if col in ['auto_birthday', 'auto_anniversary', 'auto_seasonal', 
-                      'auto_equity', 'auto_holidays']:
-                cur.execute(f"ALTER TABLE agent_contacts ADD COLUMN {col} INTEGER DEFAULT 1")
-            elif col == 'equity_frequency':
-                cur.execute(f"ALTER TABLE agent_contacts ADD COLUMN {col} TEXT DEFAULT 'monthly'")
-            elif col in ['property_value', 'equity_estimate']:
-                cur.execute(f"ALTER TABLE agent_contacts ADD COLUMN {col} REAL")
-            else:
-                cur.execute(f"ALTER TABLE agent_contacts ADD COLUMN {col} TEXT")
-        except:
-            pass
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
 
-    # ------------- LENDER BORROWERS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS lender_borrowers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            lender_user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            name TEXT,
-            status TEXT,
-            loan_type TEXT,
-            target_payment TEXT,
-            last_touch TEXT,
-            email TEXT,
-            phone TEXT,
-            birthday TEXT,
-            home_anniversary TEXT,
-            address TEXT,
-            notes TEXT,
-            tags TEXT,
-            property_address TEXT,
-            loan_amount REAL,
-            loan_rate REAL,
-            auto_birthday INTEGER DEFAULT 1,
-            auto_anniversary INTEGER DEFAULT 1,
-            auto_seasonal INTEGER DEFAULT 1,
-            auto_equity INTEGER DEFAULT 1,
-            auto_holidays INTEGER DEFAULT 1,
-            equity_frequency TEXT DEFAULT 'monthly',
-            FOREIGN KEY (lender_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Add new columns to existing table (migration)
-    for col in ['email', 'phone', 'birthday', 'home_anniversary', 'address', 
-                'notes', 'tags', 'property_address', 'loan_amount', 'loan_rate',
-                'auto_birthday', 'auto_anniversary', 'auto_seasonal', 
-                'auto_equity', 'auto_holidays', 'equity_frequency']:
-        try:
-            if col in ['auto_birthday', 'auto_anniversary', 'auto_seasonal', 
-                      'auto_equity', 'auto_holidays']:
-                cur.execute(f"ALTER TABLE lender_borrowers ADD COLUMN {col} INTEGER DEFAULT 1")
-            elif col == 'equity_frequency':
-                cur.execute(f"ALTER TABLE lender_borrowers ADD COLUMN {col} TEXT DEFAULT 'monthly'")
-            elif col in ['loan_amount', 'loan_rate']:
-                cur.execute(f"ALTER TABLE lender_borrowers ADD COLUMN {col} REAL")
-            else:
-                cur.execute(f"ALTER TABLE lender_borrowers ADD COLUMN {col} TEXT")
-        except:
-            pass
 
-    # ------------- AGENT TRANSACTIONS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS agent_transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            agent_user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            property_address TEXT,
-            client_name TEXT,
-            side TEXT,
-            stage TEXT,
-            close_date TEXT,
-            FOREIGN KEY (agent_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # Migrate transaction_participants table to new schema if needed
-    try:
-        cur.execute("PRAGMA table_info(transaction_participants)")
-        columns = [col[1] for col in cur.fetchall()]
-        
-        # Add missing columns for new transaction system
-        if 'participant_type' not in columns:
-            cur.execute("ALTER TABLE transaction_participants ADD COLUMN participant_type TEXT")
-            # Migrate existing 'role' to 'participant_type' if role exists
-            if 'role' in columns:
-                cur.execute("UPDATE transaction_participants SET participant_type = role WHERE participant_type IS NULL")
-        
-        if 'name' not in columns:
-            cur.execute("ALTER TABLE transaction_participants ADD COLUMN name TEXT")
-        
-        if 'phone' not in columns:
-            cur.execute("ALTER TABLE transaction_participants ADD COLUMN phone TEXT")
-        
-        if 'company' not in columns:
-            cur.execute("ALTER TABLE transaction_participants ADD COLUMN company TEXT")
-        
-        if 'invitation_token' not in columns:
-            cur.execute("ALTER TABLE transaction_participants ADD COLUMN invitation_token TEXT")
-            # Add unique constraint separately if needed
-            try:
-                cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_invitation_token ON transaction_participants(invitation_token) WHERE invitation_token IS NOT NULL")
-            except:
-                pass
-        
-        if 'invitation_sent_at' not in columns:
-            cur.execute("ALTER TABLE transaction_participants ADD COLUMN invitation_sent_at TIMESTAMP")
-        
-        if 'invitation_accepted_at' not in columns:
-            cur.execute("ALTER TABLE transaction_participants ADD COLUMN invitation_accepted_at TIMESTAMP")
-        
-        # Update transaction_id to INTEGER if it's TEXT
-        if 'transaction_id' in columns:
-            cur.execute("SELECT typeof(transaction_id) FROM transaction_participants LIMIT 1")
-            result = cur.fetchone()
-            if result and result[0] == 'text':
-                # SQLite doesn't support changing column type directly, so we'll handle it in queries
-                pass
-        
-        # Ensure added_at exists
-        if 'added_at' not in columns:
-            cur.execute("ALTER TABLE transaction_participants ADD COLUMN added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
-    except Exception as e:
-        print(f"Note: Could not migrate transaction_participants table: {e}")
-        pass
+def get_pool() -> ConnectionPool:
+    """Process-wide connection pool for DB_PATH (created on first use, after fork)."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ConnectionPool(DB_PATH)
+    return _POOL
 
-    # ------------- LENDER LOANS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS lender_loans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            lender_user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            borrower_name TEXT,
-            status TEXT,
-            loan_type TEXT,
-            target_payment TEXT,
-            stage TEXT,
-            close_date TEXT,
-            FOREIGN KEY (lender_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
 
-    # ------------- MESSAGE TEMPLATES -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS message_templates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            owner_user_id INTEGER,
-            role TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            label TEXT,
-            category TEXT,
-            channel TEXT,
-            subject TEXT,
-            body TEXT,
-            FOREIGN KEY (owner_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
+def get_connection() -> sqlite3.Connection:
+    """
+    Get a pooled database connection.
+    Pragmas (WAL, busy_timeout, cache_size, ...) are applied once when the pool opens
+    the connection. Calling close() returns it to the pool and rolls back anything
+    that wasn't committed, so existing callers keep their semantics.
+    """
+    return get_pool().acquire()
 
-    # ------------- MARKETING TEMPLATES -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS marketing_templates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            owner_user_id INTEGER,
-            role TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            template_type TEXT,
-            name TEXT,
-            description TEXT,
-            content TEXT,
-            FOREIGN KEY (owner_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # ------------- CRM INTERACTION HISTORY -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS crm_interactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            contact_id INTEGER,
-            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
-            professional_user_id INTEGER,
-            interaction_type TEXT,
-            interaction_date TEXT DEFAULT CURRENT_TIMESTAMP,
-            subject TEXT,
-            notes TEXT,
-            channel TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # ------------- AUTOMATED EMAIL LOGS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS automated_email_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            contact_id INTEGER,
-            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
-            professional_user_id INTEGER,
-            email_type TEXT,
-            sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            recipient_email TEXT,
-            subject TEXT,
-            status TEXT DEFAULT 'sent',
-            error_message TEXT,
-            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # ------------- CRM TASKS / FOLLOW-UPS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS crm_tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            contact_id INTEGER,
-            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
-            professional_user_id INTEGER,
-            title TEXT NOT NULL,
-            description TEXT,
-            due_date TEXT,
-            priority TEXT DEFAULT 'medium' CHECK(priority IN ('low', 'medium', 'high', 'urgent')),
-            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'in_progress', 'completed', 'cancelled')),
-            reminder_date TEXT,
-            completed_at TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # ------------- CRM DEALS / TRANSACTIONS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS crm_deals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            contact_id INTEGER,
-            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
-            professional_user_id INTEGER,
-            deal_name TEXT NOT NULL,
-            deal_type TEXT CHECK(deal_type IN ('sale', 'purchase', 'refinance', 'listing', 'other')),
-            property_address TEXT,
-            deal_value REAL,
-            commission_rate REAL,
-            expected_commission REAL,
-            stage TEXT DEFAULT 'prospect' CHECK(stage IN ('prospect', 'qualified', 'offer', 'under_contract', 'closed', 'lost')),
-            probability INTEGER DEFAULT 0 CHECK(probability >= 0 AND probability <= 100),
-            expected_close_date TEXT,
-            actual_close_date TEXT,
-            notes TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # ------------- CRM CONTACT RELATIONSHIPS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS crm_relationships (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            contact_id_1 INTEGER NOT NULL,
-            contact_id_2 INTEGER NOT NULL,
-            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
-            professional_user_id INTEGER,
-            relationship_type TEXT CHECK(relationship_type IN ('spouse', 'referral_source', 'related_contact', 'business_partner', 'other')),
-            notes TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE,
-            UNIQUE(contact_id_1, contact_id_2, contact_type, professional_user_id)
-        )
-        """
-    )
-    
-    # ------------- CRM SAVED VIEWS / FILTERS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS crm_saved_views (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            professional_user_id INTEGER,
-            role TEXT CHECK(role IN ('agent', 'lender')),
-            view_name TEXT NOT NULL,
-            filters_json TEXT,
-            is_default INTEGER DEFAULT 0,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
 
-    # ------------- HOMEOWNER TIMELINE EVENTS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS homeowner_timeline_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            event_date TEXT,
-            title TEXT,
-            category TEXT,
-            cost TEXT,
-            notes TEXT,
-            files TEXT,     -- JSON list of uploaded file names
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
+def get_pool_stats() -> Dict[str, Any]:
+    """Checkout/wait/open counters for the connection pool."""
+    return get_pool().stats()
 
-    # ------------- SIMPLE NOTES -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS simple_notes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            content TEXT,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-        )
-        """
-    )
-    
-    # ------------- FEATURE SPOTLIGHT CARD SETS -------------
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS spotlight_card_sets (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            agent_user_id INTEGER NOT NULL,
-            transaction_id INTEGER,
-            set_name TEXT NOT NULL,
-            property_address TEXT,
-            features_json TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (agent_user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (transaction_id) REFERENCES agent_transactions(id) ON DELETE SET NULL
-        )
-        """
-    )
-    
-    print("[DATABASE] ✓ All tables created/verified including spotlight_card_sets")
 
-    conn.commit()
-    conn.close()
+def init_db() -> None:
+    """
+    Bring the schema up to date.
+    Cheap when nothing is pending: one read of schema_version and no DDL, so every
+    gunicorn worker can call it at boot. See migrations.py for the ordered steps.
+    """
+    from migrations import migrate
+    migrate()
 
 
 # =========================
@@ -1558,8 +674,7 @@ def list_homeowner_documents(user_id: int) -> List[sqlite3.Row]:
     
     # Check what columns exist in the table
     try:
-        cur.execute("PRAGMA table_info(homeowner_documents)")
-        columns = [row[1] for row in cur.fetchall()]
+        columns = schema.columns('homeowner_documents')
         
         # Build SELECT statement based on available columns
         select_cols = []
@@ -1822,6 +937,250 @@ def add_homeowner_question(
     conn.close()
 
 
+# =========================
+# CRM OCCASIONS (BIRTHDAYS / HOME ANNIVERSARIES)
+# =========================
+
+# Free-text birthday / home_anniversary values are normalized at write time into
+# indexed month/day columns, so the daily automation and "upcoming" widgets are
+# index lookups instead of LIKE scans over every contact.
+OCCASION_KINDS = {
+    # kind: (text column, month column, day column, automation flag)
+    "birthday": ("birthday", "birthday_month", "birthday_day", "auto_birthday"),
+    "anniversary": ("home_anniversary", "anniversary_month", "anniversary_day", "auto_anniversary"),
+}
+
+OCCASION_TABLES = {
+    # contact_type: (table, owner column)
+    "agent_contact": ("agent_contacts", "agent_user_id"),
+    "lender_borrower": ("lender_borrowers", "lender_user_id"),
+}
+
+_MONTH_NAMES = {
+    **{name.lower(): i for i, name in enumerate(calendar.month_name) if name},
+    **{name.lower(): i for i, name in enumerate(calendar.month_abbr) if name},
+    "sept": 9,
+}
+_NUMERIC_DATE = re.compile(r"^(\d{1,4})[/\-.](\d{1,2})(?:[/\-.](\d{1,4}))?")
+_NAMED_DATE = re.compile(r"([a-z]+)\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b|(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)")
+
+
+def _valid_month_day(month: int, day: int) -> bool:
+    # 2000 is a leap year, so Feb 29 birthdays are kept
+    return 1 <= month <= 12 and 1 <= day <= calendar.monthrange(2000, month)[1]
+
+
+def parse_month_day(value: Any) -> Tuple[Optional[int], Optional[int]]:
+    """
+    (month, day) from a free-text date, or (None, None).
+
+    Understands 2024-03-05, 03/05/1980, 3/5, 03-05-80, "March 5", "Mar 5th, 1980"
+    and "5 March". Numeric dates are read US-style (month first) unless only the
+    day-first reading is valid (25/12).
+    """
+    if value is None:
+        return None, None
+    if isinstance(value, (date, datetime)):
+        return value.month, value.day
+    text = str(value).strip().lower()
+    if not text:
+        return None, None
+
+    m = _NUMERIC_DATE.match(text)
+    if m:
+        first, second = int(m.group(1)), int(m.group(2))
+        if len(m.group(1)) == 4:  # 2024-03-05
+            month, day = second, int(m.group(3) or 0)
+        else:
+            month, day = first, second
+            if not _valid_month_day(month, day) and _valid_month_day(second, first):
+                month, day = second, first
+        return (month, day) if _valid_month_day(month, day) else (None, None)
+
+    for m in _NAMED_DATE.finditer(text):
+        if m.group(1):
+            month, day = _MONTH_NAMES.get(m.group(1)), int(m.group(2))
+        else:
+            month, day = _MONTH_NAMES.get(m.group(4)), int(m.group(3))
+        if month and _valid_month_day(month, day):
+            return month, day
+    return None, None
+
+
+def occasion_columns(values: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    """Month/day columns for whichever of birthday / home_anniversary are in values"""
+    out: Dict[str, Optional[int]] = {}
+    for text_col, month_col, day_col, _flag in OCCASION_KINDS.values():
+        if text_col in values:
+            out[month_col], out[day_col] = parse_month_day(values[text_col])
+    return out
+
+
+def _occasion_dates(month: int, day: int, start: date, end: date) -> List[date]:
+    """Every date in [start, end] on which a month/day occasion falls (Feb 29 -> Feb 28 off leap years)"""
+    dates = []
+    for year in range(start.year, end.year + 1):
+        d = day
+        if month == 2 and day == 29 and not calendar.isleap(year):
+            d = 28
+        when = date(year, month, d)
+        if start <= when <= end:
+            dates.append(when)
+    return dates
+
+
+def _month_day_ranges(start: date, end: date) -> Optional[List[Tuple[Tuple[int, int], Tuple[int, int]]]]:
+    """(month, day) ranges covering the window; None when it spans a whole year"""
+    if (end - start).days >= 365:
+        return None
+
+    def key(d: date) -> Tuple[int, int]:
+        # Feb 29 occasions are celebrated on Feb 28 in non-leap years
+        if d.month == 2 and d.day == 28 and not calendar.isleap(d.year):
+            return (2, 29)
+        return (d.month, d.day)
+
+    if start.year == end.year:
+        return [((start.month, start.day), key(end))]
+    return [((start.month, start.day), (12, 31)), ((1, 1), key(end))]
+
+
+def get_occasion_contacts(kind: str, on_date: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Contacts and borrowers (with an email and the automation flag on) whose
+    birthday / home anniversary falls on on_date (default today).
+    """
+    text_col, month_col, day_col, flag = OCCASION_KINDS[kind]
+    on_date = on_date or date.today()
+    days = [on_date.day]
+    if on_date.month == 2 and on_date.day == 28 and not calendar.isleap(on_date.year):
+        days.append(29)
+
+    contacts = []
+    conn = get_connection()
+    try:
+        for contact_type, (table, owner_col) in OCCASION_TABLES.items():
+            rows = conn.execute(
+                f"""
+                SELECT id, {owner_col} AS professional_id, name, email, property_address
+                FROM {table}
+                WHERE {month_col} = ? AND {day_col} IN ({', '.join('?' for _ in days)})
+                  AND {flag} = 1 AND email IS NOT NULL AND email != ''
+                """,
+                (on_date.month, *days),
+            ).fetchall()
+            contacts.extend(dict(row) | {"type": contact_type} for row in rows)
+    finally:
+        conn.close()
+    return contacts
+
+
+def get_upcoming_occasions(
+    professional_user_id: int,
+    contact_type: str,
+    start: date,
+    end: date,
+    kinds: Tuple[str, ...] = ("birthday", "anniversary"),
+) -> List[Dict[str, Any]]:
+    """
+    Birthdays / home anniversaries of a professional's contacts between start
+    and end (inclusive; the window may wrap the new year), soonest first.
+
+    Returns [{'contact_id', 'contact_type', 'name', 'email', 'phone', 'kind',
+    'date', 'days_away'}, ...] with one entry per occurrence.
+    """
+    table, owner_col = OCCASION_TABLES[contact_type]
+    ranges = _month_day_ranges(start, end)
+    occasions = []
+    conn = get_connection()
+    try:
+        for kind in kinds:
+            _text_col, month_col, day_col, _flag = OCCASION_KINDS[kind]
+            sql = f"""
+                SELECT id, name, email, phone, {month_col} AS month, {day_col} AS day
+                FROM {table}
+                WHERE {owner_col} = ? AND {month_col} IS NOT NULL
+            """
+            params: List[Any] = [professional_user_id]
+            if ranges is not None:
+                sql += " AND (" + " OR ".join(
+                    f"({month_col}, {day_col}) BETWEEN (?, ?) AND (?, ?)" for _ in ranges
+                ) + ")"
+                for low, high in ranges:
+                    params.extend([*low, *high])
+            for row in conn.execute(sql, params).fetchall():
+                for when in _occasion_dates(row["month"], row["day"], start, end):
+                    occasions.append({
+                        "contact_id": row["id"],
+                        "contact_type": contact_type,
+                        "name": row["name"],
+                        "email": row["email"],
+                        "phone": row["phone"],
+                        "kind": kind,
+                        "date": when.isoformat(),
+                        "days_away": (when - start).days,
+                    })
+    finally:
+        conn.close()
+    occasions.sort(key=lambda o: (o["date"], o["name"] or ""))
+    return occasions
+
+
+# =========================
+# CRM DUPLICATE KEYS
+# =========================
+
+# Normalized email / phone / name are written next to the raw values, so a
+# single duplicate check (crm_dedup.find_existing_contact) is an indexed
+# equality lookup. crm_dedup's DuplicateIndex uses the same normalizers.
+DEDUP_KEY_COLUMNS = {
+    # field: key column
+    "email": "email_key",
+    "phone": "phone_key",
+    "name": "name_key",
+}
+
+_NON_DIGITS = re.compile(r"\D+")
+_SPACES = re.compile(r"\s+")
+_FLOAT_SUFFIX = re.compile(r"\.0+$")  # "5550109999.0" from a numeric spreadsheet cell
+
+
+def normalize_email(value: Any) -> str:
+    return str(value).strip().lower() if value else ""
+
+
+def normalize_phone(value: Any) -> str:
+    """Digits only; drops a leading US country code so +1 (555) 010-9999 == 5550109999"""
+    if value is None or value == "":
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    digits = _NON_DIGITS.sub("", _FLOAT_SUFFIX.sub("", str(value).strip()))
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits
+
+
+def normalize_name(value: Any) -> str:
+    return _SPACES.sub(" ", str(value)).strip().casefold() if value else ""
+
+
+_KEY_NORMALIZERS = {
+    "email": normalize_email,
+    "phone": normalize_phone,
+    "name": normalize_name,
+}
+
+
+def dedup_key_columns(values: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """Key columns for whichever of email / phone / name are in values (NULL when blank)"""
+    return {
+        key_col: _KEY_NORMALIZERS[field](values[field]) or None
+        for field, key_col in DEDUP_KEY_COLUMNS.items()
+        if field in values
+    }
+
+
 # =========================
 # AGENT CRM / CONTACTS
 # =========================
@@ -1850,6 +1209,9 @@ def add_agent_contact(
     auto_holidays: int = 1,
     equity_frequency: str = "monthly",
 ) -> int:
+    birthday_month, birthday_day = parse_month_day(birthday)
+    anniversary_month, anniversary_day = parse_month_day(home_anniversary)
+    keys = dedup_key_columns({"email": email, "phone": phone, "name": name})
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
@@ -1858,14 +1220,18 @@ def add_agent_contact(
             agent_user_id, name, email, phone, stage, best_contact, last_touch,
             birthday, home_anniversary, address, notes, tags, property_address,
             property_value, equity_estimate, auto_birthday, auto_anniversary,
-            auto_seasonal, auto_equity, auto_holidays, equity_frequency
+            auto_seasonal, auto_equity, auto_holidays, equity_frequency,
+            birthday_month, birthday_day, anniversary_month, anniversary_day,
+            email_key, phone_key, name_key
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (agent_user_id, name, email, phone, stage, best_contact, last_touch,
          birthday, home_anniversary, address, notes, tags, property_address,
          property_value, equity_estimate, auto_birthday, auto_anniversary,
-         auto_seasonal, auto_equity, auto_holidays, equity_frequency),
+         auto_seasonal, auto_equity, auto_holidays, equity_frequency,
+         birthday_month, birthday_day, anniversary_month, anniversary_day,
+         keys["email_key"], keys["phone_key"], keys["name_key"]),
     )
     contact_id = cur.lastrowid
     conn.commit()
@@ -1901,45 +1267,20 @@ def get_contacts_needing_followup(agent_user_id: int, days_threshold: int = 30)
     cur = conn.cursor()
     
     # Calculate the cutoff date (days_threshold days ago)
-    from datetime import timedelta
     cutoff_date = datetime.now() - timedelta(days=days_threshold)
     cutoff_iso = cutoff_date.isoformat()
     
-    # Get contacts where last interaction or last_touch is older than threshold
+    # Last interaction / last_touch is kept in contact_rollups by triggers;
+    # followup_key is '' for contacts never reached, so one range scan covers both
     query = """
-        SELECT DISTINCT ac.id, ac.created_at, ac.name, ac.email, ac.phone, ac.stage, 
+        SELECT ac.id, ac.created_at, ac.name, ac.email, ac.phone, ac.stage,
                ac.last_touch, ac.property_address,
-               COALESCE(
-                   (SELECT MAX(ci.interaction_date) 
-                    FROM crm_interactions ci 
-                    WHERE ci.contact_id = ac.id 
-                    AND ci.contact_type = 'agent_contact' 
-                    AND ci.professional_user_id = ac.agent_user_id),
-                   ac.last_touch,
-                   ac.created_at
-               ) as effective_last_contact
-        FROM agent_contacts ac
-        WHERE ac.agent_user_id = ?
-        AND (
-            COALESCE(
-                (SELECT MAX(ci.interaction_date) 
-                 FROM crm_interactions ci 
-                 WHERE ci.contact_id = ac.id 
-                 AND ci.contact_type = 'agent_contact' 
-                 AND ci.professional_user_id = ac.agent_user_id),
-                ac.last_touch,
-                ac.created_at
-            ) < ? OR
-            COALESCE(
-                (SELECT MAX(ci.interaction_date) 
-                 FROM crm_interactions ci 
-                 WHERE ci.contact_id = ac.id 
-                 AND ci.contact_type = 'agent_contact' 
-                 AND ci.professional_user_id = ac.agent_user_id),
-                ac.last_touch
-            ) IS NULL
-        )
-        ORDER BY effective_last_contact ASC
+               COALESCE(NULLIF(r.followup_key, ''), ac.created_at) as effective_last_contact
+        FROM contact_rollups r
+        JOIN agent_contacts ac ON ac.id = r.contact_id
+        WHERE r.professional_user_id = ? AND r.contact_type = 'agent_contact'
+        AND r.followup_key < ?
+        ORDER BY r.followup_key ASC, ac.created_at ASC
     """
     cur.execute(query, (agent_user_id, cutoff_iso))
     rows = cur.fetchall()
@@ -1947,6 +1288,25 @@ def get_contacts_needing_followup(agent_user_id: int, days_threshold: int = 30)
     return rows
 
 
+def count_contacts_needing_followup(
+    professional_user_id: int, contact_type: str = "agent_contact", days_threshold: int = 30
+) -> int:
+    """Number of agent contacts / lender borrowers due a follow-up (index-only count)"""
+    cutoff_iso = (datetime.now() - timedelta(days=days_threshold)).isoformat()
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) FROM contact_rollups
+            WHERE professional_user_id = ? AND contact_type = ? AND followup_key < ?
+            """,
+            (professional_user_id, contact_type, cutoff_iso),
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0]
+
+
 def get_agent_contact(contact_id: int, agent_user_id: int) -> Optional[sqlite3.Row]:
     conn = get_connection()
     cur = conn.cursor()
@@ -1974,6 +1334,8 @@ def update_agent_contact(
     """Update agent contact fields. Pass any fields to update as kwargs."""
     if not kwargs:
         return
+    kwargs.update(occasion_columns(kwargs))
+    kwargs.update(dedup_key_columns(kwargs))
     conn = get_connection()
     cur = conn.cursor()
     updates = []
@@ -2082,6 +1444,9 @@ def add_lender_borrower(
     auto_holidays: int = 1,
     equity_frequency: str = "monthly",
 ) -> int:
+    birthday_month, birthday_day = parse_month_day(birthday)
+    anniversary_month, anniversary_day = parse_month_day(home_anniversary)
+    keys = dedup_key_columns({"email": email, "phone": phone, "name": name})
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
@@ -2090,14 +1455,18 @@ def add_lender_borrower(
             lender_user_id, name, status, loan_type, target_payment, last_touch,
             email, phone, birthday, home_anniversary, address, notes, tags,
             property_address, loan_amount, loan_rate, auto_birthday, auto_anniversary,
-            auto_seasonal, auto_equity, auto_holidays, equity_frequency
+            auto_seasonal, auto_equity, auto_holidays, equity_frequency,
+            birthday_month, birthday_day, anniversary_month, anniversary_day,
+            email_key, phone_key, name_key
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (lender_user_id, name, status, loan_type, target_payment, last_touch,
          email, phone, birthday, home_anniversary, address, notes, tags,
          property_address, loan_amount, loan_rate, auto_birthday, auto_anniversary,
-         auto_seasonal, auto_equity, auto_holidays, equity_frequency),
+         auto_seasonal, auto_equity, auto_holidays, equity_frequency,
+         birthday_month, birthday_day, anniversary_month, anniversary_day,
+         keys["email_key"], keys["phone_key"], keys["name_key"]),
     )
     borrower_id = cur.lastrowid
     conn.commit()
@@ -2154,6 +1523,8 @@ def update_lender_borrower(
     """Update lender borrower fields. Pass any fields to update as kwargs."""
     if not kwargs:
         return
+    kwargs.update(occasion_columns(kwargs))
+    kwargs.update(dedup_key_columns(kwargs))
     conn = get_connection()
     cur = conn.cursor()
     updates = []
@@ -2974,6 +2345,7 @@ def upsert_homeowner_snapshot_for_property(
         (user_id, property_id),
     )
     existing = cur.fetchone()
+    existing = dict(existing) if existing else None
 
     # Merge with existing data - only update fields that are explicitly provided (not None)
     # This ensures empty form fields don't overwrite existing data
@@ -3146,6 +2518,11 @@ def list_crm_interactions(
 
 # ====================== CRM TASKS ======================
 
+# The one definition of an open task, for the CRM task lists and stats and the
+# open_task_count rollup (a NULL status is not open)
+OPEN_TASK_STATUS = "pending"
+
+
 def add_crm_task(
     contact_id: int,
     contact_type: str,
@@ -3440,6 +2817,143 @@ def list_crm_relationships(
     return rows
 
 
+def _id_chunks(ids: List[int], size: int = 500):
+    # Stay well under SQLite's bound-parameter limit on older builds (999)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def get_crm_rollups(
+    professional_user_id: int,
+    contact_ids: List[int],
+    contact_type: str = "agent_contact",
+    interaction_limit: int = 50,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Interactions, pending tasks, deals and relationships for a page of contacts.
+
+    Replaces calling list_crm_interactions/list_crm_tasks/list_crm_deals/
+    list_crm_relationships once per contact: one connection and one grouped query
+    per table (per 500 ids), whatever the page size.
+
+    Returns {contact_id: {...}} with the keys the CRM templates read:
+    interaction_count, recent_interactions (last 3), all_interactions (last
+    interaction_limit), pending_tasks, task_count, deals, deal_count,
+    total_pipeline_value, relationships.
+    """
+    ids = sorted({int(cid) for cid in contact_ids if cid is not None})
+    rollups = {
+        cid: {
+            "interaction_count": 0,
+            "recent_interactions": [],
+            "all_interactions": [],
+            "pending_tasks": [],
+            "task_count": 0,
+            "deals": [],
+            "deal_count": 0,
+            "total_pipeline_value": 0,
+            "relationships": [],
+        }
+        for cid in ids
+    }
+    if not ids:
+        return rollups
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        for chunk in _id_chunks(ids):
+            marks = ",".join("?" * len(chunk))
+
+            # Newest interaction_limit per contact, plus the full count
+            cur.execute(
+                f"""
+                SELECT * FROM (
+                    SELECT id, contact_id, interaction_type, interaction_date, subject,
+                           notes, channel, created_at,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY contact_id
+                               ORDER BY interaction_date DESC, created_at DESC
+                           ) AS rn,
+                           COUNT(*) OVER (PARTITION BY contact_id) AS total
+                    FROM crm_interactions
+                    WHERE professional_user_id = ? AND contact_type = ?
+                      AND contact_id IN ({marks})
+                )
+                WHERE rn <= ?
+                ORDER BY contact_id, rn
+                """,
+                (professional_user_id, contact_type, *chunk, interaction_limit),
+            )
+            for row in cur.fetchall():
+                entry = rollups[row["contact_id"]]
+                item = dict(row)
+                total = item.pop("total")
+                item.pop("rn")
+                item.pop("contact_id")
+                entry["interaction_count"] = total
+                entry["all_interactions"].append(item)
+                if len(entry["recent_interactions"]) < 3:
+                    entry["recent_interactions"].append(item)
+
+            cur.execute(
+                f"""
+                SELECT id, contact_id, contact_type, title, description, due_date, priority,
+                       status, reminder_date, completed_at, created_at
+                FROM crm_tasks
+                WHERE professional_user_id = ? AND contact_type = ? AND status = '{OPEN_TASK_STATUS}'
+                  AND contact_id IN ({marks})
+                ORDER BY due_date ASC, priority DESC, created_at DESC
+                """,
+                (professional_user_id, contact_type, *chunk),
+            )
+            for row in cur.fetchall():
+                entry = rollups[row["contact_id"]]
+                entry["pending_tasks"].append(dict(row))
+                entry["task_count"] += 1
+
+            cur.execute(
+                f"""
+                SELECT id, contact_id, contact_type, deal_name, deal_type, property_address,
+                       deal_value, commission_rate, expected_commission, stage, probability,
+                       expected_close_date, actual_close_date, notes, created_at, updated_at
+                FROM crm_deals
+                WHERE professional_user_id = ? AND contact_type = ?
+                  AND contact_id IN ({marks})
+                ORDER BY expected_close_date ASC, created_at DESC
+                """,
+                (professional_user_id, contact_type, *chunk),
+            )
+            for row in cur.fetchall():
+                entry = rollups[row["contact_id"]]
+                entry["deals"].append(dict(row))
+                entry["deal_count"] += 1
+                entry["total_pipeline_value"] += row["deal_value"] or 0
+
+            # A relationship belongs to both ends; one SELECT per side keeps each on its index
+            cur.execute(
+                f"""
+                SELECT id, contact_id_1, contact_id_2, relationship_type, notes, created_at
+                FROM crm_relationships
+                WHERE professional_user_id = ? AND contact_type = ? AND contact_id_1 IN ({marks})
+                UNION
+                SELECT id, contact_id_1, contact_id_2, relationship_type, notes, created_at
+                FROM crm_relationships
+                WHERE professional_user_id = ? AND contact_type = ? AND contact_id_2 IN ({marks})
+                """,
+                (professional_user_id, contact_type, *chunk,
+                 professional_user_id, contact_type, *chunk),
+            )
+            for row in cur.fetchall():
+                rel = dict(row)
+                for side in (row["contact_id_1"], row["contact_id_2"]):
+                    if side in rollups and rel not in rollups[side]["relationships"]:
+                        rollups[side]["relationships"].append(rel)
+    finally:
+        conn.close()
+    return rollups
+
+
 def delete_crm_relationship(relationship_id: int, professional_user_id: int) -> None:
     """Delete a CRM relationship."""
     conn = get_connection()
@@ -3809,12 +3323,7 @@ def generate_referral_code(user_id: int, role: str) -> str:
     alphabet = string.ascii_uppercase + string.digits
     
     # Check if referral_code column exists
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("PRAGMA table_info(user_profiles)")
-    columns = [row[1] for row in cur.fetchall()]
-    has_referral_code = 'referral_code' in columns
-    conn.close()
+    has_referral_code = schema.has_column('user_profiles', 'referral_code')
     
     # Try up to 10 times to get a unique code
     for _ in range(10):
@@ -3849,9 +3358,7 @@ def get_or_create_referral_code(user_id: int, role: str) -> str:
         cur = conn.cursor()
         
         # Check if referral_code column exists
-        cur.execute("PRAGMA table_info(user_profiles)")
-        columns = [row[1] for row in cur.fetchall()]
-        has_referral_code = 'referral_code' in columns
+        has_referral_code = schema.has_column('user_profiles', 'referral_code')
         
         # If column exists, try to get existing code
         if has_referral_code:
@@ -3878,9 +3385,8 @@ def get_or_create_referral_code(user_id: int, role: str) -> str:
                 # Column might already exist from concurrent request
                 print(f"Note: Could not add referral_code column (may already exist): {e}")
                 # Check again
-                cur.execute("PRAGMA table_info(user_profiles)")
-                columns = [row[1] for row in cur.fetchall()]
-                has_referral_code = 'referral_code' in columns
+                schema.refresh(conn)
+                has_referral_code = schema.has_column('user_profiles', 'referral_code')
         
         if profile_exists:
             # Update existing profile
@@ -3905,6 +3411,7 @@ def get_or_create_referral_code(user_id: int, role: str) -> str:
                     cur.execute("UPDATE user_profiles SET referral_code = ? WHERE user_id = ?", (code, user_id))
         
         conn.commit()
+        schema.refresh_if_changed(conn)
         conn.close()
         return code
     except Exception as e:
@@ -3920,11 +3427,7 @@ def get_professional_by_referral_code(referral_code: str) -> Optional[sqlite3.Ro
     cur = conn.cursor()
     
     # Check if referral_code column exists
-    cur.execute("PRAGMA table_info(user_profiles)")
-    columns = [row[1] for row in cur.fetchall()]
-    has_referral_code = 'referral_code' in columns
-    
-    if not has_referral_code:
+    if not schema.has_column('user_profiles', 'referral_code'):
         conn.close()
         return None
     
@@ -3950,10 +3453,7 @@ def create_client_relationship(
     cur = conn.cursor()
     
     # Check table structure to use correct column names
-    cur.execute("PRAGMA table_info(client_relationships)")
-    columns = [row[1] for row in cur.fetchall()]
-    homeowner_col = 'homeowner_id' if 'homeowner_id' in columns else 'client_id'
-    role_col = 'professional_role' if 'professional_role' in columns else 'professional_type'
+    homeowner_col, role_col = schema.client_relationship_columns()
     
     # Check if relationship already exists
     cur.execute(f"""
@@ -3995,10 +3495,7 @@ def get_homeowner_professionals(homeowner_id: int) -> List[sqlite3.Row]:
     cur = conn.cursor()
     
     # Check if homeowner_id column exists, otherwise use client_id
-    cur.execute("PRAGMA table_info(client_relationships)")
-    columns = [row[1] for row in cur.fetchall()]
-    homeowner_col = 'homeowner_id' if 'homeowner_id' in columns else 'client_id'
-    role_col = 'professional_role' if 'professional_role' in columns else 'professional_type'
+    homeowner_col, role_col = schema.client_relationship_columns()
     
     cur.execute(f"""
         SELECT cr.*, 
@@ -4023,11 +3520,6 @@ def get_referral_stats(professional_id: int) -> Dict[str, Any]:
     conn = get_connection()
     cur = conn.cursor()
     
-    # Check table structure to use correct column names
-    cur.execute("PRAGMA table_info(client_relationships)")
-    columns = [row[1] for row in cur.fetchall()]
-    homeowner_col = 'homeowner_id' if 'homeowner_id' in columns else 'client_id'
-    
     # Get total clients
     cur.execute(f"""
         SELECT COUNT(*) FROM client_relationships
@@ -4048,9 +3540,7 @@ def get_referral_stats(professional_id: int) -> Dict[str, Any]:
     # Get referral code - check if column exists first
     referral_code = None
     try:
-        cur.execute("PRAGMA table_info(user_profiles)")
-        profile_columns = [row[1] for row in cur.fetchall()]
-        if 'referral_code' in profile_columns:
+        if schema.has_column('user_profiles', 'referral_code'):
             cur.execute("""
                 SELECT referral_code FROM user_profiles WHERE user_id = ?
             """, (professional_id,))
@@ -0,0 +1,296 @@
+"""
+SQLite Connection Pool
+Reuses pre-configured connections instead of reopening ylh.db on every helper call
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Optional, Dict, Any
+
+# Applied once when a connection is opened, never again while it lives in the pool.
+# foreign_keys stays OFF by default: existing rows pre-date enforcement and
+# turning it on would start rejecting writes that work today.
+DEFAULT_PRAGMAS = {
+    "journal_mode": os.environ.get("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.environ.get("DB_CACHE_SIZE", -16000)),  # negative = KiB (16 MB)
+    "mmap_size": int(os.environ.get("DB_MMAP_SIZE", 128 * 1024 * 1024)),
+    "busy_timeout": int(os.environ.get("DB_BUSY_TIMEOUT_MS", 10000)),
+    "foreign_keys": os.environ.get("DB_FOREIGN_KEYS", "OFF"),
+    "temp_store": "MEMORY",
+}
+
+# gunicorn runs --threads 4 per worker; helpers nest one connection inside
+# another now and then, so two per thread covers the steady state.
+DEFAULT_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection whose close() returns it to the pool instead of closing it.
+    Existing `conn = get_connection() ... conn.close()` code works unchanged.
+    """
+
+    _pool = None
+    _checked_out = False
+    _overflow = False
+    _last_used = 0.0
+    _last_thread = None
+
+    def _check_open(self):
+        # Mimic a really-closed connection so use-after-close bugs stay loud
+        if self._pool is not None and not self._checked_out:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+
+    def cursor(self, *args, **kwargs):
+        self._check_open()
+        return super().cursor(*args, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        self._check_open()
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._check_open()
+        return super().executemany(*args, **kwargs)
+
+    def close(self):
+        pool = self._pool
+        if pool is None:
+            super().close()
+        elif self._checked_out:
+            pool.release(self)
+
+    def discard(self):
+        """Really close the underlying sqlite handle"""
+        self._pool = None
+        self._checked_out = False
+        try:
+            super().close()
+        except sqlite3.Error:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-aware pool of SQLite connections.
+
+    Idle connections sit on a LIFO stack capped at max_size open handles. A
+    thread gets back the handle it used last when that one is idle, otherwise
+    the most recently returned one. When every handle is checked out,
+    acquire() waits up to wait_timeout seconds and then opens a one-off
+    overflow connection rather than failing the request.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        max_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = 10.0,
+        wait_timeout: float = 2.0,
+        health_check_interval: float = 30.0,
+        pragmas: Optional[Dict[str, Any]] = None,
+    ):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout
+        self.health_check_interval = health_check_interval
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = []
+        self._in_use = weakref.WeakSet()
+        self._open = 0
+        self._stats = {
+            "checkouts": 0,
+            "thread_reuses": 0,
+            "shared_reuses": 0,
+            "opens": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "overflows": 0,
+            "health_check_failures": 0,
+            "discarded": 0,
+        }
+
+    # ---------------- CONNECTION LIFECYCLE ----------------
+
+    def _connect(self, overflow: bool = False) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name}={value}")
+            except sqlite3.Error:
+                pass  # WAL/mmap might not be available on every filesystem
+        conn._overflow = overflow
+        conn._pool = self
+        if not overflow:
+            # Free the slot when the handle dies, even if a caller leaked it
+            weakref.finalize(conn, self._on_finalize, self._pid)
+        with self._cond:
+            self._stats["opens"] += 1
+        return conn
+
+    def _on_finalize(self, pid):
+        if pid != os.getpid():
+            return
+        with self._cond:
+            self._open = max(0, self._open - 1)
+            self._cond.notify()
+
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        if time.monotonic() - conn._last_used < self.health_check_interval:
+            return True
+        try:
+            sqlite3.Connection.execute(conn, "SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def _check_pid(self):
+        # Connections must never cross a fork (e.g. gunicorn --preload)
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._reset_state()
+
+    # ---------------- CHECKOUT / RETURN ----------------
+
+    def acquire(self) -> PooledConnection:
+        """Check out a connection; close() on it returns it here"""
+        self._check_pid()
+        ident = threading.get_ident()
+        conn = None
+        overflow = False
+        deadline = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._take_idle(ident)
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    break
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + self.wait_timeout
+                    self._stats["waits"] += 1
+                remaining = deadline - now
+                if remaining <= 0:
+                    overflow = True
+                    self._stats["overflows"] += 1
+                    break
+                self._cond.wait(remaining)
+                self._stats["wait_seconds"] += min(remaining, time.monotonic() - now)
+
+        if conn is not None and not self._is_healthy(conn):
+            self._discard(conn)
+            with self._cond:
+                self._open += 1
+            conn = None
+        if conn is None:
+            try:
+                conn = self._connect(overflow=overflow)
+            except Exception:
+                if not overflow:
+                    with self._cond:
+                        self._open = max(0, self._open - 1)
+                        self._cond.notify()
+                raise
+
+        conn._checked_out = True
+        conn._last_thread = ident
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._in_use.add(conn)
+        return conn
+
+    def _take_idle(self, ident: int) -> PooledConnection:
+        # Prefer the handle this thread used last: its page cache is warm.
+        # Caller holds the lock.
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i]._last_thread == ident:
+                self._stats["thread_reuses"] += 1
+                return self._idle.pop(i)
+        self._stats["shared_reuses"] += 1
+        return self._idle.pop()
+
+    def release(self, conn: PooledConnection) -> None:
+        """Return a connection, rolling back anything the caller didn't commit"""
+        conn._checked_out = False
+        with self._cond:
+            self._in_use.discard(conn)
+
+        if conn._overflow or conn._pool is not self or self._pid != os.getpid():
+            conn.discard()
+            return
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        conn._last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn: PooledConnection) -> None:
+        conn.discard()
+        with self._cond:
+            self._stats["discarded"] += 1
+
+    # ---------------- ADMIN ----------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool-level counters for dashboards and debugging"""
+        with self._cond:
+            data = dict(self._stats)
+            data["wait_seconds"] = round(data["wait_seconds"], 4)
+            data.update({
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "pid": self._pid,
+            })
+        checkouts = data["checkouts"] or 1
+        data["reuse_ratio"] = round(
+            (data["thread_reuses"] + data["shared_reuses"]) / checkouts, 4
+        )
+        return data
+
+    def close_all(self) -> None:
+        """Close idle connections (checked-out ones are closed when returned)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
+
+
+__all__ = [
+    'ConnectionPool',
+    'PooledConnection',
+    'DEFAULT_PRAGMAS',
+    'DEFAULT_POOL_SIZE',
+]
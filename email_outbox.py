@@ -0,0 +1,520 @@
+"""
+Email Outbox
+Persistent queue for outgoing email plus a sender that drains it over pooled,
+authenticated SMTP sessions.
+
+send_reminder_email() used to connect, STARTTLS and LOGIN for every message,
+and the automated CRM jobs called it once per contact. Jobs now enqueue their
+messages here in one executemany and call drain_outbox(); the sender claims
+rows in batches, pushes them through a few long-lived SMTP sessions under a
+per-host rate limit, retries transient failures with exponential backoff and
+writes the automated_email_logs rows for each batch in bulk.
+
+    email_outbox.enqueue_many([
+        {"to_email": "a@b.com", "subject": "Hi", "body": "...", "email_type": "birthday",
+         "contact_id": 12, "contact_type": "agent_contact", "professional_user_id": 3},
+    ])
+    email_outbox.drain_outbox()
+
+Automated campaigns pass a period to enqueue_many(); email_send_ledger then
+guarantees each contact gets a given campaign at most once per period.
+
+SMTP settings come from the same EMAIL_* environment variables as the rest of
+the app; pass SMTPSettings(...) to OutboxSender to point it at a local test
+server instead.
+"""
+
+import os
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import send_window
+from database import get_connection
+
+CLAIM_BATCH_SIZE = 200
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 3600
+# A batch claimed longer ago than this belonged to a sender that died mid-send
+CLAIM_TIMEOUT_SECONDS = 600
+
+OUTBOX_COLUMNS = (
+    "to_email", "subject", "body", "body_html", "email_type", "contact_id", "contact_type",
+    "professional_user_id",
+)
+# automated_email_logs only takes CRM contacts; other mail (e.g. the follow-up
+# digest to the professional) is tracked in the outbox alone
+LOGGED_CONTACT_TYPES = frozenset({"agent_contact", "lender_borrower"})
+
+
+@dataclass
+class SMTPSettings:
+    host: str
+    port: int = 587
+    user: Optional[str] = None
+    password: Optional[str] = None
+    starttls: bool = True
+    from_email: Optional[str] = None
+    timeout: float = 30.0
+    # Messages per session before reconnecting (providers cap this; Gmail ~100)
+    messages_per_session: int = 100
+    # Parallel SMTP sessions and the per-host send rate shared between them
+    connections: int = 4
+    rate_per_second: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "SMTPSettings":
+        user = os.environ.get("EMAIL_USER")
+        return cls(
+            host=os.environ.get("EMAIL_HOST", "smtp.gmail.com"),
+            port=int(os.environ.get("EMAIL_PORT", 587)),
+            user=user,
+            password=os.environ.get("EMAIL_PASS"),
+            starttls=os.environ.get("EMAIL_STARTTLS", "1") != "0",
+            from_email=os.environ.get("EMAIL_FROM") or user,
+            messages_per_session=int(os.environ.get("EMAIL_MESSAGES_PER_SESSION", 100)),
+            connections=int(os.environ.get("EMAIL_CONNECTIONS", 4)),
+            rate_per_second=float(os.environ.get("EMAIL_RATE_PER_SECOND", 10)),
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.host and self.from_email and (self.user is None or self.password))
+
+
+# ---------------- QUEUE ----------------
+
+def enqueue(to_email: str, subject: str, body: str, **fields: Any) -> int:
+    """Queue one message; returns its outbox id"""
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            f"INSERT INTO email_outbox ({', '.join(OUTBOX_COLUMNS)}) VALUES ({', '.join('?' for _ in OUTBOX_COLUMNS)})",
+            _outbox_values({"to_email": to_email, "subject": subject, "body": body, **fields}),
+        )
+        conn.commit()
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+
+def enqueue_many(messages: Iterable[Dict[str, Any]], period: Optional[str] = None,
+                 delay_seconds: int = 0) -> int:
+    """
+    Queue messages (dicts with OUTBOX_COLUMNS keys) in one transaction; returns
+    the count. messages may be a generator: rows are inserted as it yields them.
+    delay_seconds holds them back from the sender (campaign send windows).
+
+    With a period (e.g. "2026-05" for a monthly campaign) each message also
+    claims its (email_type, period, contact_type, contact_id) key in
+    email_send_ledger in the same transaction, and messages whose key is
+    already there are dropped - so a retried or doubled-up job run can't send
+    a contact the same campaign twice.
+    """
+    not_before = f"+{int(delay_seconds)} seconds"
+    conn = get_connection()
+    try:
+        if period is None:
+            cur = conn.executemany(
+                f"""
+                INSERT INTO email_outbox ({', '.join(OUTBOX_COLUMNS)}, next_attempt_at)
+                VALUES ({', '.join('?' for _ in OUTBOX_COLUMNS)}, datetime('now', ?))
+                """,
+                (_outbox_values(m) + (not_before,) for m in messages if m.get("to_email")),
+            )
+            queued = max(cur.rowcount, 0)
+        else:
+            ledger: List[Tuple[Any, ...]] = []
+            # IMMEDIATE: two job runs can't both see a key as free
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.executemany(
+                f"""
+                INSERT INTO email_outbox ({', '.join(OUTBOX_COLUMNS)}, next_attempt_at)
+                SELECT {', '.join('?' for _ in OUTBOX_COLUMNS)}, datetime('now', ?)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM email_send_ledger
+                    WHERE email_type = ? AND period = ? AND contact_type = ? AND contact_id = ?
+                )
+                """,
+                _ledger_guarded(messages, period, not_before, ledger),
+            )
+            queued = max(cur.rowcount, 0)
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO email_send_ledger
+                    (email_type, period, contact_type, contact_id, professional_user_id)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                ledger,
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return queued
+
+
+def _ledger_guarded(messages: Iterable[Dict[str, Any]], period: str, not_before: str,
+                    ledger: List[Tuple[Any, ...]]) -> Iterator[Tuple[Any, ...]]:
+    """Outbox rows plus their ledger key; collects the ledger rows to insert afterwards"""
+    seen = set()
+    for m in messages:
+        if not m.get("to_email"):
+            continue
+        key = (m.get("email_type"), period, m.get("contact_type"), m.get("contact_id"))
+        if key[0] is not None and key[3] is not None:
+            if key in seen:
+                continue  # the same contact twice in one run
+            seen.add(key)
+            ledger.append(key + (m.get("professional_user_id"),))
+        yield _outbox_values(m) + (not_before,) + key
+
+
+def ledger_keys(email_type: str, period: str) -> Set[Tuple[str, int]]:
+    """(contact_type, contact_id) already queued for a campaign period (one index range scan)"""
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT contact_type, contact_id FROM email_send_ledger WHERE email_type = ? AND period = ?",
+            (email_type, period),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {(row["contact_type"], row["contact_id"]) for row in rows}
+
+
+def _outbox_values(message: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(message.get(col) for col in OUTBOX_COLUMNS)
+
+
+def outbox_counts() -> Dict[str, int]:
+    """{status: count} over the outbox"""
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM email_outbox GROUP BY status").fetchall()
+    finally:
+        conn.close()
+    return {row["status"]: row["n"] for row in rows}
+
+
+# ---------------- SMTP ----------------
+
+class RateLimiter:
+    """Token bucket per SMTP host, shared by every session sending through it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def wait(self, host: str, rate_per_second: float) -> None:
+        if rate_per_second <= 0:
+            return
+        interval = 1.0 / rate_per_second
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_rate_limiter = RateLimiter()
+
+
+class SMTPSession:
+    """
+    One authenticated SMTP connection reused for many messages; reconnects
+    after messages_per_session sends or when the server drops it.
+    """
+
+    def __init__(self, settings: SMTPSettings, rate_limiter: RateLimiter = _rate_limiter):
+        self.settings = settings
+        self.rate_limiter = rate_limiter
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._sent_on_session = 0
+        # Set when connect/STARTTLS/LOGIN fails; every later send would fail the same way
+        self.connect_error: Optional[Exception] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        s = self.settings
+        smtp = smtplib.SMTP(s.host, s.port, timeout=s.timeout)
+        if s.starttls:
+            smtp.starttls()
+        if s.user:
+            smtp.login(s.user, s.password)
+        self._sent_on_session = 0
+        return smtp
+
+    def send(self, to_email: str, subject: str, body: str, body_html: Optional[str] = None) -> None:
+        """Send one message (plain, or plain + HTML alternative); raises smtplib/socket errors"""
+        msg = MIMEMultipart("alternative") if body_html else MIMEMultipart()
+        msg["From"] = self.settings.from_email
+        msg["To"] = to_email
+        msg["Subject"] = subject
+        msg.attach(MIMEText(body or "", "plain"))
+        if body_html:
+            msg.attach(MIMEText(body_html, "html"))
+
+        if self._smtp is not None and self._sent_on_session >= self.settings.messages_per_session:
+            self.close()
+        self.rate_limiter.wait(self.settings.host, self.settings.rate_per_second)
+        for attempt in (1, 2):
+            if self._smtp is None:
+                try:
+                    self._smtp = self._connect()
+                except Exception as e:
+                    self.connect_error = e
+                    raise
+            try:
+                self._smtp.sendmail(self.settings.from_email, [to_email], msg.as_string())
+                self._sent_on_session += 1
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Idle sessions get dropped by the server; one fresh connection, then give up
+                self._smtp = None
+                if attempt == 2:
+                    raise
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+def is_transient(error: Exception) -> bool:
+    """4xx replies, dropped connections, network and login errors are worth retrying; 5xx are not"""
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return True  # credentials get fixed; the queued mail should still go out
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _msg in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.timeout, OSError))
+
+
+def backoff_seconds(attempts: int) -> int:
+    return min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+
+
+# ---------------- SENDER ----------------
+
+class OutboxSender:
+    def __init__(self, settings: Optional[SMTPSettings] = None, sender_id: Optional[str] = None,
+                 governor: Optional[send_window.SendGovernor] = None):
+        self.settings = settings or SMTPSettings.from_env()
+        self.sender_id = sender_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.governor = governor or send_window.governor
+
+    @staticmethod
+    def queued_count() -> int:
+        """Messages waiting to be sent, due now or later"""
+        conn = get_connection()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM email_outbox WHERE status = 'queued'").fetchone()[0]
+        finally:
+            conn.close()
+
+    def claim_batch(self, limit: int = CLAIM_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """Mark up to limit due messages as sending for this sender and return them"""
+        conn = get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                """
+                UPDATE email_outbox SET status = 'queued', claimed_by = NULL
+                WHERE status = 'sending' AND claimed_at < datetime('now', ?)
+                """,
+                (f"-{CLAIM_TIMEOUT_SECONDS} seconds",),
+            )
+            conn.execute(
+                """
+                UPDATE email_outbox
+                SET status = 'sending', claimed_by = ?, claimed_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE status = 'queued' AND next_attempt_at <= CURRENT_TIMESTAMP
+                    ORDER BY next_attempt_at, id
+                    LIMIT ?
+                )
+                """,
+                (self.sender_id, limit),
+            )
+            rows = conn.execute(
+                "SELECT * FROM email_outbox WHERE status = 'sending' AND claimed_by = ? ORDER BY id",
+                (self.sender_id,),
+            ).fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def _send_slice(self, session: SMTPSession, messages: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[Exception]]]:
+        results = []
+        for i, message in enumerate(messages):
+            try:
+                session.send(message["to_email"], message["subject"], message["body"], message.get("body_html"))
+                results.append((message, None))
+            except Exception as e:
+                if session.connect_error is not None:
+                    # Server unreachable or login rejected: don't retry it per message
+                    results.extend((rest, e) for rest in messages[i:])
+                    break
+                results.append((message, e))
+        return results
+
+    def send_batch(self, messages: List[Dict[str, Any]], sessions: List[SMTPSession]) -> List[Tuple[Dict[str, Any], Optional[Exception]]]:
+        """Spread messages over the open sessions; (message, error or None) per message"""
+        if not messages:
+            return []
+        slices = [messages[i::len(sessions)] for i in range(len(sessions))]
+        if len(sessions) == 1:
+            return self._send_slice(sessions[0], slices[0])
+        results = []
+        with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+            for part in pool.map(self._send_slice, sessions, slices):
+                results.extend(part)
+        return results
+
+    def record_results(self, results: List[Tuple[Dict[str, Any], Optional[Exception]]]) -> Dict[str, int]:
+        """Update the outbox and write automated_email_logs for a sent batch in one transaction"""
+        sent, retry, failed, logs = [], [], [], []
+        for message, error in results:
+            if error is None:
+                sent.append((message["id"],))
+                status, error_text = "sent", None
+            else:
+                error_text = str(error)[:500]
+                attempts = (message["attempts"] or 0) + 1
+                if is_transient(error) and attempts < MAX_ATTEMPTS:
+                    retry.append((attempts, f"+{backoff_seconds(attempts)} seconds", error_text, message["id"]))
+                    continue
+                failed.append((attempts, error_text, message["id"]))
+                status = "failed"
+            if (message["email_type"] and message["contact_id"] is not None
+                    and message["contact_type"] in LOGGED_CONTACT_TYPES):
+                logs.append((
+                    message["contact_id"], message["contact_type"], message["professional_user_id"],
+                    message["email_type"], message["to_email"], message["subject"], status, error_text,
+                ))
+
+        conn = get_connection()
+        try:
+            conn.executemany(
+                """
+                UPDATE email_outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP,
+                    attempts = attempts + 1, claimed_by = NULL, last_error = NULL
+                WHERE id = ?
+                """,
+                sent,
+            )
+            conn.executemany(
+                """
+                UPDATE email_outbox SET status = 'queued', attempts = ?, claimed_by = NULL,
+                    next_attempt_at = datetime('now', ?), last_error = ?
+                WHERE id = ?
+                """,
+                retry,
+            )
+            conn.executemany(
+                """
+                UPDATE email_outbox SET status = 'failed', attempts = ?, claimed_by = NULL, last_error = ?
+                WHERE id = ?
+                """,
+                failed,
+            )
+            conn.executemany(
+                """
+                INSERT INTO automated_email_logs (
+                    contact_id, contact_type, professional_user_id, email_type,
+                    recipient_email, subject, status, error_message
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                logs,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return {"sent": len(sent), "retry": len(retry), "failed": len(failed)}
+
+    def drain(self, max_messages: Optional[int] = None, batch_size: int = CLAIM_BATCH_SIZE) -> Dict[str, int]:
+        """Send due messages batch by batch until the queue (or max_messages) runs out"""
+        totals = {"sent": 0, "retry": 0, "failed": 0}
+        if not self.settings.configured:
+            # Enqueueing still works (and claims ledger periods), so say so rather than let mail pile up
+            waiting = self.queued_count()
+            if waiting:
+                print(f"[EMAIL OUTBOX] WARNING: SMTP is not configured (EMAIL_HOST / EMAIL_USER / EMAIL_PASS / "
+                      f"EMAIL_FROM); {waiting} message(s) waiting")
+            return totals
+        started = time.monotonic()
+        handled = 0
+        # Sessions live for the whole drain, so a 10k blast costs a handful of logins
+        sessions = [SMTPSession(self.settings) for _ in range(max(1, self.settings.connections))]
+        try:
+            while max_messages is None or handled < max_messages:
+                # Back off while interactive requests are slow; see send_window.py
+                allowed = self.governor.allowed_sessions(len(sessions))
+                if allowed == 0:
+                    print(f"[EMAIL OUTBOX] Deferring sends, request p95 {self.governor.monitor.p95_ms():.0f}ms")
+                    break
+                limit = batch_size if max_messages is None else min(batch_size, max_messages - handled)
+                batch = self.claim_batch(limit)
+                if not batch:
+                    break
+                counts = self.record_results(self.send_batch(batch, sessions[:allowed]))
+                for key in totals:
+                    totals[key] += counts[key]
+                handled += len(batch)
+                if any(session.connect_error is not None for session in sessions):
+                    break  # leave the rest queued for the next drain
+        finally:
+            for session in sessions:
+                session.close()
+        if handled:
+            print(f"[EMAIL OUTBOX] {totals['sent']} sent, {totals['retry']} to retry, "
+                  f"{totals['failed']} failed in {time.monotonic() - started:.1f}s")
+        return totals
+
+
+_drain_lock = threading.Lock()
+
+
+def drain_outbox(max_messages: Optional[int] = None) -> Dict[str, int]:
+    """Drain with env settings; a drain already running in this process makes this a no-op"""
+    if not _drain_lock.acquire(blocking=False):
+        return {"sent": 0, "retry": 0, "failed": 0}
+    try:
+        return OutboxSender().drain(max_messages)
+    finally:
+        _drain_lock.release()
+
+
+__all__ = [
+    'OutboxSender',
+    'RateLimiter',
+    'SMTPSession',
+    'SMTPSettings',
+    'backoff_seconds',
+    'drain_outbox',
+    'enqueue',
+    'enqueue_many',
+    'is_transient',
+    'ledger_keys',
+    'outbox_counts',
+]
@@ -0,0 +1,251 @@
+"""
+Follow-up Queue
+Per-professional "who to call next", read straight off the contact_rollups
+indexes.
+
+Each professional's book is kept ordered by effective last contact (the latest
+logged interaction, else last_touch) in idx_contact_rollups_followup, and by
+stage then last contact in idx_contact_rollups_stage_followup. The rollup
+triggers move a contact within that order when an interaction is logged or
+deleted, its last_touch or stage changes, or it changes hands, so nothing is
+recomputed when the queue is read: the next N contacts are an index range scan
+stopped after N rows, and "how many are due" is a count over the same range.
+The due cutoff is the professional's follow_up_days, applied at query time,
+so changing it takes effect immediately without touching any rows.
+
+The queue feeds the CRM "Needs Follow-up" panel and dashboard counts, the
+/api/crm/followups endpoint and a daily digest email (send_followup_digests).
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import campaign_renderer
+import email_outbox
+from crm_query import CRM_BOOKS
+from database import get_connection
+
+DEFAULT_FOLLOW_UP_DAYS = 30
+DIGEST_LIMIT = 10
+
+FOLLOWUP_DIGEST = campaign_renderer.Campaign(
+    "followup_digest",
+    subject="{due_count} contacts are due a follow-up",
+    text="""Hi {name},
+
+{due_count} of your contacts haven't heard from you in {follow_up_days} days or more. Here's who to call first:
+
+{contact_lines}
+
+Log a call or note in your CRM and they'll drop off tomorrow's list.
+
+{signature}
+""",
+)
+
+
+def _book(role: str) -> Dict[str, Any]:
+    if role not in CRM_BOOKS:
+        raise ValueError(f"role must be one of {tuple(CRM_BOOKS)}")
+    return CRM_BOOKS[role]
+
+
+def _cutoff(days: int) -> str:
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+
+# ---------------- SETTINGS ----------------
+
+def follow_up_days(user_id: int) -> int:
+    """The professional's follow-up threshold in days"""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT follow_up_days FROM users WHERE id = ?", (user_id,)).fetchone()
+    finally:
+        conn.close()
+    return row["follow_up_days"] if row and row["follow_up_days"] else DEFAULT_FOLLOW_UP_DAYS
+
+
+def set_follow_up_days(user_id: int, days: int) -> None:
+    """Change the threshold (1-365); the queue reorders nothing, the cutoff just moves"""
+    days = int(days)
+    if not 1 <= days <= 365:
+        raise ValueError("Follow-up days must be between 1 and 365")
+    conn = get_connection()
+    try:
+        conn.execute("UPDATE users SET follow_up_days = ? WHERE id = ?", (days, user_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ---------------- QUEUE ----------------
+
+def next_contacts(professional_user_id: int, role: str = "agent", limit: int = 10,
+                  stage: Optional[str] = None, days: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    The `limit` contacts longest without contact among those due (no contact
+    in `days`, default the professional's follow_up_days), oldest first,
+    optionally within one stage. Never-contacted contacts come first.
+    """
+    book = _book(role)
+    if days is None:
+        days = follow_up_days(professional_user_id)
+    clauses = ["r.professional_user_id = ?", "r.contact_type = ?"]
+    params: List[Any] = [professional_user_id, book["contact_type"]]
+    if stage:
+        clauses.append("r.stage = ?")
+        params.append(stage)
+    clauses.append("r.followup_key < ?")
+    params.extend([_cutoff(days), int(limit)])
+
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT c.id, c.name, c.email, c.phone, c.property_address, r.stage,
+                   NULLIF(r.followup_key, '') AS last_contact_at,
+                   CAST(julianday('now', 'localtime') - julianday(COALESCE(NULLIF(r.followup_key, ''), c.created_at)) AS INTEGER)
+                       AS days_since_contact,
+                   r.interaction_count, r.open_task_count
+            FROM contact_rollups r
+            JOIN {book['table']} c ON c.id = r.contact_id
+            WHERE {' AND '.join(clauses)}
+            ORDER BY r.followup_key ASC
+            LIMIT ?
+            """,
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    queue = []
+    for row in rows:
+        item = dict(row)
+        # The CRM templates read the stage under the book's own column name
+        item[book["stage_column"]] = item["stage"]
+        queue.append(item)
+    return queue
+
+
+def due_count(professional_user_id: int, role: str = "agent", stage: Optional[str] = None,
+              days: Optional[int] = None) -> int:
+    """How many contacts are due a follow-up (counted on the index, no table access)"""
+    book = _book(role)
+    if days is None:
+        days = follow_up_days(professional_user_id)
+    sql = "SELECT COUNT(*) FROM contact_rollups WHERE professional_user_id = ? AND contact_type = ?"
+    params: List[Any] = [professional_user_id, book["contact_type"]]
+    if stage:
+        sql += " AND stage = ?"
+        params.append(stage)
+    sql += " AND followup_key < ?"
+    params.append(_cutoff(days))
+    conn = get_connection()
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def due_counts_by_stage(professional_user_id: int, role: str = "agent",
+                        days: Optional[int] = None) -> Dict[str, int]:
+    """{stage: due count} for the professional's book, one pass over the stage index"""
+    book = _book(role)
+    if days is None:
+        days = follow_up_days(professional_user_id)
+    conn = get_connection()
+    try:
+        rows = conn.execute(
+            """
+            SELECT COALESCE(stage, '') AS stage, COUNT(*) AS n FROM contact_rollups
+            WHERE professional_user_id = ? AND contact_type = ? AND followup_key < ?
+            GROUP BY stage
+            """,
+            (professional_user_id, book["contact_type"], _cutoff(days)),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row["stage"]: row["n"] for row in rows}
+
+
+# ---------------- DIGEST ----------------
+
+def _contact_line(contact: Dict[str, Any]) -> str:
+    since = (f"{contact['days_since_contact']} days since last contact" if contact["last_contact_at"]
+             else "never contacted")
+    reach = contact.get("phone") or contact.get("email") or "no phone or email on file"
+    stage = (contact.get("stage") or "").replace("_", " ")
+    return f"• {contact.get('name') or 'Unnamed'}{f' ({stage})' if stage else ''} - {since} - {reach}"
+
+
+def send_followup_digests() -> int:
+    """
+    Daily email to each agent and lender with contacts due a follow-up: the
+    count and the top of their queue. Professionals opt out with
+    users.followup_digest = 0. Queued with the day as the ledger period, so
+    a re-run the same day sends nothing twice.
+
+    Like the other automated emails, nothing is queued (or claimed in the
+    ledger) while SMTP isn't configured. Digests are built before
+    enqueue_many opens its write transaction, since each one runs queue
+    queries of its own.
+    """
+    if not os.environ.get("EMAIL_USER") or not os.environ.get("EMAIL_PASS"):
+        return 0
+    conn = get_connection()
+    try:
+        professionals = conn.execute(
+            """
+            SELECT id, name, email, role, COALESCE(follow_up_days, ?) AS follow_up_days
+            FROM users
+            WHERE role IN ('agent', 'lender') AND email IS NOT NULL AND email != ''
+              AND COALESCE(followup_digest, 1) = 1
+            """,
+            (DEFAULT_FOLLOW_UP_DAYS,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    compiled = FOLLOWUP_DIGEST.compile()
+    period = datetime.now().strftime("%Y-%m-%d")
+    already = email_outbox.ledger_keys(FOLLOWUP_DIGEST.email_type, period)
+
+    messages = []
+    for user in professionals:
+        if ("professional", user["id"]) in already:
+            continue
+        days = user["follow_up_days"]
+        due = due_count(user["id"], user["role"], days=days)
+        if not due:
+            continue
+        queue = next_contacts(user["id"], user["role"], limit=DIGEST_LIMIT, days=days)
+        messages.append(compiled.render({
+            "id": user["id"],
+            "type": "professional",
+            "professional_id": user["id"],
+            "email": user["email"],
+            "name": user["name"] or "there",
+            "due_count": due,
+            "follow_up_days": days,
+            "contact_lines": "\n".join(_contact_line(contact) for contact in queue),
+        }))
+
+    queued = email_outbox.enqueue_many(messages, period=period)
+    if queued:
+        print(f"[EMAIL OUTBOX] Queued {queued} follow-up digests")
+        email_outbox.drain_outbox()
+    return queued
+
+
+__all__ = [
+    'DEFAULT_FOLLOW_UP_DAYS',
+    'FOLLOWUP_DIGEST',
+    'due_count',
+    'due_counts_by_stage',
+    'follow_up_days',
+    'next_contacts',
+    'send_followup_digests',
+    'set_follow_up_days',
+]
@@ -0,0 +1,220 @@
+"""
+Home Valuation Engine
+Bulk daily appreciation of homeowner snapshots with NumPy.
+
+update_home_values_daily used to fetch and upsert every snapshot one at a
+time (two connections, a read-modify-write and a history check per property).
+This loads every eligible snapshot into arrays, applies appreciation and
+computes equity for all rows at once, and writes the snapshots plus the day's
+history rows with executemany in a single transaction.
+
+Annual rates resolve per property, then ZIP code, then state (parsed from the
+property address), then DEFAULT_ANNUAL_RATE; overrides live in
+appreciation_rates and are managed with set_appreciation_rate().
+
+    python scripts/benchmark_home_valuation.py --properties 100000
+"""
+
+import os
+import re
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from database import get_connection
+
+DEFAULT_ANNUAL_RATE = float(os.environ.get("HOME_APPRECIATION_RATE", 0.035))
+RATE_SCOPES = ("property", "zip", "state")
+
+_STATE_ZIP = re.compile(r"\b([A-Za-z]{2})\s+(\d{5})(?:-\d{4})?\b")
+_ZIP = re.compile(r"\b(\d{5})(?:-\d{4})?\s*$")
+
+
+def region_keys(address: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(zip, state) parsed from a US street address, either may be None"""
+    if not address:
+        return None, None
+    m = _STATE_ZIP.search(address)
+    if m:
+        return m.group(2), m.group(1).upper()
+    m = _ZIP.search(address)
+    return (m.group(1) if m else None), None
+
+
+# ---------------- RATES ----------------
+
+def set_appreciation_rate(scope: str, key: Any, annual_rate: Optional[float]) -> None:
+    """Set (or with annual_rate=None, clear) the rate for a property id, ZIP code or state"""
+    if scope not in RATE_SCOPES:
+        raise ValueError(f"scope must be one of {RATE_SCOPES}")
+    key = str(key).strip().upper()
+    conn = get_connection()
+    try:
+        if annual_rate is None:
+            conn.execute("DELETE FROM appreciation_rates WHERE scope = ? AND key = ?", (scope, key))
+        else:
+            conn.execute(
+                """
+                INSERT INTO appreciation_rates (scope, key, annual_rate) VALUES (?, ?, ?)
+                ON CONFLICT(scope, key) DO UPDATE SET
+                    annual_rate = excluded.annual_rate, updated_at = CURRENT_TIMESTAMP
+                """,
+                (scope, key, float(annual_rate)),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_rates(conn) -> Dict[str, Dict[str, float]]:
+    """{scope: {key: annual_rate}}"""
+    rates: Dict[str, Dict[str, float]] = {scope: {} for scope in RATE_SCOPES}
+    for row in conn.execute("SELECT scope, key, annual_rate FROM appreciation_rates").fetchall():
+        if row["scope"] in rates:
+            rates[row["scope"]][row["key"]] = row["annual_rate"]
+    return rates
+
+
+def resolve_rates(property_ids: np.ndarray, addresses: list, rates: Dict[str, Dict[str, float]]) -> np.ndarray:
+    """Annual rate per row: property override, else ZIP, else state, else the default"""
+    annual = np.full(len(property_ids), DEFAULT_ANNUAL_RATE, dtype=np.float64)
+    if rates["zip"] or rates["state"]:
+        for i, address in enumerate(addresses):
+            zip_code, state = region_keys(address)
+            rate = rates["zip"].get(zip_code) if zip_code else None
+            if rate is None and state:
+                rate = rates["state"].get(state)
+            if rate is not None:
+                annual[i] = rate
+    if rates["property"]:
+        keys = np.array([int(k) for k in rates["property"] if k.isdigit()], dtype=np.int64)
+        values = np.array([rates["property"][str(k)] for k in keys], dtype=np.float64)
+        order = np.argsort(keys)
+        keys, values = keys[order], values[order]
+        pos = np.clip(np.searchsorted(keys, property_ids), 0, max(len(keys) - 1, 0))
+        hit = keys[pos] == property_ids if len(keys) else np.zeros(len(property_ids), dtype=bool)
+        annual[hit] = values[pos[hit]]
+    return annual
+
+
+# ---------------- ENGINE ----------------
+
+def _load_snapshots(conn):
+    """Snapshots with a value, as column arrays"""
+    rows = conn.execute(
+        """
+        SELECT s.id, s.user_id, s.property_id, s.value_estimate, s.loan_balance,
+               s.loan_rate, s.loan_payment, p.address,
+               julianday('now') - julianday(REPLACE(s.last_value_refresh, 'Z', '')) AS days_since
+        FROM homeowner_snapshots s
+        LEFT JOIN properties p ON p.id = s.property_id
+        WHERE s.property_id IS NOT NULL AND s.value_estimate > 0
+        """
+    ).fetchall()
+    if not rows:
+        return None
+    cols = list(zip(*rows))
+    as_float = lambda values: np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return {
+        "id": np.array(cols[0], dtype=np.int64),
+        "user_id": np.array(cols[1], dtype=np.int64),
+        "property_id": np.array(cols[2], dtype=np.int64),
+        "value": as_float(cols[3]),
+        "loan_balance": as_float(cols[4]),
+        "loan_rate": cols[5],
+        "loan_payment": cols[6],
+        "address": cols[7],
+        "days_since": as_float(cols[8]),
+    }
+
+
+def _none_if_nan(values: np.ndarray) -> list:
+    return [None if v != v else v for v in values.tolist()]
+
+
+def run_valuation(dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Appreciate every eligible snapshot and record today's history rows.
+
+    Same rules as the per-row job it replaces: one day of appreciation per
+    run, skipping snapshots whose value was refreshed externally (Homebot) in
+    the last 24 hours. Returns {'eligible', 'updated', 'history_rows',
+    'seconds', 'total_value'}.
+    """
+    started = time.monotonic()
+    conn = get_connection()
+    try:
+        snaps = _load_snapshots(conn)
+        if snaps is None:
+            return {"eligible": 0, "updated": 0, "history_rows": 0, "seconds": 0.0, "total_value": 0.0}
+        rates = load_rates(conn)
+
+        days_since = snaps["days_since"]
+        due = np.isnan(days_since) | (days_since >= 1)
+
+        annual = resolve_rates(snaps["property_id"], snaps["address"], rates)
+        new_value = snaps["value"] * np.power(1.0 + annual, 1.0 / 365.0)
+        equity = new_value - snaps["loan_balance"]  # NaN where there's no loan balance
+
+        idx = np.flatnonzero(due)
+        ids = snaps["id"][idx].tolist()
+        values = new_value[idx].tolist()
+        equities = _none_if_nan(equity[idx])
+        updates = list(zip(values, equities, ids))
+
+        loan_rate, loan_payment = snaps["loan_rate"], snaps["loan_payment"]
+        history = [
+            (int(snaps["user_id"][i]), int(snaps["property_id"][i]), values[n], equities[n],
+             None if np.isnan(snaps["loan_balance"][i]) else float(snaps["loan_balance"][i]),
+             loan_rate[i], loan_payment[i], int(snaps["user_id"][i]), int(snaps["property_id"][i]))
+            for n, i in enumerate(idx.tolist())
+        ]
+
+        history_rows = 0
+        if not dry_run and updates:
+            conn.executemany(
+                """
+                UPDATE homeowner_snapshots
+                SET value_estimate = ?, equity_estimate = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                updates,
+            )
+            before = conn.total_changes
+            # One history row per property per day, same rule as upsert_homeowner_snapshot_for_property
+            conn.executemany(
+                """
+                INSERT INTO homeowner_snapshot_history
+                    (user_id, property_id, snapshot_date, value_estimate, equity_estimate,
+                     loan_balance, loan_rate, loan_payment)
+                SELECT ?, ?, date('now'), ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM homeowner_snapshot_history
+                    WHERE user_id = ? AND property_id = ? AND snapshot_date >= date('now')
+                )
+                """,
+                history,
+            )
+            history_rows = conn.total_changes - before
+            conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "eligible": len(updates),
+        "updated": 0 if dry_run else len(updates),
+        "history_rows": history_rows,
+        "seconds": round(time.monotonic() - started, 3),
+        "total_value": float(new_value[idx].sum()) if len(idx) else 0.0,
+    }
+
+
+__all__ = [
+    'DEFAULT_ANNUAL_RATE',
+    'load_rates',
+    'region_keys',
+    'resolve_rates',
+    'run_valuation',
+    'set_appreciation_rate',
+]
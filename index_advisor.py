@@ -0,0 +1,289 @@
+"""
+Index Advisor
+Runs EXPLAIN QUERY PLAN over the app's hot queries and flags full-table scans.
+
+Catches index regressions before an agent's book grows into tens of thousands
+of contacts and a page quietly goes from milliseconds to seconds.
+
+Plans are computed against an empty in-memory copy of the schema by default, so
+the planner assumes large tables and the verdict doesn't depend on how much data
+(or which sqlite_stat1 statistics) the local ylh.db happens to have.
+
+Usage:
+    python index_advisor.py            # report; exit code 1 if anything is flagged
+    python index_advisor.py --verbose  # also print every plan
+    python index_advisor.py --live     # plan against the live database and its statistics
+"""
+
+import re
+import sqlite3
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import get_connection
+from migrations import CRM_SORT_INDEXES, DEDUP_KEY_INDEXES, MANAGED_INDEXES, OCCASION_INDEXES
+
+# (name, sql, sample params). Keep these in sync with the real queries in
+# database.py / app.py - the parameter values don't matter to the planner.
+QUERY_CATALOGUE: List[Tuple[str, str, tuple]] = [
+    ("list_agent_contacts",
+     "SELECT id, name, stage FROM agent_contacts WHERE agent_user_id = ? ORDER BY created_at DESC",
+     (1,)),
+    ("list_agent_contacts(stage)",
+     "SELECT id, name, stage FROM agent_contacts WHERE agent_user_id = ? AND stage = ? ORDER BY created_at DESC",
+     (1, "lead")),
+    ("crm_page(agent, name)",
+     """SELECT id, name FROM agent_contacts WHERE agent_user_id = ?
+        AND (COALESCE(name, '') COLLATE NOCASE > ? OR (COALESCE(name, '') COLLATE NOCASE = ? AND id > ?))
+        ORDER BY COALESCE(name, '') COLLATE NOCASE ASC, id ASC LIMIT ?""",
+     (1, "m", "m", 10, 101)),
+    ("crm_page(agent, stage, name)",
+     """SELECT id, name FROM agent_contacts WHERE agent_user_id = ? AND stage = ?
+        ORDER BY COALESCE(name, '') COLLATE NOCASE ASC, id ASC LIMIT ?""",
+     (1, "new", 101)),
+    ("crm_page(agent, last_touch)",
+     """SELECT id, name FROM agent_contacts WHERE agent_user_id = ?
+        ORDER BY COALESCE(last_touch, '') DESC, id DESC LIMIT ?""",
+     (1, 101)),
+    ("crm_page(lender, status, created_at)",
+     """SELECT id, name FROM lender_borrowers WHERE lender_user_id = ? AND status = ?
+        ORDER BY COALESCE(created_at, '') DESC, id DESC LIMIT ?""",
+     (1, "prospect", 101)),
+    ("occasion_contacts(birthday)",
+     """SELECT id, agent_user_id, name, email FROM agent_contacts
+        WHERE birthday_month = ? AND birthday_day IN (?) AND auto_birthday = 1
+          AND email IS NOT NULL AND email != ''""",
+     (3, 5)),
+    ("upcoming_occasions(anniversary)",
+     """SELECT id, name FROM lender_borrowers
+        WHERE lender_user_id = ? AND anniversary_month IS NOT NULL
+          AND ((anniversary_month, anniversary_day) BETWEEN (?, ?) AND (?, ?))""",
+     (1, 3, 5, 4, 4)),
+    ("find_existing_contact(agent, email)",
+     "SELECT id FROM agent_contacts WHERE agent_user_id = ? AND email_key = ? ORDER BY id LIMIT 1",
+     (1, "a@example.com")),
+    ("find_existing_contact(lender, phone)",
+     "SELECT id FROM lender_borrowers WHERE lender_user_id = ? AND phone_key = ? ORDER BY id LIMIT 1",
+     (1, "5550109999")),
+    ("get_agent_contact",
+     "SELECT * FROM agent_contacts WHERE id = ? AND agent_user_id = ?",
+     (1, 1)),
+    ("list_lender_borrowers",
+     "SELECT id, name, status FROM lender_borrowers WHERE lender_user_id = ? ORDER BY created_at DESC",
+     (1,)),
+    ("list_lender_borrowers(status)",
+     "SELECT id, name, status FROM lender_borrowers WHERE lender_user_id = ? AND status = ? ORDER BY created_at DESC",
+     (1, "preapproval")),
+    ("list_crm_interactions",
+     """SELECT id, interaction_type, interaction_date FROM crm_interactions
+        WHERE contact_id = ? AND contact_type = ? AND professional_user_id = ?
+        ORDER BY interaction_date DESC, created_at DESC LIMIT ?""",
+     (1, "agent_contact", 1, 50)),
+    ("last_interaction_per_contact",
+     """SELECT MAX(interaction_date) FROM crm_interactions
+        WHERE contact_id = ? AND contact_type = 'agent_contact' AND professional_user_id = ?""",
+     (1, 1)),
+    ("contacts_needing_followup",
+     """SELECT r.contact_id FROM contact_rollups r
+        WHERE r.professional_user_id = ? AND r.contact_type = ? AND r.followup_key < ?
+        ORDER BY r.followup_key""",
+     (1, "agent_contact", "2026-01-01")),
+    ("followup_queue(stage)",
+     """SELECT r.contact_id FROM contact_rollups r
+        WHERE r.professional_user_id = ? AND r.contact_type = ? AND r.stage = ? AND r.followup_key < ?
+        ORDER BY r.followup_key LIMIT 10""",
+     (1, "agent_contact", "active", "2026-01-01")),
+    ("list_crm_tasks",
+     """SELECT id, title, due_date FROM crm_tasks WHERE professional_user_id = ?
+        ORDER BY due_date ASC, priority DESC, created_at DESC""",
+     (1,)),
+    ("list_crm_tasks(contact)",
+     """SELECT id, title FROM crm_tasks
+        WHERE professional_user_id = ? AND contact_id = ? AND contact_type = ?""",
+     (1, 1, "agent_contact")),
+    ("list_crm_deals",
+     """SELECT id, deal_name FROM crm_deals WHERE professional_user_id = ?
+        ORDER BY expected_close_date ASC, created_at DESC""",
+     (1,)),
+    ("list_crm_deals(contact)",
+     """SELECT id, deal_name FROM crm_deals
+        WHERE professional_user_id = ? AND contact_id = ? AND contact_type = ?""",
+     (1, 1, "agent_contact")),
+    ("list_crm_relationships",
+     """SELECT id FROM crm_relationships
+        WHERE professional_user_id = ? AND contact_type = ? AND (contact_id_1 = ? OR contact_id_2 = ?)""",
+     (1, "agent_contact", 1, 1)),
+    ("list_crm_saved_views",
+     """SELECT id, view_name FROM crm_saved_views WHERE professional_user_id = ? AND role = ?
+        ORDER BY is_default DESC, created_at DESC""",
+     (1, "agent")),
+    ("automated_email_history",
+     """SELECT id FROM automated_email_logs
+        WHERE contact_type = ? AND contact_id = ? AND email_type = ? AND sent_at >= ?""",
+     ("agent_contact", 1, "equity", "2026-01-01")),
+    ("list_homeowner_notes",
+     "SELECT id, title FROM homeowner_notes WHERE user_id = ? ORDER BY created_at DESC",
+     (1,)),
+    ("get_design_board_details",
+     """SELECT id, title FROM homeowner_notes WHERE user_id = ? AND project_name = ?
+        ORDER BY created_at ASC""",
+     (1, "Kitchen")),
+    ("list_homeowner_documents",
+     "SELECT id, name FROM homeowner_documents WHERE user_id = ?",
+     (1,)),
+    ("list_timeline_events",
+     "SELECT id, title FROM homeowner_timeline_events WHERE user_id = ? ORDER BY event_date DESC",
+     (1,)),
+    ("get_user_properties",
+     "SELECT id, address FROM properties WHERE user_id = ? ORDER BY is_primary DESC",
+     (1,)),
+    ("get_homeowner_professionals",
+     """SELECT cr.id, u.name FROM client_relationships cr
+        JOIN users u ON cr.professional_id = u.id
+        LEFT JOIN user_profiles up ON cr.professional_id = up.user_id
+        WHERE cr.homeowner_id = ? AND cr.status = 'active'""",
+     (1,)),
+    ("get_referral_stats",
+     "SELECT COUNT(*) FROM client_relationships WHERE professional_id = ? AND status = 'active'",
+     (1,)),
+    ("get_accessible_homeowners(agent)",
+     "SELECT id FROM users WHERE role = 'homeowner' AND agent_id = ?",
+     (1,)),
+    ("get_user_by_email",
+     "SELECT * FROM users WHERE email = ?",
+     ("someone@example.com",)),
+    ("get_audit_logs",
+     "SELECT * FROM audit_logs WHERE 1=1 ORDER BY created_at DESC LIMIT ?",
+     (100,)),
+    ("get_user_activity_summary",
+     """SELECT action, COUNT(*) FROM audit_logs
+        WHERE user_id = ? AND created_at > datetime('now', '-30 days') GROUP BY action""",
+     (1,)),
+    ("get_user_video_projects",
+     "SELECT * FROM video_projects WHERE user_id = ? ORDER BY created_at DESC",
+     (1,)),
+]
+
+# "SCAN agent_contacts" is a full-table scan; "SCAN agent_contacts USING INDEX ..."
+# walks an index in order and is fine. Subqueries/CTEs show up as "SCAN (subquery-1)".
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)")
+_TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)")
+
+
+def explain(conn, sql: str, params: tuple = ()) -> List[str]:
+    """EXPLAIN QUERY PLAN detail lines for one statement"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def analyse_query(conn, name: str, sql: str, params: tuple = ()) -> Dict[str, Any]:
+    try:
+        plan = explain(conn, sql, params)
+    except Exception as e:
+        # Usually a table/column that doesn't exist in this database's shape
+        return {"name": name, "plan": [], "scans": [], "temp_sorts": [], "error": str(e), "ok": True}
+    scans = [m.group(1) for m in (_FULL_SCAN.match(line) for line in plan) if m]
+    temp_sorts = [m.group(1) for m in (_TEMP_SORT.search(line) for line in plan) if m]
+    return {
+        "name": name,
+        "plan": plan,
+        "scans": scans,
+        "temp_sorts": temp_sorts,
+        "error": None,
+        "ok": not scans,
+    }
+
+
+def schema_only_copy(conn) -> sqlite3.Connection:
+    """Empty :memory: database with the same tables and indexes as conn"""
+    copy = sqlite3.connect(":memory:")
+    rows = conn.execute(
+        """
+        SELECT type, sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+        """
+    ).fetchall()
+    for row_type, sql in rows:
+        if row_type in ("table", "index"):
+            try:
+                copy.execute(sql)
+            except sqlite3.Error:
+                pass  # virtual tables and friends aren't needed for planning
+    return copy
+
+
+def missing_managed_indexes(conn) -> List[str]:
+    """Managed indexes that apply to this database but haven't been created"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    missing = []
+    for name, table, cols, *_ in MANAGED_INDEXES + CRM_SORT_INDEXES + OCCASION_INDEXES + DEDUP_KEY_INDEXES:
+        table_cols = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if table_cols and set(cols) <= table_cols and name not in existing:
+            missing.append(name)
+    return missing
+
+
+def run_advisor(
+    catalogue: Optional[List[Tuple[str, str, tuple]]] = None,
+    live: bool = False,
+) -> Dict[str, Any]:
+    """Analyse every catalogued query. Returns {'results', 'flagged', 'missing_indexes'}."""
+    catalogue = QUERY_CATALOGUE if catalogue is None else catalogue
+    conn = get_connection()
+    try:
+        missing = missing_managed_indexes(conn)
+        plan_conn = conn if live else schema_only_copy(conn)
+        try:
+            results = [analyse_query(plan_conn, name, sql, params) for name, sql, params in catalogue]
+        finally:
+            if plan_conn is not conn:
+                plan_conn.close()
+    finally:
+        conn.close()
+    return {
+        "results": results,
+        "flagged": [r for r in results if not r["ok"]],
+        "missing_indexes": missing,
+    }
+
+
+def main(argv: List[str]) -> int:
+    verbose = "--verbose" in argv or "-v" in argv
+    report = run_advisor(live="--live" in argv)
+
+    print("=" * 70)
+    print("INDEX ADVISOR")
+    print("=" * 70)
+    for r in report["results"]:
+        if r["error"]:
+            status = "SKIP"
+        elif not r["ok"]:
+            status = "SCAN"
+        elif r["temp_sorts"]:
+            status = "SORT"
+        else:
+            status = " OK "
+        line = f"[{status}] {r['name']}"
+        if r["scans"]:
+            line += f"  full scan of: {', '.join(r['scans'])}"
+        if r["temp_sorts"]:
+            line += f"  temp b-tree for: {', '.join(r['temp_sorts'])}"
+        if r["error"]:
+            line += f"  ({r['error']})"
+        print(line)
+        if verbose:
+            for detail in r["plan"]:
+                print(f"         {detail}")
+
+    if report["missing_indexes"]:
+        print("\nManaged indexes not present (run `python migrations.py`):")
+        for name in report["missing_indexes"]:
+            print(f"  - {name}")
+
+    flagged = len(report["flagged"])
+    print(f"\n{flagged} quer{'y' if flagged == 1 else 'ies'} with full-table scans")
+    return 1 if flagged or report["missing_indexes"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,318 @@
+"""
+Job Scheduler
+Cron jobs that run in exactly one gunicorn worker, with a run history.
+
+Every worker imports app.py and starts an APScheduler, so before this each
+cron job (birthday emails, home value updates, ...) ran once per worker. Now
+the workers elect a leader through a lease row in scheduler_leases: the holder
+renews it every RENEW_SECONDS, and if it dies the lease expires and another
+worker takes over. Only the leader executes jobs. As a second guard every
+scheduled run claims a (job, minute) slot in job_runs, so even two workers
+that both believe they lead can't run the same firing twice.
+
+Each run is recorded in job_runs with start/end, duration, rows processed (a
+job's int return value, or the sum of a returned dict of counts) and the error.
+
+    scheduler = JobScheduler()
+    scheduler.add_job("send_birthday_emails", send_birthday_emails, "cron", hour=9, minute=0)
+    scheduler.start()
+    scheduler.trigger("send_birthday_emails", user_id=1)   # admin "run now"
+"""
+
+import atexit
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from database import get_connection
+
+LEASE_NAME = "scheduler"
+LEASE_SECONDS = 60
+RENEW_SECONDS = 15
+# A run still marked running after this long died with its worker
+STALE_RUN_HOURS = 6
+RUN_RETENTION_DAYS = 30
+
+
+def rows_processed(result: Any) -> Optional[int]:
+    """Rows a job reports: an int return value, or the sum of a dict of counts"""
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        if isinstance(result.get("rows"), int):
+            return result["rows"]
+        counts = [v for v in result.values() if isinstance(v, int) and not isinstance(v, bool)]
+        return sum(counts) if counts else None
+    return None
+
+
+class JobScheduler:
+    def __init__(self, lease_name: str = LEASE_NAME, lease_seconds: int = LEASE_SECONDS):
+        self.lease_name = lease_name
+        self.lease_seconds = lease_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self.is_leader = False
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._scheduler = None
+
+    # ---------------- REGISTRATION ----------------
+
+    def add_job(self, name: str, func: Callable, trigger: str, description: str = "",
+                quiet: bool = False, **trigger_args: Any) -> None:
+        """
+        Register a job under a stable name (used in job_runs and the admin page).
+        quiet jobs (frequent pollers) only keep runs that did something or failed.
+        """
+        self.jobs[name] = {
+            "func": func,
+            "trigger": trigger,
+            "trigger_args": trigger_args,
+            "description": description or (func.__doc__ or "").strip().split("\n")[0],
+            "quiet": quiet,
+        }
+
+    def start(self) -> None:
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        scheduler = BackgroundScheduler()
+        for name, job in self.jobs.items():
+            scheduler.add_job(
+                self._fire, job["trigger"], args=[name], id=name,
+                max_instances=1, coalesce=True, misfire_grace_time=300,
+                **job["trigger_args"],
+            )
+        scheduler.add_job(self.renew_lease, "interval", seconds=RENEW_SECONDS, id="_scheduler_lease")
+        scheduler.add_job(self.prune_runs, "cron", hour=3, minute=30, id="_scheduler_prune")
+        self.renew_lease()
+        scheduler.start()
+        self._scheduler = scheduler
+        atexit.register(self.release_lease)
+        print(f"[SCHEDULER] {self.holder} started with {len(self.jobs)} jobs "
+              f"({'leader' if self.is_leader else 'standby'})")
+
+    # ---------------- LEADER LEASE ----------------
+
+    def renew_lease(self) -> bool:
+        """Take or extend the lease; True if this process is the leader"""
+        conn = get_connection()
+        try:
+            changed = conn.execute(
+                """
+                INSERT INTO scheduler_leases (name, holder, acquired_at, renewed_at, expires_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, datetime('now', ?))
+                ON CONFLICT(name) DO UPDATE SET
+                    acquired_at = CASE WHEN scheduler_leases.holder = excluded.holder
+                                       THEN scheduler_leases.acquired_at ELSE excluded.acquired_at END,
+                    holder = excluded.holder,
+                    renewed_at = excluded.renewed_at,
+                    expires_at = excluded.expires_at
+                WHERE scheduler_leases.holder = excluded.holder
+                   OR scheduler_leases.expires_at < CURRENT_TIMESTAMP
+                """,
+                (self.lease_name, self.holder, f"+{self.lease_seconds} seconds"),
+            ).rowcount
+            conn.commit()
+        except Exception as e:
+            print(f"[SCHEDULER] Lease renewal failed: {e}")
+            changed = 0
+        finally:
+            conn.close()
+        was_leader, self.is_leader = self.is_leader, bool(changed)
+        if self.is_leader and not was_leader:
+            print(f"[SCHEDULER] {self.holder} is now the leader")
+        elif was_leader and not self.is_leader:
+            print(f"[SCHEDULER] {self.holder} lost the lease")
+        return self.is_leader
+
+    def release_lease(self) -> None:
+        """Give up the lease on shutdown so a standby takes over without waiting for expiry"""
+        try:
+            conn = get_connection()
+            try:
+                conn.execute(
+                    "DELETE FROM scheduler_leases WHERE name = ? AND holder = ?",
+                    (self.lease_name, self.holder),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception:
+            pass
+        self.is_leader = False
+
+    def leader(self) -> Optional[Dict[str, Any]]:
+        conn = get_connection()
+        try:
+            row = conn.execute(
+                "SELECT *, expires_at >= CURRENT_TIMESTAMP AS active FROM scheduler_leases WHERE name = ?",
+                (self.lease_name,),
+            ).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    # ---------------- RUNS ----------------
+
+    def _fire(self, name: str) -> None:
+        """APScheduler entry point: run only on the leader, once per (job, minute)"""
+        if not self.renew_lease():
+            return
+        slot = datetime.now().strftime("%Y-%m-%d %H:%M")
+        run_id = self._begin_run(name, "schedule", scheduled_for=slot)
+        if run_id is not None:
+            self._execute(run_id, name)
+
+    def _begin_run(self, name: str, trigger: str, scheduled_for: Optional[str] = None,
+                   triggered_by: Optional[int] = None) -> Optional[int]:
+        conn = get_connection()
+        try:
+            cur = conn.execute(
+                """
+                INSERT OR IGNORE INTO job_runs (job_name, trigger, scheduled_for, triggered_by, holder, status)
+                VALUES (?, ?, ?, ?, ?, 'running')
+                """,
+                (name, trigger, scheduled_for, triggered_by, self.holder),
+            )
+            conn.commit()
+            return cur.lastrowid if cur.rowcount else None
+        finally:
+            conn.close()
+
+    def _execute(self, run_id: int, name: str) -> None:
+        job = self.jobs[name]
+        started = time.monotonic()
+        status, error, rows = "succeeded", None, None
+        try:
+            rows = rows_processed(job["func"]())
+        except Exception as e:
+            status, error = "failed", f"{e}\n{traceback.format_exc()}"[-4000:]
+            print(f"[SCHEDULER] {name} failed: {e}")
+        duration_ms = (time.monotonic() - started) * 1000
+
+        conn = get_connection()
+        try:
+            if job["quiet"] and status == "succeeded" and not rows:
+                conn.execute("DELETE FROM job_runs WHERE id = ?", (run_id,))
+            else:
+                conn.execute(
+                    """
+                    UPDATE job_runs
+                    SET status = ?, finished_at = CURRENT_TIMESTAMP, duration_ms = ?,
+                        rows_processed = ?, error = ?
+                    WHERE id = ?
+                    """,
+                    (status, duration_ms, rows, error, run_id),
+                )
+            conn.commit()
+        finally:
+            conn.close()
+        if not job["quiet"] or rows or error:
+            print(f"[SCHEDULER] {name} {status} in {duration_ms:.0f}ms"
+                  f"{f', {rows} rows' if rows is not None else ''}")
+
+    def trigger(self, name: str, user_id: Optional[int] = None) -> int:
+        """
+        Run a job now in a background thread of this process (admin "run now").
+        Raises KeyError for unknown jobs and RuntimeError if it's already running.
+        """
+        if name not in self.jobs:
+            raise KeyError(name)
+        conn = get_connection()
+        try:
+            running = conn.execute(
+                """
+                SELECT id FROM job_runs
+                WHERE job_name = ? AND status = 'running' AND started_at > datetime('now', ?)
+                LIMIT 1
+                """,
+                (name, f"-{STALE_RUN_HOURS} hours"),
+            ).fetchone()
+        finally:
+            conn.close()
+        if running:
+            raise RuntimeError(f"{name} is already running (run #{running['id']})")
+        run_id = self._begin_run(name, "manual", triggered_by=user_id)
+        threading.Thread(
+            target=self._execute, args=(run_id, name), name=f"job-{name}", daemon=True
+        ).start()
+        return run_id
+
+    # ---------------- HISTORY ----------------
+
+    def recent_runs(self, limit: int = 50, job_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM job_runs"
+        params: List[Any] = []
+        if job_name:
+            sql += " WHERE job_name = ?"
+            params.append(job_name)
+        sql += " ORDER BY started_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        conn = get_connection()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def job_summaries(self) -> List[Dict[str, Any]]:
+        """Registered jobs with their schedule, next local fire time and last run"""
+        conn = get_connection()
+        try:
+            last_runs = {
+                row["job_name"]: dict(row)
+                for row in conn.execute(
+                    """
+                    SELECT * FROM (
+                        SELECT *, ROW_NUMBER() OVER (PARTITION BY job_name ORDER BY started_at DESC, id DESC) AS rn
+                        FROM job_runs
+                    ) WHERE rn = 1
+                    """
+                ).fetchall()
+            }
+        finally:
+            conn.close()
+        summaries = []
+        for name, job in self.jobs.items():
+            aps_job = self._scheduler.get_job(name) if self._scheduler else None
+            summaries.append({
+                "name": name,
+                "description": job["description"],
+                "schedule": str(aps_job.trigger) if aps_job else job["trigger"],
+                "next_run": aps_job.next_run_time.strftime("%Y-%m-%d %H:%M") if aps_job and aps_job.next_run_time else None,
+                "last_run": last_runs.get(name),
+            })
+        return summaries
+
+    def prune_runs(self) -> None:
+        conn = get_connection()
+        try:
+            conn.execute(
+                "DELETE FROM job_runs WHERE started_at < datetime('now', ?)",
+                (f"-{RUN_RETENTION_DAYS} days",),
+            )
+            conn.execute(
+                """
+                UPDATE job_runs SET status = 'abandoned', finished_at = CURRENT_TIMESTAMP
+                WHERE status = 'running' AND started_at < datetime('now', ?)
+                """,
+                (f"-{STALE_RUN_HOURS} hours",),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+__all__ = [
+    'JobScheduler',
+    'LEASE_SECONDS',
+    'RENEW_SECONDS',
+    'rows_processed',
+]
@@ -0,0 +1,2160 @@
+"""
+Schema Migrations
+Ordered, idempotent schema steps tracked in a schema_version table.
+
+init_db() used to run every CREATE TABLE / ALTER TABLE on each worker boot.
+Now each step runs once per database: workers read schema_version, see the
+schema is current and skip straight past. When steps are pending, the first
+worker takes the SQLite write lock (BEGIN IMMEDIATE) and applies them; the
+other worker blocks on that lock and then finds nothing left to do.
+
+Usage:
+    python migrations.py           # apply pending steps
+    python migrations.py status    # show applied / pending steps
+    python migrations.py rebuild-rollups   # recompute contact_rollups from scratch
+"""
+
+import sqlite3
+import sys
+import time
+from typing import Callable, List, Optional, Set, Tuple
+
+from database import DEDUP_KEY_COLUMNS, OPEN_TASK_STATUS, dedup_key_columns, get_connection, parse_month_day
+from schema_registry import schema
+
+
+# =========================
+# HELPERS
+# =========================
+
+
+def _columns(cur, table: str) -> Set[str]:
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cur.fetchall()}
+
+
+def _add_column(cur, table: str, column: str, decl: str) -> bool:
+    """ALTER TABLE ... ADD COLUMN unless it already exists. Returns True if added."""
+    if column in _columns(cur, table):
+        return False
+    cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
+
+# =========================
+# STEPS
+# =========================
+
+
+def _m001_baseline(cur) -> None:
+    """Everything init_db() used to create, verbatim. Safe on legacy databases."""
+    # ---------------- USERS ----------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            name TEXT,
+            email TEXT UNIQUE,
+            password_hash TEXT,
+            role TEXT CHECK(role IN ('homeowner','agent','lender')) NOT NULL,
+            follow_up_days INTEGER DEFAULT 30
+        )
+        """
+    )
+    
+    # Add follow_up_days column if it doesn't exist
+    try:
+        cur.execute("ALTER TABLE users ADD COLUMN follow_up_days INTEGER DEFAULT 30")
+    except:
+        pass
+    
+    # Add agent_id and lender_id columns for homeowner linking
+    try:
+        cur.execute("ALTER TABLE users ADD COLUMN agent_id INTEGER REFERENCES users(id)")
+    except:
+        pass
+    try:
+        cur.execute("ALTER TABLE users ADD COLUMN lender_id INTEGER REFERENCES users(id)")
+    except:
+        pass
+    
+    # Add subscription_tier column for premium features (free, basic, premium, pro)
+    try:
+        cur.execute("ALTER TABLE users ADD COLUMN subscription_tier TEXT DEFAULT 'free' CHECK(subscription_tier IN ('free','basic','premium','pro'))")
+    except:
+        pass
+
+    # ------------- USER PROFILES -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            role TEXT CHECK(role IN ('agent','lender')) NOT NULL,
+            referral_code TEXT UNIQUE,
+            professional_photo TEXT,
+            brokerage_logo TEXT,
+            team_name TEXT,
+            brokerage_name TEXT,
+            website_url TEXT,
+            facebook_url TEXT,
+            instagram_url TEXT,
+            linkedin_url TEXT,
+            twitter_url TEXT,
+            youtube_url TEXT,
+            phone TEXT,
+            call_button_enabled INTEGER DEFAULT 1,
+            schedule_button_enabled INTEGER DEFAULT 1,
+            schedule_url TEXT,
+            bio TEXT,
+            specialties TEXT,
+            years_experience INTEGER,
+            languages TEXT,
+            service_areas TEXT,
+            nmls_number TEXT,
+            license_number TEXT,
+            company_address TEXT,
+            company_city TEXT,
+            company_state TEXT,
+            company_zip TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Add referral_code column if it doesn't exist
+    try:
+        # Check if column exists
+        cur.execute("PRAGMA table_info(user_profiles)")
+        columns = [row[1] for row in cur.fetchall()]
+        if 'referral_code' not in columns:
+            # Add column without UNIQUE constraint (SQLite limitation)
+            cur.execute("ALTER TABLE user_profiles ADD COLUMN referral_code TEXT")
+            # Create unique index for referral_code
+            try:
+                cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_profiles_referral_code ON user_profiles(referral_code) WHERE referral_code IS NOT NULL")
+            except:
+                pass  # Index might already exist
+    except Exception as e:
+        print(f"Warning: Could not add referral_code column: {e}")
+        pass
+    
+    # Add application_url column if it doesn't exist (for lenders)
+    try:
+        cur.execute("ALTER TABLE user_profiles ADD COLUMN application_url TEXT")
+    except:
+        pass
+    
+    # Add homebot_widget_id column if it doesn't exist (for agents/lenders)
+    try:
+        cur.execute("ALTER TABLE user_profiles ADD COLUMN homebot_widget_id TEXT")
+    except:
+        pass
+    
+    # Add market rate columns if they don't exist (for lenders/agents to set rates)
+    try:
+        cur.execute("ALTER TABLE user_profiles ADD COLUMN va_rate_30yr REAL")
+    except:
+        pass
+    try:
+        cur.execute("ALTER TABLE user_profiles ADD COLUMN fha_rate_30yr REAL")
+    except:
+        pass
+    try:
+        cur.execute("ALTER TABLE user_profiles ADD COLUMN conventional_rate_30yr REAL")
+    except:
+        pass
+
+    # ---------------- VIDEO STUDIO ----------------
+    # Table for video projects
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS video_projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            transaction_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            video_type TEXT NOT NULL,
+            aspect_ratio TEXT NOT NULL,
+            duration INTEGER NOT NULL,
+            style_preset TEXT NOT NULL,
+            headline TEXT,
+            property_address TEXT,
+            highlights TEXT,
+            media_files TEXT,
+            include_lender INTEGER DEFAULT 0,
+            include_captions INTEGER DEFAULT 1,
+            render_status TEXT DEFAULT 'draft',
+            output_path TEXT,
+            thumbnail_path TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (transaction_id) REFERENCES agent_transactions (id)
+        )
+    """)
+
+    # ------------- CLIENT RELATIONSHIPS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS client_relationships (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            homeowner_id INTEGER NOT NULL,
+            professional_id INTEGER NOT NULL,
+            professional_role TEXT CHECK(professional_role IN ('agent','lender')) NOT NULL,
+            referral_code TEXT,
+            status TEXT DEFAULT 'active' CHECK(status IN ('active','inactive','removed')),
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (homeowner_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (professional_id) REFERENCES users(id) ON DELETE CASCADE,
+            UNIQUE(homeowner_id, professional_id, professional_role)
+        )
+        """
+    )
+    
+    # Migration: Ensure homeowner_id column exists (for existing databases)
+    try:
+        cur.execute("ALTER TABLE client_relationships ADD COLUMN homeowner_id INTEGER")
+        # If homeowner_id was missing, we need to handle existing data
+        # For now, we'll just ensure the column exists
+    except:
+        pass  # Column already exists
+    
+    # Migration: Ensure status column exists
+    try:
+        cur.execute("ALTER TABLE client_relationships ADD COLUMN status TEXT DEFAULT 'active'")
+    except:
+        pass  # Column already exists
+
+    # ------------- REFERRAL LINKS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS referral_links (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token TEXT UNIQUE NOT NULL,
+            agent_id INTEGER REFERENCES users(id),
+            lender_id INTEGER REFERENCES users(id),
+            is_active INTEGER DEFAULT 1,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            CHECK(agent_id IS NOT NULL OR lender_id IS NOT NULL)
+        )
+        """
+    )
+    
+    # Create index on token for fast lookups
+    try:
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_referral_links_token ON referral_links(token)")
+    except:
+        pass
+
+    # ------------- TRUSTED VENDORS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS trusted_vendors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            contact_name TEXT,
+            phone TEXT,
+            email TEXT,
+            website TEXT,
+            address TEXT,
+            notes TEXT,
+            is_active INTEGER DEFAULT 1,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (agent_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Create index for faster lookups
+    try:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_trusted_vendors_agent_id ON trusted_vendors(agent_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_trusted_vendors_category ON trusted_vendors(category)")
+    except:
+        pass
+
+    # ------------- TRANSACTION VENDOR LINKS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transaction_vendors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL,
+            vendor_id INTEGER NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (transaction_id) REFERENCES agent_transactions(id) ON DELETE CASCADE,
+            FOREIGN KEY (vendor_id) REFERENCES trusted_vendors(id) ON DELETE CASCADE,
+            UNIQUE(transaction_id, vendor_id)
+        )
+        """
+    )
+
+    # ------------- PROPERTIES -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS properties (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            address TEXT NOT NULL,
+            estimated_value REAL,
+            property_type TEXT DEFAULT 'primary',
+            is_primary INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    # ------------- HOMEOWNER SNAPSHOTS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS homeowner_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            property_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            value_estimate REAL,
+            equity_estimate REAL,
+            loan_rate REAL,
+            loan_payment REAL,
+            loan_balance REAL,
+            loan_term_years REAL,
+            loan_start_date TEXT,
+            last_value_refresh TEXT,
+            value_refresh_source TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (property_id) REFERENCES properties(id) ON DELETE CASCADE,
+            UNIQUE(user_id, property_id)
+        )
+        """
+    )
+    
+    # Add refresh tracking columns if they don't exist (migration)
+    try:
+        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN last_value_refresh TEXT")
+    except:
+        pass
+    try:
+        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN value_refresh_source TEXT")
+    except:
+        pass
+    
+    # Add initial purchase value for appreciation calculation
+    try:
+        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN initial_purchase_value REAL")
+    except:
+        pass
+    
+    # Add property tax, insurance, and PMI columns for accurate payment calculations
+    try:
+        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN property_tax_monthly REAL")
+    except:
+        pass
+    try:
+        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN homeowners_insurance_monthly REAL")
+    except:
+        pass
+    try:
+        cur.execute("ALTER TABLE homeowner_snapshots ADD COLUMN pmi_monthly REAL")
+    except:
+        pass
+
+    # ------------- SNAPSHOT HISTORY (Monthly tracking) -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS homeowner_snapshot_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            property_id INTEGER,
+            snapshot_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            value_estimate REAL,
+            equity_estimate REAL,
+            loan_balance REAL,
+            loan_rate REAL,
+            loan_payment REAL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (property_id) REFERENCES properties(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Create index for faster history queries
+    try:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_snapshot_history_user_property ON homeowner_snapshot_history(user_id, property_id, snapshot_date)")
+    except:
+        pass
+
+    # ------------- HOMEOWNER NOTES (DESIGN BOARDS) -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS homeowner_notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            project_name TEXT,          -- board name
+            title TEXT,
+            tags TEXT,
+            details TEXT,
+            links TEXT,
+            photos TEXT,                -- JSON list of photo filenames
+            files TEXT,                 -- JSON list of file filenames
+            vision_statement TEXT,
+            color_palette TEXT,         -- JSON list of hex colors
+            board_template TEXT,        -- 'minimal', 'modern', 'cozy', 'bold'
+            label_style TEXT,          -- 'none', 'subtle', 'bold'
+            is_private INTEGER DEFAULT 0,
+            shareable_link TEXT,
+            product_sources TEXT,
+            show_notes_panel INTEGER DEFAULT 1,
+            fixtures TEXT               -- JSON list of fixture image filenames
+        )
+        """
+    )
+    
+    # Migration: Add missing columns to homeowner_notes if they don't exist
+    migration_columns = [
+        ("links", "TEXT"),
+        ("vision_statement", "TEXT"),
+        ("color_palette", "TEXT"),
+        ("board_template", "TEXT"),
+        ("label_style", "TEXT"),
+        ("is_private", "INTEGER DEFAULT 0"),
+        ("shareable_link", "TEXT"),
+        ("product_sources", "TEXT"),
+        ("show_notes_panel", "INTEGER DEFAULT 1"),
+        ("fixtures", "TEXT"),
+    ]
+    
+    for col_name, col_type in migration_columns:
+        try:
+            cur.execute(f"ALTER TABLE homeowner_notes ADD COLUMN {col_name} {col_type}")
+            print(f"[DB MIGRATION] Added column '{col_name}' to homeowner_notes")
+        except Exception as e:
+            # Column already exists, ignore
+            pass
+
+    # ------------- HOMEOWNER DOCUMENTS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS homeowner_documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            name TEXT,
+            category TEXT,
+            file_path TEXT,
+            r2_key TEXT,
+            r2_url TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Migration: Add name column if it doesn't exist (for existing databases)
+    try:
+        cur.execute("ALTER TABLE homeowner_documents ADD COLUMN name TEXT")
+        print("[DB MIGRATION] Added 'name' column to homeowner_documents")
+    except:
+        pass  # Column already exists
+    
+    # Migration: Ensure all required columns exist
+    try:
+        cur.execute("ALTER TABLE homeowner_documents ADD COLUMN r2_key TEXT")
+    except:
+        pass
+    try:
+        cur.execute("ALTER TABLE homeowner_documents ADD COLUMN r2_url TEXT")
+    except:
+        pass
+
+    # ------------- HOMEOWNER WARRANTY LOG -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS homeowner_warranty_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            item_name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            purchase_date TEXT,
+            warranty_start TEXT,
+            warranty_expiry TEXT,
+            warranty_provider TEXT,
+            warranty_number TEXT,
+            notes TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Create index for faster lookups
+    try:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_warranty_log_user_id ON homeowner_warranty_log(user_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_warranty_log_category ON homeowner_warranty_log(category)")
+    except:
+        pass
+
+    # ------------- HOMEOWNER PROJECTS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS homeowner_projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            name TEXT,
+            category TEXT,
+            status TEXT,
+            budget TEXT,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Add category column if it doesn't exist (migration for existing databases)
+    try:
+        cur.execute("PRAGMA table_info(homeowner_projects)")
+        columns = [row[1] for row in cur.fetchall()]
+        if 'category' not in columns:
+            cur.execute("ALTER TABLE homeowner_projects ADD COLUMN category TEXT")
+    except Exception as e:
+        print(f"Warning: Could not add category column to homeowner_projects: {e}")
+        pass
+
+    # ------------- NEXT MOVE PLAN -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS next_move_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            timeline TEXT,
+            budget_range TEXT,
+            location_preferences TEXT,
+            property_type_preferences TEXT,
+            must_haves TEXT,
+            nice_to_haves TEXT,
+            concerns TEXT,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    # ------------- HOMEOWNER QUESTIONS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS homeowner_questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            topic TEXT,
+            question TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    # ------------- AGENT CONTACTS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS agent_contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            name TEXT,
+            email TEXT,
+            phone TEXT,
+            stage TEXT,
+            best_contact TEXT,
+            last_touch TEXT,
+            birthday TEXT,
+            home_anniversary TEXT,
+            address TEXT,
+            notes TEXT,
+            tags TEXT,
+            property_address TEXT,
+            property_value REAL,
+            equity_estimate REAL,
+            auto_birthday INTEGER DEFAULT 1,
+            auto_anniversary INTEGER DEFAULT 1,
+            auto_seasonal INTEGER DEFAULT 1,
+            auto_equity INTEGER DEFAULT 1,
+            auto_holidays INTEGER DEFAULT 1,
+            equity_frequency TEXT DEFAULT 'monthly',
+            FOREIGN KEY (agent_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Add new columns to existing table (migration)
+    for col in ['birthday', 'home_anniversary', 'address', 'notes', 'tags', 
+                'property_address', 'property_value', 'equity_estimate',
+                'auto_birthday', 'auto_anniversary', 'auto_seasonal', 
+                'auto_equity', 'auto_holidays', 'equity_frequency']:
+        try:
+            if col in ['auto_birthday', 'auto_anniversary', 'auto_seasonal', 
+                      'auto_equity', 'auto_holidays']:
+                cur.execute(f"ALTER TABLE agent_contacts ADD COLUMN {col} INTEGER DEFAULT 1")
+            elif col == 'equity_frequency':
+                cur.execute(f"ALTER TABLE agent_contacts ADD COLUMN {col} TEXT DEFAULT 'monthly'")
+            elif col in ['property_value', 'equity_estimate']:
+                cur.execute(f"ALTER TABLE agent_contacts ADD COLUMN {col} REAL")
+            else:
+                cur.execute(f"ALTER TABLE agent_contacts ADD COLUMN {col} TEXT")
+        except:
+            pass
+
+    # ------------- LENDER BORROWERS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS lender_borrowers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lender_user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            name TEXT,
+            status TEXT,
+            loan_type TEXT,
+            target_payment TEXT,
+            last_touch TEXT,
+            email TEXT,
+            phone TEXT,
+            birthday TEXT,
+            home_anniversary TEXT,
+            address TEXT,
+            notes TEXT,
+            tags TEXT,
+            property_address TEXT,
+            loan_amount REAL,
+            loan_rate REAL,
+            auto_birthday INTEGER DEFAULT 1,
+            auto_anniversary INTEGER DEFAULT 1,
+            auto_seasonal INTEGER DEFAULT 1,
+            auto_equity INTEGER DEFAULT 1,
+            auto_holidays INTEGER DEFAULT 1,
+            equity_frequency TEXT DEFAULT 'monthly',
+            FOREIGN KEY (lender_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Add new columns to existing table (migration)
+    for col in ['email', 'phone', 'birthday', 'home_anniversary', 'address', 
+                'notes', 'tags', 'property_address', 'loan_amount', 'loan_rate',
+                'auto_birthday', 'auto_anniversary', 'auto_seasonal', 
+                'auto_equity', 'auto_holidays', 'equity_frequency']:
+        try:
+            if col in ['auto_birthday', 'auto_anniversary', 'auto_seasonal', 
+                      'auto_equity', 'auto_holidays']:
+                cur.execute(f"ALTER TABLE lender_borrowers ADD COLUMN {col} INTEGER DEFAULT 1")
+            elif col == 'equity_frequency':
+                cur.execute(f"ALTER TABLE lender_borrowers ADD COLUMN {col} TEXT DEFAULT 'monthly'")
+            elif col in ['loan_amount', 'loan_rate']:
+                cur.execute(f"ALTER TABLE lender_borrowers ADD COLUMN {col} REAL")
+            else:
+                cur.execute(f"ALTER TABLE lender_borrowers ADD COLUMN {col} TEXT")
+        except:
+            pass
+
+    # ------------- AGENT TRANSACTIONS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS agent_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            property_address TEXT,
+            client_name TEXT,
+            side TEXT,
+            stage TEXT,
+            close_date TEXT,
+            FOREIGN KEY (agent_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # Migrate transaction_participants table to new schema if needed
+    try:
+        cur.execute("PRAGMA table_info(transaction_participants)")
+        columns = [col[1] for col in cur.fetchall()]
+        
+        # Add missing columns for new transaction system
+        if 'participant_type' not in columns:
+            cur.execute("ALTER TABLE transaction_participants ADD COLUMN participant_type TEXT")
+            # Migrate existing 'role' to 'participant_type' if role exists
+            if 'role' in columns:
+                cur.execute("UPDATE transaction_participants SET participant_type = role WHERE participant_type IS NULL")
+        
+        if 'name' not in columns:
+            cur.execute("ALTER TABLE transaction_participants ADD COLUMN name TEXT")
+        
+        if 'phone' not in columns:
+            cur.execute("ALTER TABLE transaction_participants ADD COLUMN phone TEXT")
+        
+        if 'company' not in columns:
+            cur.execute("ALTER TABLE transaction_participants ADD COLUMN company TEXT")
+        
+        if 'invitation_token' not in columns:
+            cur.execute("ALTER TABLE transaction_participants ADD COLUMN invitation_token TEXT")
+            # Add unique constraint separately if needed
+            try:
+                cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_invitation_token ON transaction_participants(invitation_token) WHERE invitation_token IS NOT NULL")
+            except:
+                pass
+        
+        if 'invitation_sent_at' not in columns:
+            cur.execute("ALTER TABLE transaction_participants ADD COLUMN invitation_sent_at TIMESTAMP")
+        
+        if 'invitation_accepted_at' not in columns:
+            cur.execute("ALTER TABLE transaction_participants ADD COLUMN invitation_accepted_at TIMESTAMP")
+        
+        # Update transaction_id to INTEGER if it's TEXT
+        if 'transaction_id' in columns:
+            cur.execute("SELECT typeof(transaction_id) FROM transaction_participants LIMIT 1")
+            result = cur.fetchone()
+            if result and result[0] == 'text':
+                # SQLite doesn't support changing column type directly, so we'll handle it in queries
+                pass
+        
+        # Ensure added_at exists
+        if 'added_at' not in columns:
+            cur.execute("ALTER TABLE transaction_participants ADD COLUMN added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+    except Exception as e:
+        print(f"Note: Could not migrate transaction_participants table: {e}")
+        pass
+
+    # ------------- LENDER LOANS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS lender_loans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lender_user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            borrower_name TEXT,
+            status TEXT,
+            loan_type TEXT,
+            target_payment TEXT,
+            stage TEXT,
+            close_date TEXT,
+            FOREIGN KEY (lender_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    # ------------- MESSAGE TEMPLATES -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS message_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_user_id INTEGER,
+            role TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            label TEXT,
+            category TEXT,
+            channel TEXT,
+            subject TEXT,
+            body TEXT,
+            FOREIGN KEY (owner_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    # ------------- MARKETING TEMPLATES -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS marketing_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_user_id INTEGER,
+            role TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            template_type TEXT,
+            name TEXT,
+            description TEXT,
+            content TEXT,
+            FOREIGN KEY (owner_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # ------------- CRM INTERACTION HISTORY -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_interactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contact_id INTEGER,
+            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
+            professional_user_id INTEGER,
+            interaction_type TEXT,
+            interaction_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            subject TEXT,
+            notes TEXT,
+            channel TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # ------------- AUTOMATED EMAIL LOGS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS automated_email_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contact_id INTEGER,
+            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
+            professional_user_id INTEGER,
+            email_type TEXT,
+            sent_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            recipient_email TEXT,
+            subject TEXT,
+            status TEXT DEFAULT 'sent',
+            error_message TEXT,
+            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # ------------- CRM TASKS / FOLLOW-UPS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contact_id INTEGER,
+            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
+            professional_user_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            due_date TEXT,
+            priority TEXT DEFAULT 'medium' CHECK(priority IN ('low', 'medium', 'high', 'urgent')),
+            status TEXT DEFAULT 'pending' CHECK(status IN ('pending', 'in_progress', 'completed', 'cancelled')),
+            reminder_date TEXT,
+            completed_at TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # ------------- CRM DEALS / TRANSACTIONS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_deals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contact_id INTEGER,
+            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
+            professional_user_id INTEGER,
+            deal_name TEXT NOT NULL,
+            deal_type TEXT CHECK(deal_type IN ('sale', 'purchase', 'refinance', 'listing', 'other')),
+            property_address TEXT,
+            deal_value REAL,
+            commission_rate REAL,
+            expected_commission REAL,
+            stage TEXT DEFAULT 'prospect' CHECK(stage IN ('prospect', 'qualified', 'offer', 'under_contract', 'closed', 'lost')),
+            probability INTEGER DEFAULT 0 CHECK(probability >= 0 AND probability <= 100),
+            expected_close_date TEXT,
+            actual_close_date TEXT,
+            notes TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # ------------- CRM CONTACT RELATIONSHIPS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_relationships (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contact_id_1 INTEGER NOT NULL,
+            contact_id_2 INTEGER NOT NULL,
+            contact_type TEXT CHECK(contact_type IN ('agent_contact', 'lender_borrower')),
+            professional_user_id INTEGER,
+            relationship_type TEXT CHECK(relationship_type IN ('spouse', 'referral_source', 'related_contact', 'business_partner', 'other')),
+            notes TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE,
+            UNIQUE(contact_id_1, contact_id_2, contact_type, professional_user_id)
+        )
+        """
+    )
+    
+    # ------------- CRM SAVED VIEWS / FILTERS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_saved_views (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            professional_user_id INTEGER,
+            role TEXT CHECK(role IN ('agent', 'lender')),
+            view_name TEXT NOT NULL,
+            filters_json TEXT,
+            is_default INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (professional_user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    # ------------- HOMEOWNER TIMELINE EVENTS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS homeowner_timeline_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            event_date TEXT,
+            title TEXT,
+            category TEXT,
+            cost TEXT,
+            notes TEXT,
+            files TEXT,     -- JSON list of uploaded file names
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+    # ------------- SIMPLE NOTES -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS simple_notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            content TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """
+    )
+    
+    # ------------- FEATURE SPOTLIGHT CARD SETS -------------
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS spotlight_card_sets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_user_id INTEGER NOT NULL,
+            transaction_id INTEGER,
+            set_name TEXT NOT NULL,
+            property_address TEXT,
+            features_json TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (agent_user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (transaction_id) REFERENCES agent_transactions(id) ON DELETE SET NULL
+        )
+        """
+    )
+
+
+def _m002_equity_columns(cur) -> None:
+    """Absorbs scripts/migrate_equity_columns.py and migrate_add_properties.py (column part)."""
+    _add_column(cur, "homeowner_snapshots", "loan_term_years", "REAL")
+    _add_column(cur, "homeowner_snapshots", "loan_start_date", "TEXT")
+    _add_column(cur, "homeowner_snapshots", "property_id",
+                "INTEGER REFERENCES properties(id) ON DELETE CASCADE")
+
+
+def _m003_rbac_tables(cur) -> None:
+    """Absorbs scripts/setup_rbac_tables.py, plus the users columns the admin pages read."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS roles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS permissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            resource TEXT NOT NULL,
+            action TEXT NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS role_permissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role_id INTEGER NOT NULL,
+            permission_id INTEGER NOT NULL,
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (role_id) REFERENCES roles(id),
+            FOREIGN KEY (permission_id) REFERENCES permissions(id),
+            UNIQUE(role_id, permission_id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_roles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            granted_by INTEGER,
+            granted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (role_id) REFERENCES roles(id),
+            FOREIGN KEY (granted_by) REFERENCES users(id),
+            UNIQUE(user_id, role_id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS audit_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            resource TEXT,
+            resource_id INTEGER,
+            details TEXT,
+            ip_address TEXT,
+            user_agent TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS impersonation_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER NOT NULL,
+            target_user_id INTEGER NOT NULL,
+            reason TEXT,
+            consent_given BOOLEAN DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ended_at TIMESTAMP,
+            ip_address TEXT,
+            FOREIGN KEY (admin_id) REFERENCES users(id),
+            FOREIGN KEY (target_user_id) REFERENCES users(id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS mfa_settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            method TEXT NOT NULL,
+            secret TEXT NOT NULL,
+            backup_codes TEXT,
+            enabled BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+    # Read by /admin and scripts/reset_and_create_admin.py
+    _add_column(cur, "users", "phone", "TEXT")
+    _add_column(cur, "users", "last_login", "TEXT")
+    _add_column(cur, "users", "email_verified", "INTEGER DEFAULT 0")
+
+
+def _m004_access_control(cur) -> None:
+    """Absorbs scripts/migrate_access_control.py."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            subscription_type TEXT NOT NULL,  -- 'agent', 'lender', 'premium'
+            status TEXT NOT NULL DEFAULT 'active',  -- 'active', 'inactive', 'trial', 'cancelled'
+            start_date TEXT NOT NULL,
+            end_date TEXT,
+            trial_ends_at TEXT,
+            stripe_subscription_id TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS invitations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id TEXT,  -- NULL for general client invites
+            invited_by INTEGER NOT NULL,
+            invited_email TEXT NOT NULL,
+            invited_role TEXT NOT NULL,
+            custom_role_name TEXT,
+            invite_code TEXT UNIQUE NOT NULL,
+            permissions TEXT DEFAULT 'view',
+            message TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',  -- 'pending', 'accepted', 'declined', 'expired'
+            expires_at TEXT,
+            accepted_at TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (invited_by) REFERENCES users(id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS guest_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            referral_code TEXT,
+            data TEXT,
+            email TEXT,
+            last_activity TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # SQLite can't ADD COLUMN ... UNIQUE; the script's version of this always failed
+    _add_column(cur, "users", "referral_code", "TEXT")
+    _add_column(cur, "users", "has_active_subscription", "INTEGER DEFAULT 0")
+
+    # client_relationships exists in two shapes in the wild (homeowner_id/professional_role
+    # from init_db, client_id/professional_type from the old script) - index what's there
+    rel_cols = _columns(cur, "client_relationships")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_client_relationships_professional ON client_relationships(professional_id)")
+    if "client_id" in rel_cols:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_client_relationships_client ON client_relationships(client_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_client_relationships_code ON client_relationships(referral_code)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_invitations_code ON invitations(invite_code)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_invitations_email ON invitations(invited_email)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions(user_id)")
+
+
+TRANSACTION_CHECKLIST = [
+    # PRE-CONTRACT STAGE
+    ('pre_contract', 'pre_approval_letter', 'Pre-Approval Letter', 'Buyer financing pre-approval', 0, None, 1),
+    ('pre_contract', 'proof_of_funds', 'Proof of Funds', 'Bank statements or liquid assets', 0, None, 2),
+    ('pre_contract', 'buyer_agency_agreement', 'Buyer Agency Agreement', 'Signed representation agreement', 0, None, 3),
+
+    # UNDER CONTRACT STAGE
+    ('under_contract', 'purchase_agreement', 'Purchase Agreement', 'Fully executed purchase contract', 1, 'under_contract', 1),
+    ('under_contract', 'earnest_money_receipt', 'Earnest Money Receipt', 'Proof of deposit', 1, None, 2),
+    ('under_contract', 'seller_disclosures', 'Seller Disclosures', 'Property condition disclosures', 1, None, 3),
+    ('under_contract', 'hoa_documents', 'HOA Documents', 'CC&Rs, budget, meeting minutes', 0, None, 4),
+
+    # IN ESCROW STAGE
+    ('in_escrow', 'inspection_report', 'Home Inspection Report', 'Professional inspection findings', 1, None, 1),
+    ('in_escrow', 'inspection_response', 'Inspection Response', 'Repair requests or acceptance', 1, None, 2),
+    ('in_escrow', 'appraisal_report', 'Appraisal Report', 'Property valuation', 1, 'clear_to_close', 3),
+    ('in_escrow', 'title_report', 'Title Report', 'Preliminary title report', 1, None, 4),
+    ('in_escrow', 'loan_application', 'Loan Application', 'Submitted to lender', 1, None, 5),
+    ('in_escrow', 'homeowners_insurance', 'Homeowners Insurance', 'Policy binder', 1, None, 6),
+
+    # CLEAR TO CLOSE STAGE
+    ('clear_to_close', 'final_walkthrough', 'Final Walkthrough', 'Property condition verification', 1, None, 1),
+    ('clear_to_close', 'clear_to_close_letter', 'Clear to Close Letter', 'Lender approval', 1, None, 2),
+    ('clear_to_close', 'closing_disclosure', 'Closing Disclosure', 'Final loan terms', 1, None, 3),
+    ('clear_to_close', 'wire_instructions', 'Wire Instructions', 'Funds transfer details', 1, None, 4),
+    ('clear_to_close', 'utilities_transfer', 'Utilities Transfer', 'Service change documentation', 0, None, 5),
+
+    # CLOSED STAGE
+    ('closed', 'recorded_deed', 'Recorded Deed', 'County-recorded ownership', 1, None, 1),
+    ('closed', 'settlement_statement', 'Settlement Statement', 'Final HUD-1 or closing statement', 1, None, 2),
+    ('closed', 'keys', 'Keys Delivered', 'Property access transferred', 1, None, 3),
+]
+
+
+def _m005_transaction_system(cur) -> None:
+    """Absorbs scripts/migrate_transaction_system.py and add_added_at_column.py."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            agent_id INTEGER NOT NULL,
+            property_address TEXT NOT NULL,
+            client_name TEXT NOT NULL,
+            client_email TEXT,
+            client_phone TEXT,
+            side TEXT NOT NULL CHECK(side IN ('buyer', 'seller', 'both')),
+            current_stage TEXT NOT NULL DEFAULT 'pre_contract'
+                CHECK(current_stage IN ('pre_contract', 'under_contract', 'in_escrow', 'clear_to_close', 'closed', 'cancelled')),
+            purchase_price REAL,
+            target_close_date DATE,
+            actual_close_date DATE,
+            status TEXT NOT NULL DEFAULT 'active' CHECK(status IN ('active', 'closed', 'cancelled')),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (agent_id) REFERENCES users(id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL,
+            document_type TEXT NOT NULL,
+            document_name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            file_size INTEGER,
+            uploaded_by INTEGER NOT NULL,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            triggers_stage_change TEXT,
+            notes TEXT,
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE CASCADE,
+            FOREIGN KEY (uploaded_by) REFERENCES users(id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_participants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL,
+            participant_type TEXT NOT NULL
+                CHECK(participant_type IN ('client', 'lender', 'title_company', 'inspector', 'appraiser', 'attorney', 'other')),
+            user_id INTEGER,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            company TEXT,
+            permissions TEXT NOT NULL DEFAULT 'view_only'
+                CHECK(permissions IN ('view_only', 'upload_docs', 'full_access')),
+            invitation_token TEXT UNIQUE,
+            invitation_sent_at TIMESTAMP,
+            invitation_accepted_at TIMESTAMP,
+            status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'active', 'removed')),
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    # Older databases got transaction_participants from migrate_access_control.py
+    _add_column(cur, "transaction_participants", "added_at", "TIMESTAMP")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_timeline (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL,
+            event_type TEXT NOT NULL
+                CHECK(event_type IN ('created', 'stage_changed', 'document_uploaded', 'participant_added', 'note_added', 'date_changed', 'closed', 'cancelled')),
+            description TEXT NOT NULL,
+            created_by INTEGER,
+            metadata TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE CASCADE,
+            FOREIGN KEY (created_by) REFERENCES users(id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS document_checklists (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stage TEXT NOT NULL,
+            document_type TEXT NOT NULL,
+            document_name TEXT NOT NULL,
+            description TEXT,
+            required BOOLEAN NOT NULL DEFAULT 0,
+            triggers_stage_change TEXT,
+            display_order INTEGER DEFAULT 0
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS transaction_stage_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL,
+            from_stage TEXT,
+            to_stage TEXT NOT NULL,
+            changed_by INTEGER,
+            auto_changed BOOLEAN DEFAULT 0,
+            trigger_document_id INTEGER,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE CASCADE,
+            FOREIGN KEY (changed_by) REFERENCES users(id),
+            FOREIGN KEY (trigger_document_id) REFERENCES transaction_documents(id)
+        )
+    """)
+
+    # Seed the checklist only once - the old script duplicated it on every run
+    cur.execute("SELECT COUNT(*) FROM document_checklists")
+    if cur.fetchone()[0] == 0:
+        cur.executemany("""
+            INSERT INTO document_checklists
+            (stage, document_type, document_name, description, required, triggers_stage_change, display_order)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, TRANSACTION_CHECKLIST)
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_agent ON transactions(agent_id, status)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transaction_documents_tx ON transaction_documents(transaction_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transaction_participants_transaction ON transaction_participants(transaction_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transaction_timeline_tx ON transaction_timeline(transaction_id, created_at)")
+
+
+# Secondary indexes for the hot query paths: (name, table, columns). An entry
+# whose table or columns don't exist in this database is skipped, which covers
+# the two client_relationships shapes. index_advisor.py checks these too.
+MANAGED_INDEXES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    # Agent / lender CRM lists (filter by owner, optional stage/status, newest first)
+    ("idx_agent_contacts_owner_created", "agent_contacts", ("agent_user_id", "created_at")),
+    ("idx_agent_contacts_owner_stage_created", "agent_contacts", ("agent_user_id", "stage", "created_at")),
+    ("idx_lender_borrowers_owner_created", "lender_borrowers", ("lender_user_id", "created_at")),
+    ("idx_lender_borrowers_owner_status", "lender_borrowers", ("lender_user_id", "status", "created_at")),
+
+    # CRM activity per contact
+    ("idx_crm_interactions_contact", "crm_interactions",
+     ("contact_id", "contact_type", "professional_user_id", "interaction_date")),
+    ("idx_crm_tasks_owner_due", "crm_tasks", ("professional_user_id", "due_date")),
+    ("idx_crm_tasks_contact", "crm_tasks", ("contact_id", "contact_type", "professional_user_id")),
+    ("idx_crm_deals_owner_close", "crm_deals", ("professional_user_id", "expected_close_date")),
+    ("idx_crm_deals_contact", "crm_deals", ("contact_id", "contact_type", "professional_user_id")),
+    ("idx_crm_relationships_contact2", "crm_relationships", ("contact_id_2",)),
+    ("idx_crm_saved_views_owner", "crm_saved_views", ("professional_user_id", "role")),
+    ("idx_automated_email_logs_contact", "automated_email_logs",
+     ("contact_type", "contact_id", "email_type", "sent_at")),
+
+    # Homeowner pages
+    ("idx_homeowner_notes_user_created", "homeowner_notes", ("user_id", "created_at")),
+    ("idx_homeowner_notes_user_board", "homeowner_notes", ("user_id", "project_name", "created_at")),
+    ("idx_homeowner_documents_user", "homeowner_documents", ("user_id",)),
+    ("idx_homeowner_timeline_user", "homeowner_timeline_events", ("user_id", "event_date")),
+    ("idx_homeowner_projects_user", "homeowner_projects", ("user_id",)),
+    ("idx_simple_notes_user", "simple_notes", ("user_id",)),
+    ("idx_properties_user", "properties", ("user_id", "is_primary")),
+
+    # Relationships / ownership lookups
+    ("idx_client_relationships_homeowner_status", "client_relationships", ("homeowner_id", "status")),
+    ("idx_client_relationships_client_status", "client_relationships", ("client_id", "status")),
+    ("idx_client_relationships_professional_status", "client_relationships", ("professional_id", "status")),
+    ("idx_users_agent", "users", ("agent_id",)),
+    ("idx_users_lender", "users", ("lender_id",)),
+    ("idx_referral_links_agent", "referral_links", ("agent_id",)),
+    ("idx_referral_links_lender", "referral_links", ("lender_id",)),
+    ("idx_agent_transactions_owner", "agent_transactions", ("agent_user_id",)),
+    ("idx_lender_loans_owner", "lender_loans", ("lender_user_id",)),
+    ("idx_spotlight_card_sets_owner", "spotlight_card_sets", ("agent_user_id", "transaction_id")),
+    ("idx_video_projects_user", "video_projects", ("user_id", "created_at")),
+
+    # Admin / audit
+    ("idx_audit_logs_created", "audit_logs", ("created_at",)),
+    ("idx_audit_logs_user_created", "audit_logs", ("user_id", "created_at")),
+]
+
+
+# Expression indexes backing crm_query's keyset pagination. The 4th element is the
+# list of index terms; they must match crm_query._sort_spec character for
+# character or the planner won't use them. The 3rd element is only the set of
+# columns that must exist.
+_AGENT_STAGE_RANK = (
+    "(CASE stage WHEN 'new' THEN 0 WHEN 'nurture' THEN 1 WHEN 'active' THEN 2 "
+    "WHEN 'past' THEN 3 WHEN 'sphere' THEN 4 ELSE 5 END)"
+)
+_LENDER_STATUS_RANK = (
+    "(CASE status WHEN 'prospect' THEN 0 WHEN 'preapproval' THEN 1 "
+    "WHEN 'in_process' THEN 2 WHEN 'closed' THEN 3 ELSE 4 END)"
+)
+CRM_SORT_INDEXES: List[Tuple[str, str, Tuple[str, ...], Tuple[str, ...]]] = [
+    ("idx_agent_contacts_sort_name", "agent_contacts", ("agent_user_id", "name"),
+     ("agent_user_id", "COALESCE(name, '') COLLATE NOCASE")),
+    ("idx_agent_contacts_stage_sort_name", "agent_contacts", ("agent_user_id", "stage", "name"),
+     ("agent_user_id", "stage", "COALESCE(name, '') COLLATE NOCASE")),
+    ("idx_agent_contacts_sort_created", "agent_contacts", ("agent_user_id", "created_at"),
+     ("agent_user_id", "COALESCE(created_at, '')")),
+    ("idx_agent_contacts_sort_touch", "agent_contacts", ("agent_user_id", "last_touch"),
+     ("agent_user_id", "COALESCE(last_touch, '')")),
+    ("idx_agent_contacts_sort_stage", "agent_contacts", ("agent_user_id", "stage"),
+     ("agent_user_id", _AGENT_STAGE_RANK)),
+    ("idx_lender_borrowers_sort_name", "lender_borrowers", ("lender_user_id", "name"),
+     ("lender_user_id", "COALESCE(name, '') COLLATE NOCASE")),
+    ("idx_lender_borrowers_sort_created", "lender_borrowers", ("lender_user_id", "created_at"),
+     ("lender_user_id", "COALESCE(created_at, '')")),
+    ("idx_lender_borrowers_status_sort_created", "lender_borrowers", ("lender_user_id", "status", "created_at"),
+     ("lender_user_id", "status", "COALESCE(created_at, '')")),
+    ("idx_lender_borrowers_sort_touch", "lender_borrowers", ("lender_user_id", "last_touch"),
+     ("lender_user_id", "COALESCE(last_touch, '')")),
+    ("idx_lender_borrowers_sort_status", "lender_borrowers", ("lender_user_id", "status"),
+     ("lender_user_id", _LENDER_STATUS_RANK)),
+]
+
+
+def ensure_indexes(cur, specs) -> List[str]:
+    """
+    CREATE INDEX IF NOT EXISTS for each spec whose table/columns exist. Returns names created or kept.
+
+    A spec is (name, table, columns) or (name, table, columns, terms) for
+    expression indexes, where columns are only checked for existence.
+    """
+    created = []
+    for spec in specs:
+        name, table, cols = spec[:3]
+        terms = spec[3] if len(spec) > 3 else cols
+        existing = _columns(cur, table)
+        if not existing or not set(cols) <= existing:
+            continue
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(terms)})")
+        created.append(name)
+    return created
+
+
+def _m006_hot_path_indexes(cur) -> None:
+    """Managed secondary indexes for CRM, homeowner and audit queries."""
+    ensure_indexes(cur, MANAGED_INDEXES)
+    # Give the planner fresh statistics for the new indexes
+    cur.execute("ANALYZE")
+
+
+def _m007_crm_sort_indexes(cur) -> None:
+    """Expression indexes so every CRM sort order pages by index range."""
+    ensure_indexes(cur, CRM_SORT_INDEXES)
+    cur.execute("ANALYZE")
+
+
+# Full-text indexes: (fts table, content table, indexed columns). These are
+# external-content FTS5 tables - the text lives only in the content table and
+# triggers keep the index in step. search_index.py queries them.
+FTS_TABLES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("fts_agent_contacts", "agent_contacts",
+     ("name", "email", "phone", "property_address", "notes", "tags")),
+    ("fts_lender_borrowers", "lender_borrowers",
+     ("name", "email", "phone", "property_address", "notes", "tags", "loan_type")),
+    ("fts_crm_interactions", "crm_interactions", ("subject", "notes")),
+    ("fts_homeowner_notes", "homeowner_notes",
+     ("project_name", "title", "details", "vision_statement", "tags")),
+]
+
+
+def fts5_available(cur) -> bool:
+    try:
+        cur.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+        cur.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def create_fts_index(cur, fts: str, table: str, cols: Tuple[str, ...]) -> bool:
+    """External-content FTS5 table plus insert/update/delete triggers, then a rebuild"""
+    existing = _columns(cur, table)
+    if not existing or not set(cols) <= existing:
+        return False
+    col_list = ", ".join(cols)
+    new_vals = ", ".join(f"new.{c}" for c in cols)
+    old_vals = ", ".join(f"old.{c}" for c in cols)
+    cur.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {col_list},
+            content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+        END
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+        END
+        """
+    )
+    # Only fire when an indexed column changes; stage/flag updates stay cheap
+    cur.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_au AFTER UPDATE OF {col_list} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals});
+        END
+        """
+    )
+    cur.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    return True
+
+
+def _m008_full_text_search(cur) -> None:
+    """FTS5 indexes over CRM contacts, interaction notes and design-board notes."""
+    if not fts5_available(cur):
+        print("[DB MIGRATION] SQLite build has no FTS5; search falls back to LIKE")
+        return
+    for fts, table, cols in FTS_TABLES:
+        create_fts_index(cur, fts, table, cols)
+
+
+def _m009_crm_import_staging(cur) -> None:
+    """Server-side staging for CRM spreadsheet imports (replaces the session cookie)."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_import_batches (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            filename TEXT,
+            columns_json TEXT NOT NULL,
+            total_rows INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'staged',
+            imported INTEGER DEFAULT 0,
+            skipped INTEGER DEFAULT 0,
+            error_count INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            completed_at TEXT
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_import_rows (
+            import_id TEXT NOT NULL,
+            row_num INTEGER NOT NULL,
+            values_json TEXT NOT NULL,
+            PRIMARY KEY (import_id, row_num)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_crm_import_batches_user ON crm_import_batches(user_id, created_at)"
+    )
+
+
+def _m010_crm_import_jobs(cur) -> None:
+    """Turn import batches into resumable background jobs with a per-row report."""
+    for col, ddl in (
+        ("options_json", "TEXT"),
+        ("processed_rows", "INTEGER DEFAULT 0"),
+        ("worker_id", "TEXT"),
+        ("heartbeat_at", "TEXT"),
+        ("started_at", "TEXT"),
+        ("attempts", "INTEGER DEFAULT 0"),
+        ("error_message", "TEXT"),
+    ):
+        _add_column(cur, "crm_import_batches", col, ddl)
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS crm_import_errors (
+            import_id TEXT NOT NULL,
+            row_num INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            message TEXT NOT NULL,
+            PRIMARY KEY (import_id, row_num)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_crm_import_batches_status ON crm_import_batches(status, heartbeat_at)"
+    )
+
+
+def _m011_email_outbox(cur) -> None:
+    """Persistent outbox drained by the pooled SMTP sender (email_outbox.py)."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_email TEXT NOT NULL,
+            subject TEXT,
+            body TEXT,
+            email_type TEXT,
+            contact_id INTEGER,
+            contact_type TEXT,
+            professional_user_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT,
+            claimed_by TEXT,
+            claimed_at TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            sent_at TEXT
+        )
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at, id)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_claim ON email_outbox(claimed_by) WHERE claimed_by IS NOT NULL"
+    )
+
+
+# Month/day lookups for the daily birthday / anniversary automation
+OCCASION_INDEXES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("idx_agent_contacts_birthday_md", "agent_contacts", ("birthday_month", "birthday_day")),
+    ("idx_agent_contacts_anniversary_md", "agent_contacts", ("anniversary_month", "anniversary_day")),
+    ("idx_lender_borrowers_birthday_md", "lender_borrowers", ("birthday_month", "birthday_day")),
+    ("idx_lender_borrowers_anniversary_md", "lender_borrowers", ("anniversary_month", "anniversary_day")),
+]
+
+
+def _m012_occasion_month_day(cur) -> None:
+    """Indexed month/day columns parsed from the free-text birthday / home_anniversary."""
+    for table in ("agent_contacts", "lender_borrowers"):
+        if not _columns(cur, table):
+            continue
+        for col in ("birthday_month", "birthday_day", "anniversary_month", "anniversary_day"):
+            _add_column(cur, table, col, "INTEGER")
+        rows = cur.execute(
+            f"""
+            SELECT id, birthday, home_anniversary FROM {table}
+            WHERE COALESCE(birthday, '') != '' OR COALESCE(home_anniversary, '') != ''
+            """
+        ).fetchall()
+        updates = []
+        for row_id, birthday, anniversary in rows:
+            updates.append((*parse_month_day(birthday), *parse_month_day(anniversary), row_id))
+        cur.executemany(
+            f"""
+            UPDATE {table}
+            SET birthday_month = ?, birthday_day = ?, anniversary_month = ?, anniversary_day = ?
+            WHERE id = ?
+            """,
+            updates,
+        )
+        print(f"[DB MIGRATION] Backfilled occasion dates for {len(updates)} {table} rows")
+    ensure_indexes(cur, OCCASION_INDEXES)
+
+
+def _m013_scheduler(cur) -> None:
+    """Leader lease and run history for the single-leader job scheduler."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            acquired_at TEXT,
+            renewed_at TEXT,
+            expires_at TEXT NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_name TEXT NOT NULL,
+            trigger TEXT NOT NULL,
+            scheduled_for TEXT,
+            triggered_by INTEGER,
+            holder TEXT,
+            status TEXT NOT NULL,
+            started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            finished_at TEXT,
+            duration_ms REAL,
+            rows_processed INTEGER,
+            error TEXT
+        )
+        """
+    )
+    # One run per scheduled firing; manual runs have no slot (NULLs never collide)
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_job_runs_slot ON job_runs(job_name, scheduled_for)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_job_runs_started ON job_runs(started_at)"
+    )
+
+
+def _m014_appreciation_rates(cur) -> None:
+    """Per-property / ZIP / state annual appreciation overrides for home_valuation."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS appreciation_rates (
+            scope TEXT NOT NULL CHECK (scope IN ('property', 'zip', 'state')),
+            key TEXT NOT NULL,
+            annual_rate REAL NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (scope, key)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _m015_email_outbox_html(cur) -> None:
+    """HTML alternative part for outbox messages rendered by campaign_renderer."""
+    _add_column(cur, "email_outbox", "body_html", "TEXT")
+
+
+def _m016_email_send_ledger(cur) -> None:
+    """One row per automated email queued for a contact and period (dedup for re-runs)."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS email_send_ledger (
+            email_type TEXT NOT NULL,
+            period TEXT NOT NULL,
+            contact_type TEXT NOT NULL,
+            contact_id INTEGER NOT NULL,
+            professional_user_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (email_type, period, contact_type, contact_id)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+# Per-contact activity rollups (contact_rollups), kept current by triggers.
+# (contact_type, contact table, owner column, stage column)
+ROLLUP_BOOKS: List[Tuple[str, str, str, str]] = [
+    ("agent_contact", "agent_contacts", "agent_user_id", "stage"),
+    ("lender_borrower", "lender_borrowers", "lender_user_id", "status"),
+]
+
+# column -> (activity table, aggregate, extra filter); only activity logged by
+# the contact's owner counts, as in the old follow-up subqueries
+ROLLUP_AGGREGATES = {
+    "last_interaction_at": ("crm_interactions", "MAX(interaction_date)", ""),
+    "interaction_count": ("crm_interactions", "COUNT(*)", ""),
+    "open_task_count": ("crm_tasks", "COUNT(*)", f"AND status = '{OPEN_TASK_STATUS}'"),
+    "deal_count": ("crm_deals", "COUNT(*)", ""),
+    "pipeline_value": ("crm_deals", "COALESCE(SUM(deal_value), 0)", ""),
+}
+
+
+def _rollup_recompute(type_expr: str, id_expr: str, source: Optional[str] = None) -> str:
+    """UPDATE recomputing one contact's aggregates (all, or those fed by source) from the per-contact indexes"""
+    sets = []
+    for column, (table, aggregate, extra) in ROLLUP_AGGREGATES.items():
+        if source is not None and table != source:
+            continue
+        sets.append(
+            f"""{column} = (SELECT {aggregate} FROM {table} s
+                    WHERE s.contact_id = contact_rollups.contact_id
+                      AND s.contact_type = contact_rollups.contact_type
+                      AND s.professional_user_id = contact_rollups.professional_user_id {extra})"""
+        )
+    return f"""
+            UPDATE contact_rollups SET {', '.join(sets)}
+            WHERE contact_type = {type_expr} AND contact_id = {id_expr};"""
+
+
+def _rollup_followup(type_expr: str, id_expr: str) -> str:
+    return f"""
+            UPDATE contact_rollups SET followup_key = COALESCE(last_interaction_at, last_touch, '')
+            WHERE contact_type = {type_expr} AND contact_id = {id_expr};"""
+
+
+def create_rollup_triggers(cur) -> None:
+    """(Re)create the triggers that maintain contact_rollups"""
+    # contact_rollups.stage arrived in step 18; step 17 builds triggers without it
+    has_stage = "stage" in _columns(cur, "contact_rollups")
+    triggers = {}
+    key = "contact_type = new.contact_type AND contact_id = new.contact_id AND professional_user_id = new.professional_user_id"
+
+    # Inserts apply a delta; deletes and key/value updates recompute the affected
+    # contact(s) from the indexes so counts and sums never drift
+    triggers["trg_rollup_interactions_ai"] = f"""
+        AFTER INSERT ON crm_interactions BEGIN
+            UPDATE contact_rollups SET
+                interaction_count = interaction_count + 1,
+                last_interaction_at = CASE
+                    WHEN last_interaction_at IS NULL OR new.interaction_date > last_interaction_at
+                    THEN new.interaction_date ELSE last_interaction_at END
+            WHERE {key};{_rollup_followup('new.contact_type', 'new.contact_id')}
+        END"""
+    triggers["trg_rollup_interactions_ad"] = f"""
+        AFTER DELETE ON crm_interactions BEGIN{_rollup_recompute('old.contact_type', 'old.contact_id', 'crm_interactions')}{_rollup_followup('old.contact_type', 'old.contact_id')}
+        END"""
+    triggers["trg_rollup_interactions_au"] = f"""
+        AFTER UPDATE OF contact_id, contact_type, professional_user_id, interaction_date ON crm_interactions BEGIN{_rollup_recompute('old.contact_type', 'old.contact_id', 'crm_interactions')}{_rollup_followup('old.contact_type', 'old.contact_id')}{_rollup_recompute('new.contact_type', 'new.contact_id', 'crm_interactions')}{_rollup_followup('new.contact_type', 'new.contact_id')}
+        END"""
+
+    triggers["trg_rollup_tasks_ai"] = f"""
+        AFTER INSERT ON crm_tasks WHEN new.status = '{OPEN_TASK_STATUS}' BEGIN
+            UPDATE contact_rollups SET open_task_count = open_task_count + 1 WHERE {key};
+        END"""
+    triggers["trg_rollup_tasks_ad"] = f"""
+        AFTER DELETE ON crm_tasks BEGIN{_rollup_recompute('old.contact_type', 'old.contact_id', 'crm_tasks')}
+        END"""
+    triggers["trg_rollup_tasks_au"] = f"""
+        AFTER UPDATE OF contact_id, contact_type, professional_user_id, status ON crm_tasks BEGIN{_rollup_recompute('old.contact_type', 'old.contact_id', 'crm_tasks')}{_rollup_recompute('new.contact_type', 'new.contact_id', 'crm_tasks')}
+        END"""
+
+    triggers["trg_rollup_deals_ai"] = f"""
+        AFTER INSERT ON crm_deals BEGIN
+            UPDATE contact_rollups SET
+                deal_count = deal_count + 1,
+                pipeline_value = pipeline_value + COALESCE(new.deal_value, 0)
+            WHERE {key};
+        END"""
+    triggers["trg_rollup_deals_ad"] = f"""
+        AFTER DELETE ON crm_deals BEGIN{_rollup_recompute('old.contact_type', 'old.contact_id', 'crm_deals')}
+        END"""
+    triggers["trg_rollup_deals_au"] = f"""
+        AFTER UPDATE OF contact_id, contact_type, professional_user_id, deal_value ON crm_deals BEGIN{_rollup_recompute('old.contact_type', 'old.contact_id', 'crm_deals')}{_rollup_recompute('new.contact_type', 'new.contact_id', 'crm_deals')}
+        END"""
+
+    for contact_type, table, owner, stage in ROLLUP_BOOKS:
+        short = table.split("_")[0]
+        stage_col = ", stage" if has_stage else ""
+        stage_val = f", new.{stage}" if has_stage else ""
+        stage_of = f", {stage}" if has_stage else ""
+        stage_set = f", stage = new.{stage}" if has_stage else ""
+        triggers[f"trg_rollup_{short}_ai"] = f"""
+        AFTER INSERT ON {table} BEGIN
+            INSERT OR REPLACE INTO contact_rollups
+                (contact_type, contact_id, professional_user_id, contact_created_at, last_touch{stage_col})
+            VALUES ('{contact_type}', new.id, new.{owner}, new.created_at, new.last_touch{stage_val});{_rollup_recompute(f"'{contact_type}'", 'new.id')}{_rollup_followup(f"'{contact_type}'", 'new.id')}
+        END"""
+        triggers[f"trg_rollup_{short}_au"] = f"""
+        AFTER UPDATE OF {owner}, last_touch, created_at{stage_of} ON {table} BEGIN
+            UPDATE contact_rollups SET
+                professional_user_id = new.{owner}, contact_created_at = new.created_at, last_touch = new.last_touch{stage_set}
+            WHERE contact_type = '{contact_type}' AND contact_id = new.id;{_rollup_recompute(f"'{contact_type}'", 'new.id')}{_rollup_followup(f"'{contact_type}'", 'new.id')}
+        END"""
+        triggers[f"trg_rollup_{short}_ad"] = f"""
+        AFTER DELETE ON {table} BEGIN
+            DELETE FROM contact_rollups WHERE contact_type = '{contact_type}' AND contact_id = old.id;
+        END"""
+
+    for name, body in triggers.items():
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cur.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def rebuild_contact_rollups(cur) -> int:
+    """Recompute every rollup row set-based (one grouped scan per activity table); returns the row count"""
+    has_stage = "stage" in _columns(cur, "contact_rollups")
+    cur.execute("DELETE FROM contact_rollups")
+    total = 0
+    for contact_type, table, owner, stage in ROLLUP_BOOKS:
+        cur.execute(
+            f"""
+            INSERT INTO contact_rollups (
+                contact_type, contact_id, professional_user_id, contact_created_at, last_touch,
+                last_interaction_at, interaction_count, open_task_count, deal_count, pipeline_value,
+                followup_key{", stage" if has_stage else ""}
+            )
+            SELECT '{contact_type}', c.id, c.{owner}, c.created_at, c.last_touch,
+                   i.last_at, COALESCE(i.n, 0), COALESCE(t.n, 0), COALESCE(d.n, 0), COALESCE(d.value, 0),
+                   COALESCE(i.last_at, c.last_touch, ''){f", c.{stage}" if has_stage else ""}
+            FROM {table} c
+            LEFT JOIN (
+                SELECT contact_id, professional_user_id, MAX(interaction_date) AS last_at, COUNT(*) AS n
+                FROM crm_interactions WHERE contact_type = '{contact_type}'
+                GROUP BY contact_id, professional_user_id
+            ) i ON i.contact_id = c.id AND i.professional_user_id = c.{owner}
+            LEFT JOIN (
+                SELECT contact_id, professional_user_id, COUNT(*) AS n
+                FROM crm_tasks WHERE contact_type = '{contact_type}' AND status = '{OPEN_TASK_STATUS}'
+                GROUP BY contact_id, professional_user_id
+            ) t ON t.contact_id = c.id AND t.professional_user_id = c.{owner}
+            LEFT JOIN (
+                SELECT contact_id, professional_user_id, COUNT(*) AS n, SUM(deal_value) AS value
+                FROM crm_deals WHERE contact_type = '{contact_type}'
+                GROUP BY contact_id, professional_user_id
+            ) d ON d.contact_id = c.id AND d.professional_user_id = c.{owner}
+            """
+        )
+        total += cur.rowcount
+    return total
+
+
+def _m017_contact_rollups(cur) -> None:
+    """Trigger-maintained per-contact activity rollups for follow-up and CRM counts."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS contact_rollups (
+            contact_type TEXT NOT NULL,
+            contact_id INTEGER NOT NULL,
+            professional_user_id INTEGER,
+            contact_created_at TEXT,
+            last_touch TEXT,
+            last_interaction_at TEXT,
+            interaction_count INTEGER NOT NULL DEFAULT 0,
+            open_task_count INTEGER NOT NULL DEFAULT 0,
+            deal_count INTEGER NOT NULL DEFAULT 0,
+            pipeline_value REAL NOT NULL DEFAULT 0,
+            -- COALESCE(last_interaction_at, last_touch, ''): '' (never contacted) sorts first
+            followup_key TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (contact_type, contact_id)
+        ) WITHOUT ROWID
+        """
+    )
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_contact_rollups_followup
+        ON contact_rollups(professional_user_id, contact_type, followup_key)
+        """
+    )
+    create_rollup_triggers(cur)
+    rows = rebuild_contact_rollups(cur)
+    print(f"[DB MIGRATION] Built contact rollups for {rows} contacts")
+
+
+def _m018_followup_queue(cur) -> None:
+    """Pipeline stage on contact_rollups for the per-professional follow-up queue, plus the digest opt-out."""
+    _add_column(cur, "contact_rollups", "stage", "TEXT")
+    _add_column(cur, "users", "followup_digest", "INTEGER DEFAULT 1")
+    # Queue order within a stage filter: oldest effective last contact first
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_contact_rollups_stage_followup
+        ON contact_rollups(professional_user_id, contact_type, stage, followup_key)
+        """
+    )
+    create_rollup_triggers(cur)
+    rows = rebuild_contact_rollups(cur)
+    print(f"[DB MIGRATION] Rebuilt contact rollups with stage for {rows} contacts")
+
+
+def _m019_video_render_queue(cur) -> None:
+    """Render job state on video_projects for the background render workers (video_render_queue.py)."""
+    for col, ddl in (
+        ("render_options", "TEXT"),
+        ("render_progress", "REAL DEFAULT 0"),
+        ("render_message", "TEXT"),
+        ("render_error", "TEXT"),
+        ("render_worker_id", "TEXT"),
+        ("render_heartbeat_at", "TEXT"),
+        ("render_attempts", "INTEGER DEFAULT 0"),
+        ("render_queued_at", "TEXT"),
+        ("render_started_at", "TEXT"),
+        ("render_completed_at", "TEXT"),
+    ):
+        _add_column(cur, "video_projects", col, ddl)
+    cur.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_video_projects_render_queue
+        ON video_projects(render_status, render_queued_at)
+        """
+    )
+
+
+def _m020_video_segment_cache(cur) -> None:
+    """Hit/miss/eviction counters for the rendered-segment cache (video_segment_cache.py)."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS video_cache_stats (
+            kind TEXT PRIMARY KEY,
+            hits INTEGER NOT NULL DEFAULT 0,
+            misses INTEGER NOT NULL DEFAULT 0,
+            evictions INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def _m021_video_render_quality(cur) -> None:
+    """Draft vs final renders: which quality a project's queued job / current output is."""
+    _add_column(cur, "video_projects", "render_quality", "TEXT DEFAULT 'final'")
+
+
+# Expression indexes behind crm_dedup.find_existing_contact: owner plus a
+# normalized email / phone / name. The terms must match crm_dedup.LOOKUP_SQL
+# character for character.
+_DEDUP_PHONE = (
+    "REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(TRIM(phone), "
+    "' ', ''), '-', ''), '(', ''), ')', ''), '.', ''), '+', '')"
+)
+DEDUP_LOOKUP_INDEXES: List[Tuple[str, str, Tuple[str, ...], Tuple[str, ...]]] = [
+    ("idx_agent_contacts_dedup_email", "agent_contacts", ("agent_user_id", "email"),
+     ("agent_user_id", "LOWER(TRIM(email))")),
+    ("idx_agent_contacts_dedup_phone", "agent_contacts", ("agent_user_id", "phone"),
+     ("agent_user_id", _DEDUP_PHONE)),
+    ("idx_agent_contacts_dedup_name", "agent_contacts", ("agent_user_id", "name"),
+     ("agent_user_id", "LOWER(TRIM(name))")),
+    ("idx_lender_borrowers_dedup_email", "lender_borrowers", ("lender_user_id", "email"),
+     ("lender_user_id", "LOWER(TRIM(email))")),
+    ("idx_lender_borrowers_dedup_phone", "lender_borrowers", ("lender_user_id", "phone"),
+     ("lender_user_id", _DEDUP_PHONE)),
+    ("idx_lender_borrowers_dedup_name", "lender_borrowers", ("lender_user_id", "name"),
+     ("lender_user_id", "LOWER(TRIM(name))")),
+]
+
+
+def _m022_dedup_lookup_indexes(cur) -> None:
+    """Indexed single-contact duplicate lookups (crm_dedup.find_existing_contact)."""
+    ensure_indexes(cur, DEDUP_LOOKUP_INDEXES)
+    cur.execute("ANALYZE")
+
+
+# Step 22's SQL expressions didn't match the Python normalizers (ASCII-only
+# LOWER, a few phone separators, no whitespace collapsing), so lookups missed
+# real duplicates. The normalized keys are now stored, written by
+# database.dedup_key_columns on every insert/update, and indexed per owner.
+DEDUP_KEY_INDEXES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("idx_agent_contacts_email_key", "agent_contacts", ("agent_user_id", "email_key")),
+    ("idx_agent_contacts_phone_key", "agent_contacts", ("agent_user_id", "phone_key")),
+    ("idx_agent_contacts_name_key", "agent_contacts", ("agent_user_id", "name_key")),
+    ("idx_lender_borrowers_email_key", "lender_borrowers", ("lender_user_id", "email_key")),
+    ("idx_lender_borrowers_phone_key", "lender_borrowers", ("lender_user_id", "phone_key")),
+    ("idx_lender_borrowers_name_key", "lender_borrowers", ("lender_user_id", "name_key")),
+]
+
+
+def _m023_dedup_key_columns(cur) -> None:
+    """Stored email/phone/name keys for duplicate lookups, replacing step 22's expression indexes."""
+    for name, *_ in DEDUP_LOOKUP_INDEXES:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+    for table in ("agent_contacts", "lender_borrowers"):
+        if not _columns(cur, table):
+            continue
+        for key_col in DEDUP_KEY_COLUMNS.values():
+            _add_column(cur, table, key_col, "TEXT")
+        rows = cur.execute(f"SELECT id, email, phone, name FROM {table}").fetchall()
+        updates = []
+        for row_id, email, phone, name in rows:
+            keys = dedup_key_columns({"email": email, "phone": phone, "name": name})
+            updates.append((keys["email_key"], keys["phone_key"], keys["name_key"], row_id))
+        cur.executemany(
+            f"UPDATE {table} SET email_key = ?, phone_key = ?, name_key = ? WHERE id = ?",
+            updates,
+        )
+        print(f"[DB MIGRATION] Backfilled duplicate keys for {len(updates)} {table} rows")
+    ensure_indexes(cur, DEDUP_KEY_INDEXES)
+    cur.execute("ANALYZE")
+
+
+def _m024_open_task_definition(cur) -> None:
+    """open_task_count counts database.OPEN_TASK_STATUS tasks only, like the CRM task lists and stats."""
+    create_rollup_triggers(cur)
+    rows = rebuild_contact_rollups(cur)
+    print(f"[DB MIGRATION] Recounted open tasks for {rows} contacts")
+
+
+# Append new steps at the end with the next version number. Never renumber or
+# edit a step that has shipped - write a new one instead.
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "baseline_schema", _m001_baseline),
+    (2, "equity_columns", _m002_equity_columns),
+    (3, "rbac_tables", _m003_rbac_tables),
+    (4, "access_control", _m004_access_control),
+    (5, "transaction_system", _m005_transaction_system),
+    (6, "hot_path_indexes", _m006_hot_path_indexes),
+    (7, "crm_sort_indexes", _m007_crm_sort_indexes),
+    (8, "full_text_search", _m008_full_text_search),
+    (9, "crm_import_staging", _m009_crm_import_staging),
+    (10, "crm_import_jobs", _m010_crm_import_jobs),
+    (11, "email_outbox", _m011_email_outbox),
+    (12, "occasion_month_day", _m012_occasion_month_day),
+    (13, "scheduler", _m013_scheduler),
+    (14, "appreciation_rates", _m014_appreciation_rates),
+    (15, "email_outbox_html", _m015_email_outbox_html),
+    (16, "email_send_ledger", _m016_email_send_ledger),
+    (17, "contact_rollups", _m017_contact_rollups),
+    (18, "followup_queue", _m018_followup_queue),
+    (19, "video_render_queue", _m019_video_render_queue),
+    (20, "video_segment_cache", _m020_video_segment_cache),
+    (21, "video_render_quality", _m021_video_render_quality),
+    (22, "dedup_lookup_indexes", _m022_dedup_lookup_indexes),
+    (23, "dedup_key_columns", _m023_dedup_key_columns),
+    (24, "open_task_definition", _m024_open_task_definition),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# =========================
+# ENGINE
+# =========================
+
+
+def _ensure_version_table(conn) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            duration_ms REAL
+        )
+        """
+    )
+
+
+def _read_version(conn) -> int:
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def get_schema_version() -> int:
+    """Highest applied migration, 0 for a database that predates schema_version."""
+    conn = get_connection()
+    try:
+        return _read_version(conn)
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def migrate(target: Optional[int] = None, verbose: bool = True) -> int:
+    """
+    Apply pending steps up to target (default: latest). Returns the resulting version.
+    Each step commits together with its schema_version row, so a crash mid-way
+    leaves the database at the last completed step.
+    """
+    target = LATEST_VERSION if target is None else target
+    conn = get_connection()
+    try:
+        try:
+            if _read_version(conn) >= target:
+                return _read_version(conn)
+        except sqlite3.OperationalError:
+            pass  # no schema_version table yet
+
+        conn.isolation_level = None  # we issue BEGIN/COMMIT ourselves
+        _ensure_version_table(conn)
+        cur = conn.cursor()
+        while True:
+            # IMMEDIATE takes the write lock up front: a second worker booting at
+            # the same time waits here, then re-reads the version and moves on
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                current = _read_version(conn)
+                pending = [m for m in MIGRATIONS if current < m[0] <= target]
+                if not pending:
+                    cur.execute("COMMIT")
+                    schema.refresh(conn)
+                    return current
+                version, name, step = pending[0]
+                started = time.perf_counter()
+                step(cur)
+                duration_ms = (time.perf_counter() - started) * 1000
+                cur.execute(
+                    "INSERT INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)",
+                    (version, name, round(duration_ms, 2)),
+                )
+                cur.execute("COMMIT")
+                if verbose:
+                    print(f"[DB MIGRATION] Applied {version:03d}_{name} ({duration_ms:.0f} ms)")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+    finally:
+        conn.isolation_level = ""
+        conn.close()
+
+
+def migration_status() -> List[dict]:
+    """Every known step with its applied_at (None when pending)."""
+    conn = get_connection()
+    try:
+        try:
+            applied = {
+                row["version"]: row
+                for row in conn.execute("SELECT version, applied_at, duration_ms FROM schema_version")
+            }
+        except sqlite3.OperationalError:
+            applied = {}
+    finally:
+        conn.close()
+    return [
+        {
+            "version": version,
+            "name": name,
+            "applied_at": applied[version]["applied_at"] if version in applied else None,
+            "duration_ms": applied[version]["duration_ms"] if version in applied else None,
+        }
+        for version, name, _ in MIGRATIONS
+    ]
+
+
+def rebuild_rollups() -> int:
+    """Recreate the rollup triggers and recompute contact_rollups in one write transaction"""
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.cursor()
+        create_rollup_triggers(cur)
+        rows = rebuild_contact_rollups(cur)
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        for step in migration_status():
+            state = step["applied_at"] or "pending"
+            print(f"{step['version']:03d}_{step['name']:<24} {state}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "rebuild-rollups":
+        print(f"✅ Rebuilt contact rollups for {rebuild_rollups()} contacts")
+    else:
+        version = migrate()
+        print(f"✅ Schema is at version {version} (latest {LATEST_VERSION})")
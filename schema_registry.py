@@ -0,0 +1,120 @@
+"""
+Schema Registry
+Process-wide cache of table columns so query builders don't run PRAGMA table_info per call.
+
+Some tables exist in more than one shape depending on which old script created
+them (client_relationships has homeowner_id/professional_role or
+client_id/professional_type). Helpers ask the registry which name to use
+instead of introspecting on every request.
+
+The registry loads lazily on first use and is refreshed by migrations.migrate()
+and by any code path that alters a table at runtime. `version` increases every
+time a refresh sees a different schema.
+"""
+
+import threading
+from typing import Dict, FrozenSet, Optional
+
+
+class SchemaRegistry:
+    """Snapshot of {table: frozenset(columns)} plus SQLite's schema cookie"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Optional[Dict[str, FrozenSet[str]]] = None
+        self.version = 0
+        self.sqlite_schema_version = None
+
+    # ---------------- LOADING ----------------
+
+    def refresh(self, conn=None) -> int:
+        """Re-introspect every table. Returns the (possibly bumped) registry version."""
+        own_conn = conn is None
+        if own_conn:
+            from database import get_connection
+            conn = get_connection()
+        try:
+            cookie = conn.execute("PRAGMA schema_version").fetchone()[0]
+            names = [
+                row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                )
+            ]
+            tables = {}
+            for name in names:
+                cols = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+                tables[name] = frozenset(col[1] for col in cols)
+        finally:
+            if own_conn:
+                conn.close()
+
+        with self._lock:
+            if tables != self._tables:
+                self._tables = tables
+                self.version += 1
+            self.sqlite_schema_version = cookie
+            return self.version
+
+    def refresh_if_changed(self, conn=None) -> bool:
+        """Cheap check against SQLite's schema cookie; refresh only when it moved."""
+        own_conn = conn is None
+        if own_conn:
+            from database import get_connection
+            conn = get_connection()
+        try:
+            cookie = conn.execute("PRAGMA schema_version").fetchone()[0]
+            if self._tables is not None and cookie == self.sqlite_schema_version:
+                return False
+            self.refresh(conn)
+            return True
+        finally:
+            if own_conn:
+                conn.close()
+
+    def _snapshot(self) -> Dict[str, FrozenSet[str]]:
+        tables = self._tables
+        if tables is None:
+            self.refresh()
+            tables = self._tables
+        return tables
+
+    # ---------------- LOOKUPS ----------------
+
+    def tables(self) -> FrozenSet[str]:
+        return frozenset(self._snapshot())
+
+    def has_table(self, table: str) -> bool:
+        return table in self._snapshot()
+
+    def columns(self, table: str) -> FrozenSet[str]:
+        """Column names for table (empty if the table doesn't exist)"""
+        return self._snapshot().get(table, frozenset())
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in self.columns(table)
+
+    def resolve(self, table: str, *candidates: str) -> str:
+        """First candidate column that exists; falls back to the last candidate"""
+        cols = self.columns(table)
+        for name in candidates:
+            if name in cols:
+                return name
+        return candidates[-1]
+
+    # ---------------- NAMED RESOLUTIONS ----------------
+
+    def client_relationship_columns(self):
+        """(homeowner column, professional role column) for client_relationships"""
+        return (
+            self.resolve("client_relationships", "homeowner_id", "client_id"),
+            self.resolve("client_relationships", "professional_role", "professional_type"),
+        )
+
+
+schema = SchemaRegistry()
+
+
+__all__ = [
+    'SchemaRegistry',
+    'schema',
+]
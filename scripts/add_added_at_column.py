@@ -1,20 +1,21 @@
-import sqlite3
+"""
+Add added_at to transaction_participants
 
-DB_PATH = 'ylh.db'
+Superseded by migrations.py (step 005_transaction_system); kept so existing setup
+instructions keep working. Runs every pending migration.
+"""
 
-if __name__ == '__main__':
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            ALTER TABLE transaction_participants ADD COLUMN added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
-        """)
-        print("✅ 'added_at' column added to transaction_participants table.")
-    except sqlite3.OperationalError as e:
-        if 'duplicate column name' in str(e):
-            print("ℹ️  'added_at' column already exists.")
-        else:
-            print(f"❌ Error: {e}")
-    finally:
-        conn.commit()
-        conn.close()
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate as apply_migrations
+
+
+def migrate():
+    version = apply_migrations()
+    print(f"✅ Schema is at version {version}")
+
+
+if __name__ == "__main__":
+    migrate()
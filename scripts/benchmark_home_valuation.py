@@ -0,0 +1,105 @@
+"""
+Benchmark the daily home value job on a synthetic database.
+
+Seeds N homeowners with one property and snapshot each into a temporary
+database, then times home_valuation.run_valuation() against the old per-row
+path (upsert_homeowner_snapshot_for_property on a sample, extrapolated).
+
+    python scripts/benchmark_home_valuation.py --properties 100000
+"""
+import argparse
+import contextlib
+import io
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import database
+
+STATES = ["CA", "TX", "FL", "NY", "WA", "CO", "AZ", "GA"]
+
+
+def seed(n: int) -> None:
+    conn = database.get_connection()
+    try:
+        conn.executemany(
+            "INSERT INTO users (id, name, email, role) VALUES (?, ?, ?, 'homeowner')",
+            ((i, f"Owner {i}", f"owner{i}@example.com") for i in range(1, n + 1)),
+        )
+        conn.executemany(
+            "INSERT INTO properties (id, user_id, address, is_primary) VALUES (?, ?, ?, 1)",
+            (
+                (i, i, f"{i} Main St, Springfield, {STATES[i % len(STATES)]} {90000 + i % 5000:05d}")
+                for i in range(1, n + 1)
+            ),
+        )
+        rng = random.Random(42)
+        rows = []
+        for i in range(1, n + 1):
+            value = rng.uniform(150_000, 1_500_000)
+            balance = value * rng.uniform(0.2, 0.9) if i % 4 else None
+            rows.append((i, i, value, balance, 6.25, 2100.0))
+        conn.executemany(
+            """
+            INSERT INTO homeowner_snapshots (user_id, property_id, value_estimate, loan_balance, loan_rate, loan_payment)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def legacy_sample(sample: int) -> float:
+    """Seconds per property for the old get + upsert loop"""
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # the upsert's debug prints
+        for property_id in range(1, sample + 1):
+            snapshot = database.get_homeowner_snapshot_for_property(property_id, property_id)
+            database.upsert_homeowner_snapshot_for_property(
+                user_id=property_id,
+                property_id=property_id,
+                value_estimate=snapshot["value_estimate"] * 1.035 ** (1 / 365),
+            )
+    return (time.perf_counter() - started) / sample
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--properties", type=int, default=100_000)
+    parser.add_argument("--legacy-sample", type=int, default=1000,
+                        help="properties to time on the old per-row path (0 to skip)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ylh-bench-")
+    database.DB_PATH = Path(workdir) / "bench.db"
+    database.init_db()
+
+    print(f"Seeding {args.properties:,} properties into {database.DB_PATH} ...")
+    seed(args.properties)
+
+    import home_valuation
+    home_valuation.set_appreciation_rate("state", "CA", 0.05)
+    home_valuation.set_appreciation_rate("zip", "90001", 0.08)
+    home_valuation.set_appreciation_rate("property", 7, 0.12)
+
+    result = home_valuation.run_valuation()
+    print(f"Vectorized: {result['updated']:,} snapshots, {result['history_rows']:,} history rows "
+          f"in {result['seconds']:.2f}s ({result['updated'] / max(result['seconds'], 1e-9):,.0f}/s)")
+
+    if args.legacy_sample:
+        # The vectorized run already wrote today's history rows, so the sample
+        # measures the old read-modify-write without the history insert
+        per_row = legacy_sample(min(args.legacy_sample, args.properties))
+        print(f"Per-row:    {per_row * 1000:.2f}ms/property, "
+              f"~{per_row * args.properties:.1f}s for {args.properties:,} (from {args.legacy_sample:,} sample)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark the Video Studio photo ingest stage against raw full-size photos.
+
+Writes N synthetic phone-size JPEGs (every other one tagged as rotated, like
+a portrait phone shot), then times video_ingest.prepare_image() cold and
+warm, and - when FFmpeg is installed - one Ken Burns segment rendered from
+the original photo versus from the normalized copy. The segment cache is
+off throughout so every render really runs FFmpeg.
+
+    python scripts/benchmark_video_ingest.py --photos 6 --megapixels 24 --aspect 9:16
+"""
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import database
+
+EXIF_ORIENTATION = 0x0112
+
+
+def make_photos(directory: Path, count: int, megapixels: float) -> list:
+    """Noisy gradient JPEGs at 4:3, roughly the given size"""
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    rng = random.Random(42)
+    paths = []
+    for i in range(count):
+        # Upscaled noise plus a gradient: compresses like a photo, not a flat fill
+        noise = Image.frombytes("RGB", (64, 48), bytes(rng.getrandbits(8) for _ in range(64 * 48 * 3)))
+        image = Image.blend(
+            noise.resize((width, height), Image.BICUBIC),
+            Image.linear_gradient("L").convert("RGB").resize((width, height)),
+            0.5,
+        )
+        exif = Image.Exif()
+        if i % 2:
+            exif[EXIF_ORIENTATION] = 6  # rotate 90 CW on display
+        path = directory / f"photo_{i}.jpg"
+        image.save(path, "JPEG", quality=90, exif=exif.tobytes())
+        paths.append(path)
+    return paths
+
+
+def time_segments(renderer, sources: list, width: int, height: int, workdir: Path) -> list:
+    timings = []
+    for i, source in enumerate(sources):
+        output = workdir / f"segment_{i}.mp4"
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            renderer._create_image_segment(str(source), output, 5.0, width, height, "luxury_cinematic")
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--photos", type=int, default=6)
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--aspect", default="9:16", choices=["9:16", "16:9", "1:1"])
+    parser.add_argument("--skip-render", action="store_true", help="only time the ingest stage")
+    args = parser.parse_args()
+
+    import video_ingest
+    import video_segment_cache
+    import video_studio
+
+    if not video_ingest.PIL_AVAILABLE:
+        sys.exit("Pillow is required (pip install pillow)")
+
+    workdir = Path(tempfile.mkdtemp(prefix="ylh-bench-"))
+    database.DB_PATH = workdir / "bench.db"
+    database.init_db()
+    video_segment_cache.CACHE_DIR = workdir / "segment_cache"
+    video_segment_cache.MAX_BYTES = 0
+    video_ingest.INGEST_DIR = workdir / "ingest"
+
+    print(f"Writing {args.photos} x {args.megapixels:g} MP photos to {workdir} ...")
+    photos = make_photos(workdir, args.photos, args.megapixels)
+    renderer = video_studio.VideoRenderer(output_dir=str(workdir / "out"))
+    width, height = renderer._get_dimensions(args.aspect)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        prepared = [video_ingest.prepare_image(str(p), width, height) for p in photos]
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        for p in photos:
+            video_ingest.prepare_image(str(p), width, height)
+        warm = time.perf_counter() - started
+    source_bytes = sum(p.stat().st_size for p in photos)
+    prepared_bytes = sum(Path(p).stat().st_size for p in prepared)
+    print(f"Ingest ({args.aspect}, {width}x{height} canvas): "
+          f"{cold / len(photos) * 1000:.0f}ms/photo cold, {warm / len(photos) * 1000:.2f}ms/photo cached; "
+          f"{source_bytes / 1e6:.1f} MB -> {prepared_bytes / 1e6:.1f} MB")
+
+    if args.skip_render:
+        return
+    if not video_studio.FFMPEG_AVAILABLE:
+        print("FFmpeg not found - skipping the segment render comparison")
+        return
+
+    # Before: ingest off, FFmpeg reads the full-size photo on every frame
+    video_ingest.MAX_BYTES = 0
+    before = time_segments(renderer, photos, width, height, workdir)
+    video_ingest.MAX_BYTES = 1024 * 1024 * 1024
+    after = time_segments(renderer, photos, width, height, workdir)
+    print(f"5s segment from original:   {statistics.mean(before):.2f}s avg "
+          f"(min {min(before):.2f}s, max {max(before):.2f}s)")
+    print(f"5s segment from normalized: {statistics.mean(after):.2f}s avg "
+          f"(min {min(after):.2f}s, max {max(after):.2f}s) - "
+          f"{statistics.mean(before) / statistics.mean(after):.1f}x faster, "
+          f"plus {cold / len(photos):.2f}s one-time ingest per photo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Full-Text Search
+Ranked, prefix-aware search over CRM contacts, interaction notes and design-board
+notes, backed by the FTS5 tables created in migrations (FTS_TABLES).
+
+The FTS tables are external-content indexes kept current by triggers, so there
+is nothing to call after a write. When the SQLite build has no FTS5 the tables
+don't exist and fts_enabled() is False; callers fall back to LIKE.
+"""
+
+import html
+import re
+from typing import Any, Dict, List, Optional
+
+from database import get_connection
+from schema_registry import schema
+
+CONTACT_FTS = {
+    "agent": ("fts_agent_contacts", "agent_contacts", "agent_user_id", "stage"),
+    "lender": ("fts_lender_borrowers", "lender_borrowers", "lender_user_id", "status"),
+}
+
+# SQLite wraps hits in these control characters; _run() HTML-escapes the rest of
+# the text and only then swaps them for <mark> tags, so stored contact data
+# can't inject markup into search results.
+HIGHLIGHT_OPEN = "\x02"
+HIGHLIGHT_CLOSE = "\x03"
+SNIPPET_TOKENS = 12
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_enabled(fts_table: str) -> bool:
+    return schema.has_table(fts_table)
+
+
+def match_expression(text: Optional[str]) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term and all terms must match, so
+    "jo smi" finds "John Smith" and punctuation in emails or phone numbers
+    can't produce FTS5 syntax errors. Returns None when there is nothing to search.
+    """
+    if not text:
+        return None
+    tokens = _TOKEN.findall(text.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens[:16])
+
+
+def contact_match_clause(role: str):
+    """
+    WHERE fragment restricting a contacts query to FTS hits; takes one
+    match_expression() parameter. None when the FTS table isn't available.
+    """
+    fts, _table, _owner, _stage = CONTACT_FTS[role]
+    if not fts_enabled(fts):
+        return None
+    return f"id IN (SELECT rowid FROM {fts} WHERE {fts} MATCH ?)"
+
+
+def _marked_html(text: Optional[str]) -> str:
+    escaped = html.escape(text or "")
+    return escaped.replace(HIGHLIGHT_OPEN, "<mark>").replace(HIGHLIGHT_CLOSE, "</mark>")
+
+
+def _run(sql: str, params: list) -> List[Dict[str, Any]]:
+    conn = get_connection()
+    try:
+        rows = [dict(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+    for row in rows:
+        for key in row:
+            if key.endswith("_highlight") or key.endswith("snippet"):
+                row[key] = _marked_html(row[key])
+    return rows
+
+
+def search_contacts(role: str, owner_id: int, text: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Best-ranked contacts (agent) or borrowers (lender) for owner_id, with snippets"""
+    fts, table, owner_col, stage_col = CONTACT_FTS[role]
+    query = match_expression(text)
+    if not query or not fts_enabled(fts):
+        return []
+    # Column 4 is notes in both contact FTS tables
+    return _run(
+        f"""
+        SELECT c.id, c.name, c.email, c.phone, c.{stage_col} AS stage,
+               highlight({fts}, 0, ?, ?) AS name_highlight,
+               snippet({fts}, 4, ?, ?, '…', {SNIPPET_TOKENS}) AS notes_snippet,
+               bm25({fts}, 10.0, 5.0, 5.0, 3.0, 1.0, 2.0) AS rank
+        FROM {fts}
+        JOIN {table} c ON c.id = {fts}.rowid
+        WHERE {fts} MATCH ? AND c.{owner_col} = ?
+        ORDER BY rank
+        LIMIT ?
+        """,
+        [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE,
+         query, owner_id, limit],
+    )
+
+
+def search_interactions(
+    professional_user_id: int,
+    text: str,
+    contact_type: Optional[str] = None,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """Interaction notes/subjects matching text, best first"""
+    query = match_expression(text)
+    if not query or not fts_enabled("fts_crm_interactions"):
+        return []
+    sql = f"""
+        SELECT i.id, i.contact_id, i.contact_type, i.interaction_type, i.interaction_date,
+               highlight(fts_crm_interactions, 0, ?, ?) AS subject_highlight,
+               snippet(fts_crm_interactions, 1, ?, ?, '…', {SNIPPET_TOKENS}) AS notes_snippet,
+               bm25(fts_crm_interactions, 3.0, 1.0) AS rank
+        FROM fts_crm_interactions
+        JOIN crm_interactions i ON i.id = fts_crm_interactions.rowid
+        WHERE fts_crm_interactions MATCH ? AND i.professional_user_id = ?
+    """
+    params: List[Any] = [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE,
+                         query, professional_user_id]
+    if contact_type:
+        sql += " AND i.contact_type = ?"
+        params.append(contact_type)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    return _run(sql, params)
+
+
+def search_design_boards(user_id: int, text: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Design-board notes (titles, details, vision statements) matching text, best first"""
+    query = match_expression(text)
+    if not query or not fts_enabled("fts_homeowner_notes"):
+        return []
+    return _run(
+        f"""
+        SELECT n.id, n.project_name, n.title, n.created_at,
+               highlight(fts_homeowner_notes, 1, ?, ?) AS title_highlight,
+               snippet(fts_homeowner_notes, -1, ?, ?, '…', {SNIPPET_TOKENS}) AS snippet,
+               bm25(fts_homeowner_notes, 4.0, 6.0, 1.0, 2.0, 2.0) AS rank
+        FROM fts_homeowner_notes
+        JOIN homeowner_notes n ON n.id = fts_homeowner_notes.rowid
+        WHERE fts_homeowner_notes MATCH ? AND n.user_id = ?
+        ORDER BY rank
+        LIMIT ?
+        """,
+        [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE,
+         query, user_id, limit],
+    )
+
+
+def rebuild_search_index() -> List[str]:
+    """Re-derive every FTS table from its content table (after bulk loads or restores)"""
+    from migrations import FTS_TABLES
+    rebuilt = []
+    conn = get_connection()
+    try:
+        for fts, _table, _cols in FTS_TABLES:
+            if schema.has_table(fts):
+                conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+                rebuilt.append(fts)
+        conn.commit()
+    finally:
+        conn.close()
+    return rebuilt
+
+
+__all__ = [
+    'contact_match_clause',
+    'fts_enabled',
+    'match_expression',
+    'rebuild_search_index',
+    'search_contacts',
+    'search_design_boards',
+    'search_interactions',
+]
@@ -0,0 +1,139 @@
+"""
+Send Window
+Spreads large automated campaigns over time so bulk email never starves
+interactive requests of the SQLite writer.
+
+Campaign jobs fire at fixed cron times; on the 1st of the month the seasonal
+checklist and equity update used to enqueue and send everything back to back.
+Now queue_campaign_emails() splits a campaign into shards by a stable hash of
+the professional (or contact) and gives shard k a not-before time of
+k * window / shards, each shard enqueued in its own short transaction. The
+drain_outbox job picks each shard up as it comes due.
+
+While draining, OutboxSender asks SendGovernor how many SMTP sessions it may
+use: all of them (capped at CAMPAIGN_MAX_CONCURRENCY) while request latency is
+normal, one when the recent p95 passes CAMPAIGN_BACKPRESSURE_MS, and none -
+leave the rest queued for the next drain - past twice that. Latency comes from
+the after_request hook in app.py; the leader worker serves its share of
+traffic, so its own p95 tracks the load on the shared database.
+
+    CAMPAIGN_SEND_WINDOW_MINUTES=60  CAMPAIGN_SHARDS=12
+    CAMPAIGN_MAX_CONCURRENCY=4       CAMPAIGN_BACKPRESSURE_MS=750
+"""
+
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+SEND_WINDOW_MINUTES = float(os.environ.get("CAMPAIGN_SEND_WINDOW_MINUTES", 60))
+SHARDS = int(os.environ.get("CAMPAIGN_SHARDS", 12))
+MAX_CONCURRENCY = int(os.environ.get("CAMPAIGN_MAX_CONCURRENCY", 4))
+BACKPRESSURE_MS = float(os.environ.get("CAMPAIGN_BACKPRESSURE_MS", 750))
+# Campaigns smaller than this go out in one shard right away
+MIN_SHARD_SIZE = int(os.environ.get("CAMPAIGN_MIN_SHARD_SIZE", 200))
+
+LATENCY_WINDOW_SECONDS = 60
+LATENCY_MIN_SAMPLES = 20
+
+
+class LatencyMonitor:
+    """Rolling request durations for this process"""
+
+    def __init__(self, window_seconds: float = LATENCY_WINDOW_SECONDS, max_samples: int = 5000):
+        self.window_seconds = window_seconds
+        self._samples: deque = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def p95_ms(self) -> Optional[float]:
+        """95th percentile over the window, or None with too few samples to judge"""
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            durations = sorted(seconds for _, seconds in self._samples)
+        if len(durations) < LATENCY_MIN_SAMPLES:
+            return None
+        return durations[int(len(durations) * 0.95) - 1] * 1000
+
+
+request_latency = LatencyMonitor()
+
+
+class SendGovernor:
+    """Decides how many SMTP sessions a drain may use right now"""
+
+    def __init__(self, monitor: LatencyMonitor = request_latency,
+                 threshold_ms: float = BACKPRESSURE_MS, max_concurrency: int = MAX_CONCURRENCY):
+        self.monitor = monitor
+        self.threshold_ms = threshold_ms
+        self.max_concurrency = max_concurrency
+
+    def allowed_sessions(self, available: int) -> int:
+        p95 = self.monitor.p95_ms()
+        cap = min(available, self.max_concurrency)
+        if p95 is None or p95 < self.threshold_ms:
+            return cap
+        if p95 < 2 * self.threshold_ms:
+            return min(cap, 1)
+        return 0
+
+    def status(self) -> Dict[str, Any]:
+        p95 = self.monitor.p95_ms()
+        return {
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "threshold_ms": self.threshold_ms,
+            "allowed_sessions": self.allowed_sessions(self.max_concurrency),
+        }
+
+
+governor = SendGovernor()
+
+
+# ---------------- SHARDING ----------------
+
+def shard_of(key: Any, shards: int) -> int:
+    """Stable shard for a key (same professional -> same shard on every run)"""
+    return zlib.crc32(str(key).encode()) % shards
+
+
+def shard_contacts(contacts: List[Dict[str, Any]], shards: int = SHARDS,
+                   by: str = "professional") -> List[List[Dict[str, Any]]]:
+    """
+    Split contacts into up to `shards` groups by professional_id (keeps one
+    professional's sends together) or by contact ("contact" - evens out a few
+    very large books). Small campaigns stay in a single shard.
+    """
+    shards = max(1, min(shards, len(contacts) // max(MIN_SHARD_SIZE, 1)))
+    if shards == 1:
+        return [contacts] if contacts else []
+    groups: List[List[Dict[str, Any]]] = [[] for _ in range(shards)]
+    for contact in contacts:
+        key = contact["professional_id"] if by == "professional" else (contact["type"], contact["id"])
+        groups[shard_of(key, shards)].append(contact)
+    return [group for group in groups if group]
+
+
+def shard_delays(shard_count: int, window_minutes: float = SEND_WINDOW_MINUTES) -> List[int]:
+    """Not-before offsets in seconds, evenly spaced across the window; shard 0 starts now"""
+    if shard_count <= 1:
+        return [0] * shard_count
+    step = window_minutes * 60 / shard_count
+    return [int(k * step) for k in range(shard_count)]
+
+
+__all__ = [
+    'LatencyMonitor',
+    'SendGovernor',
+    'governor',
+    'request_latency',
+    'shard_contacts',
+    'shard_delays',
+    'shard_of',
+]
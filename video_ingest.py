@@ -0,0 +1,145 @@
+"""
+Video Ingest
+Normalizes listing photos before they reach FFmpeg.
+
+Phone photos are 12-48 MP. _create_image_segment loops the photo with
+`-loop 1`, so FFmpeg decoded and scaled the full-size image again for every
+output frame - 300 times for a 10 second segment at 30fps. prepare_image()
+instead decodes each photo once with Pillow and writes a JPEG of about
+OVERSAMPLE x the canvas (enough headroom for the zoompan to stay sharp), which
+is what FFmpeg reads:
+
+- JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 while
+  decoding, to the smallest size that still covers the target;
+- EXIF orientation is applied, so sideways phone shots come out upright
+  (FFmpeg ignores the tag on stills);
+- HEIC/HEIF is read when the optional pillow-heif plugin is installed.
+
+Intermediates are cached under INGEST_DIR keyed by the photo's content hash
+and the target size, so re-renders and other photos' segments reuse them;
+the directory is LRU-bounded like the segment cache and counted there as
+kind "ingest". Anything Pillow can't open falls back to the original file.
+
+    VIDEO_INGEST_CACHE_MB=1024      # 0 turns ingest off (FFmpeg reads originals)
+"""
+
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import video_segment_cache
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# HEIC support is an optional Pillow plugin
+try:
+    import pillow_heif
+    pillow_heif.register_heif_opener()
+except ImportError:
+    pass
+
+INGEST_DIR = Path(os.environ.get("VIDEO_INGEST_CACHE_DIR", str(video_segment_cache.CACHE_DIR / "ingest")))
+MAX_BYTES = int(float(os.environ.get("VIDEO_INGEST_CACHE_MB", 1024)) * 1024 * 1024)
+# Intermediate size relative to the output canvas
+OVERSAMPLE = 2.0
+JPEG_QUALITY = 92
+# Bump when normalization changes, to stop reusing old intermediates
+INGEST_VERSION = 1
+
+_ORIENTATION_TAG = 0x0112
+# EXIF orientations that swap width and height
+_TRANSPOSED = (5, 6, 7, 8)
+
+
+def enabled() -> bool:
+    return PIL_AVAILABLE and MAX_BYTES > 0
+
+
+def target_box(width: int, height: int, oversample: float = OVERSAMPLE) -> Tuple[int, int]:
+    """Largest intermediate size for a width x height canvas"""
+    return int(width * oversample), int(height * oversample)
+
+
+def _normalize(source: str, dest: Path, box: Tuple[int, int]) -> Tuple[int, int]:
+    """Decode, orient and shrink source to fit box; writes a JPEG to dest and returns its size"""
+    with Image.open(source) as img:
+        stored_w, stored_h = img.size
+        transposed = img.getexif().get(_ORIENTATION_TAG, 1) in _TRANSPOSED
+        upright_w, upright_h = (stored_h, stored_w) if transposed else (stored_w, stored_h)
+        # Same fit as the FFmpeg scale filter (force_original_aspect_ratio=decrease)
+        ratio = min(box[0] / upright_w, box[1] / upright_h, 1.0)
+        need_w, need_h = max(1, round(upright_w * ratio)), max(1, round(upright_h * ratio))
+        if img.format == "JPEG":
+            # draft() sizes are in stored orientation and never go below the request
+            img.draft("RGB", (need_h, need_w) if transposed else (need_w, need_h))
+        image = ImageOps.exif_transpose(img)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != (need_w, need_h):
+            image = image.resize((need_w, need_h), Image.LANCZOS)
+        tmp = dest.with_name(f".{dest.stem}.{uuid.uuid4().hex}.tmp")
+        image.save(tmp, "JPEG", quality=JPEG_QUALITY)
+    # Atomic, so another render process never reads a half-written file
+    os.replace(tmp, dest)
+    return need_w, need_h
+
+
+def prepare_image(image_path: str, width: int, height: int) -> str:
+    """
+    Path of the normalized copy of image_path for a width x height canvas,
+    creating it if needed. Returns image_path itself when ingest is off or
+    the photo can't be read.
+    """
+    if not enabled():
+        return image_path
+    box = target_box(width, height)
+    try:
+        digest = video_segment_cache.file_digest(image_path)
+    except OSError:
+        return image_path  # FFmpeg reports the missing file as before
+
+    key = hashlib.sha256(f"v{INGEST_VERSION}:{digest}:{box[0]}x{box[1]}:q{JPEG_QUALITY}".encode()).hexdigest()
+    dest = INGEST_DIR / f"{key}.jpg"
+    try:
+        # Touch for LRU; a miss if it isn't there (or was just evicted)
+        os.utime(dest)
+        video_segment_cache.record_lookup("ingest", hit=True)
+        return str(dest)
+    except FileNotFoundError:
+        pass
+
+    try:
+        INGEST_DIR.mkdir(parents=True, exist_ok=True)
+        size = _normalize(image_path, dest, box)
+    except Exception as e:
+        print(f"[VIDEO INGEST] Using original {image_path}: {e}")
+        return image_path
+    video_segment_cache.record_lookup("ingest", hit=False)
+    print(f"[VIDEO INGEST] Normalized {image_path} to {size[0]}x{size[1]}")
+    video_segment_cache.evict("ingest", MAX_BYTES, directory=INGEST_DIR, suffix=".jpg")
+    return str(dest)
+
+
+def disk_usage() -> Dict[str, Any]:
+    return {
+        "enabled": enabled(),
+        "directory": str(INGEST_DIR),
+        **video_segment_cache.disk_usage(INGEST_DIR, ".jpg"),
+        "max_bytes": MAX_BYTES,
+    }
+
+
+__all__ = [
+    'INGEST_DIR',
+    'OVERSAMPLE',
+    'disk_usage',
+    'enabled',
+    'prepare_image',
+    'target_box',
+]
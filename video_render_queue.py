@@ -0,0 +1,306 @@
+"""
+Video Render Queue
+Persistent render jobs for Video Studio, stored on video_projects.
+
+agent_video_studio_create used to run VideoRenderer.create_listing_video
+inside the POST, waiting on every FFmpeg subprocess; a 20-photo 3D tour could
+outlast gunicorn's timeout and held a request thread for the whole render.
+Now the POST saves the project, calls enqueue_render() and returns the
+project id as the job id. Render workers (video_render_worker.py, separate
+processes) claim queued projects with a guarded UPDATE, render them, and
+write progress as they go; the view page polls render_job_status().
+
+render_status moves draft -> queued -> rendering -> complete | failed. A
+rendering job heartbeats every HEARTBEAT_SECONDS; one whose worker died stops
+heartbeating and is claimed again, up to RENDER_MAX_ATTEMPTS times.
+
+render_quality is 'final' or 'draft' (a fast watermarked preview, see
+video_studio.DRAFT). Queued drafts are claimed ahead of final renders so a
+preview isn't stuck behind someone's 20-photo tour; promote_to_final() then
+queues the full render with the options the draft was made with.
+"""
+
+import json
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from database import get_connection
+
+OUTPUT_DIR = Path("generated_videos")
+HEARTBEAT_SECONDS = 15
+RENDER_HEARTBEAT_TIMEOUT_SECONDS = 120
+RENDER_MAX_ATTEMPTS = 2
+
+QUALITIES = ("final", "draft")
+
+# Claim order: drafts first, then oldest first
+_QUEUE_ORDER = "CASE WHEN render_quality = 'draft' THEN 0 ELSE 1 END, render_queued_at, id"
+
+_CLAIMABLE = """
+    (render_status = 'queued'
+     OR (render_status = 'rendering'
+         AND (render_heartbeat_at IS NULL OR render_heartbeat_at < datetime('now', ?))))
+"""
+
+
+def enqueue_render(project_id: int, options: Optional[Dict[str, Any]] = None, quality: str = "final") -> None:
+    """
+    Queue a project for rendering at quality 'final' or 'draft'. options
+    holds renderer arguments that aren't columns on video_projects
+    (agent_name, agent_phone, room_labels); branding images are loaded from
+    the user's profile at render time.
+    """
+    if quality not in QUALITIES:
+        raise ValueError(f"quality must be one of {QUALITIES}")
+    conn = get_connection()
+    try:
+        conn.execute(
+            """
+            UPDATE video_projects
+            SET render_status = 'queued', render_quality = ?, render_options = ?, render_progress = 0,
+                render_message = 'Waiting for a render worker', render_error = NULL,
+                render_worker_id = NULL, render_heartbeat_at = NULL, render_attempts = 0,
+                render_queued_at = CURRENT_TIMESTAMP, render_started_at = NULL,
+                render_completed_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (quality, json.dumps(options or {}), project_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def claim_next_render(worker_id: str) -> Optional[int]:
+    """
+    Take the oldest queued project, or a rendering one whose worker stopped
+    heartbeating. The UPDATE re-checks the claim condition so only one worker
+    wins. Returns the project id.
+    """
+    stale = f"-{RENDER_HEARTBEAT_TIMEOUT_SECONDS} seconds"
+    conn = get_connection()
+    try:
+        while True:
+            row = conn.execute(
+                f"""
+                SELECT id, render_attempts FROM video_projects WHERE {_CLAIMABLE}
+                ORDER BY {_QUEUE_ORDER} LIMIT 1
+                """,
+                (stale,),
+            ).fetchone()
+            if not row:
+                return None
+            if (row["render_attempts"] or 0) >= RENDER_MAX_ATTEMPTS:
+                conn.execute(
+                    f"""
+                    UPDATE video_projects
+                    SET render_status = 'failed', render_completed_at = CURRENT_TIMESTAMP,
+                        render_error = 'Render stopped after {RENDER_MAX_ATTEMPTS} attempts',
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND {_CLAIMABLE}
+                    """,
+                    (row["id"], stale),
+                )
+                conn.commit()
+                continue
+            claimed = conn.execute(
+                f"""
+                UPDATE video_projects
+                SET render_status = 'rendering', render_worker_id = ?,
+                    render_heartbeat_at = CURRENT_TIMESTAMP,
+                    render_started_at = CURRENT_TIMESTAMP, render_message = 'Starting render',
+                    render_attempts = COALESCE(render_attempts, 0) + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND {_CLAIMABLE}
+                """,
+                (worker_id, row["id"], stale),
+            ).rowcount
+            conn.commit()
+            if claimed:
+                return row["id"]
+    finally:
+        conn.close()
+
+
+def promote_to_final(project_id: int) -> None:
+    """Queue the full-quality render of a project with the options its draft was rendered with"""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT render_options FROM video_projects WHERE id = ?", (project_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise ValueError("Video project not found")
+    enqueue_render(project_id, json.loads(row["render_options"] or "{}"), quality="final")
+
+
+def _report(project_id: int, worker_id: str, progress: Optional[float] = None,
+            message: Optional[str] = None) -> None:
+    """Heartbeat, optionally with progress; ignored if another worker has taken the job over"""
+    conn = get_connection()
+    try:
+        conn.execute(
+            """
+            UPDATE video_projects
+            SET render_heartbeat_at = CURRENT_TIMESTAMP,
+                render_progress = COALESCE(?, render_progress),
+                render_message = COALESCE(?, render_message)
+            WHERE id = ? AND render_worker_id = ? AND render_status = 'rendering'
+            """,
+            (progress, message, project_id, worker_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _finish(project_id: int, worker_id: str, result: Dict[str, Any]) -> None:
+    conn = get_connection()
+    try:
+        if result.get("success"):
+            conn.execute(
+                """
+                UPDATE video_projects
+                SET render_status = 'complete', output_path = ?, render_progress = 1,
+                    render_message = 'Ready', render_error = NULL,
+                    render_completed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND render_worker_id = ?
+                """,
+                (result["output_path"], project_id, worker_id),
+            )
+        else:
+            conn.execute(
+                """
+                UPDATE video_projects
+                SET render_status = 'failed', render_error = ?, render_message = 'Render failed',
+                    render_completed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND render_worker_id = ?
+                """,
+                (str(result.get("error") or "Unknown error")[:2000], project_id, worker_id),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _render_arguments(project: Dict[str, Any]) -> Dict[str, Any]:
+    """create_listing_video keyword arguments for a project row"""
+    from database import get_user_by_id, get_user_profile
+
+    options = json.loads(project.get("render_options") or "{}")
+    user = get_user_by_id(project["user_id"])
+    profile = get_user_profile(project["user_id"])
+    profile = dict(profile) if profile else {}
+    return {
+        "project_id": project["id"],
+        "media_files": json.loads(project.get("media_files") or "[]"),
+        "style": project["style_preset"],
+        "aspect_ratio": project["aspect_ratio"],
+        "duration": project["duration"],
+        "headline": project.get("headline") or "",
+        "property_address": project.get("property_address") or "",
+        "agent_name": options.get("agent_name") or (user["name"] if user else "") or "",
+        "agent_phone": options.get("agent_phone") or "",
+        "agent_logo": profile.get("brokerage_logo"),
+        "agent_photo": profile.get("professional_photo"),
+        "include_captions": bool(project.get("include_captions")),
+        "video_type": project["video_type"],
+        "room_labels": options.get("room_labels"),
+        "quality": project.get("render_quality") or "final",
+    }
+
+
+def run_render(project_id: int, worker_id: str) -> Dict[str, Any]:
+    """Render a claimed project, reporting progress; records the outcome on the project"""
+    from video_studio import VideoRenderer
+
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM video_projects WHERE id = ?", (project_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return {"success": False, "error": "Project was deleted"}
+
+    # FFmpeg calls can run longer than the heartbeat timeout, so beat from a
+    # side thread rather than only between steps
+    done = threading.Event()
+
+    def beat() -> None:
+        while not done.wait(HEARTBEAT_SECONDS):
+            try:
+                _report(project_id, worker_id)
+            except Exception as e:
+                print(f"[VIDEO RENDER] Heartbeat failed for project {project_id}: {e}")
+
+    heartbeat = threading.Thread(target=beat, name=f"render-heartbeat-{project_id}", daemon=True)
+    heartbeat.start()
+    started = time.monotonic()
+    try:
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        renderer = VideoRenderer(output_dir=str(OUTPUT_DIR))
+        result = renderer.create_listing_video(
+            **_render_arguments(dict(row)),
+            progress=lambda fraction, message: _report(project_id, worker_id, fraction, message),
+        )
+    except Exception as e:
+        traceback.print_exc()
+        result = {"success": False, "error": str(e)}
+    finally:
+        done.set()
+        heartbeat.join()
+
+    _finish(project_id, worker_id, result)
+    outcome = "complete" if result.get("success") else f"failed: {result.get('error')}"
+    print(f"[VIDEO RENDER] Project {project_id} {outcome} in {time.monotonic() - started:.1f}s")
+    return result
+
+
+def render_job_status(project_id: int) -> Optional[Dict[str, Any]]:
+    """What the status endpoint returns: state, progress 0-1, message, queue position"""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            """
+            SELECT id, user_id, render_status, render_quality, render_progress, render_message, render_error,
+                   render_queued_at, render_started_at, render_completed_at, output_path
+            FROM video_projects WHERE id = ?
+            """,
+            (project_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        status = dict(row)
+        status["queue_position"] = None
+        if row["render_status"] == "queued":
+            # Jobs claimed before this one: every queued draft ahead of a final
+            # render, then earlier jobs of the same quality
+            is_draft = 1 if row["render_quality"] == "draft" else 0
+            status["queue_position"] = conn.execute(
+                """
+                SELECT COUNT(*) FROM video_projects
+                WHERE render_status = 'queued'
+                  AND ((render_quality IS 'draft') > ?
+                       OR ((render_quality IS 'draft') = ?
+                           AND (render_queued_at < ? OR (render_queued_at = ? AND id < ?))))
+                """,
+                (is_draft, is_draft, row["render_queued_at"], row["render_queued_at"], row["id"]),
+            ).fetchone()[0] + 1
+    finally:
+        conn.close()
+    status["ready"] = status["render_status"] == "complete" and bool(status["output_path"])
+    return status
+
+
+__all__ = [
+    'HEARTBEAT_SECONDS',
+    'RENDER_HEARTBEAT_TIMEOUT_SECONDS',
+    'RENDER_MAX_ATTEMPTS',
+    'claim_next_render',
+    'enqueue_render',
+    'promote_to_final',
+    'render_job_status',
+    'run_render',
+]
@@ -0,0 +1,190 @@
+"""
+Video Render Worker
+Dedicated processes that service the Video Studio render queue.
+
+Rendering is CPU-bound FFmpeg work, so it runs in its own processes rather
+than in gunicorn request threads. Each process loops: claim the next job
+(video_render_queue.claim_next_render), render it, repeat; it polls the
+queue every POLL_SECONDS while idle.
+
+Two ways to run them:
+
+    python video_render_worker.py --processes 2    # standalone, e.g. a Procfile "render" process
+
+or embedded: app.py calls start(), and the first gunicorn worker on the host
+to take RENDER_LOCK_FILE spawns VIDEO_RENDER_PROCESSES children and restarts
+any that die. The other gunicorn workers find the lock held and do nothing.
+Set VIDEO_RENDER_EMBEDDED=0 when a standalone worker is deployed instead
+(the Procfile does this for "web", since it also declares "render").
+Children exit between jobs once their parent is gone, so a gunicorn worker
+killed on timeout doesn't leave its render processes running.
+Either way jobs are claimed with a guarded UPDATE, so extra workers are safe.
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import List, Optional
+
+import video_render_queue
+
+POLL_SECONDS = 3
+PROCESSES = int(os.environ.get("VIDEO_RENDER_PROCESSES", max(1, (os.cpu_count() or 2) // 2)))
+EMBEDDED = os.environ.get("VIDEO_RENDER_EMBEDDED", "1") != "0"
+RENDER_LOCK_FILE = Path(os.environ.get("VIDEO_RENDER_LOCK_FILE", "generated_videos/.render_workers.lock"))
+SUPERVISE_SECONDS = 10
+
+
+def worker_loop(poll_seconds: float = POLL_SECONDS, max_jobs: Optional[int] = None,
+                parent_pid: Optional[int] = None) -> int:
+    """
+    Claim and render jobs until max_jobs have run (forever by default);
+    returns the count. With parent_pid, stops once that process is gone.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"[VIDEO RENDER] Worker {worker_id} started")
+    ran = 0
+    while max_jobs is None or ran < max_jobs:
+        # A SIGKILLed parent (gunicorn worker timeout) can't stop its daemon
+        # children; the next worker to take the host lock starts new ones
+        if parent_pid is not None and os.getppid() != parent_pid:
+            print(f"[VIDEO RENDER] Worker {worker_id} parent {parent_pid} exited; stopping")
+            break
+        try:
+            project_id = video_render_queue.claim_next_render(worker_id)
+        except Exception as e:
+            print(f"[VIDEO RENDER] Worker poll error: {e}")
+            project_id = None
+        if project_id is None:
+            if max_jobs is not None:
+                break
+            time.sleep(poll_seconds)
+            continue
+        ran += 1
+        try:
+            video_render_queue.run_render(project_id, worker_id)
+        except Exception:
+            # Outcome is already on the project when possible; keep serving the queue
+            print(f"[VIDEO RENDER] Project {project_id} error: {traceback.format_exc()}")
+    return ran
+
+
+def _process_main(cwd: str, processes: int, parent_pid: int) -> None:
+    import video_studio
+
+    # Media and output paths on video_projects are relative to the app directory
+    os.chdir(cwd)
+    # The host's cores are shared by this many concurrent renders
+    video_studio.RENDER_PROCESSES = processes
+    worker_loop(parent_pid=parent_pid)
+
+
+class RenderWorkerPool:
+    """Spawns and keeps alive the render processes for this host"""
+
+    def __init__(self, processes: int = PROCESSES, host_lock: bool = True):
+        self.processes = max(1, processes)
+        self.host_lock = host_lock
+        self._children: List[multiprocessing.Process] = []
+        # spawn, not fork: the parent is a threaded web worker
+        self._context = multiprocessing.get_context("spawn")
+        self._lock_handle = None
+        self._guard = threading.Lock()
+        self._supervisor: Optional[threading.Thread] = None
+
+    def _take_host_lock(self) -> bool:
+        """Only one process per host runs the pool (lock held for this process's lifetime)"""
+        try:
+            import fcntl
+        except ImportError:
+            return True  # no flock (Windows dev box): single web process there anyway
+        RENDER_LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+        handle = open(RENDER_LOCK_FILE, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_handle = handle
+        return True
+
+    def _spawn(self) -> multiprocessing.Process:
+        child = self._context.Process(
+            target=_process_main, args=(os.getcwd(), self.processes, os.getpid()),
+            name="video-render-worker", daemon=True,
+        )
+        child.start()
+        return child
+
+    def start(self) -> bool:
+        """Start the pool if this process holds the host lock; True if it's running here"""
+        with self._guard:
+            if self._supervisor is not None and self._supervisor.is_alive():
+                return True
+            if self.host_lock and self._lock_handle is None and not self._take_host_lock():
+                return False
+            self._children = [self._spawn() for _ in range(self.processes)]
+            self._supervisor = threading.Thread(target=self._supervise, name="video-render-supervisor", daemon=True)
+            self._supervisor.start()
+            print(f"[VIDEO RENDER] Started {self.processes} render process(es) from pid {os.getpid()}")
+            return True
+
+    def _supervise(self) -> None:
+        while True:
+            time.sleep(SUPERVISE_SECONDS)
+            with self._guard:
+                for i, child in enumerate(self._children):
+                    if not child.is_alive():
+                        print(f"[VIDEO RENDER] Render process {child.pid} exited ({child.exitcode}); restarting")
+                        self._children[i] = self._spawn()
+
+    def join(self) -> None:
+        """Block for the life of the pool (the supervisor never exits)"""
+        if self._supervisor is not None:
+            self._supervisor.join()
+
+
+_pool: Optional[RenderWorkerPool] = None
+
+
+def start() -> None:
+    """Embedded mode: make sure this host has render processes (idempotent)"""
+    global _pool
+    if not EMBEDDED:
+        return
+    if _pool is None:
+        _pool = RenderWorkerPool()
+    _pool.start()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Run Video Studio render workers")
+    parser.add_argument("--processes", type=int, default=PROCESSES)
+    parser.add_argument("--once", action="store_true", help="render what's queued in this process, then exit")
+    args = parser.parse_args(argv)
+    os.chdir(Path(__file__).parent)
+    if args.once:
+        print(f"[VIDEO RENDER] Rendered {worker_loop(max_jobs=sys.maxsize)} project(s)")
+        return 0
+    pool = RenderWorkerPool(args.processes, host_lock=False)
+    pool.start()
+    pool.join()
+    return 0
+
+
+__all__ = [
+    'POLL_SECONDS',
+    'RenderWorkerPool',
+    'start',
+    'worker_loop',
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,236 @@
+"""
+Video Segment Cache
+Content-addressed store of rendered Video Studio segments and title cards.
+
+Agents re-render the same listing with a new headline, or in 9:16, 16:9 and
+1:1, and every photo used to be re-encoded each time. A segment is fully
+determined by its FFmpeg command, so the cache key is that command - filter
+chain, dimensions, duration, encoder settings - with the output path left out
+and the source file replaced by the SHA-256 of its bytes (renaming or
+re-uploading the same photo still hits). Title cards have no source file;
+their headline, address and agent details are in the drawtext filters, so
+they are cached per branding and headline the same way.
+
+A hit hard-links (or copies) the cached file into the render's temp dir and
+FFmpeg doesn't run at all. Entries live as <key>.mp4 under CACHE_DIR, shared
+by every render process on the host; a file's mtime is its last use, and
+when the directory grows past VIDEO_SEGMENT_CACHE_MB the least recently used
+entries are deleted. Hits, misses and evictions are counted per kind in
+video_cache_stats for /admin/video-cache (video_ingest's normalized photos
+are counted here too, as kind "ingest").
+
+    VIDEO_SEGMENT_CACHE_DIR=generated_videos/segment_cache
+    VIDEO_SEGMENT_CACHE_MB=2048     # 0 turns the cache off
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from database import get_connection
+
+CACHE_DIR = Path(os.environ.get("VIDEO_SEGMENT_CACHE_DIR", "generated_videos/segment_cache"))
+MAX_BYTES = int(float(os.environ.get("VIDEO_SEGMENT_CACHE_MB", 2048)) * 1024 * 1024)
+# Eviction trims to this fraction of MAX_BYTES so it doesn't run on every store
+LOW_WATER = 0.9
+# Bump when a renderer change should invalidate everything already cached
+CACHE_VERSION = 1
+
+KINDS = ("segment", "card", "ingest")
+
+_digest_lock = threading.Lock()
+_digests: Dict[tuple, str] = {}
+_DIGEST_MEMO_SIZE = 1024
+
+
+def enabled() -> bool:
+    return MAX_BYTES > 0
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes, remembered per (path, size, mtime) for this process"""
+    stat = os.stat(path)
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        digest = _digests.get(memo_key)
+    if digest:
+        return digest
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digest_lock:
+        if len(_digests) >= _DIGEST_MEMO_SIZE:
+            _digests.clear()
+        _digests[memo_key] = digest
+    return digest
+
+
+def command_key(cmd: List[str], output_path: Path, source: Optional[str] = None) -> str:
+    """Cache key for an FFmpeg command: every argument but the output, the source as its content hash"""
+    parts = [f"v{CACHE_VERSION}"]
+    for arg in cmd:
+        if arg == str(output_path):
+            continue
+        if source is not None and arg == str(source):
+            parts.append(f"sha256:{file_digest(source)}")
+        else:
+            parts.append(arg)
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def _entry(key: str) -> Path:
+    return CACHE_DIR / f"{key}.mp4"
+
+
+def _count(kind: str, field: str, n: int = 1) -> None:
+    # Counters are best-effort: a locked database must never fail a render
+    try:
+        conn = get_connection()
+        try:
+            conn.execute(
+                f"""
+                INSERT INTO video_cache_stats (kind, {field}) VALUES (?, ?)
+                ON CONFLICT(kind) DO UPDATE SET {field} = {field} + excluded.{field},
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                (kind, n),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"[VIDEO CACHE] Could not count {kind} {field}: {e}")
+
+
+def record_lookup(kind: str, hit: bool) -> None:
+    """Count a cache hit or miss for the admin stats"""
+    _count(kind, "hits" if hit else "misses")
+
+
+def fetch(kind: str, key: str, dest: Path) -> bool:
+    """Put the cached output for key at dest; False (a miss) if there isn't one"""
+    entry = _entry(key)
+    dest = Path(dest)
+    try:
+        if dest.exists():
+            dest.unlink()
+        try:
+            os.link(entry, dest)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # Cache and temp dir on different filesystems
+            shutil.copyfile(entry, dest)
+        os.utime(entry)
+    except FileNotFoundError:
+        _count(kind, "misses")
+        return False
+    _count(kind, "hits")
+    return True
+
+
+def store(kind: str, key: str, source: Path) -> None:
+    """Add a freshly rendered output under key, then evict down to size if needed"""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = CACHE_DIR / f".{key}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source, tmp)
+        # Atomic, so a concurrent fetch sees the whole file or none of it
+        os.replace(tmp, _entry(key))
+    except OSError as e:
+        print(f"[VIDEO CACHE] Could not store {kind} {key[:12]}: {e}")
+        return
+    evict(kind)
+
+
+def _entries(directory: Optional[Path] = None, suffix: str = ".mp4") -> List[tuple]:
+    """(path, stat) for each cached file"""
+    found = []
+    try:
+        with os.scandir(directory or CACHE_DIR) as it:
+            for item in it:
+                if item.name.endswith(suffix):
+                    try:
+                        found.append((item.path, item.stat()))
+                    except FileNotFoundError:
+                        pass  # evicted by another process mid-scan
+    except FileNotFoundError:
+        pass
+    return found
+
+
+def evict(kind: str = "segment", max_bytes: int = MAX_BYTES, directory: Optional[Path] = None,
+          suffix: str = ".mp4") -> int:
+    """Delete least recently used entries while the cache is over max_bytes; returns how many"""
+    entries = _entries(directory, suffix)
+    total = sum(stat.st_size for _, stat in entries)
+    if total <= max_bytes:
+        return 0
+    target = int(max_bytes * LOW_WATER)
+    removed = 0
+    for path, stat in sorted(entries, key=lambda e: e[1].st_mtime):
+        if total <= target:
+            break
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= stat.st_size
+    if removed:
+        _count(kind, "evictions", removed)
+        print(f"[VIDEO CACHE] Evicted {removed} {kind} entries ({total / 1024 / 1024:.0f} MB left)")
+    return removed
+
+
+def disk_usage(directory: Optional[Path] = None, suffix: str = ".mp4") -> Dict[str, int]:
+    entries = _entries(directory, suffix)
+    return {"entries": len(entries), "bytes": sum(stat.st_size for _, stat in entries)}
+
+
+def stats() -> Dict[str, Any]:
+    """Counters per kind plus what's on disk, for the admin endpoint"""
+    conn = get_connection()
+    try:
+        rows = conn.execute("SELECT kind, hits, misses, evictions, updated_at FROM video_cache_stats").fetchall()
+    finally:
+        conn.close()
+    kinds = {}
+    for row in rows:
+        lookups = row["hits"] + row["misses"]
+        kinds[row["kind"]] = {
+            "hits": row["hits"],
+            "misses": row["misses"],
+            "evictions": row["evictions"],
+            "hit_rate": round(row["hits"] / lookups, 3) if lookups else None,
+            "updated_at": row["updated_at"],
+        }
+    return {
+        "enabled": enabled(),
+        "directory": str(CACHE_DIR),
+        **disk_usage(),
+        "max_bytes": MAX_BYTES,
+        "kinds": kinds,
+    }
+
+
+__all__ = [
+    'CACHE_DIR',
+    'KINDS',
+    'MAX_BYTES',
+    'command_key',
+    'disk_usage',
+    'enabled',
+    'evict',
+    'fetch',
+    'file_digest',
+    'record_lookup',
+    'stats',
+    'store',
+]
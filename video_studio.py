@@ -5,11 +5,19 @@ Generates luxury real estate marketing videos with branding
 
 import os
 import json
+import functools
 import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional, Tuple
 import base64
 
+import video_ingest
+import video_segment_cache
+
 # Import subprocess with fallback
 try:
     import subprocess
@@ -52,6 +60,153 @@ except ImportError:
     print("WARNING: Pillow not found. Image processing may be limited.")
 
 
+# Segments and cards rendered at once per video; 0 sizes the pool to this
+# render's share of the cores
+SEGMENT_WORKERS = int(os.environ.get("VIDEO_SEGMENT_WORKERS", 0))
+# Renders that can run at once on this host. video_render_worker sets it in
+# each render process so the processes split the cores between them instead
+# of each starting an FFmpeg per core.
+RENDER_PROCESSES = 1
+
+
+@dataclass(frozen=True)
+class RenderQuality:
+    """Resolution, frame rate, encoder settings and finishing passes for one kind of render"""
+    name: str
+    scale: float            # of the full 1080p-class dimensions
+    fps: int
+    preset: str             # x264 preset for photo/video segments
+    card_preset: str        # x264 preset for the intro/outro cards
+    crf: Optional[int]      # None keeps each segment type's own CRF
+    finishing_filters: bool  # unsharp + vignette passes
+    watermark: Optional[str] = None
+
+
+FINAL = RenderQuality("final", scale=1.0, fps=30, preset="medium", card_preset="fast", crf=None,
+                      finishing_filters=True)
+# Drafts are for checking headline, order and timing: a third of the
+# resolution, half the frame rate, ultrafast x264, no sharpen/vignette
+# passes, and a watermark so a preview is never mistaken for the final cut
+DRAFT = RenderQuality("draft", scale=1 / 3, fps=15, preset="ultrafast", card_preset="ultrafast", crf=28,
+                      finishing_filters=False, watermark="DRAFT PREVIEW")
+QUALITIES = {quality.name: quality for quality in (FINAL, DRAFT)}
+
+
+def _available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return os.cpu_count() or 1
+
+
+def _core_budget() -> int:
+    """Cores one render may keep busy: its share of the host's when several render at once"""
+    return max(1, _available_cores() // max(1, RENDER_PROCESSES))
+
+
+class RenderCancelled(Exception):
+    """A parallel render was stopped because another segment failed"""
+
+
+class SegmentPipeline:
+    """
+    Renders independent pieces of a video (photo segments, intro, outro) at
+    the same time and hands them back in the order they were given, for the
+    concat step.
+
+    Each piece is an FFmpeg subprocess, so threads are enough to keep every
+    core busy - and a render worker is a daemon process, which may not start
+    a multiprocessing pool of its own. On the first failure, pieces not yet
+    started are dropped, running FFmpeg processes are killed, and the
+    original error is raised once every thread has stopped.
+
+    Each FFmpeg gets -threads threads (x264 otherwise starts one per core),
+    so workers x threads stays within the render's core budget.
+    """
+
+    def __init__(self, workers: int, threads: int = 0):
+        self.workers = max(1, workers)
+        self.threads = threads
+        self.timings: List[Dict[str, Any]] = []
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+
+    def run_ffmpeg(self, cmd: List[str], check: bool = False) -> "subprocess.CompletedProcess":
+        """subprocess.run(cmd, capture_output=True, text=True), killed if the pipeline is cancelled"""
+        with self._lock:
+            if self._cancelled.is_set():
+                raise RenderCancelled()
+            if self.threads:
+                # Output options go right before the output path, the last argument
+                cmd = cmd[:-1] + ['-threads', str(self.threads), cmd[-1]]
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            self._processes.add(process)
+        try:
+            stdout, stderr = process.communicate()
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+        if self._cancelled.is_set():
+            raise RenderCancelled()
+        result = subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+        if check:
+            result.check_returncode()
+        return result
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled.set()
+            for process in self._processes:
+                process.kill()
+
+    def run(self, tasks: List[Tuple[str, Callable[[], Path]]],
+            on_done: Optional[Callable[[int, str], None]] = None) -> List[Path]:
+        """
+        Run (label, render function) tasks; each function returns the path it
+        wrote. Returns the paths in task order. on_done(count, label) is
+        called from this thread as each task finishes.
+        """
+        started = time.monotonic()
+
+        def timed(label: str, render: Callable[[], Path]) -> Path:
+            begin = time.monotonic()
+            path = render()
+            with self._lock:
+                self.timings.append({"label": label, "seconds": round(time.monotonic() - begin, 2)})
+            return path
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="video-segment")
+        try:
+            futures = [executor.submit(timed, label, render) for label, render in tasks]
+            labels = {future: label for future, (label, _) in zip(futures, tasks)}
+            pending, finished = set(futures), 0
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    error = future.exception()
+                    if error is not None:
+                        print(f"[VIDEO RENDERER] ✗ {labels[future]} failed; cancelling the other segments")
+                        for other in pending:
+                            other.cancel()
+                        self.cancel()
+                        raise error
+                    finished += 1
+                    if on_done:
+                        on_done(finished, labels[future])
+        finally:
+            # Waits for running tasks, which exit promptly once cancelled
+            executor.shutdown(wait=True)
+
+        wall = time.monotonic() - started
+        busy = sum(t["seconds"] for t in self.timings)
+        print(f"[VIDEO RENDERER] Rendered {len(tasks)} pieces in {wall:.1f}s with {self.workers} worker(s) "
+              f"x {self.threads or 'auto'} thread(s) ({busy:.1f}s of FFmpeg time, {busy / wall if wall else 1:.1f}x)")
+        for timing in self.timings:
+            print(f"[VIDEO RENDERER]   {timing['label']}: {timing['seconds']:.1f}s")
+        return [future.result() for future in futures]
+
+
 class VideoRenderer:
     """
     Handles video rendering using FFmpeg
@@ -61,6 +216,10 @@ class VideoRenderer:
     def __init__(self, output_dir: str = "generated_videos"):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        # Set while create_listing_video runs, so FFmpeg calls can be cancelled
+        # (one render at a time per renderer)
+        self._pipeline: Optional[SegmentPipeline] = None
+        self._quality: RenderQuality = FINAL
         
     def create_listing_video(
         self,
@@ -79,14 +238,27 @@ class VideoRenderer:
         include_captions: bool = True,
         video_type: str = "listing",  # listing, 3d-tour
         room_labels: Optional[List[str]] = None,  # For 3D tours
+        progress: Optional[Callable[[float, str], None]] = None,  # (fraction done, message)
+        quality: str = "final",  # final, draft
     ) -> Dict:
         """
         Generate a luxury real estate video
         
+        progress, if given, is called after each rendering step with the
+        fraction of steps done (0-1) and a short message for the status page.
+        
+        quality="draft" renders a fast, watermarked low-resolution preview
+        (see DRAFT) to video_<id>_<ratio>_draft.mp4; the final render of the
+        same settings goes to the usual file.
+        
+        Photo segments and the intro/outro cards render in parallel
+        (SegmentPipeline); per-piece timings come back under "timings".
+        
         Returns:
             {
                 "success": True/False,
                 "output_path": "path/to/video.mp4",
+                "timings": {"workers": 4, "threads_per_worker": 2, "wall_seconds": 41.2, "segments": [...]},
                 "error": "error message if failed"
             }
         """
@@ -104,7 +276,15 @@ class VideoRenderer:
                 "error": "FFmpeg is not installed. Please install FFmpeg or wait for Railway deployment to complete."
             }
         
+        if quality not in QUALITIES:
+            return {
+                "success": False,
+                "error": f"Unknown render quality: {quality}"
+            }
+        
         try:
+            self._quality = QUALITIES[quality]
+            
             # Calculate dimensions based on aspect ratio
             dimensions = self._get_dimensions(aspect_ratio)
             width, height = dimensions
@@ -112,6 +292,12 @@ class VideoRenderer:
             # Calculate duration per media item
             duration_per_item = duration / len(media_files)
             
+            # Steps: one per media item, intro, outro, final concat
+            total_steps = len(media_files) + 3
+            def report(done: int, message: str):
+                if progress:
+                    progress(round(done / total_steps, 3), message)
+            
             # Create temporary directory for processing
             with tempfile.TemporaryDirectory() as temp_dir:
                 temp_path = Path(temp_dir)
@@ -120,82 +306,77 @@ class VideoRenderer:
                 logo_path = self._save_base64_image(agent_logo, temp_path / "logo.png") if agent_logo else None
                 photo_path = self._save_base64_image(agent_photo, temp_path / "photo.png") if agent_photo else None
                 
-                # Generate video segments
-                segments = []
+                # Every segment and card is independent - render them side by side
+                tasks = []
                 for idx, media_file in enumerate(media_files):
                     segment_path = temp_path / f"segment_{idx}.mp4"
                     
-                    print(f"[VIDEO RENDERER] Processing media {idx+1}/{len(media_files)}: {media_file}")
-                    
                     # Get room label if provided
                     room_label = room_labels[idx] if room_labels and idx < len(room_labels) else None
                     
-                    if self._is_image(media_file):
-                        # Create video from image with appropriate effect
-                        if video_type == "3d-tour":
-                            # Use 3D-style effects for property tours
-                            self._create_3d_image_segment(
-                                media_file,
-                                segment_path,
-                                duration_per_item,
-                                width,
-                                height,
-                                style,
-                                room_label
-                            )
-                        else:
-                            # Use Ken Burns effect for regular listings
-                            self._create_image_segment(
-                                media_file,
-                                segment_path,
-                                duration_per_item,
-                                width,
-                                height,
-                                style
-                            )
-                    else:
-                        # Process video segment
-                        self._process_video_segment(
-                            media_file,
-                            segment_path,
-                            duration_per_item,
-                            width,
-                            height
-                        )
-                    
-                    if segment_path.exists():
-                        print(f"[VIDEO RENDERER] ✓ Segment {idx} created: {segment_path.stat().st_size} bytes")
-                        segments.append(segment_path)
-                    else:
-                        print(f"[VIDEO RENDERER] ✗ Segment {idx} NOT created!")
-                        raise Exception(f"Failed to create segment {idx} from {media_file}")
+                    tasks.append((f"segment {idx + 1}", functools.partial(
+                        self._render_media_segment,
+                        idx,
+                        len(media_files),
+                        media_file,
+                        segment_path,
+                        duration_per_item,
+                        width,
+                        height,
+                        style,
+                        video_type,
+                        room_label
+                    )))
                 
                 # Create intro card
                 intro_path = temp_path / "intro.mp4"
-                self._create_intro_card(
-                    intro_path,
-                    headline,
-                    property_address,
-                    logo_path,
-                    width,
-                    height,
-                    style,
-                    duration=3
-                )
+                def render_intro():
+                    self._create_intro_card(
+                        intro_path,
+                        headline,
+                        property_address,
+                        logo_path,
+                        width,
+                        height,
+                        style,
+                        duration=3
+                    )
+                    return intro_path
+                tasks.append(("intro card", render_intro))
                 
                 # Create outro card
                 outro_path = temp_path / "outro.mp4"
-                self._create_outro_card(
-                    outro_path,
-                    agent_name,
-                    agent_phone,
-                    logo_path,
-                    photo_path,
-                    width,
-                    height,
-                    style,
-                    duration=3
+                def render_outro():
+                    self._create_outro_card(
+                        outro_path,
+                        agent_name,
+                        agent_phone,
+                        logo_path,
+                        photo_path,
+                        width,
+                        height,
+                        style,
+                        duration=3
+                    )
+                    return outro_path
+                tasks.append(("outro card", render_outro))
+                
+                cores = _core_budget()
+                workers = min(SEGMENT_WORKERS or cores, len(tasks))
+                threads = max(1, cores // workers)
+                self._pipeline = SegmentPipeline(workers, threads)
+                render_started = time.monotonic()
+                rendered = self._pipeline.run(
+                    tasks,
+                    on_done=lambda count, label: report(count, f"Rendered {label} ({count} of {len(tasks)})"),
                 )
+                timings = {
+                    "workers": workers,
+                    "threads_per_worker": threads,
+                    "wall_seconds": round(time.monotonic() - render_started, 2),
+                    "segments": self._pipeline.timings,
+                }
+                segments = rendered[:len(media_files)]
                 
                 # ROBUST CONCATENATION - Works with ANY number of photos!
                 all_segments = [intro_path] + segments + [outro_path]
@@ -211,7 +392,8 @@ class VideoRenderer:
                         f.write(f"file '{seg_path}'\n")
                 
                 # Final output path
-                output_filename = f"video_{project_id}_{aspect_ratio.replace(':', 'x')}.mp4"
+                draft_suffix = "_draft" if self._quality.watermark else ""
+                output_filename = f"video_{project_id}_{aspect_ratio.replace(':', 'x')}{draft_suffix}.mp4"
                 output_path = self.output_dir / output_filename
                 
                 # Build LUXURY FFmpeg concat command (fast combine, already rendered segments!)
@@ -226,12 +408,13 @@ class VideoRenderer:
                 ]
                 
                 print(f"[VIDEO RENDERER] Rendering final video with {len(all_segments)} segments...")
-                result = subprocess.run(concat_cmd, check=True, capture_output=True, text=True)
+                result = self._run_ffmpeg(concat_cmd, check=True)
                 print(f"[VIDEO RENDERER] ✓ Final video created successfully!")
+                report(total_steps, "Final video assembled")
                 
                 # Add music if provided
                 if music_path and os.path.exists(music_path):
-                    output_with_music = self.output_dir / f"video_{project_id}_{aspect_ratio.replace(':', 'x')}_music.mp4"
+                    output_with_music = self.output_dir / f"video_{project_id}_{aspect_ratio.replace(':', 'x')}{draft_suffix}_music.mp4"
                     self._add_background_music(output_path, music_path, output_with_music)
                     output_path = output_with_music
                 
@@ -245,7 +428,9 @@ class VideoRenderer:
                 return {
                     "success": True,
                     "output_path": str(output_path),
-                    "filename": output_filename
+                    "filename": output_filename,
+                    "quality": quality,
+                    "timings": timings
                 }
                 
         except Exception as e:
@@ -253,15 +438,124 @@ class VideoRenderer:
                 "success": False,
                 "error": str(e)
             }
+        finally:
+            self._pipeline = None
+            self._quality = FINAL
+    
+    def _render_media_segment(
+        self,
+        idx: int,
+        count: int,
+        media_file: str,
+        segment_path: Path,
+        duration: float,
+        width: int,
+        height: int,
+        style: str,
+        video_type: str,
+        room_label: Optional[str] = None
+    ) -> Path:
+        """Render one photo or clip to segment_path (runs on a pipeline thread)"""
+        print(f"[VIDEO RENDERER] Processing media {idx+1}/{count}: {media_file}")
+        
+        if self._is_image(media_file):
+            # Create video from image with appropriate effect
+            if video_type == "3d-tour":
+                # Use 3D-style effects for property tours
+                self._create_3d_image_segment(
+                    media_file,
+                    segment_path,
+                    duration,
+                    width,
+                    height,
+                    style,
+                    room_label
+                )
+            else:
+                # Use Ken Burns effect for regular listings
+                self._create_image_segment(
+                    media_file,
+                    segment_path,
+                    duration,
+                    width,
+                    height,
+                    style
+                )
+        else:
+            # Process video segment
+            self._process_video_segment(
+                media_file,
+                segment_path,
+                duration,
+                width,
+                height
+            )
+        
+        if not segment_path.exists():
+            print(f"[VIDEO RENDERER] ✗ Segment {idx} NOT created!")
+            raise Exception(f"Failed to create segment {idx} from {media_file}")
+        print(f"[VIDEO RENDERER] ✓ Segment {idx} created: {segment_path.stat().st_size} bytes")
+        return segment_path
+    
+    def _run_ffmpeg(self, cmd: List[str], check: bool = False) -> "subprocess.CompletedProcess":
+        """Run an FFmpeg command, through the active pipeline so a failed render can stop it"""
+        if self._pipeline is not None:
+            return self._pipeline.run_ffmpeg(cmd, check=check)
+        return subprocess.run(cmd, check=check, capture_output=True, text=True)
+    
+    def _run_ffmpeg_cached(
+        self,
+        kind: str,
+        cmd: List[str],
+        output_path: Path,
+        source: Optional[str] = None,
+        check: bool = False
+    ) -> "subprocess.CompletedProcess":
+        """_run_ffmpeg, skipped entirely when the segment cache already holds this exact output"""
+        if not video_segment_cache.enabled():
+            return self._run_ffmpeg(cmd, check=check)
+        
+        key = video_segment_cache.command_key(cmd, output_path, source)
+        if video_segment_cache.fetch(kind, key, output_path):
+            print(f"[VIDEO RENDERER] ✓ Reused cached {kind} {key[:12]}")
+            return subprocess.CompletedProcess(cmd, 0, "", "")
+        
+        result = self._run_ffmpeg(cmd, check=check)
+        if result.returncode == 0 and output_path.exists():
+            video_segment_cache.store(kind, key, output_path)
+        return result
     
     def _get_dimensions(self, aspect_ratio: str) -> tuple:
-        """Get video dimensions for aspect ratio"""
+        """Get video dimensions for aspect ratio (scaled down for drafts)"""
         ratios = {
             "9:16": (1080, 1920),  # Reels/TikTok
             "16:9": (1920, 1080),  # YouTube
             "1:1": (1080, 1080)    # Square
         }
-        return ratios.get(aspect_ratio, (1080, 1920))
+        width, height = ratios.get(aspect_ratio, (1080, 1920))
+        return self._px(width, even=True), self._px(height, even=True)
+    
+    def _px(self, value: float, even: bool = False) -> int:
+        """A full-resolution pixel size at the current render quality"""
+        scaled = max(1, int(round(value * self._quality.scale)))
+        return scaled + scaled % 2 if even else scaled
+    
+    def _encoder_args(self, crf: int, card: bool = False) -> List[str]:
+        """x264 preset and CRF for the current render quality"""
+        quality = self._quality
+        return [
+            '-preset', quality.card_preset if card else quality.preset,
+            '-crf', str(quality.crf if quality.crf is not None else crf),
+        ]
+    
+    def _with_watermark(self, filters: List[str]) -> List[str]:
+        """Add the draft watermark (if any) as the last filter"""
+        if not self._quality.watermark:
+            return filters
+        return filters + [
+            f"drawtext=text='{self._quality.watermark}':fontsize={self._px(90)}:fontcolor=white@0.45:"
+            f"x=(w-text_w)/2:y=h-text_h-{self._px(80)}:box=1:boxcolor=black@0.25:boxborderw={self._px(16)}"
+        ]
     
     def _is_image(self, file_path: str) -> bool:
         """Check if file is an image"""
@@ -304,13 +598,21 @@ class VideoRenderer:
         import random
         
         # ULTRA-SIMPLE movements - guaranteed to work on Windows!
+        # Per-frame steps, scaled so a draft moves as far per second as the final
+        fps = self._quality.fps
+        step = 30 / fps
+        scale = self._quality.scale
         movements = [
-            f"z=zoom+0.001:x=iw/2-(iw/zoom/2):y=ih/2-(ih/zoom/2)",  # Zoom in (standard)
+            f"z=zoom+{0.001 * step:g}:x=iw/2-(iw/zoom/2):y=ih/2-(ih/zoom/2)",  # Zoom in (standard)
             f"z=1.12:x=iw/2-(iw/zoom/2):y=ih/2-(ih/zoom/2)",  # Static zoom centered
-            f"z=1.1:x=x+2:y=ih/2-(ih/zoom/2)",  # Pan right
-            f"z=1.08:x=iw/2-(iw/zoom/2):y=y+1",  # Pan down
+            f"z=1.1:x=x+{2 * scale * step:g}:y=ih/2-(ih/zoom/2)",  # Pan right
+            f"z=1.08:x=iw/2-(iw/zoom/2):y=y+{scale * step:g}",  # Pan down
         ]
-        movement = random.choice(movements)
+        # Same photo, same movement - keeps re-renders identical and cacheable
+        movement = random.Random(video_segment_cache.file_digest(image_path)).choice(movements)
+        
+        # FFmpeg re-reads a looped still every frame - give it a pre-scaled copy
+        source = video_ingest.prepare_image(image_path, width, height)
         
         # Build ULTRA-LUXURY filter chain - Magazine-quality presentation
         filters = [
@@ -318,33 +620,36 @@ class VideoRenderer:
             f"scale={width}:{height}:force_original_aspect_ratio=decrease",
             f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black",
             # 2. CINEMATIC MOVEMENT (Ken Burns effect)
-            f"zoompan={movement}:d={int(duration*30)}:s={width}x{height}:fps=30",
+            f"zoompan={movement}:d={int(duration*fps)}:s={width}x{height}:fps={fps}",
             # 3. HIGH-END COLOR GRADING (luxury magazine look)
             "eq=contrast=1.25:brightness=0.06:saturation=1.28:gamma=1.05",
-            # 4. CRYSTAL-SHARP CLARITY (premium definition)
-            "unsharp=9:9:2.0:9:9:0.2",
-            # 5. DRAMATIC VIGNETTE (cinematic depth)
-            "vignette=angle=PI/3.5:mode=forward",
-            # 6. SILKY-SMOOTH CROSSFADE TRANSITIONS (1.5 second luxury fade)
-            f"fade=t=in:st=0:d=1.5,fade=t=out:st={duration-1.5}:d=1.5"
         ]
+        if self._quality.finishing_filters:
+            filters.extend([
+                # 4. CRYSTAL-SHARP CLARITY (premium definition)
+                "unsharp=9:9:2.0:9:9:0.2",
+                # 5. DRAMATIC VIGNETTE (cinematic depth)
+                "vignette=angle=PI/3.5:mode=forward",
+            ])
+        # 6. SILKY-SMOOTH CROSSFADE TRANSITIONS (1.5 second luxury fade)
+        filters.append(f"fade=t=in:st=0:d=1.5,fade=t=out:st={duration-1.5}:d=1.5")
+        filters = self._with_watermark(filters)
         
         cmd = [
             'ffmpeg',
             '-loop', '1',
-            '-i', image_path,
+            '-i', source,
             '-vf', ','.join(filters),
             '-t', str(duration),
             '-c:v', 'libx264',
-            '-preset', 'medium',  # Balanced quality/speed
-            '-crf', '18',  # High quality (excellent balance)
+            *self._encoder_args(18),  # medium / crf 18: high quality, balanced speed
             '-pix_fmt', 'yuv420p',
             '-y',
             str(output_path)
         ]
         
         print(f"[VIDEO RENDERER] Creating LUXURY segment with cinematic effects...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_ffmpeg_cached("segment", cmd, output_path, source=source)
         if result.returncode != 0:
             print(f"ERROR: {result.stderr}")
             raise Exception(f"Segment creation failed: {result.stderr}")
@@ -365,7 +670,11 @@ class VideoRenderer:
         import random
         
         # Choose random 3D effect (using DIFFERENT filters for variety!)
-        effect_type = random.choice(['perspective', 'tilt', 'zoom'])
+        # (seeded by the photo, so re-renders are identical and cacheable)
+        effect_type = random.Random(video_segment_cache.file_digest(image_path)).choice(['perspective', 'tilt', 'zoom'])
+        
+        # FFmpeg re-reads a looped still every frame - give it a pre-scaled copy
+        source = video_ingest.prepare_image(image_path, width, height)
         
         # Build ULTRA-3D filter chain - SHOW COMPLETE PHOTO with elegant transitions
         filters = [
@@ -384,45 +693,48 @@ class VideoRenderer:
             filters.append("rotate=angle=-0.5*PI/180:fillcolor=black")
         
         # ZOOMPAN with simple working expression
-        movement = f"z=zoom+0.002:x=iw/2-(iw/zoom/2):y=ih/2-(ih/zoom/2)"
-        filters.append(f"zoompan={movement}:d={int(duration*30)}:s={width}x{height}:fps=30")
+        fps = self._quality.fps
+        movement = f"z=zoom+{0.002 * 30 / fps:g}:x=iw/2-(iw/zoom/2):y=ih/2-(ih/zoom/2)"
+        filters.append(f"zoompan={movement}:d={int(duration*fps)}:s={width}x{height}:fps={fps}")
         
         # ULTRA-LUXURY 3D DEPTH EFFECTS
-        filters.extend([
-            # DRAMATIC ARCHITECTURAL COLOR GRADING (high-end magazine look)
-            "eq=contrast=1.28:brightness=0.07:saturation=1.32:gamma=1.08",
-            # RAZOR-SHARP CLARITY (maximum 3D definition)
-            "unsharp=11:11:2.5:11:11:0.3",
-            # CINEMATIC VIGNETTE (creates dramatic depth focus)
-            "vignette=angle=PI/3:mode=forward",
-            # PREMIUM CROSSFADE TRANSITIONS (1.8 second buttery-smooth fade)
-            f"fade=t=in:st=0:d=1.8,fade=t=out:st={duration-1.8}:d=1.8"
-        ])
+        # DRAMATIC ARCHITECTURAL COLOR GRADING (high-end magazine look)
+        filters.append("eq=contrast=1.28:brightness=0.07:saturation=1.32:gamma=1.08")
+        if self._quality.finishing_filters:
+            filters.extend([
+                # RAZOR-SHARP CLARITY (maximum 3D definition)
+                "unsharp=11:11:2.5:11:11:0.3",
+                # CINEMATIC VIGNETTE (creates dramatic depth focus)
+                "vignette=angle=PI/3:mode=forward",
+            ])
+        # PREMIUM CROSSFADE TRANSITIONS (1.8 second buttery-smooth fade)
+        filters.append(f"fade=t=in:st=0:d=1.8,fade=t=out:st={duration-1.8}:d=1.8")
         
         # Add room label if provided
         if room_label:
             # Clean label text - remove ALL special characters
             label_clean = room_label.replace("'", "").replace(":", "").replace('"', '').replace("\\", "").replace(",", "")[:30]
             # ULTRA-LUXURY ROOM LABEL with premium styling
-            label_filter = f"drawtext=text='{label_clean}':fontsize=95:fontcolor=white@0.99:x=(w-text_w)/2:y=110:shadowcolor=#d4af37@0.95:shadowx=8:shadowy=8:box=1:boxcolor=black@0.7:boxborderw=20"
+            px = self._px
+            label_filter = f"drawtext=text='{label_clean}':fontsize={px(95)}:fontcolor=white@0.99:x=(w-text_w)/2:y={px(110)}:shadowcolor=#d4af37@0.95:shadowx={px(8)}:shadowy={px(8)}:box=1:boxcolor=black@0.7:boxborderw={px(20)}"
             filters.append(label_filter)
+        filters = self._with_watermark(filters)
         
         cmd = [
             'ffmpeg',
             '-loop', '1',
-            '-i', image_path,
+            '-i', source,
             '-vf', ','.join(filters),
             '-t', str(duration),
             '-c:v', 'libx264',
-            '-preset', 'medium',  # Balanced quality/speed
-            '-crf', '17',  # High quality (excellent)
+            *self._encoder_args(17),  # medium / crf 17: high quality (excellent)
             '-pix_fmt', 'yuv420p',
             '-y',
             str(output_path)
         ]
         
         print(f"[VIDEO RENDERER] Creating ULTRA-LUXURY 3D segment{' with room label' if room_label else ''}...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_ffmpeg_cached("segment", cmd, output_path, source=source)
         if result.returncode != 0:
             print(f"ERROR: {result.stderr}")
             raise Exception(f"3D segment failed: {result.stderr}")
@@ -438,20 +750,30 @@ class VideoRenderer:
     ):
         """Process video segment - resize and trim"""
         
+        filters = [f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}"]
+        if self._quality.fps != FINAL.fps:
+            filters.append(f"fps={self._quality.fps}")
+        
         cmd = [
             'ffmpeg',
             '-i', video_path,
-            '-vf', f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height}",
+            '-vf', ','.join(self._with_watermark(filters)),
             '-t', str(duration),
             '-c:v', 'libx264',
-            '-preset', 'medium',
-            '-crf', '23',
+            *self._encoder_args(23),
             '-c:a', 'aac',
             '-y',
             str(output_path)
         ]
         
-        subprocess.run(cmd, check=True, capture_output=True)
+        self._run_ffmpeg_cached("segment", cmd, output_path, source=video_path, check=True)
+    
+    def _card_source(self, bg_color: str, width: int, height: int, duration: float) -> str:
+        """lavfi color source for a title card, at the current frame rate"""
+        source = f"color=c={bg_color}:s={width}x{height}:d={duration}"
+        if self._quality.fps != FINAL.fps:
+            source += f":r={self._quality.fps}"
+        return source
     
     def _create_intro_card(
         self,
@@ -479,37 +801,37 @@ class VideoRenderer:
         address_clean = address.replace("'", "").replace('"', '').replace(":", " ").replace("\\", "").replace(",", " ")[:60]
         
         # Calculate positions for center alignment
-        headline_y = int(height / 2 - 120)
-        line_y = int(height / 2 - 20)
-        address_y = int(height / 2 + 60)
+        px = self._px
+        headline_y = int(height / 2 - px(120))
+        line_y = int(height / 2 - px(20))
+        address_y = int(height / 2 + px(60))
         
         # Build ULTRA-LUXURY text overlay filter
         text_filters = [
             # Elegant fade in background
             f"fade=t=in:st=0:d=1.2",
             # HEADLINE - Large, bold, premium white with dramatic shadow
-            f"drawtext=text='{headline_clean}':fontsize=130:fontcolor=white@0.99:x=(w-text_w)/2:y={headline_y}:shadowcolor=black@0.95:shadowx=7:shadowy=7",
+            f"drawtext=text='{headline_clean}':fontsize={px(130)}:fontcolor=white@0.99:x=(w-text_w)/2:y={headline_y}:shadowcolor=black@0.95:shadowx={px(7)}:shadowy={px(7)}",
             # PREMIUM GOLDEN ACCENT LINE (thicker, brighter)
-            f"drawbox=x=(w-450)/2:y={line_y}:w=450:h=8:color=#d4af37@0.98:t=fill",
+            f"drawbox=x=(w-{px(450)})/2:y={line_y}:w={px(450)}:h={px(8)}:color=#d4af37@0.98:t=fill",
             # ADDRESS - Elegant golden text with glow effect
-            f"drawtext=text='{address_clean}':fontsize=75:fontcolor=#d4af37@0.99:x=(w-text_w)/2:y={address_y}:shadowcolor=black@0.85:shadowx=4:shadowy=4"
+            f"drawtext=text='{address_clean}':fontsize={px(75)}:fontcolor=#d4af37@0.99:x=(w-text_w)/2:y={address_y}:shadowcolor=black@0.85:shadowx={px(4)}:shadowy={px(4)}"
         ]
         
         cmd = [
             'ffmpeg',
             '-f', 'lavfi',
-            '-i', f"color=c={bg_color}:s={width}x{height}:d={duration}",
-            '-vf', ','.join(text_filters),
+            '-i', self._card_source(bg_color, width, height, duration),
+            '-vf', ','.join(self._with_watermark(text_filters)),
             '-c:v', 'libx264',
-            '-preset', 'fast',  # Fast for text cards
-            '-crf', '20',
+            *self._encoder_args(20, card=True),  # fast / crf 20 for text cards
             '-pix_fmt', 'yuv420p',
             '-y',
             str(output_path)
         ]
         
         print(f"[VIDEO RENDERER] Creating ULTRA-LUXURY intro card...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_ffmpeg_cached("card", cmd, output_path)
         if result.returncode != 0:
             print(f"ERROR: {result.stderr}")
             raise Exception(f"Intro card failed: {result.stderr}")
@@ -536,40 +858,40 @@ class VideoRenderer:
         phone_clean = agent_phone.replace("'", "").replace('"', '').replace(":", " ").replace("\\", "").replace(",", "")[:20]
         
         # Calculate positions
-        name_y = int(height / 2 - 140)
-        line_y = int(height / 2 - 30)
-        phone_y = int(height / 2 + 40)
-        cta_y = int(height / 2 + 140)
+        px = self._px
+        name_y = int(height / 2 - px(140))
+        line_y = int(height / 2 - px(30))
+        phone_y = int(height / 2 + px(40))
+        cta_y = int(height / 2 + px(140))
         
         # Build ULTRA-LUXURY outro filter
         text_filters = [
             # Elegant fade in
             f"fade=t=in:st=0:d=1.2",
             # AGENT NAME - Bold premium white with golden glow
-            f"drawtext=text='{name_clean}':fontsize=120:fontcolor=white@0.99:x=(w-text_w)/2:y={name_y}:shadowcolor=#d4af37@0.9:shadowx=6:shadowy=6",
+            f"drawtext=text='{name_clean}':fontsize={px(120)}:fontcolor=white@0.99:x=(w-text_w)/2:y={name_y}:shadowcolor=#d4af37@0.9:shadowx={px(6)}:shadowy={px(6)}",
             # PREMIUM GOLDEN ACCENT LINE (thicker)
-            f"drawbox=x=(w-550)/2:y={line_y}:w=550:h=8:color=#d4af37@0.98:t=fill",
+            f"drawbox=x=(w-{px(550)})/2:y={line_y}:w={px(550)}:h={px(8)}:color=#d4af37@0.98:t=fill",
             # PHONE - Prominent golden text with glow
-            f"drawtext=text='{phone_clean}':fontsize=85:fontcolor=#d4af37@0.99:x=(w-text_w)/2:y={phone_y}:shadowcolor=black@0.9:shadowx=5:shadowy=5",
+            f"drawtext=text='{phone_clean}':fontsize={px(85)}:fontcolor=#d4af37@0.99:x=(w-text_w)/2:y={phone_y}:shadowcolor=black@0.9:shadowx={px(5)}:shadowy={px(5)}",
             # CALL TO ACTION - Elegant white with emphasis
-            f"drawtext=text='Contact Me Today':fontsize=70:fontcolor=white@0.95:x=(w-text_w)/2:y={cta_y}:shadowcolor=black@0.85:shadowx=4:shadowy=4"
+            f"drawtext=text='Contact Me Today':fontsize={px(70)}:fontcolor=white@0.95:x=(w-text_w)/2:y={cta_y}:shadowcolor=black@0.85:shadowx={px(4)}:shadowy={px(4)}"
         ]
         
         cmd = [
             'ffmpeg',
             '-f', 'lavfi',
-            '-i', f"color=c={bg_color}:s={width}x{height}:d={duration}",
-            '-vf', ','.join(text_filters),
+            '-i', self._card_source(bg_color, width, height, duration),
+            '-vf', ','.join(self._with_watermark(text_filters)),
             '-c:v', 'libx264',
-            '-preset', 'fast',  # Fast for text cards
-            '-crf', '20',
+            *self._encoder_args(20, card=True),  # fast / crf 20 for text cards
             '-pix_fmt', 'yuv420p',
             '-y',
             str(output_path)
         ]
         
         print(f"[VIDEO RENDERER] Creating ULTRA-LUXURY outro card...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run_ffmpeg_cached("card", cmd, output_path)
         if result.returncode != 0:
             print(f"ERROR: {result.stderr}")
             raise Exception(f"Outro card failed: {result.stderr}")
@@ -600,5 +922,5 @@ class VideoRenderer:
 
 
 # Export
-__all__ = ['VideoRenderer']
+__all__ = ['DRAFT', 'FINAL', 'QUALITIES', 'RenderCancelled', 'RenderQuality', 'SegmentPipeline', 'VideoRenderer']
 